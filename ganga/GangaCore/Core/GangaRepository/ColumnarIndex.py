@@ -0,0 +1,485 @@
+"""
+A single append-only index file for a repository which replaces the per object <id>.index pickles.
+
+The file starts with a fixed header followed by transactions. Each transaction is a header, a column of fixed-width
+records (id, kind, status, category, class name and the size of the rest of the entry) and a blob holding, for each
+record, the subjob status vector (one byte per subjob) and a json payload with the remaining index cache fields.
+A transaction only counts once all of it has been written and its checksum matches, so a session which crashes part
+way through writing leaves a torn tail which readers ignore and the next writer overwrites.
+
+The records of a transaction are unpacked in one go straight from an mmap of the file. The payloads are only decoded
+when an index cache is first looked at, so opening a repository doesn't pay for the display columns of every object.
+"""
+
+import gc
+import os
+import json
+import mmap
+import zlib
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from GangaCore.Core.exceptions import RepositoryError
+from GangaCore.Core.GangaRepository.SessionLock import global_disk_lock
+from GangaCore.Utility.logging import getLogger
+
+logger = getLogger()
+
+FILE_MAGIC = b'GANGAIDX'
+FILE_VERSION = 1
+# magic, version, padding
+FILE_HEADER = struct.Struct('!8sH6x')
+# marker, number of records, size of the blob, crc32 of the records and blob
+TXN_HEADER = struct.Struct('!4sIII')
+TXN_MARKER = b'TXN1'
+# id, kind, status code, category, class name, length of the subjob status vector, length of the json payload
+RECORD = struct.Struct('!IBB24s40sII')
+RECORD_NAME_SIZES = (24, 40)
+
+ENTRY, DELETED = 1, 2
+
+# Status values stored as a single byte, anything not in here is kept in the json payload
+STATUS_CODES = ('new', 'submitting', 'submitted', 'running', 'completing', 'completed', 'failed', 'killed',
+                'incomplete', 'unknown', 'template', 'removed', 'completed_frozen', 'failed_frozen')
+NO_STATUS = 255
+_status_to_code = dict((status, code) for code, status in enumerate(STATUS_CODES))
+
+# Rewrite the file on shutdown once it is this many times larger than the live entries in it
+COMPACT_RATIO = 2
+COMPACT_MIN_SIZE = 1024 * 1024
+
+
+class IndexCache(dict):
+
+    """
+    The index cache of an object as read from the index file.
+    The json payload is only decoded the first time the cache is used, apart from looking up the status which is kept
+    in the fixed-width record.
+    """
+
+    __slots__ = ('_raw',)
+
+    def __init__(self, raw):
+        """
+        Args:
+            raw (tuple): (status code, blob, start of the vector in the blob, vector length, payload length) or None if
+                the cache has been filled in already
+        """
+        self._raw = raw
+
+    def _decode(self):
+        if self._raw is None:
+            return
+        (status_code, blob, start, vector_len, payload_len), self._raw = self._raw, None
+        vector_end = start + vector_len
+        dict.update(self, json.loads(blob[vector_end:vector_end + payload_len].decode('utf-8')))
+        if status_code != NO_STATUS:
+            dict.__setitem__(self, 'status', STATUS_CODES[status_code])
+        if vector_len:
+            dict.__setitem__(self, 'subjobs:status', [STATUS_CODES[c] for c in bytearray(blob[start:vector_end])])
+
+    def _status(self):
+        """ Returns the status without decoding the payload, or None if it's in the payload """
+        if self._raw is not None and self._raw[0] != NO_STATUS:
+            return STATUS_CODES[self._raw[0]]
+        return None
+
+    def __getitem__(self, key):
+        if key == 'status' and self._status() is not None:
+            return self._status()
+        self._decode()
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key == 'status' and self._status() is not None:
+            return self._status()
+        self._decode()
+        return dict.get(self, key, default)
+
+    def __contains__(self, key):
+        self._decode()
+        return dict.__contains__(self, key)
+
+    def __iter__(self):
+        self._decode()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._decode()
+        return dict.__len__(self)
+
+    def __eq__(self, other):
+        self._decode()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        self._decode()
+        return dict.__ne__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._decode()
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+        return (dict, (dict(self.items()),))
+
+    def keys(self):
+        self._decode()
+        return dict.keys(self)
+
+    def values(self):
+        self._decode()
+        return dict.values(self)
+
+    def items(self):
+        self._decode()
+        return dict.items(self)
+
+    def copy(self):
+        self._decode()
+        return dict.copy(self)
+
+    def __setitem__(self, key, value):
+        self._decode()
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._decode()
+        dict.__delitem__(self, key)
+
+    def setdefault(self, key, default=None):
+        self._decode()
+        return dict.setdefault(self, key, default)
+
+    def pop(self, *args):
+        self._decode()
+        return dict.pop(self, *args)
+
+    def update(self, *args, **kwargs):
+        self._decode()
+        dict.update(self, *args, **kwargs)
+
+
+def encode_entry(category, classname, cache):
+    """
+    Returns the (status code, category, class name, vector, payload) an index entry is stored as
+    Args:
+        category (str): The category of the object
+        classname (str): The class name of the object
+        cache (dict): The index cache of the object as returned by Registry.getIndexCache
+    """
+    fields = dict(cache)
+    cat_raw = category.encode('utf-8')
+    cls_raw = classname.encode('utf-8')
+    if not cat_raw or len(cat_raw) > RECORD_NAME_SIZES[0] or len(cls_raw) > RECORD_NAME_SIZES[1]:
+        # Names which don't fit in the record are kept in the payload along with everything else
+        payload = json.dumps({'__category__': category, '__class__': classname, '__cache__': fields},
+                             separators=(',', ':'), default=str).encode('utf-8')
+        return NO_STATUS, b'', b'', b'', payload
+    status_code = NO_STATUS
+    if fields.get('status') in _status_to_code:
+        status_code = _status_to_code[fields.pop('status')]
+    vector = b''
+    sj_status = fields.get('subjobs:status')
+    if isinstance(sj_status, (list, tuple)) and sj_status and all(s in _status_to_code for s in sj_status):
+        vector = bytes(bytearray(_status_to_code[s] for s in sj_status))
+        del fields['subjobs:status']
+    payload = json.dumps(fields, separators=(',', ':'), default=str).encode('utf-8')
+    return status_code, cat_raw, cls_raw, vector, payload
+
+
+# Decoded category and class names keyed by the raw fixed-width record fields
+_names = {}
+
+
+def _make_entry(status_code, cat_raw, cls_raw, blob, start, vector_len, payload_len):
+    """ Returns the (category, class name, index cache) for a record """
+    cache = IndexCache((status_code, blob, start, vector_len, payload_len))
+    try:
+        return _names[cat_raw], _names[cls_raw], cache
+    except KeyError:
+        pass
+    if not cat_raw.rstrip(b'\0'):
+        payload = json.loads(blob[start:start + payload_len].decode('utf-8'))
+        cache = IndexCache(None)
+        dict.update(cache, payload['__cache__'])
+        return payload['__category__'], payload['__class__'], cache
+    _names[cat_raw] = cat_raw.rstrip(b'\0').decode('utf-8')
+    _names[cls_raw] = cls_raw.rstrip(b'\0').decode('utf-8')
+    return _names[cat_raw], _names[cls_raw], cache
+
+
+def normalise_cache(cache):
+    """ Returns the index cache as it will be read back from the index file, e.g. with tuples as lists """
+    status_code, _, _, vector, payload = encode_entry('-', '-', cache)
+    return dict(IndexCache((status_code, vector + payload, 0, len(vector), len(payload))).items())
+
+
+class ColumnarIndex(object):
+
+    """
+    The index file of a single repository.
+    refresh() returns the entries committed since the previous call, including those written by other sessions, and
+    write()/delete() stage records which are appended as one transaction when the enclosing transaction() ends.
+    """
+
+    def __init__(self, filename, use_locks=True, session_lock=None):
+        """
+        Args:
+            filename (str): The index file, created if it doesn't exist
+            use_locks (bool): Lock the file while writing, this is needed if more than one session may write
+            session_lock (SessionLockManager): The session locks of the repository, on AFS its global lock is held while
+                writing as file locks aren't seen by other clients there
+        """
+        self.filename = filename
+        self.use_locks = use_locks and fcntl is not None
+        self._session_lock = session_lock
+        self._fd = None
+        self._inode = None
+        self._offset = 0
+        self._unseen = []
+        self._staged = []
+        self._depth = 0
+        self._live = {}
+        self._lock = threading.RLock()
+
+    def _open(self):
+        """ Open the file, writing the header if it is new. Returns True if the file has been (re)opened """
+        try:
+            inode = os.stat(self.filename).st_ino
+        except OSError:
+            inode = None
+        if self._fd is not None and inode == self._inode:
+            return False
+        self.close()
+        self._fd = os.open(self.filename, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._flock():
+            if os.fstat(self._fd).st_size < FILE_HEADER.size:
+                os.ftruncate(self._fd, 0)
+                self._write_all(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION), 0)
+        self._inode = os.fstat(self._fd).st_ino
+        self._offset = FILE_HEADER.size
+        self._live = {}
+        return True
+
+    def close(self):
+        """ Close the file, staged records which haven't been committed are lost """
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+            self._fd = None
+            self._inode = None
+
+    @contextmanager
+    def _flock(self):
+        """
+        Lock the file against writers in other sessions the same way as the session locks. On NFS only lockf, not flock,
+        is seen by other clients and on AFS neither is so the global AFS lock is taken instead.
+        Raises RepositoryError if the lock can't be taken, writing without it could lose the commits of other sessions
+        """
+        if not self.use_locks:
+            yield
+            return
+        if getattr(self._session_lock, 'afs', False):
+            with global_disk_lock.global_lock:
+                self._session_lock.afs_lock_require()
+                try:
+                    yield
+                finally:
+                    self._session_lock.afs_lock_release()
+            return
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        except (IOError, OSError) as err:
+            raise RepositoryError(self._session_lock.repo, "Unable to lock the index file %s: %s" % (self.filename, err))
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _write_all(self, data, offset):
+        os.lseek(self._fd, offset, os.SEEK_SET)
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+
+    def _read_committed(self):
+        """
+        Read the transactions committed after our offset and move the offset past them.
+        Returns a list of (id, entry) where entry is (category, class name, index cache) or None for a deleted id
+        """
+        size = os.fstat(self._fd).st_size
+        if size <= self._offset:
+            return []
+        # Only the latest record for each id matters
+        latest = {}
+        mm = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ)
+        # Building an index cache for every job would otherwise trigger many collections which each walk all of the
+        # objects already loaded, none of what we create here is part of a cycle
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            if self._offset == FILE_HEADER.size and FILE_HEADER.unpack_from(mm) != (FILE_MAGIC, FILE_VERSION):
+                logger.warning("Ignoring index file %s with unknown format" % self.filename)
+                self._offset = size
+                return []
+            pos = self._offset
+            while pos + TXN_HEADER.size <= size:
+                marker, count, blob_size, crc = TXN_HEADER.unpack_from(mm, pos)
+                records_start = pos + TXN_HEADER.size
+                blob_start = records_start + count * RECORD.size
+                end = blob_start + blob_size
+                if marker != TXN_MARKER or end > size or zlib.crc32(mm[records_start:end]) & 0xffffffff != crc:
+                    break
+                blob = mm[blob_start:end]
+                start = 0
+                for this_id, kind, status_code, cat_raw, cls_raw, vector_len, payload_len in RECORD.iter_unpack(mm[records_start:blob_start]):
+                    if kind == ENTRY:
+                        try:
+                            latest[this_id] = _make_entry(status_code, cat_raw, cls_raw, blob, start, vector_len, payload_len)
+                            self._live[this_id] = RECORD.size + vector_len + payload_len
+                        except (ValueError, KeyError, UnicodeDecodeError) as err:
+                            logger.debug("Skipping unreadable index entry for %s: %s" % (this_id, err))
+                    else:
+                        latest[this_id] = None
+                        self._live.pop(this_id, None)
+                    start += vector_len + payload_len
+                pos = self._offset = end
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+            mm.close()
+
+        return list(latest.items())
+
+    def refresh(self):
+        """
+        Returns a list of (id, entry) for every transaction committed since the previous call, where entry is
+        (category, class name, index cache) or None if the object has been deleted.
+        If the file has been rewritten since it was last read every live entry is returned again.
+        """
+        with self._lock:
+            self._open()
+            results = self._unseen + self._read_committed()
+            self._unseen = []
+            return results
+
+    def write(self, this_id, category, classname, cache):
+        """ Stage the index of an object, it's written when the current transaction ends """
+        with self.transaction():
+            self._staged.append((this_id, ENTRY) + encode_entry(category, classname, cache))
+
+    def delete(self, this_id):
+        """ Stage the removal of an object from the index """
+        with self.transaction():
+            self._staged.append((this_id, DELETED, NO_STATUS, b'', b'', b'', b''))
+
+    @contextmanager
+    def transaction(self):
+        """ Records staged inside this block, and any nested ones, are committed together when it exits """
+        with self._lock:
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0 and self._staged:
+                    staged, self._staged = self._staged, []
+                    try:
+                        self._commit(staged)
+                    except RepositoryError:
+                        # Keep the records so the next transaction commits them once the file can be locked again
+                        self._staged[:0] = staged
+                        raise
+                    except (IOError, OSError) as err:
+                        # The index is rebuilt from the objects themselves if it is missing so this isn't fatal
+                        logger.error("Failed to write to the index file %s: %s" % (self.filename, err))
+
+    @staticmethod
+    def _encode_transaction(staged):
+        """ Returns the bytes of a transaction holding the staged records """
+        records = b''.join(RECORD.pack(this_id, kind, status_code, cat_raw, cls_raw, len(vector), len(payload))
+                           for this_id, kind, status_code, cat_raw, cls_raw, vector, payload in staged)
+        blob = b''.join(vector + payload for _, _, _, _, _, vector, payload in staged)
+        crc = zlib.crc32(blob, zlib.crc32(records)) & 0xffffffff
+        return TXN_HEADER.pack(TXN_MARKER, len(staged), len(blob), crc) + records + blob
+
+    def _isCurrent(self):
+        """ Is the open file still the one at self.filename, i.e. it hasn't been compacted by another session """
+        try:
+            return os.stat(self.filename).st_ino == self._inode
+        except OSError:
+            return False
+
+    def _commit(self, staged):
+        """ Append the staged records as one transaction """
+        data = self._encode_transaction(staged)
+        while True:
+            self._open()
+            with self._flock():
+                if not self._isCurrent():
+                    continue
+                # Pick up anything other sessions committed first so we don't skip it, this also finds the end of the
+                # last complete transaction which is where we append
+                self._unseen.extend(self._read_committed())
+                if os.fstat(self._fd).st_size != self._offset:
+                    os.ftruncate(self._fd, self._offset)
+                self._write_all(data, self._offset)
+                self._offset += len(data)
+                break
+        for this_id, kind, _, _, _, vector, payload in staged:
+            if kind == ENTRY:
+                self._live[this_id] = RECORD.size + len(vector) + len(payload)
+            else:
+                self._live.pop(this_id, None)
+
+    def needsCompacting(self):
+        """ Is the file much larger than the live entries it holds """
+        with self._lock:
+            if self._fd is None:
+                return False
+            size = os.fstat(self._fd).st_size
+            return size > COMPACT_MIN_SIZE and size > COMPACT_RATIO * (sum(self._live.values()) + FILE_HEADER.size)
+
+    def compact(self, entries):
+        """
+        Replace the file with one holding just the given entries. Other sessions notice the new file and read it again.
+        Args:
+            entries (dict): id -> (category, class name, index cache) of every object in the repository
+        """
+        with self._lock:
+            entries = dict(entries)
+            while True:
+                self._open()
+                with self._flock():
+                    if not self._isCurrent():
+                        continue
+                    # Other sessions may have committed since the caller took its snapshot, they must not be lost
+                    committed = self._read_committed()
+                    self._unseen.extend(committed)
+                    for this_id, entry in committed:
+                        if entry is None:
+                            entries.pop(this_id, None)
+                        else:
+                            entries[this_id] = entry
+                    staged = [(this_id, ENTRY) + encode_entry(*entries[this_id]) for this_id in sorted(entries)]
+                    data = FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION) + self._encode_transaction(staged)
+                    tmp_name = self.filename + '.tmp'
+                    with open(tmp_name, 'wb') as f:
+                        f.write(data)
+                        # The rename mustn't reach the disk before the data or a crash could leave an empty index
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.rename(tmp_name, self.filename)
+                    break
+            self._open()
+            self._read_committed()
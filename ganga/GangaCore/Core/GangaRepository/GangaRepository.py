@@ -144,6 +144,37 @@ class GangaRepository(object):
         """
         raise NotImplementedError
 
+    def wait_for_index(self, ids=None):
+        """wait_for_index(ids = None) --> None
+        Block until the objects with the given ids (or all objects if None) have been created from their index.
+        Only needed by repositories which keep loading their index in the background after startup()
+        Args:
+            ids (list, None): The object keys which we want to wait for
+        """
+        pass
+
+    def pending_ids(self):
+        """pending_ids() --> list of ids
+        Returns the ids of objects which are known to be in the repository but whose index is still being loaded
+        """
+        return []
+
+    def loaded_ids(self):
+        """loaded_ids() --> set of ids or None
+        Returns the ids of the objects which have been fully loaded into memory, or None if the repository doesn't know.
+        The objects which aren't loaded are described by their index cache
+        """
+        return None
+
+    def select_ids(self, query):
+        """select_ids(query) --> set of ids or None
+        Returns the ids of the objects which may match the query, if the repository can tell without looking at the
+        objects themselves, otherwise None. The objects it returns are still checked against the query by the caller.
+        Args:
+            query (dict): attribute name: (value, is_pattern), a pattern is matched as by fnmatch
+        """
+        return None
+
 
 # Optional but suggested functions
     def get_lock_session(self, id):
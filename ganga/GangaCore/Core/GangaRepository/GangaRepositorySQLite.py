@@ -1,182 +1,637 @@
-
 # Note: Following stuff must be considered in a GangaRepository:
 #
 # * lazy loading
 # * locking
 
-from .GangaRepository import GangaRepository, RepositoryError
+"""
+A GangaRepository which keeps all of the objects of a registry in a single SQLite database.
+
+Every root object is a row of the objects table, and so is every subjob, with the id of its master job in the parent
+column (root objects have parent -1). The XML of an object is stored in the data column as the VStreamer writes it and
+the index cache is stored pickled in the idx column. The status, name, backend and application of every object are
+kept in indexed columns of their own so that selections such as jobs.select(status='running') are a single query.
+
+The database is used in WAL mode so that other sessions can read while one is writing, and all of the objects flushed
+together are written in one transaction with the same few parameterised statements, which sqlite3 keeps compiled.
+
+Instead of the session and lock files of the SessionLockManager the sessions, and the ids each of them has locked, are
+rows of the sessions and locks tables. Every session updates its heartbeat from a thread and the locks of a session
+whose heartbeat is older than [Configuration]DiskIOTimeout are released by the next session to take a lock.
+"""
+
+from GangaCore.Core.GangaRepository import GangaRepository, RepositoryError, InaccessibleObjectError
 import os
 import os.path
-
+import time
+import errno
+import pickle
 import sqlite3
+import datetime
+import threading
+import contextlib
+from io import StringIO
 
-try:
-    import pickle as pickle
-except:
-    import pickle
+from GangaCore.Core.GangaThread import GangaThread
+from GangaCore.Core.GangaRepository.VStreamer import to_file as xml_to_file
+from GangaCore.Core.GangaRepository.VStreamer import from_file as xml_from_file
+from GangaCore.Core.GangaRepository.VStreamer import EmptyGangaObject
+from GangaCore.Core.GangaRepository.ColumnarIndex import normalise_cache
+from GangaCore.GPIDev.Base.Objects import Node
+from GangaCore.GPIDev.Base.Proxy import isType, getName
+from GangaCore.Utility.Config import getConfig
 
 import GangaCore.Utility.logging
 logger = GangaCore.Utility.logging.getLogger()
 
+# The parent of root objects in the objects table
+NO_PARENT = -1
+
+_schema_statements = (
+    "CREATE TABLE IF NOT EXISTS objects (id INTEGER NOT NULL, parent INTEGER NOT NULL DEFAULT -1, "
+    "classname TEXT NOT NULL, category TEXT NOT NULL, status TEXT, name TEXT, backend TEXT, application TEXT, "
+    "idx BLOB, data TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (parent, id))",
+    "CREATE INDEX IF NOT EXISTS objects_status ON objects (parent, status)",
+    "CREATE INDEX IF NOT EXISTS objects_name ON objects (parent, name)",
+    "CREATE INDEX IF NOT EXISTS objects_backend ON objects (parent, backend)",
+    "CREATE INDEX IF NOT EXISTS objects_application ON objects (parent, application)",
+    "CREATE TABLE IF NOT EXISTS counter (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS sessions (session TEXT PRIMARY KEY, info TEXT NOT NULL, heartbeat REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS locks (id INTEGER PRIMARY KEY, session TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS locks_session ON locks (session)",
+)
+
+# The attributes which have a column of their own, those which are components are stored by class name
+_column_attrs = ('status', 'name', 'backend', 'application')
+_component_columns = ('backend', 'application')
+
+_upsert_object = ("INSERT OR REPLACE INTO objects (id, parent, classname, category, status, name, backend, application, idx, data, version) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE((SELECT version FROM objects WHERE parent = ? AND id = ?), 0) + 1)")
+
+
+class SQLiteSessionRefresher(GangaThread):
+
+    """ Keeps the heartbeat of the session in the database of a GangaRepositorySQLite up to date """
+
+    def __init__(self, repo):
+        super(SQLiteSessionRefresher, self).__init__(name='SQLiteSessionRefresher_%s' % repo.registry.name, critical=False)
+        self.repo = repo
+
+    def run(self):
+        try:
+            while not self.should_stop():
+                try:
+                    self.repo.updateLocksNow()
+                except Exception as err:
+                    logger.debug("SQLite heartbeat Exception: %s" % err)
+                waited = 0.
+                while waited < self.repo.heartbeat_interval and not self.should_stop():
+                    time.sleep(0.1)
+                    waited += 0.1
+        finally:
+            self.unregister()
+
 
 class GangaRepositorySQLite(GangaRepository):
 
     """GangaRepository SQLite"""
 
-    def startup(self):
-        """ Starts an repository and reads in a directory structure."""
-        self._load_timestamp = {}
-        self._cache_load_timestamp = {}
+    def __init__(self, registry):
+        """
+        Initialize a Repository from within a Registry and keep a reference to the Registry which 'owns' it
+        Args:
+            registry (Registry): This is the registry which manages this Repo
+        """
+        super(GangaRepositorySQLite, self).__init__(registry)
+        self.sub_split = "subjobs"
+        self.root = os.path.join(self.registry.location, "6.0", self.registry.name)
+        self.dbfile = os.path.join(self.root, "repository.sqlite")
+        self.con = None
+        self._db_lock = threading.RLock()
         self._fully_loaded = {}
+        self._versions = {}
+        self.locked = set()
         self.known_bad_ids = []
-        self.root = os.path.join(
-            self.registry.location, "0.1", self.registry.name)
+        self.session_name = None
+        self.heartbeat_interval = 5.
+        self._refresher = None
+
+    def startup(self):
+        """ Connects to the database, creating it if needed, registers this session and creates the objects from the index
+        Raise RepositoryError"""
         try:
             os.makedirs(self.root)
-        except OSError as x:
-            pass
-        self.con = sqlite3.connect(os.path.join(self.root, "database.db"))
-        logger.debug("Connected to ", os.path.join(self.root, "database.db"))
-        self.cur = self.con.cursor()
-        tables = self.cur.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' and name LIKE 'objects'")
-        if len(self.cur.fetchall()) == 0:
-            self.cur.execute(
-                "CREATE TABLE objects (id INTEGER PRIMARY KEY, classname VARCHAR(30), category VARCHAR(20), idx VARCHAR(100), data VARCHAR(1000))")
-        self.con.commit()
-        self.update_index(verbose=True)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise RepositoryError(self, "OSError on mkdir: %s" % err)
+
+        self.session_timeout = getConfig('Configuration')['DiskIOTimeout']
+        self.heartbeat_interval = max(1., min(10., self.session_timeout / 3.))
+
+        try:
+            # Autocommit mode, the transactions are opened explicitly by _transaction
+            self.con = sqlite3.connect(self.dbfile, timeout=self.session_timeout, isolation_level=None,
+                                       check_same_thread=False, cached_statements=64)
+            journal_mode = self.con.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if journal_mode.lower() != 'wal':
+                logger.debug("SQLite repository '%s' is using journal mode '%s'" % (self.registry.name, journal_mode))
+            self.con.execute("PRAGMA synchronous=NORMAL")
+            with self._transaction() as cur:
+                for statement in _schema_statements:
+                    cur.execute(statement)
+                cur.execute("INSERT OR IGNORE INTO counter (name, value) VALUES ('next_id', 0)")
+        except sqlite3.Error as err:
+            raise RepositoryError(self, "Unable to open the SQLite repository '%s': %s" % (self.dbfile, err))
+
+        self._fully_loaded = {}
+        self._versions = {}
+        self.locked = set()
+        self._register_session()
+        self.update_index(verbose=True, firstRun=True)
+
+        self._refresher = SQLiteSessionRefresher(self)
+        self._refresher.start()
+        logger.debug("GangaRepositorySQLite Finished Startup")
 
     def shutdown(self):
         """Shutdown the repository. Flushing is done by the Registry
+        Releases the locks of this session and closes the database
         Raise RepositoryError"""
-        self.cur.close()
-        self.con.close()
+        logger.debug("Shutting Down GangaRepositorySQLite: %s" % self.registry.name)
+        if self._refresher is not None:
+            self._refresher.stop()
+            self._refresher = None
+        if self.con is None:
+            return
+        try:
+            with self._transaction() as cur:
+                cur.execute("DELETE FROM locks WHERE session = ?", (self.session_name,))
+                cur.execute("DELETE FROM sessions WHERE session = ?", (self.session_name,))
+        except sqlite3.Error as err:
+            logger.debug("Failed to remove session '%s': %s" % (self.session_name, err))
+        with self._db_lock:
+            self.con.close()
+            self.con = None
+        self.locked = set()
 
-    def update_index(self, id=None, verbose=False):
-        """ Update the list of available objects
-        Raise RepositoryError"""
-        # First locate and load the index files
+    @contextlib.contextmanager
+    def _transaction(self):
+        """
+        Context manager holding the connection in a write transaction, committed on exit and rolled back on an exception
+        The database is locked for writing from the start so that the reads made in the transaction are not stale
+        """
+        with self._db_lock:
+            if self.con is None:
+                raise RepositoryError(self, "The SQLite repository '%s' is not connected!" % self.registry.name)
+            cur = self.con.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                yield cur
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            else:
+                cur.execute("COMMIT")
+            finally:
+                cur.close()
+
+    def _query(self, statement, args=()):
+        """
+        Returns all the rows of a read-only statement
+        Args:
+            statement (str): The SQL statement with ? placeholders
+            args (tuple): The values of the placeholders
+        """
+        with self._db_lock:
+            if self.con is None:
+                raise RepositoryError(self, "The SQLite repository '%s' is not connected!" % self.registry.name)
+            return self.con.execute(statement, args).fetchall()
+
+    def _register_session(self):
+        """ Adds this session to the sessions table """
+        if self.session_name is None:
+            started = datetime.datetime.now().strftime("%H.%M_%A_%d_%B_%Y")
+            self.session_name = ".".join([os.uname()[1], started, "PID", str(os.getpid()), "%.6f" % time.time()])
+            self.session_info = "%s (pid %s) since %s" % (os.uname()[1], os.getpid(), started)
+        with self._transaction() as cur:
+            cur.execute("INSERT OR REPLACE INTO sessions (session, info, heartbeat) VALUES (?, ?, ?)",
+                        (self.session_name, self.session_info, time.time()))
+
+    def _reap_dead_sessions(self, cur):
+        """
+        Removes the sessions whose heartbeat has timed out, and their locks, in the current transaction
+        Args:
+            cur (sqlite3.Cursor): A cursor in a write transaction
+        """
+        expired = time.time() - self.session_timeout
+        cur.execute("DELETE FROM locks WHERE session IN (SELECT session FROM sessions WHERE heartbeat < ? AND session != ?)",
+                    (expired, self.session_name))
+        cur.execute("DELETE FROM locks WHERE session NOT IN (SELECT session FROM sessions)")
+        cur.execute("DELETE FROM sessions WHERE heartbeat < ? AND session != ?", (expired, self.session_name))
+
+    def updateLocksNow(self):
+        """
+        Update the heartbeat of this session now
+        If this session has been reaped as dead by another session (e.g. after being suspended) it is registered again
+        and takes back those of its locks which no other session has taken since
+        """
+        if self.con is None:
+            return
+        with self._transaction() as cur:
+            cur.execute("UPDATE sessions SET heartbeat = ? WHERE session = ?", (time.time(), self.session_name))
+            if cur.rowcount == 0:
+                logger.warning("Session of the '%s' repository has expired, taking back the locks" % self.registry.name)
+                cur.execute("INSERT INTO sessions (session, info, heartbeat) VALUES (?, ?, ?)",
+                            (self.session_name, self.session_info, time.time()))
+                cur.executemany("INSERT OR IGNORE INTO locks (id, session) VALUES (?, ?)",
+                                [(this_id, self.session_name) for this_id in self.locked])
+                lost = set(row[0] for row in cur.execute("SELECT id FROM locks WHERE session != ?", (self.session_name,)))
+                lost.intersection_update(self.locked)
+                if lost:
+                    logger.error("The locks of '%s' objects %s have been taken by another session!" % (self.registry.name, sorted(lost)))
+                    self.locked.difference_update(lost)
+
+    def update_index(self, this_id=None, verbose=False, firstRun=False):
+        """ Update the list of available objects from the index of the root objects
+        Objects which are new or have been changed by another session get the index cache stored in the database
+        Returns the list of ids of objects which have changed
+        Raise RepositoryError
+        Args:
+            this_id (int): Unused, the whole index is read in one query
+            verbose (bool): Should we be verbose
+            firstRun (bool): If this is the call from the Repo startup
+        """
         logger.debug("updating index...")
-        self.cur.execute("SELECT id,classname,category,idx FROM objects")
-        for e in self.cur:
-            id = int(e[0])
-            if e[1] is None:  # deleted object
+        rows = self._query("SELECT id, classname, category, idx, version FROM objects WHERE parent = ?", (NO_PARENT,))
+        changed_ids = []
+        deleted_ids = set(self.objects.keys())
+        summary = []
+        for this_id, classname, category, idx, version in rows:
+            deleted_ids.discard(this_id)
+            # Locked ids are ours to change, and corrupt ones are not reloaded
+            if this_id in self.locked or this_id in self.incomplete_objects:
                 continue
-            # Locked IDs can be ignored
-            # if id in self.sessionlock.locked:
-            #    continue
-            # Now we treat unlocked IDs
-            if id in self.objects:
-                obj = self.objects[id]
-            else:
-                obj = self._make_empty_object_(id, e[2], e[1])
-            obj._index_cache = pickle.loads(e[3])
-        logger.debug("updated index done")
+            if this_id in self.objects and self._versions.get(this_id) == version:
+                continue
+            try:
+                if this_id in self.objects:
+                    obj = self.objects[this_id]
+                    setattr(obj, "_registry_refresh", True)
+                else:
+                    obj = self._make_empty_object_(this_id, category, classname)
+                obj._index_cache = pickle.loads(idx) if idx is not None else {}
+            except Exception as err:
+                logger.debug("Failed to load index %s: %s" % (this_id, err))
+                summary.append((this_id, err))
+                continue
+            self._versions[this_id] = version
+            changed_ids.append(this_id)
+
+        for this_id in deleted_ids:
+            if this_id in self.locked:
+                continue
+            self._internal_del__(this_id)
+            self._fully_loaded.pop(this_id, None)
+            self._versions.pop(this_id, None)
+            changed_ids.append(this_id)
+        if deleted_ids and not firstRun:
+            logger.warning("Registry '%s': Job %s externally deleted." % (self.registry.name, ",".join(map(str, sorted(deleted_ids)))))
 
-    def constructDataDict(self, obj):
-        data_dict = {}
-        for attr_name, attr in obj._schema.allItems():
-            if not attr['getter']:
-                data_dict[attr_name] = getattr(obj, attr_name)
-        return data_dict
+        for this_id, err in summary:
+            if this_id not in self.incomplete_objects:
+                self.incomplete_objects.append(this_id)
+            if verbose:
+                logger.error("Registry '%s': Failed to load the index of object #%s: %s" % (self.registry.name, this_id, err))
+        logger.debug("updated index done")
+        return changed_ids
 
     def add(self, objs, force_ids=None):
         """ Add the given objects to the repository, forcing the IDs if told to.
-        Raise RepositoryError"""
-        ids = []
-        # assume the ids are already locked by Registry
-        if not force_ids is None:
+        New ids are locked by this session
+        Raise RepositoryError
+        Args:
+            objs (list): GangaObject-s which we want to add to the Repo
+            force_ids (list, None): IDs to assign to object, None for auto-assign
+        """
+        if force_ids not in [None, []]:  # assume the ids are already locked by Registry
             if not len(objs) == len(force_ids):
-                raise RepositoryError(
-                    self, "Internal Error: add with different number of objects and force_ids!")
-            ids = force_ids
-        for i in range(0, len(objs)):
-            cls = objs[i]._name
-            cat = objs[i]._category
-            objs[i]._index_cache = self.registry.getIndexCache(objs[i])
-            data = pickle.dumps(self.constructDataDict(obj)).replace("'", "''")
-            idx = pickle.dumps(objs[i]._index_cache).replace("'", "''")
-            if force_ids is None:
-                self.cur.execute("INSERT INTO objects (id,classname,category,idx,data) VALUES (NULL,'%s','%s','%s','%s')" % (
-                    cls, cat, idx, data))
-            else:
-                self.cur.execute("INSERT INTO objects (id,classname,category,idx,data) VALUES (%i,'%s','%s','%s','%s')" % (
-                    force_ids[i], cls, cat, idx, data))
-            ids.append(self.cur.lastrowid)
-            self._internal_setitem__(ids[i], objs[i])
-        self.con.commit()
+                raise RepositoryError(self, "Internal Error: add with different number of objects and force_ids!")
+            ids = list(force_ids)
+        else:
+            ids = self._make_new_ids(len(objs))
+
+        for this_id, obj in zip(ids, objs):
+            self._internal_setitem__(this_id, obj)
+            # A new object is fully in memory and all of its subjobs are still to be written
+            self._fully_loaded[this_id] = obj
+            for sj in getattr(obj, self.sub_split, None) or []:
+                sj._dirty = True
         return ids
 
+    def _make_new_ids(self, n):
+        """
+        Takes the next n ids from the counter and locks them
+        Args:
+            n (int): The number of ids to make
+        """
+        with self._transaction() as cur:
+            next_id = cur.execute("SELECT value FROM counter WHERE name = 'next_id'").fetchone()[0]
+            max_id = cur.execute("SELECT MAX(id) FROM objects WHERE parent = ?", (NO_PARENT,)).fetchone()[0]
+            max_lock = cur.execute("SELECT MAX(id) FROM locks").fetchone()[0]
+            # Never hand out an id which is in use, e.g. after the counter has been reset
+            for used in (max_id, max_lock):
+                if used is not None and used >= next_id:
+                    next_id = used + 1
+            ids = list(range(next_id, next_id + n))
+            cur.execute("UPDATE counter SET value = ? WHERE name = 'next_id'", (next_id + n,))
+            cur.executemany("INSERT OR REPLACE INTO locks (id, session) VALUES (?, ?)", [(this_id, self.session_name) for this_id in ids])
+        self.locked.update(ids)
+        return ids
+
+    def _column_values(self, obj):
+        """
+        Returns the values of the indexed columns of an object
+        Args:
+            obj (GangaObject): The object being flushed
+        """
+        values = []
+        for attr in _column_attrs:
+            value = None
+            if obj._schema.hasAttribute(attr):
+                value = getattr(obj, attr)
+                if attr in _component_columns:
+                    value = getName(value) if value is not None else None
+                elif value is not None:
+                    value = str(value)
+            values.append(value)
+        return values
+
+    def _object_row(self, this_id, parent, obj, idx, ignore_subs):
+        """
+        Returns the parameters of _upsert_object which store an object
+        Args:
+            this_id (int): The id of the object, or of the subjob within its master
+            parent (int): The id of the master, NO_PARENT for root objects
+            obj (GangaObject): The object to store
+            idx (bytes, None): The pickled index cache
+            ignore_subs (str): The attribute not to be written to the XML
+        """
+        sio = StringIO()
+        xml_to_file(obj, sio, ignore_subs)
+        return [this_id, parent, getName(obj), obj._category] + self._column_values(obj) + [idx, sio.getvalue(), parent, this_id]
+
     def flush(self, ids):
-        for id in ids:
-            obj = self.objects[id]
-            if obj._name != "EmptyGangaObject":
-                obj._index_cache = self.registry.getIndexCache(obj)
-                data = pickle.dumps(self.constructDataDict(obj)).replace("'", "''")
-                idx = pickle.dumps(obj._index_cache).replace("'", "''")
-                self.cur.execute(
-                    "UPDATE objects SET idx='%s',data='%s' WHERE id=%s" % (idx, data, id))
-                # print "flushing id ", id, " backend ", obj.backend._name
-        self.con.commit()
+        """
+        Write the objects with these ids, and their changed subjobs, to the database in a single transaction
+        Args:
+            ids (list): List of integers, used as keys to objects in the self.objects dict
+        """
+        logger.debug("Flushing: %s" % ids)
+        rows = []
+        stale_subjobs = []
+        flushed = []
+        for this_id in ids:
+            if this_id in self.incomplete_objects:
+                logger.debug("Should NEVER re-flush an incomplete object, it's now 'bad' respect this!")
+                continue
+            obj = self.objects[this_id]
+            if isType(obj, EmptyGangaObject):
+                raise RepositoryError(self, "Cannot flush an Empty object for ID: %s" % this_id)
+            if this_id not in self._fully_loaded:
+                # Only the index of this object is in memory, there is nothing new to write
+                logger.debug("Not flushing object #%s which hasn't been loaded" % this_id)
+                continue
+            try:
+                subjobs = getattr(obj, self.sub_split, None) or []
+                for sj in subjobs:
+                    if sj._dirty:
+                        rows.append(self._object_row(sj.id, this_id, sj, None, ''))
+                        flushed.append(sj)
+                stale_subjobs.append((this_id, len(subjobs)))
+                idx = pickle.dumps(normalise_cache(self.registry.getIndexCache(obj)))
+                rows.append(self._object_row(this_id, NO_PARENT, obj, idx, self.sub_split))
+                flushed.append(obj)
+            except Exception as err:
+                raise RepositoryError(self, "Error of type: %s on flushing id '%s': %s" % (type(err), this_id, err))
+
+        try:
+            with self._transaction() as cur:
+                cur.executemany(_upsert_object, rows)
+                # Remove the subjobs which are not there anymore
+                cur.executemany("DELETE FROM objects WHERE parent = ? AND id >= ?", stale_subjobs)
+                for this_id, _ in stale_subjobs:
+                    self._versions[this_id] = cur.execute("SELECT version FROM objects WHERE parent = ? AND id = ?",
+                                                          (NO_PARENT, this_id)).fetchone()[0]
+        except sqlite3.Error as err:
+            raise RepositoryError(self, "Error on flushing ids %s: %s" % (ids, err))
+
+        for obj in flushed:
+            obj._setFlushed()
+
+    def _parse_xml(self, this_id, tmpobj, subjobs):
+        """
+        Replace the attrs of "objects[this_id]" with the attrs of tmpobj and attach its subjobs
+        Args:
+            this_id (int): This is the integer key of the object in the self.objects dict
+            tmpobj (GangaObject): This contains the object which has been read from the database
+            subjobs (list): The subjobs of the object read from the database
+        """
+        if this_id not in self.objects:
+            self._internal_setitem__(this_id, tmpobj)
+        obj = self.objects[this_id]
+
+        if obj is not tmpobj:
+            for key, val in tmpobj._data.items():
+                obj.setSchemaAttribute(key, val)
+            for attr_name, attr_val in obj._schema.allItems():
+                if attr_name not in tmpobj._data:
+                    obj.setSchemaAttribute(attr_name, obj._schema.getDefaultValue(attr_name))
+
+        if obj._schema.hasAttribute(self.sub_split):
+            from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
+            sj_list = GangaList()
+            for sj in subjobs:
+                sj_list.append(sj, False)
+            # NB Keep be a SetSchemaAttribute to bypass the list manipulation
+            obj.setSchemaAttribute(self.sub_split, sj_list)
+
+        from GangaCore.GPIDev.Base.Objects import do_not_copy
+        for node_key, node_val in obj._data.items():
+            if isType(node_val, Node):
+                if node_key not in do_not_copy:
+                    node_val._setParent(obj)
+
+        obj._index_cache = {}
+        self._fully_loaded[this_id] = obj
 
     def load(self, ids):
-        self.cur.execute("SELECT id,classname,category,data FROM objects WHERE id IN (%s)" % (
-            ",".join(map(str, ids))))
-        for e in self.cur:
-            # print "load: ",e
-            _id = int(e[0])
-            if e[1] is None:  # deleted object
-                continue
-            if not _id in self.objects:
-                obj = self._make_empty_object_(_id, e[2], e[1])
-            else:
-                obj = self.objects[_id]
-            if _id not in self._fully_loaded:
-                new_data = pickle.loads(e[3])
-                for k, v in new_data:
-                    setattr(obj, k, v)
-            self._fully_loaded[_id] = obj
-            ids.remove(_id)
-        if len(ids) > 0:
-            raise KeyError(ids[0])
+        """
+        Load the objects with these ids, and all of their subjobs, from the database
+        Args:
+            ids (list): The object keys which we want to iterate over from the objects dict
+        """
+        logger.debug("Loading Repo object(s): %s" % ids)
+        for this_id in ids:
+            if this_id in self.incomplete_objects:
+                raise RepositoryError(self, "Trying to re-load a corrupt repository id: %s" % this_id)
+
+            rows = self._query("SELECT id, data, version FROM objects WHERE parent = ? AND id = ?", (NO_PARENT, this_id))
+            if not rows:
+                if this_id in self.objects:
+                    self._internal_del__(this_id)
+                raise KeyError(this_id)
+            _, data, version = rows[0]
+
+            try:
+                tmpobj, errs = xml_from_file(StringIO(data))
+                if errs:
+                    raise InaccessibleObjectError(self, this_id, errs[0])
+                subjobs = []
+                for sj_id, sj_data in self._query("SELECT id, data FROM objects WHERE parent = ? ORDER BY id", (this_id,)):
+                    sj, errs = xml_from_file(StringIO(sj_data))
+                    if errs:
+                        raise InaccessibleObjectError(self, this_id, errs[0])
+                    subjobs.append(sj)
+                self._parse_xml(this_id, tmpobj, subjobs)
+            except Exception as err:
+                logger.error("Failed to load '%s' object #%s: %s" % (self.registry.name, this_id, err))
+                logger.error("Adding id: %s to Corrupt IDs will not attempt to re-load this session" % this_id)
+                if this_id not in self.incomplete_objects:
+                    self.incomplete_objects.append(this_id)
+                if isType(err, InaccessibleObjectError):
+                    raise
+                raise InaccessibleObjectError(self, this_id, err)
+
+            self._versions[this_id] = version
+            self.objects[this_id]._setFlushed()
+
+        logger.debug("Finished 'load'-ing of: %s" % ids)
 
     def delete(self, ids):
-        for id in ids:
-            self.cur.execute(
-                "UPDATE objects SET classname=NULL,category=NULL,idx=NULL,data=NULL WHERE id=%s" % (id))
-            self._internal_del__(id)
-        self.con.commit()
+        """
+        Delete the objects with these ids and their subjobs from the database
+        Args:
+            ids (list): The object keys which we want to iterate over from the objects dict
+        """
+        with self._transaction() as cur:
+            cur.executemany("DELETE FROM objects WHERE (parent = ? AND id = ?) OR parent = ?",
+                            [(NO_PARENT, this_id, this_id) for this_id in ids])
+            cur.executemany("DELETE FROM locks WHERE id = ? AND session = ?", [(this_id, self.session_name) for this_id in ids])
+        for this_id in ids:
+            self._internal_del__(this_id)
+            self._fully_loaded.pop(this_id, None)
+            self._versions.pop(this_id, None)
+            self.objects.pop(this_id, None)
+            self.locked.discard(this_id)
 
     def lock(self, ids):
-        return ids
+        """
+        Request a session lock for the following ids, returns those which this session now holds
+        Args:
+            ids (list): The object keys which we want to iterate over from the objects dict
+        """
+        ids = set(ids)
+        to_lock = ids - self.locked
+        if to_lock:
+            with self._transaction() as cur:
+                self._reap_dead_sessions(cur)
+                others = set(row[0] for row in cur.execute("SELECT id FROM locks WHERE session != ?", (self.session_name,)))
+                to_lock.difference_update(others)
+                cur.executemany("INSERT OR REPLACE INTO locks (id, session) VALUES (?, ?)",
+                                [(this_id, self.session_name) for this_id in to_lock])
+            ids.difference_update(others)
+            self.locked.update(to_lock)
+        return list(ids)
 
     def unlock(self, ids):
-        return ids
+        """
+        Release the session locks of the following ids
+        Args:
+            ids (list): The object keys which we want to iterate over from the objects dict
+        """
+        with self._transaction() as cur:
+            cur.executemany("DELETE FROM locks WHERE id = ? AND session = ?", [(this_id, self.session_name) for this_id in ids])
+        self.locked.difference_update(ids)
 
-    def get_lock_session(self, id):
+    def get_lock_session(self, this_id):
         """get_lock_session(id)
         Tries to determine the session that holds the lock on id for information purposes, and return an informative string.
         Returns None on failure
+        Args:
+            this_id (int): Get the id of the session which has a lock on the object with this id
         """
-        return ""
+        rows = self._query("SELECT sessions.info FROM locks JOIN sessions ON locks.session = sessions.session WHERE locks.id = ?", (this_id,))
+        if rows:
+            return rows[0][0]
+        return None
 
     def get_other_sessions(self):
         """get_session_list()
         Tries to determine the other sessions that are active and returns an informative string for each of them.
         """
-        return []
+        with self._transaction() as cur:
+            self._reap_dead_sessions(cur)
+            return [row[0] for row in cur.execute("SELECT info FROM sessions WHERE session != ?", (self.session_name,))]
 
     def reap_locks(self):
         """reap_locks() --> True/False
-        Remotely clear all foreign locks from the session.
+        Remotely clear the locks of all sessions which have timed out.
         WARNING: This is not nice.
         Returns True on success, False on error."""
-        return False
+        try:
+            with self._transaction() as cur:
+                self._reap_dead_sessions(cur)
+        except (sqlite3.Error, RepositoryError) as err:
+            logger.debug("Reap locks Exception: %s" % err)
+            return False
+        return True
+
+    def select_ids(self, query):
+        """
+        Returns the ids of the root objects whose indexed columns match the query as stored in the database, together with
+        the loaded objects which have changes not yet flushed. Returns None if the query can't be answered from the columns
+        Args:
+            query (dict): attribute name: (value, is_pattern), a pattern is matched as by fnmatch
+        """
+        conditions = []
+        args = [NO_PARENT]
+        for attr, (value, is_pattern) in query.items():
+            if attr not in _column_attrs or not isinstance(value, str):
+                continue
+            # GLOB matches * and ? as fnmatch does, but not the negation of character sets
+            if is_pattern and '[' in value:
+                continue
+            conditions.append("%s %s ?" % (attr, "GLOB" if is_pattern else "="))
+            args.append(value)
+        if not conditions:
+            return None
+        statement = "SELECT id FROM objects WHERE parent = ? AND " + " AND ".join(conditions)
+        ids = set(row[0] for row in self._query(statement, tuple(args)))
+        ids.update(this_id for this_id, obj in list(self._fully_loaded.items()) if obj._dirty)
+        return ids
 
     def clean(self):
         """clean() --> True/False
         Clear EVERYTHING in this repository, counter, all jobs, etc.
         WARNING: This is not nice."""
         self.shutdown()
-        os.unlink(os.path.join(self.root, "database.db"))
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.unlink(self.dbfile + suffix)
+            except OSError as err:
+                if err.errno != errno.ENOENT:
+                    logger.error("Failed to correctly clean repository due to: %s" % err)
+        self.objects.clear()
+        self.incomplete_objects[:] = []
         self.startup()
+
+    def isObjectLoaded(self, obj):
+        """
+        This will return a true false if an object has been fully loaded into memory
+        Args:
+            obj (GangaObject): The object we want to know if it was loaded into memory
+        """
+        return any(o is obj for o in self._fully_loaded.values())
+
+    def loaded_ids(self):
+        """ Returns the set of ids of the objects which have been fully loaded into memory """
+        return set(self._fully_loaded.keys())
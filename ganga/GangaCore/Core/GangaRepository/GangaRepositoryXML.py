@@ -7,7 +7,9 @@ from GangaCore.Core.GangaRepository import GangaRepository, RepositoryError, Ina
 from GangaCore.Utility.Plugin import PluginManagerError
 import os
 import os.path
+import re
 import time
+import fnmatch
 import errno
 import copy
 import threading
@@ -16,6 +18,8 @@ from GangaCore import GANGA_SWAN_INTEGRATION
 
 from GangaCore.Core.GangaRepository.SessionLock import SessionLockManager, dry_run_unix_locks
 from GangaCore.Core.GangaRepository.FixedLock import FixedLockManager
+from GangaCore.Core.GangaRepository.ColumnarIndex import ColumnarIndex, normalise_cache
+from GangaCore.Core.GangaThread import GangaThread
 
 import GangaCore.Utility.logging
 
@@ -37,6 +41,9 @@ logger = GangaCore.Utility.logging.getLogger()
 
 save_all_history = False
 
+# The value in the select_ids indexes of the objects whose index cache doesn't hold an attribute, these always match
+_NOT_INDEXED = object()
+
 def check_app_hash(obj):
     """Writes a file safely, raises IOError on error
     Args:
@@ -205,21 +212,35 @@ class GangaRepositoryLocal(GangaRepository):
         self.lockroot = os.path.join(self.registry.location, "6.0")
         self.saved_paths = {}
         self.saved_idxpaths = {}
-        self._cache_load_timestamp = {}
         self.printed_explanation = False
         self._fully_loaded = {}
+        self._load_chunk_size = 100
 
     def startup(self):
         """ Starts a repository and reads in a directory structure.
         Raise RepositoryError"""
         self._load_timestamp = {}
 
-        # New Master index to speed up loading of many, MANY files
-        self._cache_load_timestamp = {}
+        # The index of every object as last read from or written to the index file
         self._cached_cat = {}
         self._cached_cls = {}
         self._cached_obj = {}
-        self._master_index_timestamp = 0
+        # ids whose index has been changed by another session and not yet applied to self.objects
+        self._index_updated = set()
+        # Secondary indexes of the values in self._cached_obj used by select_ids, attribute: (value: ids, id: value)
+        # Each is built the first time its attribute is selected on and then kept up to date with self._cached_obj
+        self._select_index = {}
+        self._select_index_lock = threading.Lock()
+
+        # ids of the objects still to be created from their index after startup and those being created
+        self._pending_ids = set()
+        self._loading_ids = set()
+        self._pending_order = []
+        self._pending_cond = threading.Condition()
+        # Set in threads while they're creating objects, these see the objects as they are and never wait
+        self._loader_state = threading.local()
+        self._load_summary = []
+        self._load_start = None
 
         self.known_bad_ids = []
         if "XML" in self.registry.type:
@@ -248,27 +269,34 @@ class GangaRepositoryLocal(GangaRepository):
         else:
             raise RepositoryError(self, "Unable to launch due to unknown file-locking Strategy: \"%s\"" % getConfig('Configuration')['lockingStrategy'])
         self.sessionlock.startup()
+        self._columnar_index = ColumnarIndex(os.path.join(self.root, 'index.cidx'),
+                                            getConfig('Configuration')['lockingStrategy'] == "UNIX", self.sessionlock)
         # Load the list of files, this time be verbose and print out a summary
-        # of errors
-        self.update_index(True, True)
+        # of errors. The objects themselves are created in the background
+        self.update_index(True, True, firstRun=True)
         logger.debug("GangaRepositoryLocal Finished Startup")
 
     def shutdown(self):
         """Shutdown the repository. Flushing is done by the Registry
         Raise RepositoryError
-        Write an index file for all new objects in memory and master index file of indexes"""
+        Write the index of all loaded objects which has changed to the index file"""
         from GangaCore.Utility.logging import getLogger
         logger = getLogger()
         logger.debug("Shutting Down GangaRepositoryLocal: %s" % self.registry.name)
-        for k in self._fully_loaded:
-            try:
-                self.index_write(k, True)
-            except Exception as err:
-                logger.error("Warning: problem writing index object with id %s" % k)
+        self.wait_for_index()
+        with self._columnar_index.transaction():
+            for k in self._fully_loaded:
+                try:
+                    self.index_write(k)
+                except Exception as err:
+                    logger.error("Warning: problem writing index object with id %s" % k)
         try:
-            self._write_master_cache(True)
+            if self._columnar_index.needsCompacting():
+                self._columnar_index.compact(dict((k, (self._cached_cat[k], self._cached_cls[k], self._cached_obj[k]))
+                                                  for k in self.objects if k in self._cached_obj and k not in self.incomplete_objects))
         except Exception as err:
-            logger.warning("Warning: Failed to write master index due to: %s" % err)
+            logger.warning("Warning: Failed to compact the index file due to: %s" % err)
+        self._columnar_index.close()
         self.sessionlock.shutdown()
 
     def get_fn(self, this_id):
@@ -290,30 +318,28 @@ class GangaRepositoryLocal(GangaRepository):
         return self.saved_idxpaths[this_id]
 
     def index_load(self, this_id):
-        """ load the index file for this object if necessary
-            Loads if never loaded or timestamp changed. Creates object if necessary
+        """ load the index for this object if necessary
+            Loads if never loaded or changed in the index file by another session. Creates object if necessary
+            Objects missing from the index file are read from an old style <id>.index file and added to it
             Returns True if this object has been changed, False if not
             Raise IOError on access or unpickling error 
             Raise OSError on stat error
             Raise PluginManagerError if the class name is not found
         Args:
-            this_id (int): This is the id for which we want to load the index file from disk
+            this_id (int): This is the id for which we want to load the index from disk
         """
         #logger.debug("Loading index %s" % this_id)
-        fn = self.get_idxfn(this_id)
-        # index timestamp changed
-        fn_ctime = os.stat(fn).st_ctime
-        cache_time = self._cache_load_timestamp.get(this_id, 0)
-        if cache_time != fn_ctime:
-            logger.debug("%s != %s" % (cache_time, fn_ctime))
-            try:
-                with open(fn, 'rb') as fobj:
-                    cat, cls, cache = pickle_from_file(fobj)[0]
-            except EOFError:
-                pass
-            except Exception as x:
-                logger.warning("index_load Exception: %s" % x)
-                raise IOError("Error on unpickling: %s %s" %(getName(x), x))
+        if this_id in self._index_updated or this_id not in self._cached_obj:
+            if this_id in self._index_updated:
+                self._index_updated.discard(this_id)
+                cat, cls, cache = self._cached_cat[this_id], self._cached_cls[this_id], self._cached_obj[this_id]
+            else:
+                cat, cls, cache = self._legacy_index_load(this_id)
+                self._columnar_index.write(this_id, cat, cls, cache)
+                self._cached_cat[this_id] = cat
+                self._cached_cls[this_id] = cls
+                self._cached_obj[this_id] = cache
+                self._update_select_index(this_id, cache)
             if this_id in self.objects:
                 obj = self.objects[this_id]
                 setattr(obj, "_registry_refresh", True)
@@ -321,17 +347,8 @@ class GangaRepositoryLocal(GangaRepository):
                 try:
                     obj = self._make_empty_object_(this_id, cat, cls)
                 except Exception as err:
-                    raise IOError('Failed to Parse information in Index file: %s. Err: %s' % (fn, err))
-            this_cache = obj._index_cache
-            this_data = this_cache if this_cache else {}
-            for k, v in cache.items():
-                this_data[k] = v
-            #obj.setNodeData(this_data)
+                    raise IOError('Failed to Parse information in Index of: %s. Err: %s' % (this_id, err))
             obj._index_cache = cache
-            self._cache_load_timestamp[this_id] = fn_ctime
-            self._cached_cat[this_id] = cat
-            self._cached_cls[this_id] = cls
-            self._cached_obj[this_id] = cache
             return True
         elif this_id not in self.objects:
             self.objects[this_id] = self._make_empty_object_(this_id, self._cached_cat[this_id], self._cached_cls[this_id])
@@ -343,8 +360,53 @@ class GangaRepositoryLocal(GangaRepository):
             logger.debug("Just silently continuing")
         return False
 
+    def _legacy_index_load(self, this_id):
+        """ Returns the (category, class name, index cache) stored in the pickled <id>.index file of an object
+            Raise IOError on access or unpickling error
+            Raise OSError if there is no such file
+        Args:
+            this_id (int): This is the id for which we want to read the index file
+        """
+        fn = self.get_idxfn(this_id)
+        os.stat(fn)
+        try:
+            with open(fn, 'rb') as fobj:
+                cat, cls, cache = pickle_from_file(fobj)[0]
+        except Exception as x:
+            logger.warning("index_load Exception: %s" % x)
+            raise IOError("Error on unpickling: %s %s" %(getName(x), x))
+        return cat, cls, cache
+
+    def _refresh_index(self):
+        """ Read the index entries committed to the index file by other sessions since we last looked """
+        for this_id, entry in self._columnar_index.refresh():
+            if entry is None:
+                for cached in (self._cached_cat, self._cached_cls, self._cached_obj):
+                    cached.pop(this_id, None)
+                self._index_updated.discard(this_id)
+                self._update_select_index(this_id, None)
+                continue
+            cat, cls, cache = entry
+            if (self._cached_cat.get(this_id), self._cached_cls.get(this_id), self._cached_obj.get(this_id)) != (cat, cls, cache):
+                self._cached_cat[this_id] = cat
+                self._cached_cls[this_id] = cls
+                self._cached_obj[this_id] = cache
+                self._index_updated.add(this_id)
+                self._update_select_index(this_id, cache)
+
+    def _remove_index(self, this_id):
+        """ Remove the index of an object so we do not continue working with wrong information
+        Args:
+            this_id (int): This is the id of the object whose index is removed
+        """
+        rmrf(self.get_idxfn(this_id))
+        self._columnar_index.delete(this_id)
+        for cached in (self._cached_cat, self._cached_cls, self._cached_obj):
+            cached.pop(this_id, None)
+        self._update_select_index(this_id, None)
+
     def index_write(self, this_id, shutdown=False):
-        """ write an index file for this object (must be locked).
+        """ write the index for this object (must be locked) to the index file if it has changed.
             Should not raise any Errors,
         Args:
             this_id (int): This is the index for which we want to write the index to disk
@@ -354,19 +416,18 @@ class GangaRepositoryLocal(GangaRepository):
         logger.debug("Writing index: %s" % this_id)
         obj = self.objects[this_id]
         try:
-            ifn = self.get_idxfn(this_id)
-            new_idx_cache = self.registry.getIndexCache(stripProxy(obj))
-            if not os.path.exists(ifn) or shutdown:
-                new_cache = new_idx_cache
-                with open(ifn, "wb") as this_file:
-                    new_index = (obj._category, getName(obj), new_cache)
-                    logger.debug("Writing: %s" % str(new_index))
-                    pickle_to_file(new_index, this_file)
-                self._cached_obj[this_id] = new_cache
+            new_idx_cache = normalise_cache(self.registry.getIndexCache(stripProxy(obj)))
+            cat, cls = obj._category, getName(obj)
+            if shutdown or (self._cached_cat.get(this_id), self._cached_cls.get(this_id), self._cached_obj.get(this_id)) != (cat, cls, new_idx_cache):
+                logger.debug("Writing: %s" % str((cat, cls, new_idx_cache)))
+                self._columnar_index.write(this_id, cat, cls, new_idx_cache)
                 obj._index_cache = {}
+            self._cached_cat[this_id] = cat
+            self._cached_cls[this_id] = cls
             self._cached_obj[this_id] = new_idx_cache
-        except IOError as err:
-            logger.error("Index saving to '%s' failed: %s %s" % (ifn, getName(err), err))
+            self._update_select_index(this_id, new_idx_cache)
+        except (IOError, OSError) as err:
+            logger.error("Index saving to '%s' failed: %s %s" % (self._columnar_index.filename, getName(err), err))
 
     def get_index_listing(self):
         """Get dictionary of possible objects in the Repository: True means index is present,
@@ -400,127 +461,6 @@ class GangaRepositoryLocal(GangaRepository):
                             logger.debug("get_index_listing delete Exception: %s" % err)
         return objs
 
-    def _read_master_cache(self):
-        """
-        read in the master cache to reduce significant I/O over many indexes separately on startup
-        """
-        try:
-            _master_idx = os.path.join(self.root, 'master.idx')
-            if os.path.isfile(_master_idx):
-                logger.debug("Reading Master index")
-                self._master_index_timestamp = os.stat(_master_idx).st_ctime
-                with open(_master_idx, 'rb') as input_f:
-                    this_master_cache = pickle_from_file(input_f)[0]
-                for this_cache in this_master_cache:
-                    if this_cache[1] >= 0:
-                        this_id = this_cache[0]
-                        self._cache_load_timestamp[this_id] = this_cache[1]
-                        self._cached_cat[this_id] = this_cache[2]
-                        self._cached_cls[this_id] = this_cache[3]
-                        self._cached_obj[this_id] = this_cache[4]
-            else:
-                logger.debug("Not Reading Master Index")
-        except Exception as err:
-            GangaCore.Utility.logging.log_unknown_exception()
-            logger.debug("Master Index corrupt, ignoring it")
-            logger.debug("Exception: %s" % err)
-            self._clear_stored_cache()
-        finally:
-            rmrf(os.path.join(self.root, 'master.idx'))
-
-    def _clear_stored_cache(self):
-        """
-        clear the master cache(s) which have been stored in memory
-        """
-        for k, v in self._cache_load_timestamp.items():
-            self._cache_load_timestamp.pop(k)
-        for k, v in self._cached_cat.items():
-            self._cached_cat.pop(k)
-        for k, v in self._cached_cls.items():
-            self._cached_cls.pop(k)
-        for k, v in self._cached_obj.items():
-            self._cached_obj.pop(k)
-
-    def _write_master_cache(self, shutdown=False):
-        """
-        write a master index cache once per 300sec
-        Args:
-            shutdown (boool): True causes this to be written now
-        """
-        try:
-            _master_idx = os.path.join(self.root, 'master.idx')
-            this_master_cache = []
-            if os.path.isfile(_master_idx) and not shutdown:
-                if abs(self._master_index_timestamp - os.stat(_master_idx).st_ctime) < 300:
-                    return
-
-            items_to_save = iter(self.objects.items())
-            for k, v in items_to_save:
-                if k in self.incomplete_objects:
-                    continue
-                try:
-                    if k in self._fully_loaded:
-                        # Check and write index first
-                        obj = v#self.objects[k]
-                        new_index = None
-                        if obj is not None:
-                            new_index = self.registry.getIndexCache(stripProxy(obj))
-
-                        if new_index is not None:
-                            #logger.debug("k: %s" % k)
-                            arr_k = [k]
-                            if len(self.lock(arr_k)) != 0:
-                                self.index_write(k)
-                                self.unlock(arr_k)
-                                self._cached_obj[k] = new_index
-
-                except Exception as err:
-                    logger.debug("Failed to update index: %s on startup/shutdown" % k)
-                    logger.debug("Reason: %s" % err)
-
-            iterables = iter(self._cache_load_timestamp.items())
-            for k, v in iterables:
-                if k in self.incomplete_objects:
-                    continue
-                cached_list = []
-                cached_list.append(k)
-                try:
-                    fn = self.get_idxfn(k)
-                    if os.path.isfile(fn):
-                        time = os.stat(fn).st_ctime
-                    else:
-                        time = -1
-                except OSError as err:
-                    logger.debug("_write_master_cache: %s" % err)
-                    logger.debug("_cache_load_timestamp: %s" % self._cache_load_timestamp)
-                    import errno
-                    if err.errno == errno.ENOENT:  # If file is not found
-                        time = -1
-                    else:
-                        raise
-
-                if time > 0:
-                    cached_list.append(time)
-                    cached_list.append(self._cached_cat[k])
-                    cached_list.append(self._cached_cls[k])
-                    cached_list.append(self._cached_obj[k])
-                    this_master_cache.append(cached_list)
-
-            try:
-                with open(_master_idx, 'wb') as of:
-                    pickle_to_file(this_master_cache, of)
-            except IOError as err:
-                logger.debug("write_master: %s" % err)
-                try:
-                    os.remove(os.path.join(self.root, 'master.idx'))
-                except OSError as x:
-                    GangaCore.Utility.logging.log_user_exception(True)
-        except Exception as err:
-            logger.debug("write_error2: %s" % err)
-            GangaCore.Utility.logging.log_unknown_exception()
-
-        return
-
     def updateLocksNow(self):
         """
         Trigger the session locks to all be updated now
@@ -535,20 +475,21 @@ class GangaRepositoryLocal(GangaRepository):
         Args:
             this_id (int): This is the id we want to explicitly check the index on disk for
             verbose (bool): Should we be verbose
-            firstRun (bool): If this is the call from the Repo startup then load the master index for perfomance boost
+            firstRun (bool): If this is the call from the Repo startup, the objects are then created in the background
         """
+        # Anything still being loaded from startup has to be known before we can tell what changed
+        self.wait_for_index()
         # First locate and load the index files
         logger.debug("updating index...")
         objs = self.get_index_listing()
         changed_ids = []
         deleted_ids = set(self.objects.keys())
-        summary = []
-        if firstRun:
-            self._read_master_cache()
+        self._refresh_index()
         logger.debug("Iterating over Items")
 
         locked_ids = self.sessionlock.locked
 
+        to_load = []
         for this_id in objs:
             deleted_ids.discard(this_id)
             # Make sure we do not overwrite older jobs if someone deleted the
@@ -561,7 +502,40 @@ class GangaRepositoryLocal(GangaRepository):
             # Skip corrupt IDs
             if this_id in self.incomplete_objects:
                 continue
-            # Now we treat unlocked IDs
+            to_load.append(this_id)
+
+        if firstRun and getConfig('Registry')['StartupThreads'] > 0:
+            self._load_in_background(to_load)
+            summary = []
+        else:
+            # Indexes rebuilt from old index files or by loading the objects are written in one go
+            with self._columnar_index.transaction():
+                changed, summary = self._load_indexes(to_load)
+            changed_ids.extend(changed)
+
+        logger.debug("Iterated over Items")
+
+        # Check deleted files:
+        for this_id in deleted_ids:
+            self._internal_del__(this_id)
+            changed_ids.append(this_id)
+        if len(deleted_ids) > 0:
+            logger.warning("Registry '%s': Job %s externally deleted." % (self.registry.name, ",".join(map(str, list(deleted_ids)))))
+
+        self._report_load_failures(summary)
+        logger.debug("updated index done")
+
+        return changed_ids
+
+    def _load_indexes(self, ids):
+        """ Load the index of the given unlocked objects, falling back to loading the objects themselves if it's missing
+            Returns the list of ids which have changed and a list of (id, exception) for those which couldn't be loaded
+        Args:
+            ids (list): The ids of the objects to load
+        """
+        changed_ids = []
+        summary = []
+        for this_id in ids:
             try:
                 # if this succeeds, all is well and we are done
                 if self.index_load(this_id):
@@ -605,16 +579,13 @@ class GangaRepositoryLocal(GangaRepository):
                 except (InaccessibleObjectError, ) as x:
                     logger.debug("update_index: Failed to load id %i: %s" % (this_id, x))
                     summary.append((this_id, x))
+        return changed_ids, summary
 
-        logger.debug("Iterated over Items")
-
-        # Check deleted files:
-        for this_id in deleted_ids:
-            self._internal_del__(this_id)
-            changed_ids.append(this_id)
-        if len(deleted_ids) > 0:
-            logger.warning("Registry '%s': Job %s externally deleted." % (self.registry.name, ",".join(map(str, list(deleted_ids)))))
-
+    def _report_load_failures(self, summary):
+        """ Mark the objects which failed to load as incomplete and explain to the user what went wrong
+        Args:
+            summary (list): (id, exception) for each object which couldn't be loaded
+        """
         if len(summary) > 0:
             cnt = {}
             examples = {}
@@ -637,13 +608,107 @@ class GangaRepositoryLocal(GangaRepository):
                 logger.error("'for i in %s.incomplete_ids(): %s(i).remove()'\n (then press 'Enter' twice)" % (self.registry.name, self.registry.name))
                 logger.error("WARNING!!! This will result in corrupt jobs being completely deleted!!!")
                 self.printed_explanation = True
-        logger.debug("updated index done")
 
-        if len(changed_ids) != 0:
-            isShutdown = not firstRun
-            self._write_master_cache(isShutdown)
+    def _load_in_background(self, ids):
+        """ Create the objects with the given ids from their index using a pool of threads.
+            The newest objects are loaded first as they're the ones most likely to be looked at
+        Args:
+            ids (list): The ids of the objects to load
+        """
+        with self._pending_cond:
+            self._pending_ids.update(ids)
+            self._pending_order = sorted(ids)
+        self._load_start = time.time()
+        num_threads = min(getConfig('Registry')['StartupThreads'], len(ids) // self._load_chunk_size + 1)
+        for i in range(num_threads):
+            GangaThread(name='%s_index_loader_%i' % (self.registry.name, i), target=self._background_load, auto_register=False, critical=False).start()
+
+    def _claim(self, ids):
+        """ Take the ids no thread has started to load yet out of those given, must be called with _pending_cond held
+        Args:
+            ids (iterable): The ids which the calling thread wants to load
+        """
+        claimed = [this_id for this_id in ids if this_id in self._pending_ids]
+        # Added to _loading_ids first so the ids are never in neither set while still being loaded
+        self._loading_ids.update(claimed)
+        self._pending_ids.difference_update(claimed)
+        return claimed
+
+    def _background_load(self):
+        """ Loop run by each thread loading the index in the background until there's nothing left to load """
+        while True:
+            with self._pending_cond:
+                chunk = []
+                while self._pending_order and len(chunk) < self._load_chunk_size:
+                    chunk.append(self._pending_order.pop())
+                claimed = self._claim(chunk)
+                if not chunk:
+                    break
+            if claimed:
+                self._load_claimed(claimed)
+
+    def _load_claimed(self, ids):
+        """ Load the index of objects claimed by this thread and wake up anybody waiting for them
+        Args:
+            ids (list): The ids claimed by this thread
+        """
+        summary = []
+        self._loader_state.loading = True
+        try:
+            if any(this_id not in self._cached_obj for this_id in ids):
+                # Entries migrated from old index files are written in one go
+                with self._columnar_index.transaction():
+                    summary = self._load_indexes(ids)[1]
+            else:
+                summary = self._load_indexes(ids)[1]
+        except Exception as err:
+            logger.error("Failed to load the index of %s objects %s: %s" % (self.registry.name, ids, err))
+        finally:
+            self._loader_state.loading = False
+            with self._pending_cond:
+                # Failed objects are marked straight away so they're never seen as missing
+                for this_id, x in summary:
+                    if this_id not in self.incomplete_objects:
+                        self.incomplete_objects.append(this_id)
+                self._load_summary.extend(summary)
+                self._loading_ids.difference_update(ids)
+                finished = not self._pending_ids and not self._loading_ids and self._load_start is not None
+                if finished:
+                    summary, self._load_summary = self._load_summary, []
+                    logger.debug("Registry '%s': loaded %i objects in the background in %.3f s" % (self.registry.name, len(self.objects), time.time() - self._load_start))
+                    self._load_start = None
+                self._pending_cond.notify_all()
+        if finished:
+            self._report_load_failures(summary)
+
+    def wait_for_index(self, ids=None):
+        """ Block until the objects with the given ids (or all objects if None) have been created from their index.
+            Any of them which no thread has started on yet are loaded by the calling thread
+        Args:
+            ids (list, None): The object keys which we want to wait for
+        """
+        # The ids are always in one of the sets until they're loaded, _pending_ids has to be checked first
+        if not self._pending_ids and not self._loading_ids:
+            return
+        # Creating an object can look the registry up, waiting there could wait on ourselves
+        if getattr(self._loader_state, 'loading', False):
+            return
+        with self._pending_cond:
+            claimed = self._claim(list(self._pending_ids) if ids is None else ids)
+        if claimed:
+            self._load_claimed(claimed)
+        with self._pending_cond:
+            if ids is None:
+                while self._loading_ids:
+                    self._pending_cond.wait()
+            else:
+                while any(this_id in self._loading_ids for this_id in ids):
+                    self._pending_cond.wait()
 
-        return changed_ids
+    def pending_ids(self):
+        """ Returns the ids of objects which are known to be in the repository but whose index is still being loaded """
+        with self._pending_cond:
+            return list(self._pending_ids | self._loading_ids)
 
     def add(self, objs, force_ids=None):
         """ Add the given objects to the repository, forcing the IDs if told to.
@@ -712,6 +777,7 @@ class GangaRepositoryLocal(GangaRepository):
                     getattr(obj, self.sub_split).flush()
                 else:
                     # I have been constructed in this session, I don't know how to flush!
+                    flushed_ids = []
                     if hasattr(getattr(obj, self.sub_split)[0], "_dirty"):
                         split_cache = getattr(obj, self.sub_split)
                         for i in range(len(split_cache)):
@@ -725,6 +791,7 @@ class GangaRepositoryLocal(GangaRepository):
                                 logger.debug("Using Folder: %s" % os.path.dirname(sfn))
                             safe_save(sfn, split_cache[i], self.to_file)
                             split_cache[i]._setFlushed()
+                            flushed_ids.append(i)
                     # Now generate an index file to take advantage of future non-loading goodness
                     tempSubJList = SubJobXMLList(os.path.dirname(fn), self.registry, self.dataFileName, False, obj)
                     ## equivalent to for sj in job.subjobs
@@ -733,7 +800,7 @@ class GangaRepositoryLocal(GangaRepository):
                     for sj in getattr(obj, self.sub_split):
                         job_dict[sj.id] = stripProxy(sj)
                     tempSubJList._reset_cachedJobs(job_dict)
-                    tempSubJList.flush(ignore_disk=True)
+                    tempSubJList.write_subJobIndex(ignore_disk=True, changed=flushed_ids)
                     del tempSubJList
 
                 safe_save(fn, obj, self.to_file, self.sub_split)
@@ -770,38 +837,35 @@ class GangaRepositoryLocal(GangaRepository):
 
         #import traceback
         #traceback.print_stack()
-        for this_id in ids:
-            if this_id in self.incomplete_objects:
-                logger.debug("Should NEVER re-flush an incomplete object, it's now 'bad' respect this!")
-                continue
-            try:
-                logger.debug("safe_flush: %s" % this_id)
-                self._safe_flush_xml(this_id)
-
-                self._cache_load_timestamp[this_id] = time.time()
-                self._cached_cls[this_id] = getName(self.objects[this_id])
-                self._cached_cat[this_id] = self.objects[this_id]._category
-                self._cached_obj[this_id] = self.objects[this_id]._index_cache
-
+        # The indexes of all of the flushed objects are committed to the index file together
+        with self._columnar_index.transaction():
+            for this_id in ids:
+                if this_id in self.incomplete_objects:
+                    logger.debug("Should NEVER re-flush an incomplete object, it's now 'bad' respect this!")
+                    continue
                 try:
-                    self.index_write(this_id)
-                except:
-                    logger.debug("Index write failed")
-                    pass
+                    logger.debug("safe_flush: %s" % this_id)
+                    self._safe_flush_xml(this_id)
 
-                if this_id not in self._fully_loaded:
-                    self._fully_loaded[this_id] = self.objects[this_id]
+                    try:
+                        self.index_write(this_id)
+                    except:
+                        logger.debug("Index write failed")
+                        pass
 
-                subobj_attr = getattr(self.objects[this_id], self.sub_split, None)
-                sub_attr_dirty = getattr(subobj_attr, '_dirty', False)
-                if sub_attr_dirty:
-                    if hasattr(subobj_attr, 'flush'):
-                        subobj_attr.flush()
+                    if this_id not in self._fully_loaded:
+                        self._fully_loaded[this_id] = self.objects[this_id]
 
-                self.objects[this_id]._setFlushed()
+                    subobj_attr = getattr(self.objects[this_id], self.sub_split, None)
+                    sub_attr_dirty = getattr(subobj_attr, '_dirty', False)
+                    if sub_attr_dirty:
+                        if hasattr(subobj_attr, 'flush'):
+                            subobj_attr.flush()
 
-            except (OSError, IOError, XMLFileError) as x:
-                raise RepositoryError(self, "Error of type: %s on flushing id '%s': %s" % (type(x), this_id, x))
+                    self.objects[this_id]._setFlushed()
+
+                except (OSError, IOError, XMLFileError) as x:
+                    raise RepositoryError(self, "Error of type: %s on flushing id '%s': %s" % (type(x), this_id, x))
 
     def _check_index_cache(self, obj, this_id):
         """
@@ -812,7 +876,7 @@ class GangaRepositoryLocal(GangaRepository):
             obj (GangaObject): This is the object which we've loaded from disk
             this_id (int): This is the object id which is the objects key in the objects dict
         """
-        new_idx_cache = self.registry.getIndexCache(stripProxy(obj))
+        new_idx_cache = normalise_cache(self.registry.getIndexCache(stripProxy(obj)))
         if new_idx_cache != obj._index_cache:
             logger.debug("NEW: %s" % new_idx_cache)
             logger.debug("OLD: %s" % obj._index_cache)
@@ -874,8 +938,9 @@ class GangaRepositoryLocal(GangaRepository):
         if need_to_copy:
             for key, val in tmpobj._data.items():
                 obj.setSchemaAttribute(key, val)
+            # The children are set below, only once, so that another thread never sees the default in their place
             for attr_name, attr_val in obj._schema.allItems():
-                if attr_name not in tmpobj._data:
+                if attr_name not in tmpobj._data and attr_name != self.sub_split:
                     obj.setSchemaAttribute(attr_name, obj._schema.getDefaultValue(attr_name))
 
         if has_children:
@@ -976,7 +1041,7 @@ class GangaRepositoryLocal(GangaRepository):
                 try:
                     # remove internal representation
                     self._internal_del__(this_id)
-                    rmrf(os.path.dirname(fn) + ".index")
+                    self._remove_index(this_id)
                 except OSError as err:
                     logger.debug("load unlink Error: %s" % err)
                     pass
@@ -1109,7 +1174,7 @@ class GangaRepositoryLocal(GangaRepository):
             self.incomplete_objects.append(this_id)
             # remove index so we do not continue working with wrong
             # information
-            rmrf(os.path.dirname(fn) + ".index")
+            self._remove_index(this_id)
             raise InaccessibleObjectError(self, this_id, err)
 
         return False
@@ -1125,7 +1190,7 @@ class GangaRepositoryLocal(GangaRepository):
             # KeyError
             fn = self.get_fn(this_id)
             try:
-                rmrf(os.path.dirname(fn) + ".index")
+                self._remove_index(this_id)
             except OSError as err:
                 logger.debug("Delete Error: %s" % err)
             self._internal_del__(this_id)
@@ -1193,8 +1258,101 @@ class GangaRepositoryLocal(GangaRepository):
             obj (GangaObject): The object we want to know if it was loaded into memory
         """
         try:
-            _id = next(id_ for id_, o in self._fully_loaded.items() if o is obj)
+            _id = next(id_ for id_, o in list(self._fully_loaded.items()) if o is obj)
             return True
         except StopIteration:
             return False
 
+    def loaded_ids(self):
+        """ Returns the set of ids of the objects which have been fully loaded into memory """
+        return set(self._fully_loaded.keys())
+
+    @staticmethod
+    def _select_value(cache, attr):
+        """
+        Returns the value of an attribute as stored in an index cache, or _NOT_INDEXED if it isn't there.
+        The status and name are stored as they are, the attributes in [Configuration]selectIndexAttributes as 'select:<attr>'
+        Args:
+            cache (dict): The index cache of an object
+            attr (str): The name of the attribute
+        """
+        key = attr if attr in ('status', 'name') else 'select:' + attr
+        if key not in cache:
+            return _NOT_INDEXED
+        value = cache[key]
+        try:
+            hash(value)
+        except TypeError:
+            return _NOT_INDEXED
+        return value
+
+    def _update_select_index(self, this_id, cache):
+        """
+        Moves an object to its new value in the secondary indexes which have been built
+        Args:
+            this_id (int): The id of the object whose index cache has changed
+            cache (dict, None): The new index cache of the object, None if it has been removed
+        """
+        with self._select_index_lock:
+            for attr, (by_value, by_id) in self._select_index.items():
+                if this_id in by_id:
+                    old_value = by_id.pop(this_id)
+                    old_ids = by_value[old_value]
+                    old_ids.discard(this_id)
+                    if not old_ids:
+                        del by_value[old_value]
+                if cache is not None:
+                    value = self._select_value(cache, attr)
+                    by_id[this_id] = value
+                    by_value.setdefault(value, set()).add(this_id)
+
+    def _match_select_index(self, attr, value, is_pattern):
+        """
+        Returns the ids whose index value for an attribute matches, together with the ids which don't have one
+        Args:
+            attr (str): The name of the attribute
+            value (str): The value or fnmatch pattern to match
+            is_pattern (bool): Whether value is a pattern
+        """
+        with self._select_index_lock:
+            if attr not in self._select_index:
+                by_value, by_id = {}, {}
+                for this_id, cache in list(self._cached_obj.items()):
+                    this_value = self._select_value(cache, attr)
+                    by_id[this_id] = this_value
+                    by_value.setdefault(this_value, set()).add(this_id)
+                self._select_index[attr] = (by_value, by_id)
+            by_value = self._select_index[attr][0]
+
+            ids = set(by_value.get(_NOT_INDEXED, ()))
+            if is_pattern:
+                regex = re.compile(fnmatch.translate(value))
+                for this_value, value_ids in by_value.items():
+                    if this_value is not _NOT_INDEXED and regex.match(str(this_value)):
+                        ids.update(value_ids)
+            else:
+                ids.update(by_value.get(value, ()))
+            return ids
+
+    def select_ids(self, query):
+        """
+        Returns the ids of the objects which may match the query according to their index caches, together with those the
+        index can't answer for: objects without an index, changed by another session or with unflushed changes.
+        Only the status, name and [Configuration]selectIndexAttributes are indexed, None is returned if the query has none
+        Args:
+            query (dict): attribute name: (value, is_pattern), a pattern is matched as by fnmatch
+        """
+        indexed_attrs = ['status', 'name'] + list(getConfig('Configuration')['selectIndexAttributes'])
+        ids = None
+        for attr, (value, is_pattern) in query.items():
+            if attr not in indexed_attrs:
+                continue
+            matched = self._match_select_index(attr, value, is_pattern)
+            ids = matched if ids is None else ids & matched
+        if ids is None:
+            return None
+        ids.update(self.objects.keys() - self._cached_obj.keys())
+        ids.update(self._index_updated)
+        ids.update(this_id for this_id, obj in list(self._fully_loaded.items()) if obj._dirty)
+        return ids
+
@@ -0,0 +1,200 @@
+"""
+Decoder for the text of the <value> elements of the XML repository.
+
+The VStreamer writes every simple value as its repr(). Nearly all of these are literals: strings, numbers, booleans,
+None, and dicts/lists/tuples of those, plus datetime objects in the job timestamps. They are decoded here without eval.
+The most common forms (quoted strings without escapes, numbers, None/True/False) skip the parser entirely.
+
+Decoded values are kept in a bounded LRU. Immutable values are handed out as they are. A cached container only holding
+immutable values is handed out as a shallow copy, anything else as a deep copy, so that no two objects share a
+mutable attribute.
+
+Anything which isn't a literal (e.g. File(...) or other names from the config scope) is evaluated in the config scope
+as before and never cached, since it may build a new object each time.
+"""
+
+import ast
+import re
+import sys
+import copy
+import datetime
+import threading
+from functools import lru_cache
+
+# config_scope is namespace used for evaluating simple objects (e.g. File, datetime, SharedDir)
+from GangaCore.Utility.Config import config_scope
+
+# Maximum number of distinct value strings whose decoded value is kept
+CACHE_SIZE = 10000
+
+_constants = {'None': None, 'True': True, 'False': False}
+
+_int_re = re.compile(r'-?\d+$')
+_float_re = re.compile(r'-?(\d+\.\d*|\.\d+|\d+)([eE][-+]?\d+)?$')
+# values written by python 2 sessions may contain longs, e.g. {'a': 1L}
+_long_re = re.compile(r'(\d)L(\})')
+
+# Constructors which may appear inside a literal, by their dotted name
+_safe_calls = {'datetime.datetime': datetime.datetime,
+               'datetime.date': datetime.date,
+               'datetime.time': datetime.time,
+               'datetime.timedelta': datetime.timedelta}
+
+# ast.parse isn't thread safe in some python versions, it fails with 'AST constructor recursion depth mismatch'
+_parse_lock = threading.Lock()
+
+# Before python 3.8 the parser produces these node types for constants rather than ast.Constant, with the value
+# held in the named field
+if sys.version_info < (3, 8):
+    _legacy_constants = ((ast.Str, 's'), (ast.Bytes, 's'), (ast.Num, 'n'), (ast.NameConstant, 'value'))
+else:
+    _legacy_constants = ()
+
+_immutable_types = (str, bytes, int, float, complex, bool, type(None), datetime.datetime, datetime.date, datetime.time, datetime.timedelta)
+
+
+class NotALiteral(Exception):
+
+    """ Raised when a value string contains something other than a literal """
+    pass
+
+
+def _dotted_name(node):
+    """
+    Return the dotted name 'a.b.c' of a Name/Attribute node
+    Args:
+        node (ast.AST): The func of an ast.Call
+    """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return _dotted_name(node.value) + '.' + node.attr
+    raise NotALiteral(node)
+
+
+def _from_ast(node):
+    """
+    Build the value of a literal expression, raise NotALiteral for anything else
+    Args:
+        node (ast.AST): A node of the expression
+    """
+    if isinstance(node, ast.Constant):
+        return node.value
+    for node_type, field in _legacy_constants:
+        if isinstance(node, node_type):
+            return getattr(node, field)
+    if isinstance(node, ast.Dict):
+        return {_from_ast(k): _from_ast(v) for k, v in zip(node.keys, node.values)}
+    if isinstance(node, ast.List):
+        return [_from_ast(elt) for elt in node.elts]
+    if isinstance(node, ast.Tuple):
+        return tuple(_from_ast(elt) for elt in node.elts)
+    if isinstance(node, ast.Set):
+        return set(_from_ast(elt) for elt in node.elts)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _from_ast(node.operand)
+        if not isinstance(operand, (int, float, complex)):
+            raise NotALiteral(node)
+        return -operand if isinstance(node.op, ast.USub) else operand
+    if isinstance(node, ast.Call):
+        func = _safe_calls.get(_dotted_name(node.func))
+        if func is None or any(kw.arg is None for kw in node.keywords):
+            raise NotALiteral(node)
+        return func(*[_from_ast(arg) for arg in node.args], **{kw.arg: _from_ast(kw.value) for kw in node.keywords})
+    raise NotALiteral(node)
+
+
+def _is_immutable(value):
+    """
+    Returns whether value can be shared between objects
+    Args:
+        value (unknown): A decoded value
+    """
+    if isinstance(value, tuple):
+        return all(_is_immutable(v) for v in value)
+    return isinstance(value, _immutable_types)
+
+
+def _copier(value):
+    """
+    Returns how to copy a cached value before handing it out, None if it can be shared
+    Args:
+        value (unknown): A decoded value
+    """
+    if _is_immutable(value):
+        return None
+    if type(value) is dict and all(_is_immutable(k) and _is_immutable(v) for k, v in value.items()):
+        return dict
+    if type(value) in (list, set) and all(_is_immutable(v) for v in value):
+        return type(value)
+    return copy.deepcopy
+
+
+def _decode_fast(s):
+    """
+    Decode the most common value strings without parsing them, returns (True, value) or (False, None)
+    Args:
+        s (str): The value string
+    """
+    if not s:
+        return False, None
+    first = s[0]
+    if first in '\'"':
+        if len(s) > 1 and s[-1] == first and '\\' not in s and first not in s[1:-1]:
+            return True, s[1:-1]
+        return False, None
+    if s in _constants:
+        return True, _constants[s]
+    if _int_re.match(s):
+        return True, int(s)
+    if _float_re.match(s):
+        return True, float(s)
+    return False, None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _decode_literal(s):
+    """
+    Decode a literal value string, returns (value, copier). Raises NotALiteral which is never cached
+    Args:
+        s (str): The value string
+    """
+    found, value = _decode_fast(s)
+    if not found:
+        try:
+            with _parse_lock:
+                tree = ast.parse(s.strip(), mode='eval')
+        except (SyntaxError, ValueError) as err:
+            raise NotALiteral(err)
+        try:
+            value = _from_ast(tree.body)
+        except (TypeError, ValueError) as err:
+            # e.g. a datetime with invalid arguments or an unhashable dict key
+            raise NotALiteral(err)
+    return value, _copier(value)
+
+
+def decode_value(s):
+    """
+    Return the value for the (unescaped) text of a <value> element
+    Args:
+        s (str): The repr() of the value as found in the XML
+    """
+    if 'L}' in s:
+        s = _long_re.sub(r'\1\2', s)
+    try:
+        value, copier = _decode_literal(s)
+    except NotALiteral:
+        # This is ugly and classes which use this are bad, but this needs to be fixed in another PR
+        # TODO Make the scope of objects a lot better than whatever is in the config
+        return eval(s, config_scope)
+    if copier is None:
+        return value
+    return copier(value)
+
+
+def cache_info():
+    """
+    Returns the hits, misses and size of the cache of decoded values
+    """
+    return _decode_literal.cache_info()
@@ -318,6 +318,8 @@ class Registry(object):
             this_id (int): This is the key of an object in the object dictionary
         """
         logger.debug("__getitem__")
+        # Objects may still be being created from the index in the background
+        self.repository.wait_for_index([this_id])
         # Is this an Incomplete Object?
         if this_id in self._incomplete_objects:
             return IncompleteObject(self, this_id)
@@ -334,6 +336,7 @@ class Registry(object):
     def __len__(self):
         """ Returns the current number of root objects """
         logger.debug("__len__")
+        self.repository.wait_for_index()
         return len(self._objects)
 
     @synchronised_read_lock
@@ -343,6 +346,7 @@ class Registry(object):
             this_id (int): This is the key of an object in the object dictionary
         """
         logger.debug("__contains__")
+        self.repository.wait_for_index([this_id])
         return this_id in self._objects
 
     def updateLocksNow(self):
@@ -357,12 +361,14 @@ class Registry(object):
     def ids(self):
         """ Returns the list of ids of this registry """
         logger.debug("ids")
+        self.repository.wait_for_index()
         return sorted(self._objects.keys())
 
     @synchronised_read_lock
     def items(self):
         """ Return the items (ID,obj) in this registry. 
         Recommended access for iteration, since accessing by ID can fail if the ID iterator is old"""
+        self.repository.wait_for_index()
         return sorted(self._objects.items())
 
     def iteritems(self):
@@ -398,8 +404,9 @@ class Registry(object):
         Args:
             _obj (GangaObject): This is the object we want to match in the objects repo
         """
+        self.repository.wait_for_index()
         try:
-            return next(id_ for id_, o in self._objects.items() if o is obj)
+            return next(id_ for id_, o in list(self._objects.items()) if o is obj)
         except StopIteration:
             raise ObjectNotInRegistryError("Object '%s' does not seem to be in this registry: %s !" % (getName(obj), self.name))
 
@@ -421,6 +428,7 @@ class Registry(object):
                 logger.error("The following other sessions are active and have blocked the clearing of the repository: \n * %s" % ("\n * ".join(other_sessions)))
                 return False
         self.repository.reap_locks()
+        self.repository.wait_for_index()
         self.repository.delete(list(self._objects.keys()))
         self.repository.clean()
 
@@ -582,6 +590,34 @@ class Registry(object):
 
             obj._registry_locked = True
 
+    def _acquire_session_locks(self, objs):
+        """Obtain write access on many objects at once, with a single request to the session lock rather than one per
+        object. The objects which can't be locked are left as they are so that _acquire_session_lock reports them when
+        they're changed
+        Raise RepositoryError
+        Raise RegistryAccessError
+        Raise ObjectNotInRegistryError
+        Args:
+            objs (list): The objects of this registry we want to get write access to and lock on disk
+        """
+        if self.hasStarted() is not True:
+            raise RegistryAccessError("Cannot get write access to a disconnected repository!")
+
+        to_lock = dict((id(obj), obj) for obj in objs if not getattr(obj, '_registry_locked', False))
+        if not to_lock:
+            return
+
+        # Look the objects up in one pass over the registry rather than with a find() each
+        self.repository.wait_for_index()
+        ids = dict((id(o), id_) for id_, o in list(self._objects.items()) if id(o) in to_lock)
+        for obj in to_lock.values():
+            if id(obj) not in ids:
+                raise ObjectNotInRegistryError("Object '%s' does not seem to be in this registry: %s !" % (getName(obj), self.name))
+        to_lock = dict((ids[key], obj) for key, obj in to_lock.items())
+
+        for this_id in self.repository.lock(list(to_lock.keys())):
+            to_lock[this_id]._registry_locked = True
+
     def _release_session_lock_and_flush(self, obj):
         """Release the lock on a given object.
         Raise RepositoryError
@@ -688,6 +724,7 @@ class Registry(object):
     def info(self, full=False):
         """Returns an informative string onFlush and disconnect the repository. Called from Repository_runtime.py """
         logger.debug("info")
+        self.repository.wait_for_index()
         s = "registry '%s': %i objects" % (self.name, len(self._objects))
         if full:
             other_sessions = self.repository.get_other_sessions()
@@ -107,6 +107,9 @@ class SessionLockRefresher(GangaThread):
         self.repos = [repo]
         self.afs = afs
         self.FileCheckTimes = {}
+        # fn: descriptor kept open to update the timestamps of the file, see touchFile
+        self._fds = {}
+        self._fds_lock = threading.Lock()
 
     # This function attempts to grab the ctime from a file which should exist
     # As we don't want this to fail outright it attempts to re-read every 1s
@@ -127,8 +130,55 @@ class SessionLockRefresher(GangaThread):
                     else:
                         break
         finally:
+            self.closeFiles()
             self.unregister()
 
+    def touchFile(self, fn):
+        """
+        Update the timestamps of a session file in-process through a descriptor kept open for it, rather than forking
+        a touch. The file is still looked up by name each time so that one removed by another session is noticed
+        Returns the new ctime of the file
+        Raises OSError (ENOENT if the file has been removed)
+        Args:
+            fn (str): The session file
+        """
+        with self._fds_lock:
+            st = os.stat(fn)
+            fd = self._fds.get(fn)
+            if fd is not None:
+                fd_st = os.fstat(fd)
+                if (fd_st.st_dev, fd_st.st_ino) != (st.st_dev, st.st_ino):
+                    # The file has been replaced since it was opened
+                    self._closeFile(fn)
+                    fd = None
+            if fd is None:
+                fd = os.open(fn, os.O_RDONLY)
+                self._fds[fn] = fd
+            if os.utime in os.supports_fd:
+                os.utime(fd)
+            else:
+                os.utime(fn)
+            return os.fstat(fd).st_ctime
+
+    def _closeFile(self, fn):
+        """
+        Close the descriptor kept open for a session file, if there is one
+        Args:
+            fn (str): The session file
+        """
+        fd = self._fds.pop(fn, None)
+        if fd is not None:
+            try:
+                os.close(fd)
+            except OSError as err:
+                logger.debug("Failed to close session file descriptor: %s" % err)
+
+    def closeFiles(self):
+        """Close all of the descriptors kept open for the session files"""
+        with self._fds_lock:
+            for fn in list(self._fds.keys()):
+                self._closeFile(fn)
+
     def checkAndReap(self):
         # TODO: Check for services active/inactive
         try:
@@ -166,9 +216,7 @@ class SessionLockRefresher(GangaThread):
         this_index_file = self.fns[index]
         now = None
         try:
-            oldnow = os.stat(this_index_file).st_ctime
-            os.system('touch "%s"' % this_index_file)
-            now = os.stat(this_index_file).st_ctime # os.stat(self.fn).st_ctime
+            now = self.touchFile(this_index_file)
         except OSError as x:
             if x.errno != errno.ENOENT:
                 logger.debug("Session file timestamp could not be updated! Locks could be lost!")
@@ -246,6 +294,8 @@ class SessionLockRefresher(GangaThread):
     def removeRepo(self, fn, repo):
         #logger.debug("Removing fn: %s" % fn )
         self.fns.remove(fn)
+        with self._fds_lock:
+            self._closeFile(fn)
         #logger.debug("Removing fn: %s" % fn )
         self.repos.remove(repo)
 
@@ -346,6 +396,12 @@ class SessionLockManager(object):
     """
 
     LastCountAccess = namedtuple('LastCountAccess', ['time', 'val'])
+    # The locks of another session as last read from its lock file, see other_sessions_locks
+    SessionLocks = namedtuple('SessionLocks', ['stat', 'time', 'ids'])
+
+    # Seconds within which a file changed twice may not show a new modification time. A file modified this close to
+    # when it was read is read again the next time rather than trusted to be unchanged
+    racy_window = 1.
 
     def mkdir(self, dn):
         """Make sure the given directory exists"""
@@ -387,6 +443,10 @@ class SessionLockManager(object):
         self._lock = threading.RLock()
         self.last_count_access = None
         self._stored_session_path = {}
+        # (stat of the session directory, time, lock files) as last listed
+        self._lock_files = None
+        # lock file: SessionLocks of the other sessions
+        self._other_locks = {}
 
     @synchronised
     def startup(self):
@@ -722,30 +782,82 @@ class SessionLockManager(object):
             self._stored_session_path[session] = os.path.join(self.sdir, session)
         return self._stored_session_path[session]
 
+    def _is_unchanged(self, st, cached_stat, read_time):
+        """
+        Returns True if a file with the stat st is unchanged since it was read at read_time with the stat cached_stat
+        Args:
+            st (stat_result): The stat of the file now
+            cached_stat (tuple): The stat of the file when it was read, see _stat_key
+            read_time (float): The time just before it was read
+        """
+        return self._stat_key(st) == cached_stat and st.st_mtime < read_time - self.racy_window
+
+    @staticmethod
+    def _stat_key(st):
+        """
+        Returns what's compared of the stat of a file to tell that it hasn't changed
+        Args:
+            st (stat_result): The stat of the file
+        """
+        return (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+    def _list_lock_files(self):
+        """
+        Returns the lock files of this registry of the other sessions. The session directory is only listed again once
+        it has changed, i.e. when a session has been started or has finished
+        Raises RepositoryError if the directory can't be listed
+        """
+        try:
+            st = os.stat(self.sdir)
+            if self._lock_files is None or not self._is_unchanged(st, self._lock_files[0], self._lock_files[1]):
+                read_time = time.time()
+                lock_files = [self._path_helper(sn) for sn in os.listdir(self.sdir) if sn.endswith(self.name + ".locks")]
+                self._lock_files = (self._stat_key(st), read_time, lock_files)
+        except OSError as x:
+            raise RepositoryError(self.repo, "Could not list session directory '%s'!" % (self.sdir))
+        return [sf for sf in self._lock_files[2] if sf != self.fn]
+
+    @synchronised
+    def other_sessions_locks(self):
+        """
+        Returns a dict of the lock file of each other session and the set of ids it has locked. The lock files are
+        only read again when they've changed since they were last read.
+        The global lock MUST be held for this function to work
+        Raises RepositoryError if severe access problems occur
+        """
+        other_locks = {}
+        for sf in self._list_lock_files():
+            try:
+                st = os.stat(sf)
+            except OSError as x:
+                if x.errno == errno.ENOENT:
+                    # the session has finished since the directory was listed
+                    continue
+                raise RepositoryError(self.repo, "Error on session file access '%s': %s" % (sf, x))
+            cached = self._other_locks.get(sf)
+            if cached is None or not self._is_unchanged(st, cached.stat, cached.time):
+                read_time = time.time()
+                cached = SessionLockManager.SessionLocks(self._stat_key(st), read_time, frozenset(self.session_read(sf)))
+            other_locks[sf] = cached
+        self._other_locks = other_locks
+        return dict((sf, cached.ids) for sf, cached in other_locks.items())
+
     @synchronised
     @global_disk_lock
     def lock_ids(self, ids):
+        """ Locks as many of ids as possible at once and returns those which were locked, this session's lock file is
+            only written when this adds to the locks it holds
+            Raise RepositoryError on fatal error """
 
         #logger.debug( "locking: %s" % ids)
         ids = set(ids)
-        try:
-            sessions = [sn for sn in os.listdir(self.sdir) if sn.endswith(self.name + ".locks")]
-        except OSError as x:
-            raise RepositoryError(self.repo, "Could not list session directory '%s'!" % (self.sdir))
-
-        slocked = set()
-        for session in sessions:
-            sf = self._path_helper(session)
-            if sf == self.fn:
-                continue
-            slocked.update(self.session_read(sf))
-        #logger.debug( "locked: %s" % slocked)
-        ids.difference_update(slocked)
-        if not GANGA_SWAN_INTEGRATION:
+        for slocked in self.other_sessions_locks().values():
+            ids.difference_update(slocked)
+        if not GANGA_SWAN_INTEGRATION and not ids.issubset(self.locked):
             # If sharing sessions don't update id to locked.
             self.locked.update(ids)
-        #logger.debug( "stored_lock: %s" % self.locked)
-        self.session_write()
+            #logger.debug( "stored_lock: %s" % self.locked)
+            self.session_write()
         #logger.debug( "list: %s" % list(ids))
         return list(ids)
 
@@ -802,26 +914,16 @@ class SessionLockManager(object):
         Returns None on failure
         """
 
-        sessions = [s for s in os.listdir(self.sdir) if s.endswith(self.name + ".locks")]
-        for session in sessions:
-            fd = None
-            try:
-                sf = self._path_helper(session)
-                if not self.afs:
-                    fd = os.open(sf, os.O_RDWR)
-                    fcntl.lockf(fd, fcntl.LOCK_SH)  # ONLY NFS
-                with open(sf) as sf_file:
-                    names = pickle.load(sf_file)
-                if not self.afs and fd is not None:
-                    fcntl.lockf(fd, fcntl.LOCK_UN)  # ONLY NFS
-                if id in names:
-                    return self.session_to_info(session)
-            except Exception as err:
-                logger.debug("Get Lock Session Exception: %s" % err)
-                continue
-            finally:
-                if fd is not None:
-                    os.close(fd)
+        if id in self.locked:
+            return self.session_to_info(os.path.basename(self.fn))
+        try:
+            other_locks = self.other_sessions_locks()
+        except RepositoryError as err:
+            logger.debug("Get Lock Session Exception: %s" % err)
+            return None
+        for sf, names in other_locks.items():
+            if id in names:
+                return self.session_to_info(os.path.basename(sf))
 
     @synchronised
     @global_disk_lock
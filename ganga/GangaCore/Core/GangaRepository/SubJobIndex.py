@@ -0,0 +1,229 @@
+"""
+The index entries of the subjobs of a job held as one column per field rather than as one dict per subjob.
+
+A master job with tens of thousands of subjobs otherwise keeps a dict per subjob with its own copy of every status,
+backend name and timestamp dict read from the subjob index on disk. Here each field is a list indexed by the subjob
+id, the values which repeat (statuses, class names, empty lists) are shared between the subjobs and the fields held
+as dicts (e.g. 'time:timestamps') are split into a column per key.
+"""
+
+# Marks a subjob without a value for a field
+_MISSING = object()
+# Marks a subjob whose value for a field is a dict held in the sub-columns of the field
+_DICT = object()
+
+
+class SubJobIndex(object):
+
+    """
+    A mapping of subjob id to index entry which stores the entries as columns. Entries are handed out as new dicts
+    so changing one doesn't change the index, use getValue to read a single field without building the entry
+    """
+
+    __slots__ = ('_columns', '_subcolumns', '_list_fields', '_shared', '_present', '_count')
+
+    # Number of distinct values of a field which are shared between the subjobs. Beyond this the values of the
+    # field are mostly different (e.g. names and timestamps) and aren't worth looking up
+    _max_shared = 256
+
+    def __init__(self, entries=None):
+        """
+        Args:
+            entries (dict): The index entries to hold, keyed by subjob id
+        """
+        # field: list of values indexed by subjob id
+        self._columns = {}
+        # field: {key: list of values} for the fields held as dicts
+        self._subcolumns = {}
+        # fields whose values are lists, these are held as tuples
+        self._list_fields = set()
+        # field: {(type, value): value} of the values shared between subjobs, None once there are too many
+        self._shared = {}
+        self._present = bytearray()
+        self._count = 0
+        if entries:
+            self.update(entries)
+
+    def _share(self, field, value):
+        """
+        Returns the instance of value shared by the subjobs
+        Args:
+            field (str, tuple): The field, or (field, key) of a sub-column
+            value (object): The value being stored
+        """
+        shared = self._shared.get(field, {})
+        if shared is None:
+            return value
+        try:
+            value = shared.setdefault((type(value), value), value)
+        except TypeError:
+            return value
+        if len(shared) > self._max_shared:
+            shared = None
+        self._shared[field] = shared
+        return value
+
+    def _grow(self, sj_id):
+        """
+        Make room in every column for the subjob sj_id
+        Args:
+            sj_id (int): The id of the subjob
+        """
+        extra = sj_id + 1 - len(self._present)
+        if extra <= 0:
+            return
+        self._present.extend(bytes(extra))
+        for column in self._columns.values():
+            column.extend([_MISSING] * extra)
+        for subcolumns in self._subcolumns.values():
+            for column in subcolumns.values():
+                column.extend([_MISSING] * extra)
+
+    def _column(self, columns, field):
+        """
+        Returns the column of field in columns, adding it if it's new
+        Args:
+            columns (dict): The columns to look in
+            field (str): The name of the field
+        """
+        column = columns.get(field)
+        if column is None:
+            column = [_MISSING] * len(self._present)
+            columns[field] = column
+        return column
+
+    def _clear(self, sj_id):
+        """
+        Remove every value of a subjob
+        Args:
+            sj_id (int): The id of the subjob
+        """
+        for column in self._columns.values():
+            column[sj_id] = _MISSING
+        for subcolumns in self._subcolumns.values():
+            for column in subcolumns.values():
+                column[sj_id] = _MISSING
+
+    def __setitem__(self, sj_id, entry):
+        """
+        Store the index entry of a subjob, an entry of None removes it
+        Args:
+            sj_id (int): The id of the subjob
+            entry (dict): The index entry
+        """
+        if entry is None:
+            self.pop(sj_id, None)
+            return
+        self._grow(sj_id)
+        if self._present[sj_id]:
+            self._clear(sj_id)
+        else:
+            self._present[sj_id] = 1
+            self._count += 1
+        for field, value in entry.items():
+            if isinstance(value, dict):
+                subcolumns = self._subcolumns.setdefault(field, {})
+                for key, sub_value in value.items():
+                    self._column(subcolumns, key)[sj_id] = self._share((field, key), sub_value)
+                value = _DICT
+            elif isinstance(value, list):
+                self._list_fields.add(field)
+                value = self._share(field, tuple(value))
+            else:
+                value = self._share(field, value)
+            self._column(self._columns, field)[sj_id] = value
+
+    def __getitem__(self, sj_id):
+        """
+        Returns a new dict holding the index entry of a subjob
+        Args:
+            sj_id (int): The id of the subjob
+        """
+        if sj_id not in self:
+            raise KeyError(sj_id)
+        entry = {}
+        for field, column in self._columns.items():
+            value = column[sj_id]
+            if value is _MISSING:
+                continue
+            entry[field] = self._value(field, sj_id, value)
+        return entry
+
+    def _value(self, field, sj_id, value):
+        """
+        Returns a value of a column as it was stored
+        Args:
+            field (str): The name of the field
+            sj_id (int): The id of the subjob
+            value (object): The value in the column
+        """
+        if value is _DICT:
+            return dict((key, column[sj_id]) for key, column in self._subcolumns[field].items()
+                        if column[sj_id] is not _MISSING)
+        if field in self._list_fields and isinstance(value, tuple):
+            return list(value)
+        return value
+
+    def getValue(self, sj_id, field, default=None):
+        """
+        Returns the value of one field of the index entry of a subjob, or default if it doesn't have one
+        Args:
+            sj_id (int): The id of the subjob
+            field (str): The name of the field, e.g. 'status'
+            default (object): The value returned for a missing subjob or field
+        """
+        if sj_id not in self or field not in self._columns:
+            return default
+        value = self._columns[field][sj_id]
+        if value is _MISSING:
+            return default
+        return self._value(field, sj_id, value)
+
+    def get(self, sj_id, default=None):
+        if sj_id in self:
+            return self[sj_id]
+        return default
+
+    def pop(self, sj_id, *default):
+        if sj_id not in self:
+            if default:
+                return default[0]
+            raise KeyError(sj_id)
+        entry = self[sj_id]
+        self._clear(sj_id)
+        self._present[sj_id] = 0
+        self._count -= 1
+        return entry
+
+    def update(self, entries):
+        for sj_id, entry in entries.items():
+            self[sj_id] = entry
+
+    def __contains__(self, sj_id):
+        return isinstance(sj_id, int) and 0 <= sj_id < len(self._present) and self._present[sj_id] == 1
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return (sj_id for sj_id, present in enumerate(self._present) if present)
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(sj_id, self[sj_id]) for sj_id in self]
+
+    def __eq__(self, other):
+        if isinstance(other, SubJobIndex):
+            other = dict(other.items())
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __deepcopy__(self, memo=None):
+        return SubJobIndex(dict(self.items()))
+
+    def __repr__(self):
+        return 'SubJobIndex(%d entries)' % self._count
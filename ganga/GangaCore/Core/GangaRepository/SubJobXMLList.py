@@ -5,11 +5,17 @@ from GangaCore.Core.GangaRepository.GangaRepository import RepositoryError
 from GangaCore.Core.exceptions import GangaException
 from GangaCore.GPIDev.Base.Proxy import stripProxy
 from GangaCore.Core.GangaRepository.VStreamer import XMLFileError
+from GangaCore.Core.GangaRepository.SubJobIndex import SubJobIndex
+from GangaCore.Utility.Config import getConfig
 import errno
 import copy
+import pickle
 import threading
 import shutil
-from os import listdir, path, stat
+import weakref
+from os import listdir, path, stat, fstat, replace
+
+from GangaCore.Core.GangaThread import GangaThread
 
 logger = getLogger()
 
@@ -49,6 +55,14 @@ class SubJobXMLList(GangaObject):
 
     _schema = Schema(Version(1, 0), {})
 
+    # Number of delta records appended to the subjob index before it is compacted in the background
+    _max_index_records = 100
+
+    # Number of subjobs loaded before those which are unchanged are released, see _releaseSubJobs
+    _max_loaded_subjobs = 100
+    # Number of subjobs in memory at which they're next released, this grows with those which can't be
+    _release_at = _max_loaded_subjobs
+
     def __init__(self, jobDirectory='', registry=None, dataFileName='data', load_backup=False, parent=None):
         """ Constructor for SubjobXMLList
         Args:
@@ -63,6 +77,8 @@ class SubJobXMLList(GangaObject):
         self._jobDirectory = jobDirectory
         self._registry = registry
         self._cachedJobs = {}
+        # Subjobs released from _cachedJobs which are only kept for as long as they're used elsewhere
+        self._releasedJobs = weakref.WeakValueDictionary()
 
         self._dataFileName = dataFileName
         self._load_backup = load_backup
@@ -71,10 +87,19 @@ class SubJobXMLList(GangaObject):
 
         self._subjob_master_index_name = "subjobs.idx"
 
+        # The index on disk is a full record followed by delta records, see write_subJobIndex
+        self._index_lock = threading.RLock()
+        self._index_on_disk = False
+        self._index_records = 0
+        self._index_generation = 0
+        self._compacting = False
+        # ctime of the data files we've written, used for the 'modified' entry of the index
+        self._modified = {}
+
         if jobDirectory == '' and registry is None:
             return
 
-        self._subjobIndexData = {}
+        self._subjobIndexData = SubJobIndex()
         if parent:
             self._setParent(parent)
         self.load_subJobIndex()
@@ -105,6 +130,7 @@ class SubJobXMLList(GangaObject):
         ## Manually define unsafe/uncopyable objects
         obj._definedParent = None
         obj._cachedJobs = {}
+        obj._releasedJobs = weakref.WeakValueDictionary()
         return obj
 
     def _reset_cachedJobs(self, obj):
@@ -113,6 +139,7 @@ class SubJobXMLList(GangaObject):
             obj (dict): This is the new dictonary of subjob Job objects with sequential integer keys
         """
         self._cachedJobs = obj
+        self._releasedJobs = weakref.WeakValueDictionary()
 
     def isLoaded(self, subjob_id):
         """Has the subjob been loaded? True/False
@@ -127,20 +154,20 @@ class SubJobXMLList(GangaObject):
         if path.isfile( index_file ):
             index_file_obj = None
             try:
-                from GangaCore.Core.GangaRepository.PickleStreamer import from_file
-
+                index_data_read = None
                 try:
                     index_file_obj = open(index_file, "rb" )
-                    self._subjobIndexData = from_file( index_file_obj )[0]
+                    index_data_read, self._index_records, complete = SubJobXMLList.read_subJobIndex(index_file_obj)
+                    self._index_on_disk = complete
                 except IOError as err:
-                    self._subjobIndexData = None
                     self._setDirty()
 
-                if self._subjobIndexData is None:
-                    self._subjobIndexData = {}
+                if index_data_read is None:
+                    self._subjobIndexData = SubJobIndex()
                 else:
-                    for subjob_id in self._subjobIndexData:
-                        index_data = self._subjobIndexData.get(subjob_id)
+                    self._subjobIndexData = SubJobIndex()
+                    for subjob_id in index_data_read:
+                        index_data = index_data_read.get(subjob_id)
                         ## CANNOT PERFORM REASONABLE DISK CHECKING ON AFS
                         ## SLOW FILE ACCESS WRITE AND METADATA MEANS FILE DATA DOES NOT MATCH MOD TIME
                         #if index_data is not None and 'modified' in index_data:
@@ -162,31 +189,137 @@ class SubJobXMLList(GangaObject):
                             self._subjobIndexData[subjob_id] = new_data
                             continue
                         #self._subjobIndexData = {}
+                        self._subjobIndexData[subjob_id] = index_data
             except Exception as err:
                 logger.debug( "Subjob Index file open, error: %s" % err )
-                self._subjobIndexData = {}
+                self._subjobIndexData = SubJobIndex()
                 self._setDirty()
             finally:
                 if index_file_obj is not None:
                     index_file_obj.close()
-                if self._subjobIndexData is None:
-                    self._subjobIndexData = {}
         else:
             self._setDirty()
         return
 
-    def write_subJobIndex(self, ignore_disk=False):
+    @staticmethod
+    def read_subJobIndex(index_file_obj):
+        """Read a subjob index written by write_subJobIndex.
+        Returns the index data, the number of delta records which follow the full record and whether the file was read to the end.
+        A record which is cut short (e.g. by a crash while appending) and anything after it is ignored.
+        Args:
+            index_file_obj (file): The index file opened for reading in binary mode
+        """
+        index_data = pickle.load(index_file_obj)
+        if index_data is None:
+            return None, 0, False
+        records = 0
+        size = fstat(index_file_obj.fileno()).st_size
+        while True:
+            start = index_file_obj.tell()
+            try:
+                delta = pickle.load(index_file_obj)
+            except EOFError:
+                # A record torn part way through raises EOFError too, only a clean end of the file means it's complete
+                if start != size:
+                    logger.debug("Ignoring the incomplete end of the subjob index")
+                return index_data, records, start == size
+            except (pickle.UnpicklingError, ValueError, TypeError, AttributeError, IndexError) as err:
+                logger.debug("Ignoring the end of the subjob index: %s" % err)
+                return index_data, records, False
+            index_data.update(delta)
+            records += 1
+
+    def write_subJobIndex(self, ignore_disk=False, changed=None):
         """interface for writing the index which captures errors and alerts the user vs throwing uncaught exception
         Args:
             ignore_disk (bool): Optional flag to force the class to ignore all on-disk data when flushing
+            changed (list, None): ids of the subjobs which have been written since the index was last written, None for all of them
         """
         try:
-            self.__really_writeIndex(ignore_disk)
+            with self._index_lock:
+                # Deltas are only appended to an index which already covers every subjob
+                expected = len(self._cachedJobs) if ignore_disk else len(self)
+                if changed is not None and self._index_on_disk and len(self._subjobIndexData) == expected:
+                    self.__append_indexDelta(changed)
+                else:
+                    self.__really_writeIndex(ignore_disk)
         ## Once It's known what te likely exceptions here are they'll be added
         except (IOError,) as err:
             logger.debug("Can't write Index. Moving on as this is not essential to functioning it's a performance bug")
             logger.debug("Error: %s" % err)
 
+    def __get_modified(self, sj_id):
+        """Return the ctime of the data file of a subjob, only calling stat the first time
+        Args:
+            sj_id (int): id of the subjob whose data file we want
+        """
+        if sj_id not in self._modified:
+            self._modified[sj_id] = stat(self.__get_dataFile(sj_id)).st_ctime
+        return self._modified[sj_id]
+
+    def __get_indexCache(self, sj_id):
+        """Return a fresh index entry for a subjob
+        Args:
+            sj_id (int): id of the subjob
+        """
+        this_cache = self._registry.getIndexCache(self.__getitem__(sj_id))
+        this_cache['modified'] = self.__get_modified(sj_id)
+        return this_cache
+
+    def __index_fileName(self):
+        return path.join(self._jobDirectory, self._subjob_master_index_name)
+
+    def __append_indexDelta(self, changed):
+        """Append a record with the index entries of the changed subjobs to the index on disk
+        Args:
+            changed (list): ids of the subjobs whose entries have changed
+        """
+        if not changed:
+            return
+        delta = {}
+        for sj_id in changed:
+            delta[sj_id] = self.__get_indexCache(sj_id)
+        self._subjobIndexData.update(delta)
+
+        with open(self.__index_fileName(), "ab") as index_file_obj:
+            pickle.dump(delta, index_file_obj, 1)
+        self._index_records += 1
+
+        if self._index_records >= self._max_index_records and not self._compacting:
+            self._compacting = True
+            GangaThread(name='subjob_index_compaction', target=self.__compact_index, auto_register=False, critical=False).start()
+
+    def __compact_index(self):
+        """Replace the index on disk by a single full record. Runs in the background while more deltas may be appended"""
+        index_file = self.__index_fileName()
+        compact_file = index_file + '.compact'
+        try:
+            with self._index_lock:
+                generation = self._index_generation
+                records = self._index_records
+                snapshot = dict(self._subjobIndexData.items())
+                offset = path.getsize(index_file)
+
+            with open(compact_file, "wb") as compact_file_obj:
+                pickle.dump(snapshot, compact_file_obj, 1)
+
+            with self._index_lock:
+                if generation != self._index_generation:
+                    # The whole index has been rewritten in the meantime
+                    return
+                # Carry over the deltas appended while the snapshot was being written
+                with open(index_file, "rb") as index_file_obj:
+                    index_file_obj.seek(offset)
+                    tail = index_file_obj.read()
+                with open(compact_file, "ab") as compact_file_obj:
+                    compact_file_obj.write(tail)
+                replace(compact_file, index_file)
+                self._index_records -= records
+        except (IOError, OSError) as err:
+            logger.debug("Can't compact subjob index: %s" % err)
+        finally:
+            self._compacting = False
+
     def __really_writeIndex(self, ignore_disk=False):
         """Do the actual work of writing the index for all subjobs
         Args:
@@ -200,26 +333,21 @@ class SubJobXMLList(GangaObject):
             range_limit = list(range(len(self)))
 
         for sj_id in range_limit:
-            if sj_id in self._cachedJobs:
-                this_cache = self._registry.getIndexCache(self.__getitem__(sj_id))
-                all_caches[sj_id] = this_cache
-                disk_location = self.__get_dataFile(sj_id)
-                all_caches[sj_id]['modified'] = stat(disk_location).st_ctime
+            if sj_id in self._cachedJobs or sj_id not in self._subjobIndexData:
+                all_caches[sj_id] = self.__get_indexCache(sj_id)
             else:
-                if sj_id in self._subjobIndexData:
-                    all_caches[sj_id] = self._subjobIndexData[sj_id]
-                else:
-                    this_cache = self._registry.getIndexCache(self.__getitem__(sj_id))
-                    all_caches[sj_id] = this_cache
-                    disk_location = self.__get_dataFile(sj_id)
-                    all_caches[sj_id]['modified'] = stat(disk_location).st_ctime
+                all_caches[sj_id] = self._subjobIndexData[sj_id]
 
         try:
             from GangaCore.Core.GangaRepository.PickleStreamer import to_file
-            index_file = path.join(self._jobDirectory, self._subjob_master_index_name)
+            index_file = self.__index_fileName()
             index_file_obj = open(index_file, "wb")
             to_file(all_caches, index_file_obj)
             index_file_obj.close()
+            self._subjobIndexData.update(all_caches)
+            self._index_on_disk = True
+            self._index_records = 0
+            self._index_generation += 1
         ## Once I work out what the other exceptions here are I'll add them
         except (IOError,) as err:
             logger.debug("cache write error: %s" % err)
@@ -372,6 +500,15 @@ class SubJobXMLList(GangaObject):
                 if index in self._cachedJobs:
                     return self._cachedJobs[index]
 
+                # a released subjob which is still in use elsewhere is the one to hand back
+                released_sj = self._releasedJobs.pop(index, None)
+                if released_sj is not None:
+                    self._cachedJobs[index] = released_sj
+                    return released_sj
+
+                if len(self._cachedJobs) >= self._release_at:
+                    self._releaseSubJobs()
+
                 has_loaded_backup = False
 
                 # Now try to load the subjob
@@ -422,6 +559,34 @@ class SubJobXMLList(GangaObject):
 
         return self._cachedJobs[index]
 
+    def _releaseSubJobs(self):
+        """
+        In the compact mode ([Configuration]compactSubjobs) the subjobs in memory which haven't changed since they were
+        last written are only held weakly. They're then only kept as their entry in the subjob index once they're no
+        longer used elsewhere and are read back from disk when they're next accessed
+        """
+        if not getConfig('Configuration')['compactSubjobs']:
+            return
+        for index, subjob_obj in list(self._cachedJobs.items()):
+            if not subjob_obj._dirty and index in self._subjobIndexData:
+                self._releasedJobs[index] = subjob_obj
+                del self._cachedJobs[index]
+                # It may have been changed by another thread before it was released
+                if subjob_obj._dirty:
+                    self._releasedJobs.pop(index, None)
+                    self._cachedJobs.setdefault(index, subjob_obj)
+        self._release_at = max(self._max_loaded_subjobs, 2 * len(self._cachedJobs))
+
+    def _keepReleasedSubJobs(self):
+        """
+        Hold on to the released subjobs which are still in memory again. Called when the master job is marked as dirty
+        as one of them may have just been changed and has to be kept until it's been flushed
+        """
+        for index in list(self._releasedJobs.keys()):
+            subjob_obj = self._releasedJobs.pop(index, None)
+            if subjob_obj is not None:
+                self._cachedJobs.setdefault(index, subjob_obj)
+
     def _setParent(self, parentObj):
         """Set the parent of self and any objects in memory we control
         Args:
@@ -486,17 +651,34 @@ class SubJobXMLList(GangaObject):
         Returns the cached statuses of the subjobs whilst respecting the Lazy loading
         """
         sj_statuses = []
-        if len(self._subjobIndexData) == len(self):
-            for i in range(len(self)):
+        # len() stats the job directory so only ask once
+        num_subjobs = len(self)
+        if len(self._subjobIndexData) == num_subjobs:
+            for i in range(num_subjobs):
                 if self.isLoaded(i):
                     sj_statuses.append(self.__getitem__(i).status)
                 else:
-                    sj_statuses.append(self._subjobIndexData[i]['status'])
+                    sj_statuses.append(self._subjobIndexData.getValue(i, 'status'))
         else:
-            for i in range(len(self)):
+            for i in range(num_subjobs):
                 sj_statuses.append(self.__getitem__(i).status)
         return sj_statuses
 
+    def getAllSJTimestamps(self):
+        """
+        Returns the timestamps of the subjobs from the index whilst respecting the Lazy loading
+        Only subjobs whose index entry predates the timestamps being stored in it are loaded
+        """
+        sj_timestamps = []
+        num_subjobs = len(self)
+        for i in range(num_subjobs):
+            timestamps = self._subjobIndexData.getValue(i, 'time:timestamps')
+            if not self.isLoaded(i) and timestamps is not None:
+                sj_timestamps.append(timestamps)
+            else:
+                sj_timestamps.append(self.__getitem__(i).time.timestamps)
+        return sj_timestamps
+
     def flush(self, ignore_disk=False):
         """Flush all subjobs to disk using XML methods
         Args:
@@ -507,30 +689,31 @@ class SubJobXMLList(GangaObject):
         from GangaCore.Core.GangaRepository.VStreamer import to_file
 
         if ignore_disk:
-            range_limit = list(self._cachedJobs.keys())
+            range_limit = None
         else:
-            range_limit = list(range(len(self)))
+            range_limit = len(self)
 
-        for index in range_limit:
-            if index in self._cachedJobs:
-                ## If it ain't dirty skip it
-                if not self._cachedJobs[index]._dirty:
-                    continue
+        ## Only the subjobs in memory can have changed and only the dirty ones need writing
+        changed = sorted(index for index, subjob_obj in list(self._cachedJobs.items())
+                         if subjob_obj._dirty and (range_limit is None or index < range_limit))
 
-                subjob_data = self.__get_dataFile(str(index))
-                subjob_obj = self._cachedJobs[index]
+        for index in changed:
+            subjob_data = self.__get_dataFile(str(index))
+            subjob_obj = self._cachedJobs[index]
 
-                if subjob_obj is subjob_obj._getRoot():
-                    raise GangaException(self, "Subjob parent not set correctly in flush.")
+            if subjob_obj is subjob_obj._getRoot():
+                raise GangaException(self, "Subjob parent not set correctly in flush.")
 
-                safe_save( subjob_data, subjob_obj, to_file )
+            safe_save( subjob_data, subjob_obj, to_file )
+            subjob_obj._setFlushed()
+            self._modified.pop(index, None)
 
-        self.write_subJobIndex(ignore_disk)
+        self.write_subJobIndex(ignore_disk, changed)
+        self._releaseSubJobs()
 
     def _setFlushed(self):
-        """ Like Node only descend into objects which aren't in the Schema"""
-        for index in self._cachedJobs:
-            self._cachedJobs[index]._setFlushed()
+        """ Like Node only descend into objects which aren't in the Schema. The subjobs are marked as flushed by flush as
+        they're written, one changed since then is left dirty to be written by the next flush rather than be released"""
         super(SubJobXMLList, self)._setFlushed()
 
     def _private_display(self, reg_slice, this_format, default_width, markup):
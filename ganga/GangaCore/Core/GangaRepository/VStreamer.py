@@ -5,16 +5,14 @@ from GangaCore.GPIDev.Base.Proxy import addProxy, stripProxy, isType, getName
 
 from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList, makeGangaListByRef
 
-# config_scope is namespace used for evaluating simple objects (e.g. File, datetime, SharedDir)
-from GangaCore.Utility.Config import config_scope
-
 from GangaCore.Utility.Plugin import PluginManagerError, allPlugins
 
 from GangaCore.GPIDev.Base.Objects import GangaObject, ObjectMetaclass
-from GangaCore.GPIDev.Schema import Schema, Version
+from GangaCore.GPIDev.Schema import Schema, Version, ComponentItem, SharedItem, SimpleItem
 from GangaCore.GPIDev.Lib.GangaList.GangaList import makeGangaList
 
 from .GangaRepository import SchemaVersionError
+from .LiteralDecoder import decode_value
 
 import xml.sax.saxutils
 import copy
@@ -22,8 +20,6 @@ from io import StringIO
 
 logger = getLogger()
 
-_cached_eval_strings = {}
-
 ##########################################################################
 # Ganga Project. http://cern.ch/ganga
 #
@@ -49,6 +45,13 @@ class XMLFileError(GangaException):
         return "XMLFileError: %s %s" % (self.message, err)
 
 def _raw_to_file(j, fobj=None, ignore_subs=[]):
+    if fobj is None:
+        import sys
+        fobj = sys.stdout
+    fobj.write(XMLWriter(selection=ignore_subs).write(j) + '\n')
+
+def _visitor_to_file(j, fobj=None, ignore_subs=[]):
+    # The reference implementation of the XML format, kept for debugging and for validating XMLWriter
     sio = StringIO()
     vstreamer = VStreamer(out=sio, selection=ignore_subs)
     vstreamer.begin_root()
@@ -58,7 +61,7 @@ def _raw_to_file(j, fobj=None, ignore_subs=[]):
 
 def to_file(j, fobj=None, ignore_subs=[]):
     #used to debug write problems - rcurrie
-    #_raw_to_file(j, fobj, ignore_subs)
+    #_visitor_to_file(j, fobj, ignore_subs)
     #return
     _ignore_subs = [ignore_subs] if not isinstance(ignore_subs, list) else ignore_subs
     try:
@@ -67,13 +70,6 @@ def to_file(j, fobj=None, ignore_subs=[]):
         logger.error("XML to-file error for file:\n%s" % (err))
         raise XMLFileError(err, "to-file error")
 
-# Faster, but experimental version of to_file without accept()
-# def to_file(j,f=None,ignore_subs=''):
-#    sl = ["<root>"]
-#    sl.extend(fastXML(j,'   ',ignore_subs=ignore_subs))
-#    sl.append("</root>\n")
-#    f.write("".join(sl))
-
 # load object (job) from file f
 # if len(errors) > 0 the object was not loaded correctly.
 # Typical exceptions are:
@@ -110,40 +106,198 @@ def escape(s):
 def unescape(s):
     return xml.sax.saxutils.unescape(s)
 
-# An experimental, fast way to print a tree of Ganga Objects to file
-# Unused at the moment
-
-
-def fastXML(obj, indent='', ignore_subs=''):
-    if hasattr(obj, "__iter__") and not hasattr(obj, "iteritems"):
-        sl = ["\n", indent, "<sequence>", "\n"]
-        for so in obj:
-            sl.append(indent)
-            sl.extend(fastXML(so, indent + ' ', ignore_subs))
-        sl.append(indent)
-        sl.append("</sequence>")
-        return sl
-    elif hasattr(obj, '_data'):
-        v = obj._schema.version
-        sl = ['\n', indent, '<class name="%s" version="%i.%i" category="%s">\n' % (getName(obj), v.major, v.minor, obj._category)]
-        for attr_name in obj._schema.allItemNames():
-            k = attr_name
-            o = getattr(obj, k)
-            if k != ignore_subs:
-                try:
-                    if not obj._schema[k]._meta["transient"]:
-                        sl.append(indent)
-                        sl.append('<attribute name="%s">' % k)
-                        sl.extend(fastXML(o, indent + '  ', ignore_subs))
-                        sl.append('</attribute>\n')
-                except KeyError as err:
-                    logger.debug("KeyError: %s" % err)
-                    pass
-        sl.append(indent)
-        sl.append('</class>')
-        return sl
-    else:
-        return ["<value>", escape(repr(obj)), "</value>"]
+##########################################################################
+# A single pass writer producing exactly the same XML as the VStreamer visitor.
+#
+
+# Values which are always written as a plain <value> element
+_plain_value_types = (int, float, bool, dict)
+
+# Kinds of attribute in a _ClassTemplate
+_SIMPLE, _COMPONENT = 0, 1
+
+
+class _ClassTemplate(object):
+
+    """
+    The parts of the XML of a GangaObject class which don't depend on the instance being written.
+    Built once per class from the schema and reused for every object of that class.
+    """
+
+    __slots__ = ('schema', 'class_begin', 'items')
+
+    def __init__(self, cls):
+        """
+        Args:
+            cls (class): The GangaObject class the template describes
+        """
+        schema = cls._schema
+        self.schema = schema
+        self.class_begin = ' <class name="%s" version="%d.%d" category="%s">\n' % (schema.name, schema.version.major, schema.version.minor, schema.category)
+
+        # Same order and filtering as GangaObject.accept and GangaList.accept
+        is_list = issubclass(cls, GangaList)
+        items = {SimpleItem: [], SharedItem: [], ComponentItem: []}
+        for name in schema.allItemNames():
+            item = schema.getItem(name)
+            visited_as = [item_class for item_class in items if isinstance(item, item_class)]
+            if not visited_as:
+                continue
+            if is_list and name == '_list':
+                kind, sequence = _COMPONENT, 1
+            elif not item['visitable']:
+                continue
+            elif isinstance(item, ComponentItem):
+                kind, sequence = _COMPONENT, item['sequence']
+            else:
+                kind, sequence = _SIMPLE, item['sequence']
+            # Transient attributes are never written so the template doesn't contain them
+            if item['transient']:
+                continue
+            # Attributes with a getter are always read through the descriptor, everything else straight from _data
+            from_data = not item['getter']
+            items[visited_as[0]].append((name, kind, sequence, from_data, '<attribute name="%s">' % name))
+        self.items = tuple(items[SimpleItem] + items[SharedItem] + items[ComponentItem])
+
+
+class XMLWriter(object):
+
+    """
+    Writes a tree of GangaObjects as XML into a single buffer.
+    The output is byte-identical to what the VStreamer visitor produces but each class is only inspected once,
+    transient attributes are skipped without being read and the document is joined once at the end.
+    """
+
+    _templates = {}
+
+    def __init__(self, selection=[]):
+        """
+        Args:
+            selection (list): names of the attributes of the root object which should not be written, e.g. ['subjobs']
+        """
+        self.selection = selection
+        self._out = []
+
+    @classmethod
+    def _getTemplate(cls, obj_class):
+        """
+        Return the template for a class or None if objects of this class have to be written by the visitor
+        Args:
+            obj_class (class): The class of the GangaObject to be written
+        """
+        template = cls._templates.get(obj_class)
+        if template is None or template.schema is not obj_class._schema:
+            if obj_class.accept not in (GangaObject.accept, GangaList.accept) or obj_class._schema is None:
+                return None
+            template = _ClassTemplate(obj_class)
+            cls._templates[obj_class] = template
+        return template
+
+    def write(self, obj):
+        """
+        Return the full XML document for this object
+        Args:
+            obj (GangaObject): The (root) object to be written
+        """
+        self._out = ['<root>\n']
+        self._writeOptional(obj, -1)
+        self._out.append('</root>\n')
+        document = ''.join(self._out)
+        self._out = []
+        return document
+
+    @staticmethod
+    def _indent(level):
+        return ' ' * (level - 1) * 3
+
+    def _writeNode(self, node, level):
+        """
+        Write a GangaObject whose <class> element is at the given level
+        Args:
+            node (GangaObject): The object to be written
+            level (int): The nesting level of the object, 1 for the root object
+        """
+        template = self._getTemplate(type(node))
+        if template is None:
+            self._writeWithVisitor(node, level - 2)
+            return
+
+        out = self._out
+        indent = self._indent
+        node_indent = indent(level)
+        attr_indent = indent(level + 1)
+        value_indent = indent(level + 2)
+        out.append(node_indent + template.class_begin)
+
+        data = node._peekData()
+        skip = self.selection if level == 1 else ()
+        for name, kind, sequence, from_data, attr_begin in template.items:
+            if name in skip:
+                continue
+            value = data[name] if from_data and name in data else getattr(node, name)
+            if kind == _SIMPLE:
+                if sequence:
+                    out.append(attr_indent + ' ' + attr_begin + ' \n' + value_indent + ' <sequence>\n')
+                    for v in value:
+                        self._writeOptional(v, level + 2)
+                    out.append(value_indent + ' </sequence>\n' + attr_indent + ' </attribute>\n')
+                elif isinstance(value, GangaObject):
+                    out.append(attr_indent + ' ' + attr_begin + ' \n')
+                    self._writeOptional(value, level + 2)
+                    out.append(attr_indent + ' </attribute>\n')
+                else:
+                    out.append(attr_indent + ' ' + attr_begin + ' \n ' + value_indent + ' <value>' + escape(repr(value)) + '</value>\n' + attr_indent + ' </attribute>\n')
+            else:
+                out.append(attr_indent + ' ' + attr_begin + '\n')
+                if sequence:
+                    out.append(value_indent + ' <sequence>\n')
+                    for v in value:
+                        self._writeOptional(v, level + 2)
+                    out.append(value_indent + ' </sequence>\n')
+                else:
+                    self._writeOptional(value, level + 1)
+                out.append(attr_indent + ' </attribute>\n')
+
+        out.append(node_indent + ' </class>\n')
+
+    def _writeOptional(self, value, level):
+        """
+        Equivalent of VStreamer.acceptOptional called at the given level
+        Args:
+            value (unknown): The value to be written
+            level (int): The level of the visitor when the value is reached
+        """
+        if type(value) in _plain_value_types:
+            self._out.append('\n ' + self._indent(level + 1) + ' <value>' + escape(repr(value)) + '</value>\n')
+        elif value is None:
+            self._out.append(self._indent(level + 1) + ' <value>None</value>\n')
+        elif isinstance(value, str):
+            self._out.append(self._indent(level + 1) + ' <value>' + escape(repr(value)) + '</value>\n')
+        elif isinstance(value, GangaObject):
+            self._writeNode(value, level + 2)
+        elif hasattr(value, 'accept'):
+            self._writeWithVisitor(value, level)
+        elif isinstance(value, (list, tuple)):
+            seq_indent = self._indent(level + 1)
+            self._out.append(seq_indent + ' <sequence>\n')
+            for v in value:
+                self._writeOptional(v, level + 1)
+            self._out.append(seq_indent + ' </sequence>\n')
+        else:
+            self._out.append('\n ' + self._indent(level + 1) + ' <value>' + escape(repr(value)) + '</value>\n')
+
+    def _writeWithVisitor(self, value, level):
+        """
+        Hand anything the writer doesn't know about (proxies, objects with a custom accept) to the VStreamer
+        Args:
+            value (unknown): The value to be written
+            level (int): The level of the visitor when the value is reached
+        """
+        sio = StringIO()
+        vstreamer = VStreamer(out=sio, selection=self.selection)
+        vstreamer.level = level
+        vstreamer.acceptOptional(value)
+        self._out.append(sio.getvalue())
 
 ##########################################################################
 # A visitor to print the object tree into XML.
@@ -375,18 +529,7 @@ class Loader(object):
                 try:
                     # unescape the special characters
                     s = unescape(self.value_construct)
-                    s = re.sub('(\d)L(\})', r'\1\2', s)
-                    if s not in _cached_eval_strings:
-                        # This is ugly and classes which use this are bad, but this needs to be fixed in another PR
-                        # TODO Make the scope of objects a lot better than whatever is in the config
-                        # This is a dictionary constructed from eval-ing things in the Config. Why does should it do this?
-                        # Anyway, lets save the result for speed
-                        _cached_eval_strings[s] = eval(s, config_scope)
-                    eval_str = _cached_eval_strings[s]
-                    if not isinstance(eval_str, str):
-                        val = copy.deepcopy(eval_str)
-                    else:
-                        val = eval_str
+                    val = decode_value(s)
                     #logger.debug('evaled value: %s type=%s',repr(val),type(val))
                     self.stack.append(val)
                     self.value_construct = None
@@ -0,0 +1,161 @@
+import time
+import threading
+from contextlib import contextmanager
+
+from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.logging import getLogger
+
+logger = getLogger()
+
+
+def getMaxInFlight():
+    """
+    The number of tasks of a batch which may be queued or running at once, from [Queues]MaxInFlight
+    """
+    queues_config = getConfig('Queues')
+    max_in_flight = queues_config['MaxInFlight']
+    if not max_in_flight or max_in_flight < 1:
+        max_in_flight = 4 * queues_config['NumWorkerThreads']
+    return max(1, max_in_flight)
+
+
+class TaskBatch(object):
+
+    """
+    Runs a batch of functions on a WorkerThreadPool with a bound on the number of them queued or running at once.
+    add() blocks whilst the bound is reached and wait() returns as soon as the last function has finished, so the
+    caller never polls. The result or exception of each function is kept against the key it was added with.
+
+    If the pool is frozen, even part way through the batch, or the caller is one of the workers of the pool (which
+    could then wait on itself), the functions are run in the calling thread instead.
+    """
+
+    def __init__(self, threadpool, max_in_flight=None, name=None):
+        """
+        Args:
+            threadpool (WorkerThreadPool): The pool the functions are run on
+            max_in_flight (int): The maximum number of functions queued or running at once, None for [Queues]MaxInFlight
+            name (str): The name the workers show whilst running a function of the batch
+        """
+        if max_in_flight is None:
+            max_in_flight = getMaxInFlight()
+        self._threadpool = threadpool
+        self._name = name
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._done = threading.Condition()
+        self._pending = 0
+        self._inline = threadpool is None or threadpool.isfrozen() or threadpool.is_worker_thread()
+        self.results = {}
+        self.errors = {}
+
+    def add(self, key, function, *args):
+        """
+        Queue function(*args), waiting first for a free slot if max_in_flight functions are queued or running
+        Args:
+            key (object): The key the result or exception of the function is kept against
+            function (callable): The function to run
+            args (tuple): The arguments of the function
+        """
+        if self._inline:
+            self._run(key, function, args)
+            return
+        self._slots.acquire()
+        with self._done:
+            self._pending += 1
+        if not self._threadpool.add_function(self._run, (key, function, args), callback_func=self._release, name=self._name):
+            # The pool has been frozen since the batch was created, this and the rest of the batch are run here
+            self._inline = True
+            try:
+                self._run(key, function, args)
+            finally:
+                self._release(None)
+
+    def _run(self, key, function, args):
+        try:
+            result = function(*args)
+        except Exception as err:
+            logger.debug("Task %s of batch %s failed: %s" % (key, self._name, err))
+            with self._done:
+                self.errors[key] = err
+        else:
+            with self._done:
+                self.results[key] = result
+
+    def _release(self, _result):
+        self._slots.release()
+        with self._done:
+            self._pending -= 1
+            if self._pending == 0:
+                self._done.notify_all()
+
+    def wait(self):
+        """
+        Wait until every function added so far has finished
+        """
+        with self._done:
+            while self._pending > 0:
+                self._done.wait()
+
+    def map(self, function, iterable):
+        """
+        Run function on each item of iterable, keyed by its position, and wait for them all
+        Args:
+            function (callable): The function to run on each item
+            iterable (iterable): The items, each one is passed as the only argument
+        """
+        for index, item in enumerate(iterable):
+            self.add(index, function, item)
+        self.wait()
+        return self
+
+
+class StageTimer(object):
+
+    """
+    Sums the time spent in each stage of a submission, e.g. 'prepare', 'sandbox' and 'submit', over all the threads
+    taking part in it
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._start = time.time()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the block of a with statement as one call of a stage
+        Args:
+            name (str): The name of the stage
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, time.time() - start)
+
+    def add(self, name, duration, count=1):
+        """
+        Add time to a stage
+        Args:
+            name (str): The name of the stage
+            duration (float): The time spent in seconds
+            count (int): The number of calls of the stage it was spent on
+        """
+        with self._lock:
+            total, calls = self._stages.get(name, (0., 0))
+            self._stages[name] = (total + duration, calls + count)
+
+    def getStages(self):
+        """
+        Returns a dict of the stage name against its total time in seconds and its number of calls
+        """
+        with self._lock:
+            return dict(self._stages)
+
+    def report(self):
+        """
+        A one line summary of the wall time since the timer was created and the time spent in each stage
+        """
+        stages = ', '.join('%s %.2fs/%d' % (name, total, calls) for name, (total, calls) in sorted(self.getStages().items()))
+        return '%.2fs wall (%s)' % (time.time() - self._start, stages)
@@ -97,6 +97,15 @@ class ThreadPoolQueueMonitor(object):
         output += "Ganga monitoring queue:\n"
         output += "----------------------\n"
         output += str([self._display_element(elem) for elem in self._monitoring_threadpool.get_queue()])
+        throughput = self.monitoringThroughput()
+        if throughput:
+            output += '\n\n'
+            output += "Ganga monitoring throughput:\n"
+            output += "---------------------------\n"
+            output += '{0:<15} {1:>10} {2:>10} {3:>10} {4:>8} {5:>12} {6:>10}\n'.format('Backend', 'Batch size', 'Batches', 'Jobs', 'Errors', 'Last call(s)', 'Jobs/s')
+            for name, stats in sorted(throughput.items()):
+                output += '{0:<15} {1:>10} {2:>10} {3:>10} {4:>8} {5:>12.2f} {6:>10.1f}\n'.format(
+                    name, stats['batch_size'], stats['batches'], stats['jobs'], stats['errors'], stats['last_time'], stats['jobs_per_second'])
         return output
 
     def _repr_pretty_(self, p, cycle):
@@ -105,6 +114,14 @@ class ThreadPoolQueueMonitor(object):
             return
         p.text(self._display())
 
+    def monitoringThroughput(self):
+        """
+        Return the monitoring counters for each backend: the current number of jobs per status call, the number of
+        calls, jobs updated and failed calls, the duration of the last call and the number of jobs updated per second
+        """
+        from GangaCore.Core.MonitoringComponent.Local_GangaMC_Service import getMonitoringThroughput
+        return getMonitoringThroughput()
+
     def __shouldWaitonShutdown(self):
 
         if GangaThreadPool.shutdown_policy == 'batch':
@@ -174,14 +174,18 @@ class WorkerThreadPool(object):
                      callback_func=None, callback_args=(), callback_kwargs={},
                      fallback_func=None, fallback_args=(), fallback_kwargs={},
                      name=None):
+        """
+        Queue function(*args, **kwargs) to be run by the workers, returns whether it was queued. It isn't if the queue
+        is frozen, the callback and fallback are then never called.
+        """
 
         if not isinstance(function, collections.Callable):
             logger.error('Only a python callable object may be added to the queue using the add_function() method')
-            return
+            return False
         if self.isfrozen() is True:
             if not self._shutdown:
                 logger.warning("Cannot Add Process as Queue is frozen!")
-            return
+            return False
         self.__queue.put(QueueElement(priority=priority,
                                       command_input=FunctionInput(
                                           function, args, kwargs),
@@ -189,6 +193,7 @@ class WorkerThreadPool(object):
                                           callback_func, callback_args, callback_kwargs),
                                       fallback_func=FunctionInput(fallback_func, fallback_args, fallback_kwargs), name=name
                                       ))
+        return True
 
     def add_process(self,
                     command, timeout=None, env=None, cwd=None, shell=False,
@@ -249,6 +254,12 @@ class WorkerThreadPool(object):
         """
         return [w for w in self.__worker_threads if w.gangaName.startswith(name_str)]
 
+    def is_worker_thread(self):
+        """
+        Returns True if called from one of the worker threads of this pool
+        """
+        return threading.current_thread() in self.__worker_threads
+
     def isfrozen(self):
         return self._frozen
 
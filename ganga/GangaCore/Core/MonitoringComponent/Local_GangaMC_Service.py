@@ -1,3 +1,4 @@
+import heapq
 import queue
 import threading
 import time
@@ -397,6 +398,127 @@ class UpdateDict(object):
                 entry.entryLock.release()
 
 
+class BackendSchedule(object):
+
+    """
+    Priority queue of the time at which each backend is next due to be polled by the monitoring loop.
+    Backends which have never been polled are always due.
+    """
+
+    __slots__ = ('_heap', '_due', '_lock')
+
+    def __init__(self):
+        self._heap = []
+        self._due = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, backend, when):
+        """
+        Set the next time the backend should be polled
+        Args:
+            backend (str): Name of the backend
+            when (float): Time the backend is next due
+        """
+        with self._lock:
+            self._due[backend] = when
+            heapq.heappush(self._heap, (when, backend))
+
+    def isDue(self, backend, now):
+        """ Should the named backend be polled at time now """
+        with self._lock:
+            return self._due.get(backend, 0.) <= now
+
+    def nextDue(self):
+        """ Returns the earliest time a scheduled backend is due, or None if nothing is scheduled """
+        with self._lock:
+            # Entries are not removed when a backend is rescheduled so skip any which are out of date
+            while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def anyDue(self, now):
+        """ Is any backend due to be polled at time now """
+        next_due = self.nextDue()
+        return next_due is None or next_due <= now
+
+
+
+class BackendBatchTuner(object):
+
+    """
+    Chooses how many jobs the monitoring passes to one master_updateMonitoringInformation call for a backend.
+    The batch size doubles while full batches return well inside batch_target_time, is scaled down when a batch
+    takes longer than that and is halved when a batch fails. The throughput counters are shown by `queues`.
+    """
+
+    __slots__ = ('batch_size', 'batches', 'jobs', 'errors', 'busy_time', 'last_time', '_lock')
+
+    def __init__(self, batch_size):
+        self.batch_size = max(1, batch_size)
+        self.batches = 0
+        self.jobs = 0
+        self.errors = 0
+        self.busy_time = 0.
+        self.last_time = 0.
+        self._lock = threading.Lock()
+
+    def record(self, num_jobs, duration, failed=False):
+        """
+        Record a finished batch and adapt the batch size for the next pass
+        Args:
+            num_jobs (int): Number of (sub)jobs in the batch
+            duration (float): Time in seconds the backend took to update the batch
+            failed (bool): Did the backend raise an exception for this batch
+        """
+        target = config['batch_target_time']
+        with self._lock:
+            self.batches += 1
+            self.jobs += num_jobs
+            self.busy_time += duration
+            self.last_time = duration
+            if failed:
+                self.errors += 1
+                self.batch_size = max(1, self.batch_size // 2)
+            elif duration > target:
+                self.batch_size = max(1, int(self.batch_size * target / duration))
+            elif duration < target / 2. and num_jobs >= self.batch_size:
+                self.batch_size = min(config['max_batch_size'], self.batch_size * 2)
+
+    def stats(self):
+        """ Return a dictionary of the counters for this backend """
+        with self._lock:
+            return {'batch_size': self.batch_size,
+                    'batches': self.batches,
+                    'jobs': self.jobs,
+                    'errors': self.errors,
+                    'last_time': self.last_time,
+                    'jobs_per_second': self.jobs / self.busy_time if self.busy_time > 0. else 0.}
+
+
+_batch_tuners = {}
+_batch_tuners_lock = threading.Lock()
+
+
+def getBackendBatchTuner(backend_name):
+    """ Return the BackendBatchTuner for the named backend, starting it at numParallelJobs """
+    with _batch_tuners_lock:
+        if backend_name not in _batch_tuners:
+            _batch_tuners[backend_name] = BackendBatchTuner(config['numParallelJobs'])
+        return _batch_tuners[backend_name]
+
+
+def getMonitoringThroughput():
+    """ Return the throughput counters of each backend the monitoring has updated, keyed by backend name """
+    with _batch_tuners_lock:
+        tuners = dict(_batch_tuners)
+    return dict((name, tuner.stats()) for name, tuner in tuners.items())
+
+
+def count_jobs_in_bunch(job_bunch):
+    """ Number of jobs in a bunch from get_jobs_in_bunches, counting the subjobs of any split jobs """
+    return sum(len(this_job.subjobs) or 1 for this_job in job_bunch)
+
+
 class CallbackHookEntry(object):
 
     __slots__ = ('argDict', 'enabled', 'timeout', '_lastRun')
@@ -496,7 +618,7 @@ class JobRegistry_Monitor(GangaThread):
     minPollRate = 1.
     global_count = 0
 
-    __slots__ = ('registry_slice', '__sleepCounter', '__updateTimeStamp', 'progressCallback', 'callbackHookDict', 'clientCallbackDict', 'alive', 'enabled', 'steps', 'activeBackends', 'updateJobStatus', 'errors', 'updateDict_ts', '__mainLoopCond', '__cleanUpEvent', '__monStepsTerminatedEvent', 'stopIter', '_runningNow')
+    __slots__ = ('registry_slice', '__sleepCounter', '__updateTimeStamp', 'progressCallback', 'callbackHookDict', 'clientCallbackDict', 'alive', 'enabled', 'steps', 'activeBackends', 'updateJobStatus', 'errors', 'updateDict_ts', 'backendSchedule', '__mainLoopCond', '__cleanUpEvent', '__monStepsTerminatedEvent', 'stopIter', '_runningNow')
 
     def __init__(self, registry_slice):
         GangaThread.__init__(self, name="JobRegistry_Monitor")
@@ -518,6 +640,7 @@ class JobRegistry_Monitor(GangaThread):
         self.errors = {}
 
         self.updateDict_ts = SynchronisedObject(UpdateDict())
+        self.backendSchedule = BackendSchedule()
 
         # Create the default backend update method and add to callback hook.
         self.makeUpdateJobStatusFunction()
@@ -1023,8 +1146,14 @@ class JobRegistry_Monitor(GangaThread):
 
         # FIXME: this is not thread safe: if the new jobs are added then
         # iteration exception is raised
+        registry = stripProxy(self.registry_slice).objects
         if jobSlice is not None:
             fixed_ids = jobSlice.ids()
+        elif hasattr(registry, 'getMonitoredIds'):
+            # Only look at the jobs the registry knows may be active rather than every job in the repository
+            fixed_ids = registry.getMonitoredIds()
+            if GANGA_SWAN_INTEGRATION:
+                fixed_ids = sorted(set(fixed_ids) | set(self.newly_discovered_jobs))
         else:
             fixed_ids = self.registry_slice.ids()
         #log.debug("Registry: %s" % str(self.registry_slice))
@@ -1048,6 +1177,9 @@ class JobRegistry_Monitor(GangaThread):
                         backend_name = getName(backend_obj)
                         active_backends.setdefault(backend_name, [])
                         active_backends[backend_name].append(j)
+                elif jobSlice is None and hasattr(registry, 'updateMonitoredJob'):
+                    # No longer active so stop looking at this job until its status changes again
+                    registry.updateMonitoredJob(i, job_status)
             except RegistryKeyError as err:
                 log.debug("RegistryKeyError: The job was most likely removed")
                 log.debug("RegError %s" % str(err))
@@ -1112,7 +1244,7 @@ class JobRegistry_Monitor(GangaThread):
                     log.debug("NOT enabled, leaving")
                     return
 
-                block_size = config['numParallelJobs']
+                block_size = getBackendBatchTuner(getName(backendObj)).batch_size
                 all_job_bunches = get_jobs_in_bunches(jobList_fromset, blocks_of_size = block_size )
 
                 bunch_size = 0
@@ -1120,30 +1252,7 @@ class JobRegistry_Monitor(GangaThread):
                     bunch_size += len(bunch)
                 assert(bunch_size == len(jobList_fromset))
 
-                all_exceptions = []
-
-                for this_job_list in all_job_bunches:
-
-                    if self.enabled is False and self.alive is False:
-                        log.debug("NOT enabled, breaking loop")
-                        break
-
-                    ### This tries to loop over ALL jobs in 'this_job_list' with the maximum amount of redundancy to keep
-                    ### going and attempting to update all (sub)jobs if some fail
-                    ### ALL ERRORS AND EXCEPTIONS ARE REPORTED VIA log.error SO NO INFORMATION IS LOST/IGNORED HERE!
-                    job_ids = ''
-                    for this_job in this_job_list:
-                        job_ids += ' %s' % str(this_job.id) 
-                    log.debug("Updating Jobs: %s" % job_ids)
-                    try:
-                        stripProxy(backendObj).master_updateMonitoringInformation(this_job_list)
-                    except Exception as err:
-                        #raise err
-                        log.debug("Err: %s" % str(err))
-                        ## We want to catch ALL of the exceptions
-                        ## This would allow us to continue in the case of errors due to bad job/backend combinations
-                        if err not in all_exceptions:
-                            all_exceptions.append(err)
+                all_exceptions = self._updateInBatches(backendObj, all_job_bunches)
 
                 if all_exceptions != []:
                     for err in all_exceptions:
@@ -1183,10 +1292,76 @@ class JobRegistry_Monitor(GangaThread):
         log.debug("Finishing _checkBackend")
         return
 
+    def _updateInBatches(self, backendObj, all_job_bunches):
+        """
+        Run master_updateMonitoringInformation over each bunch of jobs of one backend.
+        Up to max_concurrent_batches bunches are updated at once: spare monitoring threads are asked to help through Qin
+        and the calling thread works through the bunches itself, so this never waits on a busy thread pool.
+        Returns the list of exceptions raised by the backend.
+        Args:
+            backendObj (IBackend): The backend the jobs belong to
+            all_job_bunches (list): Lists of jobs as returned by get_jobs_in_bunches
+        """
+        backend = stripProxy(backendObj)
+        tuner = getBackendBatchTuner(getName(backend))
+        pending = list(reversed(all_job_bunches))
+        all_exceptions = []
+        outstanding = [len(all_job_bunches)]
+        batch_cond = threading.Condition()
+
+        def update_batches():
+            while True:
+                with batch_cond:
+                    if not pending:
+                        return
+                    this_job_list = pending.pop()
+                try:
+                    if self.enabled is False and self.alive is False:
+                        log.debug("NOT enabled, skipping batch")
+                        continue
+                    ### This tries to loop over ALL jobs in 'this_job_list' with the maximum amount of redundancy to keep
+                    ### going and attempting to update all (sub)jobs if some fail
+                    ### ALL ERRORS AND EXCEPTIONS ARE REPORTED VIA log.error SO NO INFORMATION IS LOST/IGNORED HERE!
+                    log.debug("Updating Jobs: %s" % ' '.join(str(this_job.id) for this_job in this_job_list))
+                    start = time.time()
+                    try:
+                        backend.master_updateMonitoringInformation(this_job_list)
+                    except Exception as err:
+                        log.debug("Err: %s" % str(err))
+                        tuner.record(count_jobs_in_bunch(this_job_list), time.time() - start, failed=True)
+                        ## We want to catch ALL of the exceptions
+                        ## This would allow us to continue in the case of errors due to bad job/backend combinations
+                        with batch_cond:
+                            if err not in all_exceptions:
+                                all_exceptions.append(err)
+                    else:
+                        tuner.record(count_jobs_in_bunch(this_job_list), time.time() - start)
+                finally:
+                    with batch_cond:
+                        outstanding[0] -= 1
+                        batch_cond.notify_all()
+
+        for _ in range(min(len(all_job_bunches), config['max_concurrent_batches']) - 1):
+            Qin.put(JobAction(update_batches))
+        update_batches()
+
+        with batch_cond:
+            while outstanding[0] > 0:
+                batch_cond.wait()
+
+        return all_exceptions
+
     @staticmethod
     def _checkActiveBackends(thisMonitor, activeBackendsFunc, jobSlice):
 
         log.debug("calling function _checkActiveBackends")
+        if jobSlice is None and thisMonitor.steps <= 0:
+            # Jobs which became active since the last pass may be on a backend which has never been polled
+            registry = stripProxy(thisMonitor.registry_slice).objects
+            newly_monitored = registry.takeNewlyMonitored() if hasattr(registry, 'takeNewlyMonitored') else True
+            if not newly_monitored and not GANGA_SWAN_INTEGRATION and not thisMonitor.backendSchedule.anyDue(time.time()):
+                log.debug("No backend is due to be polled")
+                return
         if jobSlice is None:
             activeBackends = activeBackendsFunc()
         else:
@@ -1201,6 +1376,10 @@ class JobRegistry_Monitor(GangaThread):
         summary += '}'
         log.debug("Active Backends: %s" % summary)
 
+        # Requests from runMonitoring poll every backend straight away, otherwise each backend waits for its own poll rate
+        on_demand = thisMonitor.steps > 0 or jobSlice is not None
+        now = time.time()
+
         for jList in activeBackends.values():
 
             #log.debug("backend: %s" % str(jList))
@@ -1211,6 +1390,11 @@ class JobRegistry_Monitor(GangaThread):
             else:
                 pRate = config['default_backend_poll_rate']
 
+            if not on_demand and not thisMonitor.backendSchedule.isDue(b_name, now):
+                log.debug("Backend %s is not due to be polled yet" % b_name)
+                continue
+            thisMonitor.backendSchedule.schedule(b_name, now + pRate)
+
             # TODO: To include an if statement before adding entry to
             #       updateDict. Entry is added only if credential requirements
             #       of the particular backend is satisfied.
@@ -24,6 +24,7 @@ import time
 from collections import defaultdict
 
 from GangaCore.Core.GangaThread.WorkerThreads import getQueues
+from GangaCore.Core.GangaThread.WorkerThreads.TaskBatch import TaskBatch, StageTimer
 from GangaCore.Utility.Config import getConfig
 
 logger = GangaCore.Utility.logging.getLogger()
@@ -67,18 +68,43 @@ class IBackend(GangaObject):
         """
         pass
 
-    def _parallel_submit(self, b, sj, sc, master_input_sandbox, fqid, logger):
+    def _parallel_submit(self, b, sj, sc, master_input_sandbox, fqid, logger, timer=None):
+        """
+        Submit one subjob from a worker thread. A failed submission is retried [Queues]SubmitRetries times, waiting
+        [Queues]SubmitRetryBackoff seconds before the first retry and twice as long before each further one.
+        Returns 1 if the subjob was submitted, 0 otherwise
+        Args:
+            b (IBackend): The backend of the subjob
+            sj (Job): The subjob
+            sc (StandardJobConfig): The config of the subjob
+            master_input_sandbox (list): The files of the master input sandbox
+            fqid (str): The fqid of the subjob
+            logger (Logger): The logger to report failures to
+            timer (StageTimer): The timer the time spent in the backend submit is added to
+        """
+        queues_config = getConfig('Queues')
+        retries = queues_config['SubmitRetries']
+        backoff = queues_config['SubmitRetryBackoff']
 
-        try:
-            sj.updateStatus('submitting')
-            if b.submit(sc, master_input_sandbox):
-                sj.info.increment()
-                return 1
-            else:
-                raise IncompleteJobSubmissionError(fqid, 'submission failed')
-        except Exception as err:
-            logger.error("Parallel Job Submission Failed: %s" % err)
-            return 0
+        sj.updateStatus('submitting')
+        for attempt in range(retries + 1):
+            start = time.time()
+            try:
+                if b.submit(sc, master_input_sandbox):
+                    sj.info.increment()
+                    return 1
+                err = IncompleteJobSubmissionError(fqid, 'submission failed')
+            except Exception as x:
+                err = x
+            finally:
+                if timer is not None:
+                    timer.add('submit', time.time() - start)
+            if attempt < retries:
+                logger.warning("Submission of job %s failed, retrying in %.1fs: %s" % (fqid, backoff * 2 ** attempt, err))
+                time.sleep(backoff * 2 ** attempt)
+
+        logger.error("Parallel Job Submission Failed: %s" % err)
+        return 0
 
     def _successfulSubmit(self, out, sj, incomplete_subjobs):
         if out == 0:
@@ -87,6 +113,13 @@ class IBackend(GangaObject):
         else:
             sj.updateStatus('submitted', update_master = False)
 
+    def _submitSubjob(self, sj, sc, master_input_sandbox, incomplete_subjobs, timer):
+        """
+        The task run by the workers for each subjob of a parallel submission
+        """
+        fqid = sj.getFQID('.')
+        self._successfulSubmit(self._parallel_submit(sj.backend, sj, sc, master_input_sandbox, fqid, logger, timer), sj, incomplete_subjobs)
+
     def master_submit(self, rjobs, subjobconfigs, masterjobconfig, keep_going=False, parallel_submit=False):
         """  Submit   the  master  job  and  all   its  subjobs.   The
         masterjobconfig  is  shared,  individual  subjob  configs  are
@@ -142,41 +175,35 @@ class IBackend(GangaObject):
                 else:
                     return True
 
-        master_input_sandbox = self.master_prepare(masterjobconfig)
+        # The time spent in each stage is summed on the timer of the job being submitted
+        timer = getattr(self.getJobObject(), '_submit_timer', None) or StageTimer()
+
+        with timer.stage('sandbox'):
+            master_input_sandbox = self.master_prepare(masterjobconfig)
         # Shall we submit in parallel
         if parallel_submit:
 
-            from GangaCore.Core.GangaThread.WorkerThreads import getQueues
-
-            threads_before = getQueues().totalNumIntThreads()
-
-            for sc, sj in zip(subjobconfigs, rjobs):
-
-                b = sj.backend
-
-                # Must check for credentials here as we cannot handle missing credentials on Queues by design!
-                if hasattr(b, 'credential_requirements') and b.credential_requirements is not None:
-                    from GangaCore.GPIDev.Credentials.CredentialStore import credential_store
+            # Must check for credentials here as we cannot handle missing credentials on Queues by design!
+            checked_credentials = []
+            for sj in rjobs:
+                requirements = getattr(sj.backend, 'credential_requirements', None)
+                if requirements is not None and requirements not in checked_credentials:
+                    checked_credentials.append(requirements)
                     try:
-                        cred = credential_store[b.credential_requirements]
+                        cred = credential_store[requirements]
                     except GangaKeyError:
-                        credential_store.create(b.credential_requirements)
+                        credential_store.create(requirements)
 
-                fqid = sj.getFQID('.')
-                # FIXME would be nice to move this to the internal threads not user ones
-                getQueues()._monitoring_threadpool.add_function(self._parallel_submit, (b, sj, sc, master_input_sandbox, fqid, logger), callback_func = self._successfulSubmit, callback_args = (sj, incomplete_subjobs))
-
-            def subjob_status_check(rjobs):
-                has_submitted = True
-                for sj in rjobs:
-                    if sj.status not in ["submitted","failed","completed","running","completing"] and sj.getFQID('.') not in incomplete_subjobs:
-                        has_submitted = False
-                        break
-                return has_submitted
+            # Only a bounded number of subjobs are queued at once, the wait returns as soon as the last one is done
+            # FIXME would be nice to move this to the internal threads not user ones
+            batch = TaskBatch(getQueues()._monitoring_threadpool, name='submit_subjobs')
+            for sc, sj in zip(subjobconfigs, rjobs):
+                batch.add(sj.getFQID('.'), self._submitSubjob, sj, sc, master_input_sandbox, incomplete_subjobs, timer)
+            batch.wait()
 
-            while not subjob_status_check(rjobs):
-                import time
-                time.sleep(1.)
+            for fqid, err in batch.errors.items():
+                logger.error("Parallel Job Submission Failed: %s" % err)
+                incomplete_subjobs.append(fqid)
 
             if incomplete_subjobs:
                 raise IncompleteJobSubmissionError(
@@ -191,7 +218,9 @@ class IBackend(GangaObject):
             try:
                 b = stripProxy(sj.backend)
                 sj.updateStatus('submitting')
-                if b.submit(sc, master_input_sandbox):
+                with timer.stage('submit'):
+                    submitted = b.submit(sc, master_input_sandbox)
+                if submitted:
                     sj.updateStatus('submitted')
                     # sj._commit() # PENDING: TEMPORARY DISABLED
                     incomplete = 1
@@ -437,6 +466,15 @@ class IBackend(GangaObject):
 
         queues = getQueues()
 
+        # Lock the jobs which may be updated below with one request rather than one for each job as it changes
+        raw_jobs = [stripProxy(j) for j in jobs]
+        registry = raw_jobs[0]._getRegistry() if raw_jobs else None
+        if registry is not None:
+            try:
+                registry._acquire_session_locks(raw_jobs)
+            except Exception as err:
+                logger.debug("Failed to lock the jobs being monitored: %s" % err)
+
         for j in jobs:
             ## All subjobs should have same backend
             if len(j.subjobs) > 0:
@@ -444,9 +482,9 @@ class IBackend(GangaObject):
                 monitorable_subjob_ids = []
 
                 if isType(j.subjobs, SubJobXMLList):
-                    cache = j.subjobs.getAllCachedData()
-                    for sj_id in range(0,len(j.subjobs)):
-                        if cache[sj_id]['status'] in ['submitted', 'running']:
+                    sj_statuses = j.subjobs.getAllSJStatus()
+                    for sj_id in range(0,len(sj_statuses)):
+                        if sj_statuses[sj_id] in ['submitted', 'running']:
                             if j.subjobs.isLoaded(sj_id):
                                 ## SJ may have changed from cache in memory
                                 this_sj = j.subjobs(sj_id)
@@ -21,13 +21,37 @@ class ISplitter(GangaObject):
 
     __slots__ = list()
 
+    # The templates the subjobs of the split in progress are made from, see createSubjob
+    _subjob_templates = None
+
     def createSubjob(self, job, additional_skip_args=None):
         """ Create a new subjob by copying the master job and setting all fields correctly.
+
+        Within validatedSplit the master is copied only once for the split, to a template, and each subjob is a shared
+        copy of it: the objects of the subjob (application, backend, outputfiles...) are only copied from the template
+        when they're first accessed, so those the splitter doesn't change aren't copied for every subjob.
         """
-        from GangaCore.GPIDev.Lib.Job.Job import Job
         if additional_skip_args is None:
             additional_skip_args = []
 
+        templates = self._subjob_templates
+        if templates is None:
+            return self._createSubjobTemplate(job, additional_skip_args)
+
+        key = (id(stripProxy(job)), tuple(additional_skip_args))
+        if key not in templates:
+            templates[key] = self._createSubjobTemplate(job, additional_skip_args)
+        return templates[key]._sharedCopy()
+
+    @staticmethod
+    def _createSubjobTemplate(job, additional_skip_args):
+        """ Copy the master job to a new job with the fields which aren't passed on to the subjobs reset
+        Args:
+            job (Job): The master job
+            additional_skip_args (list): Names of further attributes of the master not to copy
+        """
+        from GangaCore.GPIDev.Lib.Job.Job import Job
+
         j = Job()
         skipping_args = ['splitter', 'inputsandbox', 'inputfiles', 'inputdata', 'subjobs']
         for arg in additional_skip_args:
@@ -66,17 +90,24 @@ class ISplitter(GangaObject):
         classes. """
 
         # try:
-        subjobs = self.split(stripProxy(job))
+        self._subjob_templates = {}
+        try:
+            subjobs = self.split(stripProxy(job))
+        finally:
+            self._subjob_templates = None
         # except Exception,x:
         #raise SplitterError(x)
         #raise x
         # if not len(subjobs):
         #raise SplitterError('splitter did not create any subjobs')
 
+        # peek at the backends so that those still shared with the template aren't copied
+        backend_type = type(stripProxy(job.backend))
         cnt = 0
         for s in subjobs:
-            if not isType(s.backend, type(stripProxy(job.backend))):
-                raise SplitterError('masterjob backend %s is not the same as the subjob (probable subjob id=%d) backend %s' % (job.backend._name, cnt, getName(s.backend)))
+            s_backend = stripProxy(s)._peekAttribute('backend')
+            if not isType(s_backend, backend_type):
+                raise SplitterError('masterjob backend %s is not the same as the subjob (probable subjob id=%d) backend %s' % (job.backend._name, cnt, getName(s_backend)))
             cnt += 1
 
         return subjobs
@@ -47,7 +47,14 @@ def _getName(obj):
 
 logger = getLogger()
 
-do_not_copy = ['_index_cache_dict', '_parent', '_registry', '_data_dict', '_lock', '_proxyObject']
+# The types of the values assigned to attributes which don't need to be copied
+_immutable_types = (int, str, bool, type)
+
+# The ids of the objects whose shared copy-on-write values are being read by this thread without copying them, see
+# GangaObject._peeking
+_peeking = threading.local()
+
+do_not_copy = ['_index_cache_dict', '_parent', '_registry', '_data_dict', '_shared_data', '_lock', '_proxyObject']
 
 def synchronised(f):
     """
@@ -245,40 +252,6 @@ class Node(object, metaclass=abc.ABCMeta):
 ##########################################################################
 
 
-def synchronised_get_descriptor(get_function):
-    """
-    This decorator should only be used on ``__get__`` method of the ``Descriptor``.
-    Args:
-        get_function (function): Function we intend to wrap with the soft/read lock
-    """
-    @functools.wraps(get_function)
-    def get_decorator(self, obj, type_or_value):
-        if obj is None:
-            return get_function(self, obj, type_or_value)
-
-        with obj._getRoot()._lock:
-            return get_function(self, obj, type_or_value)
-
-    return get_decorator
-
-
-def synchronised_set_descriptor(set_function):
-    """
-    This decorator should only be used on ``__set__`` method of the ``Descriptor``.
-    Args:
-        set_function (function): Function we intend to wrap with the hard/write lock
-    """
-    def set_decorator(self, obj, type_or_value):
-        root_obj = obj._getRoot()
-        if obj is None:
-            return set_function(self, obj, type_or_value, root_obj)
-
-        with root_obj._lock:
-            return set_function(self, obj, type_or_value)
-
-    return set_decorator
-
-
 class Descriptor(object):
 
     """
@@ -287,25 +260,34 @@ class Descriptor(object):
     This class also handles thread-locking of a class including both the getter and setter methods to ensure object consistency
     """
 
-    __slots__ = ('_name', '_item', '_checkset_name', '_filter_name', '_getter_name', '_checkset_name')
+    __slots__ = ('_name', '_item', '_checkset_name', '_filter_name', '_getter_name', '_eval_strings', '_plain_value')
 
-    def __init__(self, name, item):
+    def __init__(self, name, item, cls):
         """
         Lets build a descriptor for this item with this name
+        What __get__ and __set__ need to do for this attribute of this class is worked out here once so that they skip
+        everything which doesn't apply to it.
         Args:
             name (str): Name of the attribute being wrapped
-            item (Item): The Schema entry describing this attribute (Not currently used atm)
+            item (Item): The Schema entry describing this attribute
+            cls (class): The GangaObject class the attribute belongs to
         """
         super(Descriptor, self).__init__()
 
         self._name = name
         self._item = item
-        self._checkset_name = None
-        self._filter_name = None
 
         self._getter_name = item['getter']
-        self._checkset_name = item['checkset']
-        self._filter_name = item['filter']
+        # The checkset and filter methods are only called for a class with these attributes, as they always have been
+        self._checkset_name = item['checkset'] if hasattr(cls, '_checkset_name') else None
+        self._filter_name = item['filter'] if hasattr(cls, '_filter_name') else None
+
+        is_component = isinstance(item, ComponentItem)
+        # A string is only passed to runtimeEvalString if the attribute may hold something other than a string
+        typelist = item['typelist']
+        self._eval_strings = is_component or typelist is None or not any(t is str or t == 'str' for t in typelist)
+        # A value assigned to a simple non-sequence attribute is stored as it is (see cleanValue)
+        self._plain_value = not is_component and not item['sequence']
 
     @staticmethod
     def _bind_method(obj, name):
@@ -325,20 +307,35 @@ class Descriptor(object):
         if self._getter_name:
             raise AttributeError('cannot modify or delete "%s" property (declared as "getter")' % _getName(self))
 
-    @synchronised_get_descriptor
     def __get__(self, obj, cls):
         """
         Get method of Descriptor
-        This wraps the object in question with a read-lock which ensures object onsistency across multiple threads
+        A value already in the data of the object is returned straight away, a value is only ever replaced whole in the
+        data so it's consistent without a lock. Anything else is worked out with the read-lock of the object held.
         Args:
             obj (GangaObject): This is the object which controls the attribute of interest
             cls (class): This is the class of the Ganga Object which is being called
         """
-        name = _getName(self)
-
         # If obj is None then the getter was called on the class so return the Item
         if obj is None:
-            return cls._schema[name]
+            return cls._schema[self._name]
+
+        if self._getter_name is None:
+            try:
+                return obj._data_dict[self._name]
+            except KeyError:
+                pass
+
+        with obj._getRoot()._lock:
+            return self._locked_get(obj)
+
+    def _locked_get(self, obj):
+        """
+        Get the value of the attribute when it's not simply in the data of the object
+        Args:
+            obj (GangaObject): This is the object which controls the attribute of interest
+        """
+        name = self._name
 
         if self._getter_name:
             # Fixme set the parent of Node objects?!?!
@@ -348,12 +345,19 @@ class Descriptor(object):
 
         # ._data takes priority ALWAYS over ._index_cache
         # This access should not cause the object to be loaded
-        obj_data = obj._data
+        obj_data = obj._data_dict
         try:
             return obj_data[name]
         except KeyError:
             pass
 
+        # Then a value shared copy-on-write with another object, this is the first access so it's copied now
+        obj_shared = obj._shared_data
+        if obj_shared is not None and name in obj_shared:
+            if id(obj) in getattr(_peeking, 'ids', ()):
+                return obj_shared[name]
+            return obj._unshareAttribute(name)
+
         # Then try to get it from the index cache
         obj_index = obj._index_cache
         try:
@@ -366,7 +370,7 @@ class Descriptor(object):
 
         # Do we have the attribute now?
         try:
-            return obj._data[name]
+            return obj._data_dict[name]
         except KeyError:
             pass
 
@@ -460,31 +464,38 @@ class Descriptor(object):
 
         return v_copy
 
-    @synchronised_set_descriptor
-    def __set__(self, obj, val, root_obj=None):
+    def __set__(self, obj, val):
         """
         Set method
         This wraps the given object with a lock preventing both read+write until this transaction is complete for consistency
         Args:
-            self: attribute being changed or GangaCore.GPIDev.Base.Objects.Descriptor in which case _getName(self) gives the name of the attribute being changed
             obj (GanagObject): parent class which 'owns' the attribute
             val (unknown): value of the attribute which we're about to set
-            root_obj (GangaObject): a pointer to the root object of obj
         """
+        root_obj = obj._getRoot()
+        with root_obj._lock:
+            self._locked_set(obj, val, root_obj)
 
-        _set_name = _getName(self)
+    def _locked_set(self, obj, val, root_obj):
+        """
+        Set the value of the attribute with the lock of the root object held
+        Args:
+            obj (GanagObject): parent class which 'owns' the attribute
+            val (unknown): value of the attribute which we're about to set
+            root_obj (GangaObject): a pointer to the root object of obj
+        """
+        _set_name = self._name
 
-        if isinstance(val, str):
-            if val:
-                from GangaCore.GPIDev.Base.Proxy import stripProxy, runtimeEvalString
-                val = stripProxy(runtimeEvalString(obj, _set_name, val))
+        if self._eval_strings and isinstance(val, str) and val:
+            from GangaCore.GPIDev.Base.Proxy import stripProxy, runtimeEvalString
+            val = stripProxy(runtimeEvalString(obj, _set_name, val))
 
-        if hasattr(obj, '_checkset_name'):
+        if self._checkset_name is not None:
             checkSet = self._bind_method(obj, self._checkset_name)
             if checkSet is not None:
                 checkSet(val)
 
-        if hasattr(obj, '_filter_name'):
+        if self._filter_name is not None:
             this_filter = self._bind_method(obj, self._filter_name)
             if this_filter:
                 val = this_filter(val)
@@ -495,15 +506,13 @@ class Descriptor(object):
         obj._getSessionLock(root_obj)
 
         # make sure the object is loaded if it's attached to a registry
-        obj._loadObject()
+        if obj._should_load:
+            obj._loadObject()
 
-        basic=False
-        for i in [int, str, bool, type]:
-            if isinstance(val, i):
-                new_value = deepcopy(val)
-                basic=True
-                break
-        if not basic:
+        # ints, strs, bools and types are immutable so they're never copied
+        if isinstance(val, _immutable_types) or self._plain_value:
+            new_value = val
+        else:
             new_value = Descriptor.cleanValue(obj, val, _set_name)
 
         obj.setSchemaAttribute(_set_name, new_value)
@@ -667,7 +676,7 @@ class ObjectMetaclass(abc.ABCMeta):
         # export visible properties... do not export hidden properties
         # This constructs one Descriptor for each attribute which can be set for this class
         for attr, item in this_schema.allItems():
-            setattr(cls, attr, Descriptor(attr, item))
+            setattr(cls, attr, Descriptor(attr, item, cls))
 
         # additional check of type
         # bugfix #40220: Ensure that default values satisfy the declared types
@@ -717,6 +726,9 @@ class GangaObject(Node, metaclass=ObjectMetaclass):
     _should_init = True
     _should_load = False
 
+    # The schema attributes shared copy-on-write with another object, see _sharedCopy
+    _shared_data = None
+
     @classmethod
     def getNew(cls, should_load=False, should_init=False):
         """
@@ -789,15 +801,15 @@ class GangaObject(Node, metaclass=ObjectMetaclass):
 
         for (name, item) in self._schema.simpleItems():
             if item['visitable']:
-                visitor.simpleAttribute(self, name, getattr(self, name), item['sequence'])
+                visitor.simpleAttribute(self, name, self._peekAttribute(name), item['sequence'])
 
         for (name, item) in self._schema.sharedItems():
             if item['visitable']:
-                visitor.sharedAttribute(self, name, getattr(self, name), item['sequence'])
+                visitor.sharedAttribute(self, name, self._peekAttribute(name), item['sequence'])
 
         for (name, item) in self._schema.componentItems():
             if item['visitable']:
-                visitor.componentAttribute(self, name, getattr(self, name), item['sequence'])
+                visitor.componentAttribute(self, name, self._peekAttribute(name), item['sequence'])
 
         visitor.nodeEnd(self)
 
@@ -914,8 +926,12 @@ class GangaObject(Node, metaclass=ObjectMetaclass):
         """
         This returns the internal data dictionary of this class
         This should be treated as strictly internal and shouldn't be modified outside of GangaCore.GPIDev.Base or GangaCore.Core.GangaRegistry
+        Any value still shared copy-on-write is copied first as the dictionary may be modified
         """
         # type: () -> Dict[str, Any]
+        if self._shared_data is not None:
+            for name in list(self._shared_data.keys()):
+                self._unshareAttribute(name)
         return self._data_dict
 
     @_data.setter
@@ -931,6 +947,82 @@ class GangaObject(Node, metaclass=ObjectMetaclass):
             if isinstance(v, Node) and v._getParent() is not self:
                 v._setParent(self)
         self._data_dict = new_data
+        self._shared_data = None
+
+    def _peekData(self):
+        """
+        This returns the values of the schema attributes of this object including any still shared copy-on-write without
+        copying them. The values must only be read, e.g. to stream or print them.
+        """
+        # type: () -> Dict[str, Any]
+        if self._shared_data is None:
+            return self._data_dict
+        data = dict(self._shared_data)
+        data.update(self._data_dict)
+        return data
+
+    def _peekAttribute(self, name):
+        """
+        This returns the value of a schema attribute without copying it if it's still shared copy-on-write. The value must
+        only be read, e.g. to stream or print it.
+        Args:
+            name (str): the name of the schema attribute
+        """
+        if self._shared_data is not None and name in self._shared_data:
+            return self._shared_data[name]
+        return getattr(self, name)
+
+    @contextmanager
+    def _peeking(self):
+        """
+        Within this block the schema attributes of this object are read by this thread as with _peekAttribute, so code
+        which only reads them through getattr, e.g. the display functions of the registry, doesn't copy shared values
+        """
+        ids = _peeking.__dict__.setdefault('ids', set())
+        if id(self) in ids:
+            yield
+            return
+        ids.add(id(self))
+        try:
+            yield
+        finally:
+            ids.discard(id(self))
+
+    def _sharedCopy(self):
+        """
+        This returns a new object of the same class with the same schema attributes as this object. Simple values are
+        copied straight away whilst the GangaObjects (and GangaLists) are shared with this object until the first time
+        they're accessed on the copy, when the copy takes its own deepcopy of them. As values read through a proxy can be
+        modified in place, any access is treated as a write.
+        This object must not change whilst any of its shared copies exist, it's meant for a private template such as the
+        one ISplitter.createSubjob makes the subjobs of a split from.
+        """
+        new_obj = self.getNew()
+        data = {}
+        shared = {}
+        for name, value in self._peekData().items():
+            if isinstance(value, Node):
+                shared[name] = value
+            elif isinstance(value, (list, dict)):
+                data[name] = deepcopy(value)
+            else:
+                data[name] = value
+        new_obj._data_dict = data
+        if shared:
+            new_obj._shared_data = shared
+        return new_obj
+
+    def _unshareAttribute(self, name):
+        """
+        This replaces the value of a schema attribute which is shared copy-on-write with a copy of its own and returns it
+        Args:
+            name (str): the name of the schema attribute
+        """
+        value = deepcopy(self._shared_data.pop(name))
+        if not self._shared_data:
+            self._shared_data = None
+        self.setSchemaAttribute(name, value)
+        return value
 
     def setSchemaAttribute(self, attrib_name, attrib_value):
         # type: (str, Any) -> None
@@ -941,9 +1033,13 @@ class GangaObject(Node, metaclass=ObjectMetaclass):
             attrib_name (str): the name of the schema attribute
             attrib_value (unknown): the value to set it to
         """
-        self._data[attrib_name] = attrib_value
+        if self._shared_data is not None and attrib_name in self._shared_data:
+            del self._shared_data[attrib_name]
+            if not self._shared_data:
+                self._shared_data = None
+        self._data_dict[attrib_name] = attrib_value
         if isinstance(attrib_value, Node) and attrib_value._getParent() is not self:
-            self._data[attrib_name]._setParent(self)
+            attrib_value._setParent(self)
 
     @property
     def _index_cache(self):
@@ -1073,7 +1169,7 @@ class GangaObject(Node, metaclass=ObjectMetaclass):
 
     def _getSessionLock(self, root=None):
         """Acquires the session lock on this object"""
-        if root:
+        if root is not None:
             r=root
         else:
             r = self._getRoot()
@@ -1152,7 +1248,7 @@ class GangaObject(Node, metaclass=ObjectMetaclass):
         """
         if self._schema and auto_load_deps:
             for k in self._schema.allItemNames():
-                this_attr = getattr(self, k)
+                this_attr = self._peekAttribute(k)
                 if isinstance(this_attr, Node):
                     if not this_attr._dirty:
                         continue
@@ -17,6 +17,7 @@ from GangaCore.Core.exceptions import GangaAttributeError, ProtectedAttributeErr
 import collections
 import functools
 import os
+import weakref
 
 from inspect import isclass, getfullargspec
 
@@ -265,7 +266,14 @@ def stripProxy(obj):
     Args:
         obj (object): This may be an instance or a class
     """
-    if is_namedtuple_instance(obj):
+    if isinstance(obj, GPIProxyObject):
+        try:
+            return object.__getattribute__(obj, implRef)
+        except AttributeError:
+            return obj
+    elif isinstance(obj, GangaObject):
+        return obj
+    elif is_namedtuple_instance(obj):
         return type(obj)(*[stripProxy(_) for _ in obj])
     elif isinstance(obj, (list, tuple)):
         return type(obj)(stripProxy(_) for _ in obj)
@@ -282,12 +290,10 @@ def addProxy(obj):
     Args:
         obj (GangaObject): This may be a Ganga object which you're wanting to add a proxy to
     """
-    if isType(obj, GangaObject):
-        if not isProxy(obj):
-            if hasattr(obj, proxyObject):
-                return getattr(obj, proxyObject)
-            else:
-                return GPIProxyObjectFactory(obj)
+    if isinstance(obj, GangaObject):
+        return GPIProxyObjectFactory(obj)
+    elif isinstance(obj, GPIProxyObject):
+        return obj
     elif isclass(obj) and issubclass(obj, GangaObject):
         return getProxyClass(obj)
     elif is_namedtuple_instance(obj):
@@ -384,7 +390,7 @@ class ProxyDataDescriptor(object):
 
     # apply attribute conversion
     def disguiseAttribute(self, v):
-        if isType(v, GangaObject):
+        if isinstance(v, GangaObject):
             return GPIProxyObjectFactory(v)
         return v
 
@@ -396,37 +402,33 @@ class ProxyDataDescriptor(object):
             return getattr(stripProxy(cls), getName(self))
 
         raw_obj = stripProxy(obj)
+        name = self._name
         try:
-            val = getattr(raw_obj, getName(self))
+            val = getattr(raw_obj, name)
         except Exception as err:
-            if getName(self) in raw_obj.__dict__:
-                val = raw_obj.__dict__[getName(self)]
+            if name in raw_obj.__dict__:
+                val = raw_obj.__dict__[name]
             else:
-                val = getattr(raw_obj, getName(self))
+                val = getattr(raw_obj, name)
 
         # wrap proxy
-        item = raw_obj._schema[getName(self)]
+        item = raw_obj._schema[name]
 
         if item['proxy_get']:
             return getattr(raw_obj, item['proxy_get'])()
 
-        if isType(item, ComponentItem):
+        if isinstance(item, ComponentItem):
             disguiser = self.disguiseComponentObject
         else:
             disguiser = self.disguiseAttribute
 
         ## FIXME Add GangaList?
-        if item['sequence'] and isType(val, list):
+        if item['sequence'] and isinstance(val, list):
             from GangaCore.GPIDev.Lib.GangaList.GangaList import makeGangaList
             val = makeGangaList(val, disguiser)
 
-        returnable = disguiser(val)
-        
-
-        if isType(returnable, GangaObject):
-            return addProxy(returnable)
-        else:
-            return returnable
+        # The disguisers return the (cached) proxy of a GangaObject
+        return disguiser(val)
 
     @staticmethod
     def _check_type(obj, val, attr_name):
@@ -784,8 +786,12 @@ def GPIProxyObjectFactory(_obj):
     Returns:
         a proxy object
     """
-    if hasattr(_obj, proxyObject):
-        return getattr(_obj, proxyObject)
+    # The object only holds a weak reference to its proxy so the proxy is reused for as long as it's in use
+    proxy_ref = getattr(_obj, proxyObject, None)
+    if proxy_ref is not None:
+        proxy_object = proxy_ref()
+        if proxy_object is not None:
+            return proxy_object
     if not isType(_obj, GangaObject):
         raise GangaException("%s is NOT a Proxyable object" % type(_obj))
 
@@ -795,16 +801,26 @@ def GPIProxyObjectFactory(_obj):
 
     proxy_object = proxy_class(_proxy_impl_obj_to_wrap=_obj)
 
-    setattr(_obj, proxyObject, proxy_object)
-
     return proxy_object
 
+
+class GPIProxyObjectMetaclass(type):
+
+    """
+    At the class level implRef of a proxy class is the ganga (plugin) class it wraps, whilst each instance keeps the
+    wrapped object in a slot of the same name
+    """
+
+    @property
+    def _impl(cls):
+        return cls._pluginclass
+
 # this class serves only as a 'tag' for all generated GPI proxy classes
 # so we can test with isinstance rather then relying on more generic but
 # less user friendly checking of attribute x._impl
 
 
-class GPIProxyObject(object):
+class GPIProxyObject(object, metaclass=GPIProxyObjectMetaclass):
     __slots__ = list()
     pass
 
@@ -871,8 +887,8 @@ def GPIProxyClassFactory(name, pluginclass):
 
         ## Avoid intercepting any of the setter method associated with the implRef as they could trigger loading from disk
         ## These are protected objects in the setter and it will throw an exception if they're altered
-        setattr(self, implRef, instance)
-        instance.__dict__[proxyObject] = self
+        object.__setattr__(self, implRef, instance)
+        instance.__dict__[proxyObject] = weakref.ref(self)
 
         ## Need to avoid any setter methods for GangaObjects
         ## Would be very nice to remove this entirely as I'm not sure a GangaObject should worry about it's proxy (if any)
@@ -1087,6 +1103,10 @@ def GPIProxyClassFactory(name, pluginclass):
         if x == implRef and not isinstance(v, class_type):
             raise AttributeError("Internal implementation object '%s' cannot be reassigned" % implRef)
 
+        elif x in hidden_attrs:
+            # The proxy has no __dict__ to keep the value in
+            raise GangaAttributeError("Can't assign '%s' as it is hidden in the object schema for class '%s'" % (x, getName(self)))
+
         elif not raw_self._schema.hasAttribute(x):
             from GangaCore.GPIDev.Lib.Job.MetadataDict import MetadataDict
             if hasattr(raw_self, 'metadata') and isType(raw_self.metadata, MetadataDict):
@@ -1128,26 +1148,28 @@ Setting a [protected] or a unexisting property raises AttributeError.""")
         if name.startswith('__') or name == implRef:
             return GPIProxyObject.__getattribute__(self, name)
         else:
-            implInstance = stripProxy(self)
-
-            if '_attribute_filter__get__' in dir(implInstance) and \
-                    not isType(implInstance, ObjectMetaclass) and \
-                    implInstance._schema.hasItem(name) and \
-                    not implInstance._schema.getItem(name)['hidden']:
-                        returnable = addProxy(implInstance._attribute_filter__get__(name))
+            if has_attribute_filter and name in exported_attrs:
+                implInstance = GPIProxyObject.__getattribute__(self, implRef)
+                returnable = addProxy(implInstance._attribute_filter__get__(name))
             else:
                 try:
                     returnable = GPIProxyObject.__getattribute__(self, name)
                 except AttributeError:
                     raise GangaAttributeError("Object '%s' does not have attribute: '%s'" % (getName(self), name))
 
-        if isType(returnable, GangaObject):
-            return addProxy(returnable)
+        if isinstance(returnable, GangaObject):
+            return GPIProxyObjectFactory(returnable)
         else:
             return returnable
 
-    # but at the class level _impl is a ganga plugin class
-    d = {implRef: pluginclass,
+    # Worked out once for the class rather than on every access of an attribute
+    has_attribute_filter = hasattr(pluginclass, '_attribute_filter__get__')
+    exported_attrs = frozenset(attr for attr, item in pluginclass._schema.allItems() if not item['hidden'])
+    hidden_attrs = frozenset(attr for attr, item in pluginclass._schema.allItems() if item['hidden'])
+
+    # but at the class level _impl is a ganga plugin class, see GPIProxyObjectMetaclass
+    d = {'__slots__': (implRef, '__weakref__'),
+            '_pluginclass': pluginclass,
             '__init__': _init,
             '__str__': _str,
             '__repr__': _repr,
@@ -507,6 +507,30 @@ class GangaList(GangaObject):
         for i in ittr:
             self.append(i)
 
+    def _bulkAppend(self, objs):
+        """
+        Append many GangaObjects at once, e.g. the subjobs of a split. Unlike append the schema entry of the list, which
+        the objects are filtered through, is only looked up once for all of them.
+        Args:
+            objs (list): The GangaObjects to append, with or without their proxies
+        """
+        parent = self._getParent()
+        item = self.findSchemaParentSchemaEntry(parent)
+        category = item['category'] if item and item.isA(ComponentItem) else None
+        new_elems = []
+        for obj in objs:
+            raw_obj = stripProxy(obj)
+            if not isinstance(raw_obj, GangaObject) or isType(raw_obj, GangaList) or (category and raw_obj._category != category):
+                # Anything which isn't simply a GangaObject of the right category goes through the filters of append
+                self._list.extend(new_elems)
+                new_elems = []
+                self.append(raw_obj)
+                continue
+            if raw_obj._getParent() is not parent:
+                raw_obj._setParent(parent)
+            new_elems.append(raw_obj)
+        self._list.extend(new_elems)
+
     def _export_extend(self, ittr):
         self.checkReadOnly()
         self.extend(ittr)
@@ -578,7 +602,7 @@ class GangaList(GangaObject):
         result = None
         if parent and parent._schema:
             for k, v in parent._schema.allItems():
-                if getattr(parent, k) is self:
+                if parent._peekAttribute(k) is self:
                     result = v
                     break
         return result
@@ -1,5 +1,6 @@
 
 
+import collections
 import copy
 import errno
 import glob
@@ -14,6 +15,7 @@ from GangaCore.Core.exceptions import GangaException, IncompleteJobSubmissionErr
 from GangaCore.Core import Sandbox
 from GangaCore.Core.GangaRepository import getRegistry
 from GangaCore.Core.GangaRepository.SubJobXMLList import SubJobXMLList
+from GangaCore.Core.GangaThread.WorkerThreads.TaskBatch import TaskBatch, StageTimer
 from GangaCore.GPIDev.Adapters.ApplicationRuntimeHandlers import allHandlers
 from GangaCore.GPIDev.Adapters.IApplication import PostprocessStatusUpdate
 from GangaCore.GPIDev.Adapters.IPostProcessor import MultiPostProcessor
@@ -235,7 +237,8 @@ class Job(GangaObject):
 
     default_registry = 'jobs'
 
-    _additional_slots = ['_storedRTHandler', '_storedJobSubConfig', '_storedAppSubConfig', '_storedJobMasterConfig', '_storedAppMasterConfig', '_stored_subjobs_proxy']
+    _additional_slots = ['_storedRTHandler', '_storedJobSubConfig', '_storedAppSubConfig', '_storedJobMasterConfig', '_storedAppMasterConfig', '_stored_subjobs_proxy',
+                         '_subjob_status_counts', '_submit_timer']
 
     # TODO: usage of **kwds may be envisaged at this level to optimize the
     # overriding of values, this must be reviewed
@@ -730,26 +733,58 @@ class Job(GangaObject):
 
         return postprocessFailure
 
-    def getSubJobStatuses(self):
+    def _getSubJobStatusCounts(self):
         """
-        This returns a set of all of the different subjob statuses whilst respecting lazy loading
+        This returns a Counter of the statuses of the subjobs whilst respecting lazy loading
+        The counts are built from the subjob index the first time they're needed and are then kept up to date by
+        _subjobStatusChanged, they're only built again if the subjobs are replaced or their number changes
         """
+        with self.const_lock:
+            subjobs = self.subjobs
+            stored = self._subjob_status_counts
+            # Subjobs are never added to a SubJobXMLList, and len() of one stats the job directory, so only the length
+            # of a list is checked against the number counted
+            if stored is not None and stored[0] is subjobs and isinstance(subjobs, SubJobXMLList):
+                return stored[2]
+            if stored is None or stored[0] is not subjobs or stored[1] != len(subjobs):
+                if isinstance(subjobs, SubJobXMLList):
+                    counts = collections.Counter(subjobs.getAllSJStatus())
+                else:
+                    counts = collections.Counter(sj.status for sj in subjobs)
+                stored = (subjobs, sum(counts.values()), counts)
+                self._subjob_status_counts = stored
+            return stored[2]
 
-        if isinstance(self.subjobs, SubJobXMLList):
-            stats = set(self.subjobs.getAllSJStatus())
-        else:
-            stats = set(sj.status for sj in self.subjobs)
+    def _subjobStatusChanged(self, old_status, new_status):
+        """
+        This moves one subjob from old_status to new_status in the counts of the subjob statuses, if they've been built
+        Args:
+            old_status (str): The status the subjob had
+            new_status (str): The status the subjob has now
+        """
+        if old_status == new_status:
+            return
+        with self.const_lock:
+            stored = self._subjob_status_counts
+            if stored is None:
+                return
+            counts = stored[2]
+            if counts[old_status] > 0:
+                counts[old_status] -= 1
+                counts[new_status] += 1
+            else:
+                # The counts don't know about this subjob, build them again when they're next needed
+                self._subjob_status_counts = None
 
-        return stats
+    def getSubJobStatuses(self):
+        """
+        This returns a set of all of the different subjob statuses whilst respecting lazy loading
+        """
+        return set(status for status, count in self._getSubJobStatusCounts().items() if count > 0)
 
     def returnSubjobStatuses(self):
-        stats = []
-        if isinstance(self.subjobs, SubJobXMLList):
-            stats = self.subjobs.getAllSJStatus()
-        else:
-            stats = [sj.status for sj in self.subjobs]
-
-        return "%s/%s/%s/%s" % (stats.count('running'), stats.count('failed') + stats.count('killed'), stats.count('completing'), stats.count('completed'))
+        counts = self._getSubJobStatusCounts()
+        return "%s/%s/%s/%s" % (counts['running'], counts['failed'] + counts['killed'], counts['completing'], counts['completed'])
 
     def updateMasterJobStatus(self):
         """
@@ -1237,11 +1272,11 @@ class Job(GangaObject):
         return jobmasterconfig
 
     @staticmethod
-    def _prepare_sj( rtHandler, i, app, sub_c, app_master_c, job_master_c, finished):
-        if app.is_prepared in [None, False]:
-            app.prepare()
-        finished[i] = rtHandler.prepare(app, sub_c, app_master_c, job_master_c)
-        return
+    def _prepare_sj(rtHandler, app, sub_c, app_master_c, job_master_c, timer):
+        with timer.stage('prepare'):
+            if app.is_prepared in [None, False]:
+                app.prepare()
+            return rtHandler.prepare(app, sub_c, app_master_c, job_master_c)
 
     def _getJobSubConfig(self, subjobs):
 
@@ -1257,26 +1292,23 @@ class Job(GangaObject):
                 logger.debug("Job %s Calling rtHandler.prepare %s times" % (self.getFQID('.'), len(self.subjobs)))
                 logger.info("Preparing subjobs")
 
-                #Make an empty list
-                jobsubconfig = [None]*len(subjobs)
+                timer = self._submit_timer or StageTimer()
 
                 if self.parallel_submit is False:
-                    jobsubconfig = [rtHandler.prepare(sub_job.application, sub_conf, appmasterconfig, jobmasterconfig) for (sub_job, sub_conf) in zip(subjobs, appsubconfig)]
+                    with timer.stage('prepare'):
+                        jobsubconfig = [rtHandler.prepare(sub_job.application, sub_conf, appmasterconfig, jobmasterconfig) for (sub_job, sub_conf) in zip(subjobs, appsubconfig)]
                 else:
 
-                    finished = {}
-
                     from GangaCore.Core.GangaThread.WorkerThreads import getQueues
-                    index = 0
-                    for sub_j, sub_conf in zip(subjobs, appsubconfig):
-                        getQueues()._monitoring_threadpool.add_function(self._prepare_sj, (rtHandler, index, sub_j.application, sub_conf, appmasterconfig, jobmasterconfig, finished))
-                        index += 1
+                    batch = TaskBatch(getQueues()._monitoring_threadpool, name='prepare_subjobs')
+                    for index, (sub_j, sub_conf) in enumerate(zip(subjobs, appsubconfig)):
+                        batch.add(index, self._prepare_sj, rtHandler, sub_j.application, sub_conf, appmasterconfig, jobmasterconfig, timer)
+                    batch.wait()
 
-                    while len(finished) != len(subjobs):
-                        time.sleep(0.25)
+                    if batch.errors:
+                        raise batch.errors[min(batch.errors)]
 
-                    for index in finished.keys():
-                        jobsubconfig[index] = finished[index]
+                    jobsubconfig = [batch.results[index] for index in range(len(subjobs))]
 
         else:
             #   I am a sub-job, lets calculate my config
@@ -1408,7 +1440,10 @@ class Job(GangaObject):
                     sj.time.timenow('new')
                     sj.id = i
                     i += 1
-                    self.subjobs.append(sj)
+                if isType(self.subjobs, GangaList):
+                    self.subjobs._bulkAppend(subjobs)
+                else:
+                    self.subjobs.extend(subjobs)
 
                 cfg = GangaCore.Utility.Config.getConfig('Configuration')
                 for j in self.subjobs:
@@ -1538,6 +1573,8 @@ class Job(GangaObject):
             # prepare the subjobs with the runtime handler
             # Calls the rtHandler.prepare if it hasn't already been called by the master job or by self
             # Only stored as a transient if the prepare successfully completes
+            # the time spent preparing, building the sandbox and submitting is summed on the timer
+            self._submit_timer = StageTimer()
             jobsubconfig = self._getJobSubConfig(rjobs)
             logger.debug("# jobsubconfig: %s" % len(jobsubconfig))
 
@@ -1562,6 +1599,9 @@ class Job(GangaObject):
             if not r:
                 raise JobManagerError('error during submit')
 
+            if len(rjobs) > 1:
+                logger.info("Submitted %s subjobs of job %s in %s" % (len(rjobs), self.getFQID('.'), self._submit_timer.report()))
+
             # This appears to be done by the backend now in a way that handles sub-jobs,
             # in the case of a master job however we need to still perform this
             if len(rjobs) != 1:
@@ -2073,9 +2113,20 @@ class Job(GangaObject):
         rslice = self._subjobs_proxy()
         return rslice._display(1)
 
+    def _setDirty(self):
+        """ Set the dirty flag up to the master. A change to a subjob which its SubJobXMLList had released is kept until it's flushed"""
+        super(Job, self)._setDirty()
+        subjobs = self._data_dict.get('subjobs')
+        if isinstance(subjobs, SubJobXMLList):
+            subjobs._keepReleasedSubJobs()
+
     def __setattr__(self, attr, value):
 
-        if attr == 'outputfiles':
+        if attr.startswith('_'):
+            # If it's an internal attribute then just pass it on
+            super(Job, self).__setattr__(attr, value)
+
+        elif attr == 'outputfiles':
 
             if value != []:
                 if self.outputdata is not None:
@@ -2167,9 +2218,26 @@ class Job(GangaObject):
             else:
                 new_value = stripProxy(runtimeEvalString(self, attr, value))
                 super(Job, self).__setattr__('backend', new_value)
-        elif attr.startswith('_'):
-            # If it's an internal attribute then just pass it on
-            super(Job, self).__setattr__(attr, value)
+        elif attr == 'status':
+
+            old_status = self._data_dict.get('status')
+            new_value = stripProxy(runtimeEvalString(self, attr, value))
+            super(Job, self).__setattr__(attr, new_value)
+            # Keep the registry's set of jobs to be monitored up to date
+            if self.master is None:
+                reg = self._getRegistry()
+                if reg is not None and hasattr(reg, 'updateMonitoredJob'):
+                    reg.updateMonitoredJob(self.id, self.status)
+            else:
+                # and the counts of the subjob statuses of the master
+                self.master._subjobStatusChanged(old_status, self.status)
+                reg = self.master._getRegistry()
+                if reg is not None and hasattr(reg, 'jobChanged'):
+                    reg.jobChanged(self.master.id)
+
+        elif attr in self._schema.datadict:
+            # The descriptor of a schema attribute evaluates a string itself if it needs to
+            super(Job, self).__setattr__(attr, stripProxy(value))
         else:
             new_value = stripProxy(runtimeEvalString(self, attr, value))
             super(Job, self).__setattr__(attr, new_value)
@@ -11,6 +11,22 @@ from GangaCore.Utility.logging import getLogger
 GangaCore.Utility.Config.config_scope['datetime'] = datetime
 logger = getLogger(modulename=True)
 
+# For these states the master takes the last of the subjob timestamps, for all others the first
+_last_stamp_states = ('backend_final', 'final')
+
+
+def _stampsDuration(timestamps, start, end):
+    """Returns the duration between two timestamps ignoring microseconds, or None if either is missing
+    Args:
+        timestamps (dict): The timestamps of a job
+        start (str): The name of the first timestamp
+        end (str): The name of the second timestamp
+    """
+    s, e = timestamps.get(start), timestamps.get(end)
+    if not isinstance(s, datetime.datetime) or not isinstance(e, datetime.datetime):
+        return None
+    return e.replace(microsecond=0) - s.replace(microsecond=0)
+
 
 class JobTime(GangaObject):
 
@@ -59,7 +75,7 @@ class JobTime(GangaObject):
     """
 
     timestamps = {}
-    sj_statlist = []
+    _sj_summary = None
 
     _schema = Schema(Version(0, 0), {'timestamps': SimpleItem(defvalue={}, doc="Dictionary containing timestamps for job", summary_print='_timestamps_summary_print')
                                      })
@@ -85,11 +101,13 @@ class JobTime(GangaObject):
     def __init__(self):
         super(JobTime, self).__init__()
         self.timestamps = {}
-        # this makes sure the contents of the list don't get copied when the
-        # Job does.
-        self.sj_statlist = []
+        # The summary of the subjob timestamps, this makes sure it doesn't get copied when the Job does.
+        self._sj_summary = None
 
     def __deepcopy__(self, memo):
+        # The summary of the subjob timestamps refers to the subjobs of this job, don't let the copy have it
+        memo = {} if memo is None else memo
+        memo[id(self._sj_summary)] = None
         obj = super(JobTime, self).__deepcopy__(memo)
         # Lets not re-initialize the object as we lose history from previous submissions
         # obj.newjob()
@@ -100,9 +118,8 @@ class JobTime(GangaObject):
         """
         t = datetime.datetime.utcnow()
         self.timestamps['new'] = t
-        # this makes sure the contents of the list don't get copied when the
-        # Job does.
-        self.sj_statlist = []
+        # this makes sure the summary of the subjob timestamps doesn't get copied when the Job does.
+        self._sj_summary = None
 
     def timenow(self, status):
         """Updates timestamps as job status changes.
@@ -119,6 +136,9 @@ class JobTime(GangaObject):
             id = str("unknown")
         logger.debug("Job %s called timenow('%s')", str(id), status)
 
+        if j.master is not None:
+            old_stamps = dict(self.timestamps)
+
         # standard method:
         if not j.subjobs:
             # backend stamps
@@ -150,11 +170,7 @@ class JobTime(GangaObject):
             logger.debug(
                 "j.time.timenow() caught subjob %d.%d in the '%s' status", j.master.id, j.id, status)
 
-            for written_status in list(j.time.timestamps.keys()):
-                if written_status not in j.master.time.sj_statlist:
-                    j.master.time.sj_statlist.append(written_status)
-                    logger.debug(
-                        "written_status: '%s' written to sj_statlist", written_status)
+            j.master.time._subjobStampsChanged(old_stamps, self.timestamps)
 
         # master job method
         if j.subjobs:  # identifies master job
@@ -165,38 +181,115 @@ class JobTime(GangaObject):
                 logger.debug(
                     "status: '%s' in ganga_master written to master timestamps.", status)
             else:
-                for state in self.sj_statlist:
+                for state in list(self._getSubJobSummary()['stamps'].keys()):
                     if state not in ganga_master:
                         j.time.timestamps[
                             state] = self.sjStatList_return(state)
                         logger.debug(
-                            "state: '%s' from sj_statlist to written to master timestamps.", state)
-                    else:
-                        pass
+                            "state: '%s' from the subjob summary written to master timestamps.", state)
 
-    def sjStatList_return(self, status):
-        list = []
-        final = ['backend_final', 'final']
+    def _getSubJobSummary(self):
+        """
+        This returns the summary of the timestamps of the subjobs of a master job.
+        The summary holds the first and last timestamp and the number of subjobs for each state, and the summed runtime of
+        the subjobs. It is built from the subjob index the first time it's needed and is then kept up to date by
+        _subjobStampsChanged, it's only built again if the subjobs are replaced or their number changes
+        """
         j = self.getJobObject()
-        for sjs in j.subjobs:
-            try:
-                if isinstance(sjs.time.timestamps[status], datetime.datetime):
-                    list.append(sjs.time.timestamps[status])
+        with j.const_lock:
+            subjobs = j.subjobs
+            num_subjobs = len(subjobs)
+            stored = self._sj_summary
+            if stored is None or stored[0] is not subjobs or stored[1] != num_subjobs:
+                if hasattr(subjobs, 'getAllSJTimestamps'):
+                    all_stamps = subjobs.getAllSJTimestamps()
                 else:
-                    logger.debug(
-                        'Attempt to add a non datetime object in the timestamp, job=%d, subjob=%d', j.id, sjs.id)
-            except KeyError:
-                logger.debug(
-                    "Status '%s' not found in timestamps of job %d.%d.", status, sjs.master.id, sjs.id)
-        list.sort()
-        try:
-            if status in final:
-                return list[-1]
-            return list[0]
-        except IndexError:
-            # change this to a more appropriate debug.
-            logger.debug(
-                "IndexError: ID: %d, Status: '%s', length of list: %d", j.id, status, len(list))
+                    all_stamps = [sj.time.timestamps for sj in subjobs]
+                summary = {'stamps': {}, 'runtime': [datetime.timedelta(0), 0]}
+                for stamps in all_stamps:
+                    self._addToSummary(summary, stamps)
+                stored = (subjobs, num_subjobs, summary)
+                self._sj_summary = stored
+            return stored[2]
+
+    @staticmethod
+    def _addToSummary(summary, stamps):
+        """
+        Adds the timestamps of one subjob to a summary
+        Args:
+            summary (dict): The summary of the subjob timestamps
+            stamps (dict): The timestamps of the subjob
+        """
+        for state, stamp in stamps.items():
+            if not isinstance(stamp, datetime.datetime):
+                continue
+            this_summary = summary['stamps'].get(state)
+            if this_summary is None:
+                summary['stamps'][state] = [stamp, stamp, 1]
+            else:
+                this_summary[0] = min(this_summary[0], stamp)
+                this_summary[1] = max(this_summary[1], stamp)
+                this_summary[2] += 1
+        runtime = _stampsDuration(stamps, 'backend_running', 'backend_final')
+        if runtime is not None:
+            summary['runtime'][0] += runtime
+            summary['runtime'][1] += 1
+
+    def _subjobStampsChanged(self, old_stamps, new_stamps):
+        """
+        This updates the summary of the subjob timestamps, if it's been built, when the timestamps of a subjob change.
+        A summary which can't be updated without looking at the other subjobs is dropped and built again when it's next needed
+        Args:
+            old_stamps (dict): The timestamps the subjob had
+            new_stamps (dict): The timestamps the subjob has now
+        """
+        with self.const_lock:
+            stored = self._sj_summary
+            if stored is None:
+                return
+            summary = stored[2]
+            for state, stamp in new_stamps.items():
+                old_stamp = old_stamps.get(state)
+                if stamp == old_stamp or not isinstance(stamp, datetime.datetime):
+                    continue
+                this_summary = summary['stamps'].get(state)
+                if old_stamp is None:
+                    if this_summary is None:
+                        summary['stamps'][state] = [stamp, stamp, 1]
+                    else:
+                        this_summary[0] = min(this_summary[0], stamp)
+                        this_summary[1] = max(this_summary[1], stamp)
+                        this_summary[2] += 1
+                elif this_summary is None or (old_stamp == this_summary[0] and stamp > old_stamp) or\
+                        (old_stamp == this_summary[1] and stamp < old_stamp):
+                    # The first or last timestamp has moved inwards, only the other subjobs know the new one
+                    self._sj_summary = None
+                    return
+                else:
+                    this_summary[0] = min(this_summary[0], stamp)
+                    this_summary[1] = max(this_summary[1], stamp)
+
+            old_runtime = _stampsDuration(old_stamps, 'backend_running', 'backend_final')
+            new_runtime = _stampsDuration(new_stamps, 'backend_running', 'backend_final')
+            if old_runtime is not None:
+                summary['runtime'][0] -= old_runtime
+                summary['runtime'][1] -= 1
+            if new_runtime is not None:
+                summary['runtime'][0] += new_runtime
+                summary['runtime'][1] += 1
+
+    def sjStatList_return(self, status):
+        """Returns the first of the subjob timestamps for a state, or the last one for the final states
+        Args:
+            status (str): The name of the timestamp
+        """
+        this_summary = self._getSubJobSummary()['stamps'].get(status)
+        if this_summary is None:
+            logger.debug("Status '%s' not found in the timestamps of the subjobs of job %s.", status, self.getJobObject().id)
+            return None
+        if status in _last_stamp_states:
+            return this_summary[1]
+        return this_summary[0]
 
     def display(self, format="%Y/%m/%d %H:%M:%S"):
         return self._display(format)
@@ -311,19 +404,16 @@ class JobTime(GangaObject):
                 # string = error
                 if not isinstance(subjob, int):
                     raise GangaTypeError("Subjob id requires type 'int'")
-                # subjob id supplied
-                for sj in j.subjobs:
-                    if sj.id == subjob:
-                        logger.debug(
-                            "Subjob: %d, Backend ID: %d", sj.id, sj.backend.id)
-                        detdict = sj.backend.timedetails()
-                        return detdict
-                    else:
-                        pass
-                if subjob >= len(j.subjobs):
+                # subjob id supplied, only that subjob is loaded
+                if subjob < 0 or subjob >= len(j.subjobs):
                     logger.warning(
                         "Index '%s' is out of range. Corresponding subjob does not exist.", str(subjob))
                     return None
+                sj = j.subjobs[subjob]
+                logger.debug(
+                    "Subjob: %d, Backend ID: %s", sj.id, sj.backend.id)
+                detdict = sj.backend.timedetails()
+                return detdict
 
             logger.debug(
                 "subjob arguement '%s' has failed to be caught and dealt with.", subjob)
@@ -352,15 +442,12 @@ class JobTime(GangaObject):
 
            The runtime is calculated as the duration between the job entering the 'running' state and the job entering the 'completed' state.
         """
-        end_list = ['killed', 'completed', 'failed']
-        end_stamps = {}
-
-        # if master job, sum:
+        # if master job, sum of the subjobs which have run:
         j = self.getJobObject()
         if j.subjobs:
-            masterrun = datetime.timedelta(0, 0, 0)
-            for jobs in j.subjobs:
-                masterrun = masterrun + jobs.time.runtime()
+            masterrun, num_run = self._getSubJobSummary()['runtime']
+            if num_run != len(j.subjobs):
+                logger.debug("Only %d of the %d subjobs of job %s have a runtime.", num_run, len(j.subjobs), j.id)
             return masterrun
         # all other jobs:
         return self.duration('backend_running', 'backend_final')
@@ -373,15 +460,12 @@ class JobTime(GangaObject):
         # master job:
         j = self.getJobObject()
         if j.subjobs:
-            start_list = []
-            end_list = []
-            for jobs in j.subjobs:
-                start_list.append(jobs.time.timestamps['submitted'])
-                end_list.append(jobs.time.timestamps['backend_running'])
-            start_list.sort()
-            end_list.sort()
-            start = start_list[0]
-            end = end_list[len(end_list) - 1]
+            stamps = self._getSubJobSummary()['stamps']
+            if 'submitted' not in stamps or 'backend_running' not in stamps:
+                logger.warning("Could not calculate waiting time: subjobs have not been submitted and run.")
+                return None
+            start = stamps['submitted'][0]
+            end = stamps['backend_running'][1]
             masterwait = end - start
             return masterwait
         # all other jobs:
@@ -394,13 +478,12 @@ class JobTime(GangaObject):
         """
         j = self.getJobObject()
         if j.subjobs:
-            start_list = []
-            end_list = []
-            for jobs in j.subjobs:
-                end_list.append(jobs.time.timestamps['submitted'])
-            end_list.sort()
-            start = j.time.timestamps['submitting']
-            end = end_list[len(end_list) - 1]
+            stamps = self._getSubJobSummary()['stamps']
+            if 'submitting' not in self.timestamps or 'submitted' not in stamps:
+                logger.warning("Could not calculate submission time: job has not been submitted.")
+                return None
+            start = self.timestamps['submitting']
+            end = stamps['submitted'][1]
             mastersub = end - start
             return mastersub
         return self.duration('submitting', 'submitted')
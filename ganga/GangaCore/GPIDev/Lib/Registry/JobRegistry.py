@@ -5,13 +5,19 @@
 # $Id: JobRegistry.py,v 1.1.2.1 2009-07-24 13:39:39 ebke Exp $
 ##########################################################################
 
+import threading
+
 #from GangaCore.Utility.external.ordereddict import oDict
 from GangaCore.Utility.external.OrderedDict import OrderedDict as oDict
 
 from GangaCore.Core.exceptions import GangaException
 from GangaCore.Core.GangaRepository.Registry import Registry, RegistryKeyError, RegistryAccessError, RegistryFlusher
 
-from GangaCore.GPIDev.Base.Proxy import stripProxy, isType
+from GangaCore.GPIDev.Base.Objects import GangaObject
+from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
+from GangaCore.GPIDev.Base.Proxy import stripProxy, isType, getName
+
+from GangaCore.Utility.Config import getConfig
 
 import GangaCore.Utility.logging
 
@@ -29,11 +35,22 @@ logger = GangaCore.Utility.logging.getLogger()
 
 class JobRegistry(Registry):
 
+    # Jobs in these states are polled by the monitoring loop
+    monitored_states = ('submitted', 'running')
+
     def __init__(self, name, doc):
         super(JobRegistry, self).__init__(name, doc)
         self.stored_slice = JobRegistrySlice(self.name)
         self.stored_slice.objects = self
         self.stored_proxy = JobRegistrySliceProxy(self.stored_slice)
+        self._monitored_ids = set()
+        self._newly_monitored = False
+        self._monitored_lock = threading.Lock()
+        # The change feed, the id of each job which changed against the sequence number of its last change, oldest first
+        self._changed_ids = oDict()
+        self._change_seq = 0
+        self._change_cursors = {}
+        self._changes_lock = threading.Lock()
 
     def getSlice(self):
         return self.stored_slice
@@ -49,26 +66,49 @@ class JobRegistry(Registry):
             #print("cv: %s" % str(cv))
             cache[cv] = getattr(obj, cv)
             #logger.info("Setting: %s = %s" % (str(cv), str(cache[cv])))
+        # The values a subjob still shares copy-on-write with the rest of its split are only read here so they mustn't
+        # be copied, see GangaObject._sharedCopy
         this_slice = JobRegistrySlice("jobs")
-        for dpv in this_slice._display_columns:
-            #logger.debug("Storing: %s" % str(dpv))
-            try:
-                value = this_slice._get_display_value(obj, dpv)
-                cache["display:" + dpv] = value
-            except Exception as err:
-                value = None
+        with obj._peeking():
+            for dpv in this_slice._display_columns:
+                #logger.debug("Storing: %s" % str(dpv))
+                try:
+                    value = this_slice._get_display_value(obj, dpv)
+                    cache["display:" + dpv] = value
+                except Exception as err:
+                    value = None
         del this_slice
 
+        # store the values jobs.select() can match without loading the job
+        for attr in getConfig('Configuration')['selectIndexAttributes']:
+            try:
+                value = obj._peekAttribute(attr)
+            except AttributeError:
+                continue
+            if isType(value, GangaObject):
+                cache["select:" + attr] = getName(value)
+            elif value is None or isinstance(value, (str, int, float, bool)):
+                cache["select:" + attr] = value
+
         # store subjob status
         if hasattr(obj, "subjobs"):
             cache["subjobs:status"] = []
-            if hasattr(obj.subjobs, "getAllCachedData"):
-                for sj in obj.subjobs.getAllCachedData():
-                    cache["subjobs:status"].append(sj['status'])
+            if hasattr(obj.subjobs, "getAllSJStatus"):
+                cache["subjobs:status"].extend(obj.subjobs.getAllSJStatus())
             else:
                 for sj in obj.subjobs:
                     cache["subjobs:status"].append(sj.status)
 
+        # store the subjob timestamps so the master can summarise them without loading the subjobs
+        if getattr(obj, "master", None) is not None:
+            cache["time:timestamps"] = dict(obj._peekAttribute('time').timestamps)
+            # and the fields of the backend of a subjob most often read from a large job, see RegistrySlice.values
+            backend = obj._peekAttribute('backend')
+            if backend is not None:
+                for attr in ('id', 'exitcode'):
+                    if backend._schema.hasItem(attr):
+                        cache["backend." + attr] = getattr(backend, attr)
+
         #print("Cache: %s" % str(cache))
         return cache
 
@@ -84,9 +124,114 @@ class JobRegistry(Registry):
             stripProxy(jt)._setRegistry(self.metadata)
             self.metadata._add(jt)
         self.jobtree = self.metadata[self.metadata.ids()[-1]]
+        self._initMonitoredIds()
         self.flush_thread = RegistryFlusher(self, 'JobRegistryFlusher')
         self.flush_thread.start()
 
+    def _initMonitoredIds(self):
+        """
+        Build the set of job ids the monitoring loop has to poll from the status stored in the index of each job.
+        Jobs without a cached status, or still being loaded in the background, are included and dropped on the first
+        monitoring pass if they turn out to be inactive.
+        """
+        # Pending ids are taken first as they move into self._objects once loaded
+        monitored = set(self.repository.pending_ids())
+        for this_id, this_job in list(self._objects.items()):
+            index_cache = this_job._index_cache
+            if not isinstance(index_cache, dict) or index_cache.get('status') in self.monitored_states + (None,):
+                monitored.add(this_id)
+        with self._monitored_lock:
+            self._monitored_ids = monitored
+            self._newly_monitored = True
+
+    def updateMonitoredJob(self, this_id, status):
+        """
+        Called on every status change of a job in this registry to keep the set of monitored ids up to date
+        Args:
+            this_id (int): The id of the (master) job
+            status (str): The new status of the job
+        """
+        with self._monitored_lock:
+            if status in self.monitored_states:
+                if this_id not in self._monitored_ids:
+                    self._monitored_ids.add(this_id)
+                    self._newly_monitored = True
+            else:
+                self._monitored_ids.discard(this_id)
+        self.jobChanged(this_id)
+
+    def getMonitoredIds(self):
+        """
+        Returns the sorted ids of the jobs which may need polling by the monitoring loop.
+        This is a superset of the active jobs as ids are only dropped once they're seen to be inactive.
+        """
+        with self._monitored_lock:
+            return sorted(self._monitored_ids)
+
+    def takeNewlyMonitored(self):
+        """
+        Returns True if any job has been added to the monitored ids since the last call
+        """
+        with self._monitored_lock:
+            newly_monitored, self._newly_monitored = self._newly_monitored, False
+        return newly_monitored
+
+    def jobChanged(self, this_id):
+        """
+        Records that a job has been added, changed or removed for the consumers of the change feed
+        Args:
+            this_id (int): The id of the (master) job
+        """
+        with self._changes_lock:
+            self._change_seq += 1
+            if this_id in self._changed_ids:
+                del self._changed_ids[this_id]
+            self._changed_ids[this_id] = self._change_seq
+
+    def getJobChangeSeq(self, this_id):
+        """
+        Returns the sequence number of the last change of a job seen by the change feed, 0 if it hasn't changed in this session
+        Args:
+            this_id (int): The id of the (master) job
+        """
+        with self._changes_lock:
+            return self._changed_ids.get(this_id, 0)
+
+    def pollChangedJobs(self, consumer):
+        """
+        Returns the ids of the jobs which have been added, changed or removed since the last call from this consumer.
+        The first call from a consumer returns the ids of all the jobs in the registry.
+        Args:
+            consumer (str): The name of the consumer of the change feed, e.g. 'WebGUI'
+        """
+        with self._changes_lock:
+            cursor = self._change_cursors.get(consumer)
+            self._change_cursors[consumer] = self._change_seq
+            changed = []
+            if cursor is not None:
+                # The ids are ordered by their last change so stop at the first one already seen
+                for this_id in reversed(self._changed_ids):
+                    if self._changed_ids[this_id] <= cursor:
+                        break
+                    changed.append(this_id)
+        if cursor is None:
+            # Anything changing whilst the ids are listed is returned again by the next call
+            return self.ids()
+        return sorted(changed)
+
+    def _add(self, obj, force_index=None):
+        this_id = super(JobRegistry, self)._add(obj, force_index)
+        self.jobChanged(this_id)
+        return this_id
+
+    def _flush(self, objs):
+        if not isType(objs, (list, tuple, GangaList)):
+            objs = [objs]
+        changed_ids = [obj.id for obj in objs if obj._dirty and isinstance(getattr(obj, 'id', None), int)]
+        super(JobRegistry, self)._flush(objs)
+        for this_id in changed_ids:
+            self.jobChanged(this_id)
+
     def check(self):
         """
             This code checks for jobs which are in the submitting state
@@ -110,6 +255,7 @@ class JobRegistry(Registry):
             logger.warning("To try this job again resubmit or use a backend.reset()")
             this_job.force_status('failed')
 
+        self.repository.wait_for_index()
         reverse_job_list = list(self._objects.keys())
         reverse_job_list.reverse()
 
@@ -162,7 +308,11 @@ class JobRegistry(Registry):
         return self.jobtree
 
     def _remove(self, obj, auto_removed=0):
+        this_id = obj.id
         super(JobRegistry, self)._remove(obj, auto_removed)
+        with self._monitored_lock:
+            self._monitored_ids.discard(this_id)
+        self.jobChanged(this_id)
         try:
             self.jobtree.cleanlinks()
         except Exception as err:
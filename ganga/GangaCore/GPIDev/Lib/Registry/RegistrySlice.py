@@ -1,4 +1,4 @@
-import collections
+import collections.abc
 import fnmatch
 import re
 import reprlib
@@ -19,6 +19,98 @@ logger = getLogger()
 
 config = GangaCore.Utility.Config.getConfig('Display')
 
+
+class _SelectTerm(object):
+
+    """
+    One attribute=value of a select(), compiled once for the whole selection.
+    It's matched against the index cache of an object when the cache holds the attribute, otherwise against the object
+    """
+
+    __slots__ = ('attr', 'value', 'regex', '_items')
+
+    def __init__(self, attr, value):
+        """
+        Args:
+            attr (str): The name of the attribute
+            value (unknown): The value to match, a str is matched as an fnmatch pattern
+        """
+        self.attr = attr
+        self.value = value
+        self.regex = re.compile(fnmatch.translate(value)) if isinstance(value, str) else None
+        # class: (schema item, name of the component to match or None)
+        self._items = {}
+
+    def _getItem(self, obj):
+        """
+        Returns the schema item of the attribute for the class of obj and, if it's a component, the name of the component
+        to match. These are only worked out once per class
+        Args:
+            obj (GangaObject): The object being matched
+        """
+        cls = type(obj)
+        if cls not in self._items:
+            try:
+                item = obj._schema.getItem(self.attr)
+            except KeyError as err:
+                from GangaCore.GPIDev.Base import GangaAttributeError
+                logger.debug("KeyError getting item: '%s' from schema" % self.attr)
+                raise GangaAttributeError('undefined select attribute: %s' % self.attr)
+            component_name = None
+            if item.isA(ComponentItem):
+                ## TODO we need to distinguish between passing a Class type and a defined class instance
+                ## If we passed a class type to select it should look only for classes which are of this type
+                ## If we pass a class instance a compartison of the internal attributes should be performed
+                from GangaCore.GPIDev.Base.Filters import allComponentFilters
+                filtered_value = allComponentFilters[item['category']](self.value, item)
+                if filtered_value is not None:
+                    component_name = getName(filtered_value)
+                else:
+                    component_name = getName(self.value)
+            self._items[cls] = (item, component_name)
+        return self._items[cls]
+
+    def _matchValue(self, value):
+        """
+        Match the value of a simple attribute
+        Args:
+            value (unknown): The value of the attribute of an object
+        """
+        if self.regex is not None:
+            return self.regex.match(str(value)) is not None
+        return value == self.value
+
+    def matchObject(self, obj):
+        """
+        Returns True/False if the attribute of obj matches, this loads obj if it isn't loaded
+        Args:
+            obj (GangaObject): The object being matched
+        """
+        component_name = self._getItem(obj)[1]
+        if component_name is not None:
+            return getName(getattr(obj, self.attr)) == component_name
+        return self._matchValue(getattr(obj, self.attr))
+
+    def matchCache(self, obj, cache):
+        """
+        Returns True/False if the attribute of obj as stored in its index cache matches, None if the cache doesn't hold it
+        Args:
+            obj (GangaObject): The object being matched
+            cache (dict): The index cache of obj
+        """
+        component_name = self._getItem(obj)[1]
+        key = 'select:' + self.attr
+        if component_name is not None:
+            if key not in cache:
+                return None
+            return cache[key] == component_name
+        if self.attr in cache:
+            return self._matchValue(cache[self.attr])
+        if key in cache:
+            return self._matchValue(cache[key])
+        return None
+
+
 class RegistrySlice(object):
 
     def __init__(self, name, display_prefix):
@@ -188,7 +280,7 @@ class RegistrySlice(object):
 
         ids = None
 
-        if isinstance(minid, collections.Container):
+        if isinstance(minid, collections.abc.Container):
             ids = minid
             select = select_by_list
         else:
@@ -198,92 +290,99 @@ class RegistrySlice(object):
                 maxid = sys.maxsize
             select = select_by_range
 
-        for this_id in self.objects.keys():
-            obj = self.objects[this_id]
-            logger.debug("id, obj: %s, %s" % (this_id, obj))
-            if select(int(this_id)):
-                logger.debug("Selected: %s" % this_id)
-                selected = True
-                if self.name == 'box':
-                    name_str = obj._getRegistry()._getName(obj)
-                else:
-                    name_str = ''
-                for a in attrs:
-                    if self.name == 'box':
-                        attrvalue = attrs[a]
-                        if a == 'name':
-                            if not fnmatch.fnmatch(name_str, attrvalue):
-                                selected = False
-                                break
-                        elif a == 'application':
-                            if hasattr(obj, 'application'):
-                                if not getName(obj.application) == attrvalue:
-                                    selected = False
-                                    break
-                            else:
-                                selected = False
-                                break
-                        elif a == 'type':
-                            if not getName(obj) == attrvalue:
-                                selected = False
-                                break
-                        else:
-                            from GangaCore.GPIDev.Base import GangaAttributeError
-                            raise GangaAttributeError(
-                                'undefined select attribute: %s' % a)
-                    else:
+        # Objects which the repository knows can't match are skipped without being looked at
+        candidates = self._select_candidates(attrs)
 
-                        if a == 'ids':
-                            if int(this_id) not in attrs['ids']:
-                                selected = False
-                                break
-                        else:
-                            try:
-                                item = obj._schema.getItem(a)
-                                logger.debug("Here: %s, is item: %s" % (a, type(item)))
-                            except KeyError as err:
-                                from GangaCore.GPIDev.Base import GangaAttributeError
-                                logger.debug("KeyError getting item: '%s' from schema" % a)
-                                raise GangaAttributeError('undefined select attribute: %s' % a)
-                            else:
-                                attrvalue = attrs[a]
-
-                                if item.isA(ComponentItem):
-                                    ## TODO we need to distinguish between passing a Class type and a defined class instance
-                                    ## If we passed a class type to select it should look only for classes which are of this type
-                                    ## If we pass a class instance a compartison of the internal attributes should be performed
-                                    from GangaCore.GPIDev.Base.Filters import allComponentFilters
-
-                                    cfilter = allComponentFilters[item['category']]
-                                    filtered_value = cfilter(attrs[a], item)
-                                    from GangaCore.GPIDev.Base.Proxy import getName
-                                    if not filtered_value is None:
-                                        attrvalue = getName(filtered_value)
-                                    else:
-                                        attrvalue = getName(attrvalue)
-
-                                    if getName(getattr(obj, a)) != attrvalue:
-                                        selected = False
-                                        break
-                                else:
-                                    if isinstance(attrvalue, str):
-                                        regex = fnmatch.translate(attrvalue)
-                                        reobj = re.compile(regex)
-                                        # Compare the type of the attribute
-                                        # against attrvalue
-                                        if not reobj.match(str(getattr(obj, a))):
-                                            selected = False
-                                    else:
-                                        if getattr(obj, a) != attrvalue:
-                                            selected = False
-                                            break
-                if selected:
-                    logger.debug("Actually Selected")
+        if self.name == 'box':
+            for this_id in self.objects.keys():
+                if candidates is not None and this_id not in candidates:
+                    continue
+                obj = self.objects[this_id]
+                if select(int(this_id)) and self._select_box(obj, attrs):
                     callback(this_id, obj)
+            return
+
+        # Compile the attributes once, the objects which aren't loaded are matched against their index cache
+        terms = [_SelectTerm(a, attrvalue) for a, attrvalue in attrs.items() if a != 'ids']
+        select_ids = attrs.get('ids')
+        from GangaCore.Core.GangaRepository.Registry import Registry
+        if isinstance(self.objects, Registry):
+            objects = self.objects.items()
+            loaded = self.objects.repository.loaded_ids()
+        else:
+            objects = [(this_id, self.objects[this_id]) for this_id in self.objects.keys()]
+            loaded = None
+
+        for this_id, obj in objects:
+            if candidates is not None and this_id not in candidates:
+                continue
+            if not select(int(this_id)):
+                continue
+            if select_ids is not None and int(this_id) not in select_ids:
+                continue
+            # The index cache of an object is only its state on disk while it isn't loaded
+            cache = getattr(obj, '_index_cache_dict', None) if loaded is not None and this_id not in loaded else None
+            for term in terms:
+                matched = term.matchCache(obj, cache) if cache else None
+                if matched is None:
+                    matched = term.matchObject(obj)
+                if not matched:
+                    break
+            else:
+                callback(this_id, obj)
+
+    @staticmethod
+    def _select_box(obj, attrs):
+        """
+        Returns True/False if an object of the box matches the attributes of a select
+        Args:
+            obj (GangaObject): The object in the box
+            attrs (dict): The attributes to select on as prepared by do_select
+        """
+        name_str = obj._getRegistry()._getName(obj)
+        for a in attrs:
+            attrvalue = attrs[a]
+            if a == 'name':
+                if not fnmatch.fnmatch(name_str, attrvalue):
+                    return False
+            elif a == 'application':
+                if hasattr(obj, 'application'):
+                    if not getName(obj.application) == attrvalue:
+                        return False
                 else:
-                    logger.debug("NOT Actually Selected")
+                    return False
+            elif a == 'type':
+                if not getName(obj) == attrvalue:
+                    return False
             else:
-                logger.debug("NOT Selected: %s" % this_id)
+                from GangaCore.GPIDev.Base import GangaAttributeError
+                raise GangaAttributeError(
+                    'undefined select attribute: %s' % a)
+        return True
+
+    def _select_candidates(self, attrs):
+        """
+        Returns the ids of the objects which may match attrs according to the repository of the registry being sliced,
+        None if every object has to be checked
+        Args:
+            attrs (dict): The attributes to select on as prepared by do_select
+        """
+        from GangaCore.Core.GangaRepository.Registry import Registry
+        from GangaCore.GPIDev.Base.Objects import GangaObject
+        if self.name == 'box' or not attrs or not isinstance(self.objects, Registry):
+            return None
+        repository = getattr(self.objects, 'repository', None)
+        if repository is None:
+            return None
+        query = {}
+        for a, attrvalue in attrs.items():
+            if isinstance(stripProxy(attrvalue), GangaObject):
+                query[a] = (getName(attrvalue), False)
+            elif isinstance(attrvalue, str):
+                query[a] = (attrvalue, True)
+        if not query:
+            return None
+        return repository.select_ids(query)
 
     def copy(self, keep_going):
         this_slice = self.__class__("copy of %s" % self.name)
@@ -389,6 +488,67 @@ class RegistrySlice(object):
 
         raise RegistryAccessError('Expected int or string (job name).')
 
+    def values(self, *attrs):
+        """
+        Returns a list with a tuple of the values of attrs for each object of the slice, in the order of their ids.
+        The attribute of a component is named with '.', e.g. 'backend.id', and is None if the component is None.
+        The objects which aren't loaded are read from their index cache when it holds the attribute, so reading e.g. the
+        status of every job, or the backend.id of every subjob, doesn't load them. Incomplete objects are skipped
+        Args:
+            attrs (str): The names of the attributes
+        """
+        from GangaCore.Core.GangaRepository.Registry import Registry
+        paths = [attr.split('.') for attr in attrs]
+        if isinstance(self.objects, Registry):
+            loaded = self.objects.repository.loaded_ids()
+        else:
+            loaded = None
+        # The subjobs of a job on disk are only loaded once they're accessed
+        subjob_list = self.objects if hasattr(self.objects, 'getCachedData') else None
+
+        returnable = []
+        for this_id in self.objects.keys():
+            obj = None
+            cache = None
+            if subjob_list is not None and not subjob_list.isLoaded(this_id):
+                cache = subjob_list.getCachedData(this_id)
+            else:
+                obj = self.objects[this_id]
+                if isinstance(obj, IncompleteObject):
+                    continue
+                if loaded is not None and this_id not in loaded:
+                    cache = getattr(obj, '_index_cache_dict', None)
+            row = []
+            for attr, path in zip(attrs, paths):
+                if cache and attr in cache:
+                    row.append(cache[attr])
+                    continue
+                if obj is None:
+                    obj = self.objects[this_id]
+                row.append(self._getValue(obj, path))
+            returnable.append(tuple(row))
+        return returnable
+
+    @staticmethod
+    def _getValue(obj, path):
+        """
+        Returns the value of an attribute of obj, or of one of its components
+        Args:
+            obj (GangaObject): The object to read
+            path (list): The names of the components and of the attribute, e.g. ['backend', 'id']
+        """
+        val = obj
+        for name in path:
+            if val is None:
+                return None
+            try:
+                val = getattr(val, name)
+            except AttributeError as err:
+                from GangaCore.GPIDev.Base import GangaAttributeError
+                logger.debug("_getValue AttributeError: %s" % err)
+                raise GangaAttributeError('undefined attribute: %s' % '.'.join(path))
+        return val
+
     @staticmethod
     def _getatr(obj, members):
         val = getattr(obj, members[0])
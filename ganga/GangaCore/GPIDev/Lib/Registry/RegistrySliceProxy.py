@@ -20,6 +20,14 @@ class RegistrySliceProxy(object):
         Returns True on success, False on failure"""
         return stripProxy(self).clean(confirm, force)
 
+    def values(self, *attrs):
+        """ Return a list with a tuple of the values of the given attributes for each object,
+        without wrapping the objects themselves. Example:
+        for status, backend_id in jobs.values('status', 'backend.id'):
+          print(status, backend_id)
+        """
+        return [addProxy(row) for row in stripProxy(self).values(*attrs)]
+
     def incomplete_ids(self):
         try:
             return stripProxy(self).objects._incomplete_objects
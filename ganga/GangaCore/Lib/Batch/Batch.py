@@ -3,6 +3,7 @@ import time
 import os
 import re
 import os.path
+from shlex import quote
 
 import GangaCore.Utility.logging
 import GangaCore.Utility.Config
@@ -11,7 +12,8 @@ import GangaCore.Utility.Virtualization
 from GangaCore.GPIDev.Adapters.IBackend import IBackend
 from GangaCore.GPIDev.Base.Proxy import isType, getName, stripProxy
 from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem
-from GangaCore.Core.exceptions import BackendError
+from GangaCore.Core.exceptions import BackendError, IncompleteJobSubmissionError
+from GangaCore.Core.GangaThread.WorkerThreads.TaskBatch import StageTimer
 
 logger = GangaCore.Utility.logging.getLogger()
 
@@ -89,6 +91,13 @@ class Batch(IBackend):
 
     Kill job if it has exceeded the deadline (i.e. for your presentation)
     backend.extraopts = '-t 07:14:12:59' #Killed if not finished by 14 July before 1 pm
+
+    Job arrays:
+    The subjobs of a split job are submitted to LSF, PBS and Slurm as job arrays
+    of at most [backend]array_max_size subjobs, with one submit command for each
+    array. Each subjob keeps the id of its element of the array. Setting
+    [backend]array_opt to '' submits the subjobs one by one instead, as does
+    giving the array option of the batch system in extraopts.
     """
     _schema = Schema(Version(1, 0), {'queue': SimpleItem(defvalue='', doc='queue name as defomed in your local Batch installation'),
                                      'extraopts': SimpleItem(defvalue='', doc='extra options for Batch. See help(Batch) for more details'),
@@ -96,7 +105,8 @@ class Batch(IBackend):
                                      'exitcode': SimpleItem(defvalue=None, typelist=[int, None], protected=1, copyable=0, doc='Process exit code'),
                                      'status': SimpleItem(defvalue='', protected=1, hidden=1, copyable=0, doc='Batch status of the job'),
                                      'actualqueue': SimpleItem(defvalue='', protected=1, copyable=0, doc='queue name where the job was submitted.'),
-                                     'actualCE': SimpleItem(defvalue='', protected=1, copyable=0, doc='hostname where the job is/was running.')
+                                     'actualCE': SimpleItem(defvalue='', protected=1, copyable=0, doc='hostname where the job is/was running.'),
+                                     'array_index': SimpleItem(defvalue=None, typelist=[int, None], protected=1, hidden=1, copyable=0, doc='Index of the job in the job array it was submitted in')
                                      })
     _category = 'backends'
     _name = 'Batch'
@@ -119,24 +129,13 @@ class Batch(IBackend):
 
     command = classmethod(command)
 
-    def submit(self, jobconfig, master_input_sandbox):
-
-        job = self.getJobObject()
-
-        inw = job.getInputWorkspace()
-        outw = job.getOutputWorkspace()
-
-        #scriptpath = self.preparejob(jobconfig,inw,outw)
-        scriptpath = self.preparejob(jobconfig, master_input_sandbox)
-
-        # FIX from Angelo Carbone
-        # stderr_option = '-e '+str(outw.getPath())+'stderr'
-        # stdout_option = '-o '+str(outw.getPath())+'stdout'
-
-        # FIX from Alex Richards - see Savannah #87477
-        stdout_option = self.config['stdoutConfig'] % str(outw.getPath())
-        stderr_option = self.config['stderrConfig'] % str(outw.getPath())
-
+    def _getSubmitOptions(self, job, jobname=True):
+        """
+        Returns the queue, extra and job name options of the submit command, or None if extraopts has a forbidden option
+        Args:
+            job (Job): The job being submitted
+            jobname (bool): Whether to name the job with the jobnameopt option
+        """
         queue_option = ''
         if self.queue:
             if isType(self, Slurm):
@@ -144,25 +143,26 @@ class Batch(IBackend):
             else:
                 queue_option = '-q ' + str(self.queue)
 
-        try:
-            jobnameopt = "-" + self.config['jobnameopt']
-        except Exception as err:
-            logger.debug("Unknown error: %s" % str(err))
-            jobnameopt = False
+        jobnameopt = False
+        if jobname:
+            try:
+                jobnameopt = "-" + self.config['jobnameopt']
+            except Exception as err:
+                logger.debug("Unknown error: %s" % str(err))
 
         if self.extraopts:
             for opt in re.compile(r'(-\w+)').findall(self.extraopts):
                 if opt in ('-o', '-e', '-oo', '-eo'):
                     logger.warning("option %s is forbidden", opt)
-                    return False
+                    return None
                 if self.queue:
                     if isType(self, Slurm):
                         if opt == '-p':
                             logger.warning("option %s is forbidden if partition is defined ( partition = '%s')", opt, self.queue)
-                            return False
+                            return None
                     elif opt == '-q':
                         logger.warning("option %s is forbidden if queue is defined ( queue = '%s')", opt, self.queue)
-                        return False
+                        return None
                 if jobnameopt and opt == jobnameopt:
                     jobnameopt = False
 
@@ -176,35 +176,79 @@ class Batch(IBackend):
             queue_option = queue_option + " " + \
                 jobnameopt + " " + "'%s'" % (tmp_name)
 
+        return queue_option
+
+    def _getScriptCommand(self, scriptpath):
+        """
+        Returns the command running the job script
+        Args:
+            scriptpath (str): The path of the job script
+        """
         # bugfix #16646
         if self.config['shared_python_executable']:
             import sys
-            script_cmd = "%s %s" % (sys.executable, scriptpath)
-        else:
-            script_cmd = scriptpath
+            return "%s %s" % (sys.executable, scriptpath)
+        return scriptpath
+
+    def _matchSubmitOutput(self, sout, pattern):
+        """
+        Returns the batch id in the output of the submit command, or None if it isn't there. The queue the job was
+        submitted to is kept in actualqueue
+        Args:
+            sout (str): The output of the submit command
+            pattern (str): The pattern matching the id and the queue in the output
+        """
+        m = re.compile(pattern, re.M).search(sout)
+        if m is None:
+            logger.warning('could not match the output and extract the Batch job identifier!')
+            logger.warning('command output \n %s ', sout)
+            return None
+        try:
+            queue = m.group('queue')
+            if self.queue != queue:
+                if self.queue:
+                    logger.warning('you requested queue "%s" but the job was submitted to queue "%s"', self.queue, queue)
+                    logger.warning('command output \n %s ', sout)
+                else:
+                    logger.info('using default queue "%s"', queue)
+                self.actualqueue = queue
+        except IndexError:
+            logger.info('could not match the output and extract the Batch queue name')
+        return m.group('id')
+
+    def submit(self, jobconfig, master_input_sandbox):
+
+        job = self.getJobObject()
+
+        inw = job.getInputWorkspace()
+        outw = job.getOutputWorkspace()
+
+        #scriptpath = self.preparejob(jobconfig,inw,outw)
+        scriptpath = self.preparejob(jobconfig, master_input_sandbox)
+
+        # FIX from Angelo Carbone
+        # stderr_option = '-e '+str(outw.getPath())+'stderr'
+        # stdout_option = '-o '+str(outw.getPath())+'stdout'
+
+        # FIX from Alex Richards - see Savannah #87477
+        stdout_option = self.config['stdoutConfig'] % str(outw.getPath())
+        stderr_option = self.config['stderrConfig'] % str(outw.getPath())
+
+        queue_option = self._getSubmitOptions(job)
+        if queue_option is None:
+            return False
+
+        script_cmd = self._getScriptCommand(scriptpath)
 
         command_str = self.config['submit_str'] % (inw.getPath(), queue_option, stderr_option, stdout_option, script_cmd)
         self.command_string = command_str
         rc, soutfile = self.command(command_str)
         with open(soutfile) as sout_file:
             sout = sout_file.read()
-        m = re.compile(self.config['submit_res_pattern'], re.M).search(sout)
-        if m is None:
-            logger.warning('could not match the output and extract the Batch job identifier!')
-            logger.warning('command output \n %s ', sout)
-        else:
-            self.id = m.group('id')
-            try:
-                queue = m.group('queue')
-                if self.queue != queue:
-                    if self.queue:
-                        logger.warning('you requested queue "%s" but the job was submitted to queue "%s"', self.queue, queue)
-                        logger.warning('command output \n %s ', sout)
-                    else:
-                        logger.info('using default queue "%s"', queue)
-                    self.actualqueue = queue
-            except IndexError:
-                logger.info('could not match the output and extract the Batch queue name')
+        batch_id = self._matchSubmitOutput(sout, self.config['submit_res_pattern'])
+        if batch_id is not None:
+            self.id = batch_id
+            self.array_index = None
 
         # clean up the tmp file
         if os.path.exists(soutfile):
@@ -212,6 +256,147 @@ class Batch(IBackend):
 
         return rc == 0
 
+    def _canSubmitArray(self):
+        """
+        Whether the subjobs can be submitted as job arrays. They can't if the batch system has no array option or if the
+        option is given in extraopts
+        """
+        array_opt = self.config['array_opt']
+        if not array_opt:
+            return False
+        if self.extraopts:
+            flag = re.split(r'[\s=]', array_opt, 1)[0]
+            if flag in re.compile(r'(--?\w+)').findall(self.extraopts):
+                logger.info("option %s is in extraopts, the subjobs are submitted one by one", flag)
+                return False
+        return True
+
+    def _writeArrayScript(self, rjobs, scriptpaths, number):
+        """
+        Write the script run by each element of a job array, which runs the job script of the subjob with the index of
+        the element. Returns the path of the script
+        Args:
+            rjobs (list): The subjobs in the order of their index in the array
+            scriptpaths (list): The paths of the job scripts of the subjobs
+            number (int): The number of the array among the arrays submitted for the job
+        """
+        from GangaCore.GPIDev.Lib.File import FileBuffer
+
+        index_name = self.config['array_index_name']
+        lines = ['#!/bin/sh', 'case "$%s" in' % index_name]
+        for index, (sj, scriptpath) in enumerate(zip(rjobs, scriptpaths), 1):
+            outw = sj.getOutputWorkspace().getPath()
+            lines.append('%d) cd %s && exec %s > %s 2> %s ;;' % (index, quote(sj.getInputWorkspace().getPath()),
+                                                                self._getScriptCommand(quote(scriptpath)),
+                                                                quote(os.path.join(outw, 'stdout')),
+                                                                quote(os.path.join(outw, 'stderr'))))
+        lines.append('esac')
+        lines.append('echo "No subjob has index $%s in this job array" >&2' % index_name)
+        lines.append('exit 1')
+
+        return self.getJobObject().getInputWorkspace().writefile(FileBuffer('__jobarray_%d__' % number, '\n'.join(lines) + '\n'), executable=1)
+
+    def _submitArray(self, rjobs, subjobconfigs, master_input_sandbox, queue_option, number):
+        """
+        Submit subjobs as one job array. Each subjob gets the id of its element of the array. Returns True if the array
+        was submitted, otherwise the subjobs are left as new
+        Args:
+            rjobs (list): The subjobs to submit
+            subjobconfigs (list): The configs of the subjobs
+            master_input_sandbox (list): The files of the master input sandbox
+            queue_option (str): The queue, extra and job name options of the submit command
+            number (int): The number of the array among the arrays submitted for the job
+        """
+        job = self.getJobObject()
+
+        for sj in rjobs:
+            sj.updateStatus('submitting')
+
+        rc, soutfile = 1, None
+        try:
+            scriptpaths = [stripProxy(sj.backend).preparejob(sc, master_input_sandbox) for sc, sj in zip(subjobconfigs, rjobs)]
+            scriptpath = self._writeArrayScript(rjobs, scriptpaths, number)
+
+            inw = job.getInputWorkspace()
+            outw = job.getOutputWorkspace()
+            name = re.sub(r'\W', '_', job.name) or 'ganga_%s' % job.getFQID('_')
+            array_option = self.config['array_opt'] % {'name': name, 'size': len(rjobs)}
+            stdout_option = self.config['array_stdoutConfig'] % quote(outw.getPath())
+            stderr_option = self.config['array_stderrConfig'] % quote(outw.getPath())
+
+            command_str = self.config['submit_str'] % (quote(inw.getPath()), queue_option + " " + array_option,
+                                                       stderr_option, stdout_option, quote(scriptpath))
+            self.command_string = command_str
+            rc, soutfile = self.command(command_str)
+            with open(soutfile) as sout_file:
+                sout = sout_file.read()
+        except Exception as err:
+            logger.error("Failed to submit the job array of job %s: %s", job.getFQID('.'), err)
+            for sj in rjobs:
+                sj.updateStatus('new')
+            return False
+        finally:
+            # clean up the tmp file
+            if soutfile and os.path.exists(soutfile):
+                os.remove(soutfile)
+
+        array_id = None
+        if rc == 0:
+            array_id = self._matchSubmitOutput(sout, self.config['array_res_pattern'])
+        else:
+            logger.warning(sout)
+        if array_id is None:
+            for sj in rjobs:
+                sj.updateStatus('new')
+            return False
+
+        for index, sj in enumerate(rjobs, 1):
+            b = stripProxy(sj.backend)
+            b.id = self.config['array_id_str'] % {'id': array_id, 'index': index}
+            b.array_index = index
+            b.actualqueue = self.actualqueue
+            sj.updateStatus('submitted')
+            stripProxy(sj.info).increment()
+        return True
+
+    def master_submit(self, rjobs, subjobconfigs, masterjobconfig, keep_going=False, parallel_submit=False):
+        """
+        Submit the subjobs of a split job as job arrays of at most [backend]array_max_size subjobs, with one submit
+        command for each array rather than one for each subjob. A job which isn't split, or a backend or options which
+        can't submit arrays, are submitted one by one by IBackend.master_submit
+        """
+        if len(rjobs) < 2 or not self._canSubmitArray():
+            return super(Batch, self).master_submit(rjobs, subjobconfigs, masterjobconfig, keep_going, parallel_submit)
+
+        job = self.getJobObject()
+        timer = getattr(job, '_submit_timer', None) or StageTimer()
+
+        with timer.stage('sandbox'):
+            master_input_sandbox = self.master_prepare(masterjobconfig)
+
+        # the name of the array is given with the array option if it has one
+        queue_option = self._getSubmitOptions(job, jobname='%(name)s' not in self.config['array_opt'])
+        if queue_option is None:
+            raise IncompleteJobSubmissionError([sj.getFQID('.') for sj in rjobs], 'submission failed')
+
+        max_size = max(self.config['array_max_size'], 1)
+        incomplete_subjobs = []
+        for number, first in enumerate(range(0, len(rjobs), max_size)):
+            array_jobs = rjobs[first:first + max_size]
+            logger.info("submitting subjobs %s to %s of job %s to %s backend as a job array", array_jobs[0].id,
+                        array_jobs[-1].id, job.getFQID('.'), getName(self))
+            with timer.stage('submit'):
+                submitted = self._submitArray(array_jobs, subjobconfigs[first:first + max_size], master_input_sandbox,
+                                              queue_option, number)
+            if not submitted:
+                incomplete_subjobs.extend(sj.getFQID('.') for sj in array_jobs)
+                if not keep_going:
+                    break
+
+        if incomplete_subjobs:
+            raise IncompleteJobSubmissionError(incomplete_subjobs, 'submission failed for subjobs %s' % incomplete_subjobs)
+        return 1
+
     def resubmit(self):
 
         job = self.getJobObject()
@@ -234,51 +419,11 @@ class Batch(IBackend):
         stdout_option = self.config['stdoutConfig'] % str(outw.getPath())
         stderr_option = self.config['stderrConfig'] % str(outw.getPath())
 
-        queue_option = ''
-        if self.queue:
-            if isType(self, Slurm):
-                queue_option = '-p ' + str(self.queue)
-            else:
-                queue_option = '-q ' + str(self.queue)
-
-        try:
-            jobnameopt = "-" + self.config['jobnameopt']
-        except Exception as err:
-            logger.debug("Err: %s" % str(err))
-            jobnameopt = False
-
-        if self.extraopts:
-            for opt in re.compile(r'(-\w+)').findall(self.extraopts):
-                if opt in ('-o', '-e', '-oo', '-eo'):
-                    logger.warning("option %s is forbidden", opt)
-                    return False
-                if self.queue:
-                    if isType(self, Slurm):
-                        if opt == '-p':
-                            logger.warning("option %s is forbidden if partition is defined ( partition = '%s')", opt, self.queue)
-                            return False
-                    elif opt == '-q':
-                        logger.warning("option %s is forbidden if queue is defined ( queue = '%s')", opt, self.queue)
-                        return False
-                if jobnameopt and opt == jobnameopt:
-                    jobnameopt = False
-
-            queue_option = queue_option + " " + self.extraopts
-
-        if jobnameopt and job.name != '':
-            # PBS doesn't like names with spaces
-            tmp_name = job.name
-            if isType(self, PBS):
-                tmp_name = tmp_name.replace(" ", "_")
-            queue_option = queue_option + " " + \
-                jobnameopt + " " + "'%s'" % (tmp_name)
+        queue_option = self._getSubmitOptions(job)
+        if queue_option is None:
+            return False
 
-        # bugfix #16646
-        if self.config['shared_python_executable']:
-            import sys
-            script_cmd = "%s %s" % (sys.executable, scriptpath)
-        else:
-            script_cmd = scriptpath
+        script_cmd = self._getScriptCommand(scriptpath)
 
         command_str = self.config['submit_str'] % (
             inw.getPath(), queue_option, stderr_option, stdout_option, script_cmd)
@@ -288,25 +433,11 @@ class Batch(IBackend):
         if rc == 0:
             with open(soutfile) as sout_file:
                 sout = sout_file.read()
-            import re
-            m = re.compile(
-                self.config['submit_res_pattern'], re.M).search(sout)
-            if m is None:
-                logger.warning('could not match the output and extract the Batch job identifier!')
-                logger.warning('command output \n %s ', sout)
-            else:
-                self.id = m.group('id')
-                try:
-                    queue = m.group('queue')
-                    if self.queue != queue:
-                        if self.queue:
-                            logger.warning('you requested queue "%s" but the job was submitted to queue "%s"', self.queue, queue)
-                            logger.warning('command output \n %s ', sout)
-                        else:
-                            logger.info('using default queue "%s"', queue)
-                        self.actualqueue = queue
-                except IndexError:
-                    logger.info('could not match the output and extract the Batch queue name')
+            batch_id = self._matchSubmitOutput(sout, self.config['submit_res_pattern'])
+            if batch_id is not None:
+                # the job is resubmitted on its own, no longer in the job array
+                self.id = batch_id
+                self.array_index = None
         else:
             with open(soutfile) as sout_file:
                 logger.warning(sout_file.read())
@@ -318,7 +449,8 @@ class Batch(IBackend):
         return rc == 0
 
     def kill(self):
-        rc, soutfile = self.command(self.config['kill_str'] % (self.id))
+        # the id of an element of a job array has brackets in it
+        rc, soutfile = self.command(self.config['kill_str'] % quote(str(self.id)))
 
         with open(soutfile) as sout_file:
             sout = sout_file.read()
@@ -554,7 +686,8 @@ class Batch(IBackend):
                 if pid or queue:
                     j.updateStatus('running')
 
-                    if pid:
+                    # an element of a job array keeps its id so that it can still be killed on its own
+                    if pid and j.backend.array_index is None:
                         j.backend.id = pid
 
                     if queue and queue != j.backend.actualqueue:
@@ -18,6 +18,7 @@ import shutil
 import time
 import datetime
 import re
+from shlex import quote
 
 import GangaCore.Utility.logging
 import GangaCore.Utility.Virtualization
@@ -141,9 +142,9 @@ class Condor(IBackend):
 
         commandList = ["condor_submit -v"]
         if self.spool:
-            commandList.extend("-spool")
+            commandList.append("-spool")
         commandList.extend(self.submit_options)
-        commandList.append(cdfpath)
+        commandList.append(quote(cdfpath))
         commandString = " ".join(commandList)
 
         status, output = subprocess.getstatusoutput(commandString)
@@ -161,31 +162,29 @@ class Condor(IBackend):
             tmpList = output.split("\n")
             jobsDict = {}
             localID = 0
-            idString = ''
             for item in tmpList:
                 #Go through the lines until we find the local ID and add it to the dict
                 if 1 + item.find("** Proc"):
                     localID = item.strip(":").split()[2]
                     jobsDict[str(localID)] = {}
-                    idString += str(localID) + ' '
                     continue
                 #If we have found the local ID add the subsequent lines to the dict for that localID
                 if localID != 0 and ' = ' in item:
                     jobsDict[str(localID)][item.split(' = ')[0]] = item.split(' = ')[1]
 
-            #Get the global ids. This should come back as a big long string, ids separated by spaces
-            queryCommand = " ".join\
-                        (["condor_q -format \"%s \" GlobalJobId", idString])
-            qstatus, qoutput = subprocess.getstatusoutput(queryCommand)
-            queries = idString.rstrip().split(' ')
-            returns = qoutput.rstrip().split(' ')
-            localToGlobal = list(zip(queries, returns))
-            for q in localToGlobal:
-                sjIndex = jobsDict[q[0]]['Iwd'].split('/').index(str(self.getJobObject().id))
+            #Get the global ids of all the submitted jobs with one query. A job which has already left the queue keeps
+            #its local id, which the monitoring resolves later
+            clusters = set(localID.split('.')[0] for localID in jobsDict)
+            ads = Condor._queryJobs("condor_q", clusters) or {}
+            for localID in jobsDict:
+                sjIndex = jobsDict[localID]['Iwd'].split('/').index(str(self.getJobObject().id))
                 if hasSubjobs:
                     sjIndex = sjIndex+1
-                sjNo = jobsDict[q[0]]['Iwd'].split('/')[sjIndex]
-                returnIDs[sjNo] = q[1]
+                sjNo = jobsDict[localID]['Iwd'].split('/')[sjIndex]
+                if localID in ads:
+                    returnIDs[sjNo] = ads[localID]['GlobalJobId']
+                else:
+                    returnIDs[sjNo] = localID
 
         return returnIDs
 
@@ -251,7 +250,10 @@ class Condor(IBackend):
 
         # Resubmit job
         if os.path.exists(cdfpath):
-            status = self.submit_cdf(cdfpath)
+            stati = self.submit_cdf(cdfpath)
+            status = bool(stati)
+            if stati:
+                self.id = list(stati.values())[0]
         else:
             logger.warning\
                 ("No Condor Description File for job '%s' found in '%s'" %
@@ -511,11 +513,56 @@ class Condor(IBackend):
 
         return cdfString
 
+    _queryAttributes = ["ClusterId", "ProcId", "GlobalJobId", "JobStatus", "RemoteHost", "RemoteUserCpu"]
+
+    @staticmethod
+    def _localId(condorId):
+        """Return the cluster.proc id of a Condor job from its global or local id"""
+        idElementList = condorId.split("#")
+        if 3 == len(idElementList):
+            return idElementList[1]
+        return idElementList[0]
+
+    @staticmethod
+    def _queryJobs(command, clusters):
+        """Query the jobs of the given clusters with a single condor_q or condor_history call
+
+            Arguments other than self:
+               command - the query command, e.g. condor_q or condor_history
+               clusters - the Condor cluster ids of the jobs
+
+            Return value: dict of the ads of the jobs found, each keyed by both its
+                          global and its cluster.proc id, or None if the query failed"""
+
+        # The clusters must come before -af:t, every argument after it is taken as another attribute
+        queryCommand = " ".join([command] + sorted(clusters) + ["-af:t"] + Condor._queryAttributes)
+        status, output = subprocess.getstatusoutput(queryCommand)
+        if 0 != status:
+            logger.error("Problem retrieving status for Condor jobs with command: '%s'" % queryCommand)
+            logger.debug("Condor output: %s" % output)
+            return None
+
+        ads = {}
+        for line in output.split("\n"):
+            values = line.split("\t")
+            # Skip the schedd headers and messages such as 'All queues are empty'
+            if len(values) != len(Condor._queryAttributes) or not values[0].isdigit():
+                continue
+            ad = dict(zip(Condor._queryAttributes, values))
+            if ad["RemoteHost"] == "undefined":
+                ad["RemoteHost"] = ""
+            if ad["RemoteUserCpu"] == "undefined":
+                ad["RemoteUserCpu"] = ""
+            ads["%s.%s" % (ad["ClusterId"], ad["ProcId"])] = ad
+            ads[ad["GlobalJobId"]] = ad
+
+        return ads
+
     def updateMonitoringInformation(jobs):
 
         jobDict = {}
         for job in jobs:
-            if job.backend.id:
+            if job.backend.id and job.status != "killed":
                 jobDict[job.backend.id] = job
 
         idList = list(jobDict.keys())
@@ -523,39 +570,26 @@ class Condor(IBackend):
         if not idList:
             return
 
-        queryCommand = " ".join\
-            ([
-                "condor_q -global" if getConfig(
-                    "Condor")["query_global_queues"] else "condor_q",
-                "-format \"%s \" GlobalJobId",
-                "-format \"%s \" RemoteHost",
-                "-format \"%d \" JobStatus",
-                "-format \"%f\\n\" RemoteUserCpu"
-            ])
-        status, output = subprocess.getstatusoutput(queryCommand)
-        if 0 != status:
-            logger.error("Problem retrieving status for Condor jobs")
+        # A single condor_q for all the jobs, then a single condor_history for those which have left the queue
+        clusters = set(Condor._localId(id).split(".")[0] for id in idList)
+        queueAds = Condor._queryJobs("condor_q -global" if getConfig(
+            "Condor")["query_global_queues"] else "condor_q", clusters)
+        if queueAds is None:
             return
 
-        if ("All queues are empty" == output):
-            infoList = []
-        else:
-            infoList = output.split("\n")
-
-        allDict = {}
-        for infoString in infoList:
-            tmpList = infoString.split()
-            id, host, status, cputime = ("", "", "", "")
-            if 3 == len(tmpList):
-                if not 'Failure' in tmpList[0]:
-                    id, status, cputime = tmpList
-            if 4 == len(tmpList):
-                id, host, status, cputime = tmpList
-            if id:
-                allDict[id] = {}
-                allDict[id]["status"] = Condor.statusDict[status]
-                allDict[id]["cputime"] = cputime
-                allDict[id]["host"] = host
+        def findAd(ads, id):
+            """Return the ad of a job, matching a local id if the global id isn't known"""
+            if id in ads:
+                return ads[id]
+            if id == Condor._localId(id):
+                return ads.get(id)
+            return None
+
+        historyAds = {}
+        leftQueue = [id for id in idList if findAd(queueAds, id) is None]
+        if leftQueue:
+            historyAds = Condor._queryJobs("condor_history",
+                                           set(Condor._localId(id).split(".")[0] for id in leftQueue)) or {}
 
         fg = Foreground()
         fx = Effects()
@@ -566,53 +600,57 @@ class Condor(IBackend):
         for id in idList:
 
             printStatus = False
-            if jobDict[id].status == "killed":
-                continue
-
-            localId = id.split("#")[-1]
-            globalId = id
-
-            if globalId == localId:
-                queryCommand = " ".join\
-                    ([
-                        "condor_q -global" if getConfig(
-                            "Condor")["query_global_queues"] else "condor_q",
-                        "-format \"%s\" GlobalJobId",
-                        id
-                    ])
-                status, output = subprocess.getstatusoutput(queryCommand)
-                if 0 == status:
-                    globalId = output
-
-            if globalId in allDict.keys():
-                status = allDict[globalId]["status"]
-                host = allDict[globalId]["host"]
-                cputime = allDict[globalId]["cputime"]
-                if status != jobDict[id].backend.status:
+            job = jobDict[id]
+
+            inQueue = True
+            ad = findAd(queueAds, id)
+            if ad is None:
+                inQueue = False
+                ad = findAd(historyAds, id)
+
+            if ad is not None and ad["GlobalJobId"] != id:
+                # The job kept its local id at submission, store the global one now it is known
+                stripProxy(job)._getSessionLock()
+                job.backend.id = ad["GlobalJobId"]
+
+            if inQueue:
+                status = Condor.statusDict.get(ad["JobStatus"], "")
+                host = ad["RemoteHost"]
+                cputime = ad["RemoteUserCpu"]
+                if status != job.backend.status:
                     printStatus = True
-                    stripProxy(jobDict[id])._getSessionLock()
-                    jobDict[id].backend.status = status
-                    if jobDict[id].backend.status == "Running":
-                        jobDict[id].updateStatus("running")
+                    stripProxy(job)._getSessionLock()
+                    job.backend.status = status
+                    if job.backend.status == "Running":
+                        job.updateStatus("running")
 
                 if host:
-                    if jobDict[id].backend.actualCE != host:
-                        jobDict[id].backend.actualCE = host
-                jobDict[id].backend.cputime = cputime
+                    if job.backend.actualCE != host:
+                        job.backend.actualCE = host
+                job.backend.cputime = cputime
             else:
-                jobDict[id].backend.status = ""
-                outDir = jobDict[id].getOutputWorkspace().getPath()
-                condorLogPath = "".join([outDir, "condorLog"])
-                checkExit = True
-                if os.path.isfile(condorLogPath):
-                    checkExit = False
-                    for line in open(condorLogPath):
-                        if -1 != line.find("terminated"):
-                            checkExit = True
-                            break
-                        if -1 != line.find("aborted"):
-                            checkExit = True
-                            break
+                outDir = job.getOutputWorkspace().getPath()
+                if ad is not None:
+                    # The job is in the history so it has terminated or been removed
+                    job.backend.status = Condor.statusDict.get(ad["JobStatus"], "")
+                    if ad["RemoteHost"]:
+                        job.backend.actualCE = ad["RemoteHost"]
+                    if ad["RemoteUserCpu"]:
+                        job.backend.cputime = ad["RemoteUserCpu"]
+                    checkExit = True
+                else:
+                    job.backend.status = ""
+                    condorLogPath = "".join([outDir, "condorLog"])
+                    checkExit = True
+                    if os.path.isfile(condorLogPath):
+                        checkExit = False
+                        for line in open(condorLogPath):
+                            if -1 != line.find("terminated"):
+                                checkExit = True
+                                break
+                            if -1 != line.find("aborted"):
+                                checkExit = True
+                                break
 
                 if checkExit:
                     printStatus = True
@@ -633,26 +671,26 @@ class Condor(IBackend):
                             # Some filesystems/setups have the file created but empty - only worry if it's been 10mins
                             # since we first checked the file
                             if len(lineList) == 0:
-                                if not jobDict[id].backend._stdout_check_time:
-                                    jobDict[id].backend._stdout_check_time = time.time()
+                                if not job.backend._stdout_check_time:
+                                    job.backend._stdout_check_time = time.time()
 
-                                if (time.time() - jobDict[id].backend._stdout_check_time) < 10*60:
+                                if (time.time() - job.backend._stdout_check_time) < 10*60:
                                     continue
                                 else:
                                     logger.error("Empty stdout file from job %s after waiting 10mins. Marking job as"
-                                                 "failed." % jobDict[id].fqid)
+                                                 "failed." % job.fqid)
                             else:
                                 logger.error("Problem extracting exit code from job %s. Line found was '%s'." % (
-                                    jobDict[id].fqid, exitLine))
+                                    job.fqid, exitLine))
 
-                    jobDict[id].updateStatus(jobStatus)
+                    job.updateStatus(jobStatus)
 
             if printStatus:
-                if jobDict[id].backend.actualCE:
-                    hostInfo = jobDict[id].backend.actualCE
+                if job.backend.actualCE:
+                    hostInfo = job.backend.actualCE
                 else:
                     hostInfo = "Condor"
-                status = jobDict[id].status
+                status = job.status
                 if status in status_colours:
                     colour = status_colours[status]
                 else:
@@ -662,15 +700,14 @@ class Condor(IBackend):
                 else:
                     preposition = "on"
 
-                if jobDict[id].backend.status:
+                if job.backend.status:
                     backendStatus = "".join\
-                        ([" (", jobDict[id].backend.status, ") "])
+                        ([" (", job.backend.status, ") "])
                 else:
                     backendStatus = ""
 
                 logger.info(colour + 'Job %s %s%s %s %s - %s' + fx.normal,
-                            jobDict[
-                                id].fqid, status, backendStatus, preposition, hostInfo,
+                            job.fqid, status, backendStatus, preposition, hostInfo,
                             time.strftime('%c'))
 
         return None
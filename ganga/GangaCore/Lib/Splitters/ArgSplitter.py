@@ -4,7 +4,6 @@
 # $Id: ArgSplitter.py,v 1.1 2008-07-17 16:40:59 moscicki Exp $
 ###############################################################################
 
-import copy
 from GangaCore.Core.exceptions import SplitterError
 from GangaCore.GPIDev.Adapters.ISplitter import ISplitter
 from GangaCore.GPIDev.Base.Proxy import stripProxy
@@ -56,17 +55,16 @@ class ArgSplitter(ISplitter):
         subjobs = []
 
         for arg in self.args:
-            j = self.createSubjob(job,['application'])
-            # Add new arguments to subjob
-            app = copy.deepcopy(job.application)
+            j = self.createSubjob(job)
+            # Add new arguments to the subjob's own copy of the application
+            app = j.application
             if hasattr(app, 'args'):
                 app.args = arg
             elif hasattr(app, 'extraArgs'):
                 app.extraArgs = arg
             else:
                 raise SplitterError('Application has neither args or extraArgs in its schema') 
-                    
-            j.application = app
+
             logger.debug('Arguments for split job is: ' + str(arg))
             subjobs.append(stripProxy(j))
 
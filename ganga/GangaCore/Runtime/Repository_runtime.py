@@ -133,7 +133,8 @@ def bootstrap():
         logger.debug("Registry: %s" % registry.name)
         logger.debug("Loc: %s" % registry.location)
         registry.startup()
-        logger.debug("started " + registry.info(full=False))
+        # registry.info() would wait for every object to be created from the index
+        logger.debug("started registry '%s'" % registry.name)
 
         started_registries.append(registry.name)
         proxied_registry_slice = registry.getProxy()
@@ -15,7 +15,9 @@ def setupGanga(argv=sys.argv, interactive=True):
     GangaCore.Runtime._prog = GangaProgram(argv=argv)
     GangaCore.Runtime._prog.parseOptions()
     GangaCore.Runtime._prog.configure()
+    GangaCore.Runtime._prog.markStartup('configuration')
     GangaCore.Runtime._prog.initEnvironment()
+    GangaCore.Runtime._prog.markStartup('environment')
     GangaCore.Runtime._prog.bootstrap(GangaCore.Runtime._prog.interactive)
     GangaCore.Runtime._prog.new_user_wizard(interactive)
 
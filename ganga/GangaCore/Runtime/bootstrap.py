@@ -212,6 +212,8 @@ class GangaProgram(object):
         # record the start time.Currently we are using this in performance measurements
         # see Ganga/old_test/Performance tests
         self.start_time = time.time()
+        # (phase, seconds since start_time) for each phase of startup, see --startup-profile
+        self.startup_times = []
 
         versionString = _gangaVersion
         if _development:
@@ -252,6 +254,33 @@ under certain conditions; type license() for details.
             logger.error(m)
         sys.exit(1)
 
+    def markStartup(self, phase):
+        """
+        Record that a phase of startup has finished, these are printed with --startup-profile
+        Args:
+            phase (str): Short description of the phase
+        """
+        self.startup_times.append((phase, time.time() - self.start_time))
+
+    def printStartupProfile(self):
+        """
+        Print the time taken by each phase of startup and the total time until the prompt (or script) is reached.
+        The last line is meant to be parsed when tracking the startup time.
+        """
+        from GangaCore.Core.GangaRepository import getRegistries
+        lines = ['Ganga startup profile:', '  %-30s %10s %10s' % ('phase', 'took (s)', 'total (s)')]
+        previous = 0.
+        for phase, elapsed in self.startup_times:
+            lines.append('  %-30s %10.3f %10.3f' % (phase, elapsed - previous, elapsed))
+            previous = elapsed
+        for registry in getRegistries():
+            if registry.hasStarted():
+                pending = len(registry.repository.pending_ids())
+                if pending:
+                    lines.append('  %i %s objects still loading in the background' % (pending, registry.name))
+        lines.append('time-to-prompt: %.3f s' % previous)
+        sys.stderr.write('\n'.join(lines) + '\n')
+
     # parse the options
 
     def parseOptions(self):
@@ -309,6 +338,9 @@ under certain conditions; type license() for details.
         parser.add_option("--daemon", dest='daemon', action="store_true", default=False,
                           help='run Ganga as service.')
 
+        parser.add_option("--startup-profile", dest='startup_profile', action="store_true", default=False,
+                          help='print how long each phase of startup took and the time until the prompt appears')
+
         parser.set_defaults(force_interactive=False, config_file=None,
                             force_loglevel=None, rexec=1, monitoring=1, prompt=1, generate_config=None)
         parser.disable_interspersed_args()
@@ -908,6 +940,7 @@ under certain conditions; type license() for details.
         autoPopulateGPI()
         from GangaCore.Utility.Runtime import setPluginDefaults
         setPluginDefaults()
+        GangaCore.Runtime._prog.markStartup('plugins')
 
         # Start tracking all the threads and saving the information to a file
         stacktracer.trace_start()
@@ -930,12 +963,14 @@ under certain conditions; type license() for details.
         from GangaCore.Runtime.Repository_runtime import startUpRegistries
         if config['AutoStartReg']:
             startUpRegistries()
+        GangaCore.Runtime._prog.markStartup('registries')
 
         logger.debug("Bootstrap Core Modules")
         # bootstrap core modules
         from GangaCore.Core.GangaRepository import getRegistrySlice
         ## Here is where the monitoring loop and related services are started!
         GangaCore.Core.bootstrap(getRegistrySlice('jobs'), interactive)
+        GangaCore.Runtime._prog.markStartup('monitoring')
 
         # export all configuration items, new options should not be added after
         # this point
@@ -1044,6 +1079,9 @@ under certain conditions; type license() for details.
             exec(code, local_ns)
 
         logger.debug("loaded .ganga.py")
+        self.markStartup('startup scripts')
+        if self.options.startup_profile:
+            self.printStartupProfile()
 
         # this logic is a bit convoluted
         runs_script = len(self.args) > 0
@@ -2,15 +2,22 @@ from http.server import BaseHTTPRequestHandler
 from GangaCore.Core.GangaRepository import getRegistry, RegistryKeyError
 from GangaCore.Core.GangaThread import GangaThread
 from GangaCore.Utility.util import hostname
-from GangaCore.GPIDev.Base.Proxy import getName
+from GangaCore.GPIDev.Base.Proxy import getName, stripProxy
 from http.server import HTTPServer
+from socketserver import ThreadingMixIn
 
 import urllib.parse
 import GangaCore.GPI
 from GangaCore.GPIDev.Lib.Config import config
+from GangaCore.Utility.external.OrderedDict import OrderedDict as oDict
 import time
 import datetime
 import os
+import gzip
+import json
+import hashlib
+import threading
+import collections
 logger = GangaCore.Utility.logging.getLogger()
 
 job_status_color = {'new': '00FFFF',
@@ -66,23 +73,32 @@ def get_users_JSON():
     return json_users
 
 
-def get_subjob_JSON(job):
+def get_subjob_JSON(row):
 
-    result = []
-    result.append("{")
+    return json.dumps(oDict((key, str(row[key])) for key in ('id', 'status', 'name', 'application', 'backend', 'actualCE')))
 
-    result.append("\"id\": %s," % addQuotes(job.fqid))
-    result.append("\"status\": %s," % addQuotes(job.status))
-    result.append("\"name\": %s," % addQuotes(job.name))
-    result.append("\"application\": %s," %
-                  addQuotes(getName(job.application)))
-    result.append("\"backend\": %s," %
-                  addQuotes(getName(job.backend)))
-    result.append("\"actualCE\": %s" % addQuotes(job.backend.actualCE))
 
-    result.append("}")
+def get_subjob_row(jobid, index, cache, subjobs):
+    """
+    The values of a subjob shown by the web gui, taken from the index cache of the subjob
+    Args:
+        jobid (int): The id of the master job
+        index (int): The index of the subjob
+        cache (dict): The index cache of the subjob
+        subjobs (list): The subjobs of the master job, only used for indexes stored without the timestamps
+    """
+    timestamps = cache.get('time:timestamps')
+    if timestamps is None:
+        timestamps = subjobs[index].time.timestamps
 
-    return "".join(result)
+    return {'id': cache.get('display:fqid') or '%s.%s' % (jobid, cache.get('id', index)),
+            'status': cache.get('status'),
+            'name': cache.get('name') or '',
+            'application': cache.get('select:application') or cache.get('display:application') or '',
+            'backend': cache.get('select:backend') or cache.get('display:backend') or '',
+            'actualCE': cache.get('display:backend.actualCE') or '',
+            'new': timestamps.get('new'),
+            'final': timestamps.get('final')}
 
 
 def get_job_JSON(job):
@@ -127,14 +143,10 @@ def get_job_JSON(job):
     result.append("\"outputdir\": %s," % addQuotes(job.outputdir))
 
     try:
-        result.append("\"submitted\": %s," % addQuotes(
-            str(len(job.subjobs.select(status='submitted')))))
-        result.append("\"running\": %s," %
-                      addQuotes(str(len(job.subjobs.select(status='running')))))
-        result.append("\"completed\": %s," % addQuotes(
-            str(len(job.subjobs.select(status='completed')))))
-        result.append("\"failed\": %s," %
-                      addQuotes(str(len(job.subjobs.select(status='failed')))))
+        # the counts are kept by the job so the subjobs don't have to be loaded
+        subjob_counts = stripProxy(job)._getSubJobStatusCounts()
+        for status in ('submitted', 'running', 'completed', 'failed'):
+            result.append("\"%s\": %s," % (status, addQuotes(str(subjob_counts[status]))))
 
         result.append("\"application\": %s," %
                       addQuotes(getName(job.application)))
@@ -164,13 +176,16 @@ def get_job_JSON(job):
 
 
 def get_subjobs_in_time_range(jobid, fromDate=None, toDate=None):
-    from GangaCore.Core.GangaRepository import getRegistryProxy
 
     subjobs = []
 
-    for subjob in getRegistryProxy('jobs')(jobid).subjobs:
+    for subjob in jobs_view.getSubJobRows(jobid):
+
+        timeCreated = subjob['new']
 
-        timeCreated = subjob.time.timestamps['new']
+        if timeCreated is None and (fromDate is not None or toDate is not None):
+
+            continue
 
         if fromDate is None and toDate is None:
 
@@ -191,12 +206,19 @@ def get_subjobs_in_time_range(jobid, fromDate=None, toDate=None):
     return subjobs
 
 
-def get_subjobs_JSON(jobid, fromDate=None, toDate=None):
+def get_subjobs_JSON(jobid, fromDate=None, toDate=None, offset=0, limit=None):
 
     json_subjobs_strings = []
     json_subjobs_strings.append("{\"taskjobs\": [")
 
     subjobs_in_time_range = get_subjobs_in_time_range(jobid, fromDate, toDate)
+    total = len(subjobs_in_time_range)
+
+    # only the requested page of the subjobs is sent
+    if limit is None:
+        subjobs_in_time_range = subjobs_in_time_range[offset:]
+    else:
+        subjobs_in_time_range = subjobs_in_time_range[offset:offset + limit]
 
     for subjob in subjobs_in_time_range:
 
@@ -206,7 +228,7 @@ def get_subjobs_JSON(jobid, fromDate=None, toDate=None):
     if json_subjobs_strings[-1] == ",":
         json_subjobs_strings = json_subjobs_strings[:-1]
 
-    json_subjobs_strings.append("]}")
+    json_subjobs_strings.append("], \"total\": %d}" % total)
 
     return "".join(json_subjobs_strings)
 
@@ -215,7 +237,7 @@ def get_job_infos_in_time_range(fromDate=None, toDate=None):
 
     job_infos = []
 
-    for jobInfo in jobs_dictionary.values():
+    for jobInfo in jobs_view.getJobInfos():
 
         timeCreated = jobInfo.getTimeCreated()
 
@@ -256,8 +278,8 @@ def get_accumulated_subjobs_JSON(subjobs):
     completed_dates = []
 
     for subjob in subjobs:
-        if subjob.status == 'completed':
-            completed_dates.append(subjob.time.timestamps['final'])
+        if subjob['status'] == 'completed' and subjob['final'] is not None:
+            completed_dates.append(subjob['final'])
 
     if len(completed_dates) == 0:
         return ''
@@ -314,28 +336,21 @@ def get_accumulated_subjobs_JSON(subjobs):
 
 def create_subjobs_graphics(jobid, subjob_attribute, fromDate, toDate):
 
-    subjobs_in_time_range = get_subjobs_in_time_range(jobid, fromDate, toDate)
-
     if subjob_attribute == 'accumulate':
         # return some JSON here
-        return get_accumulated_subjobs_JSON(subjobs_in_time_range)
-
-    subjobs_attributes = {}
-
-    for subjob in subjobs_in_time_range:
+        return get_accumulated_subjobs_JSON(get_subjobs_in_time_range(jobid, fromDate, toDate))
 
-        if subjob_attribute == 'status':
-            increment(subjobs_attributes, subjob.status)
+    if fromDate is None and toDate is None:
+        # the counts of all the subjobs are kept by the view
+        subjobs_attributes = jobs_view.getSubJobCounts(jobid, subjob_attribute)
 
-        elif subjob_attribute == 'application':
-            increment(
-                subjobs_attributes, getName(subjob.application))
+    else:
+        subjobs_attributes = {}
 
-        elif subjob_attribute == 'backend':
-            increment(subjobs_attributes, getName(subjob.backend))
+        for subjob in get_subjobs_in_time_range(jobid, fromDate, toDate):
 
-        elif subjob_attribute == 'actualCE':
-            increment(subjobs_attributes, subjob.backend.actualCE)
+            if subjob_attribute in ('status', 'application', 'backend', 'actualCE'):
+                increment(subjobs_attributes, subjob[subjob_attribute])
 
     if subjob_attribute == 'status':
         return get_pie_chart_json(subjobs_attributes, colors=True, jobs=False)
@@ -384,18 +399,21 @@ def get_pie_chart_json(d, colors=False, jobs=False):
 
 def create_jobs_graphics(job_attribute, fromDate=None, toDate=None):
 
-    job_infos_in_time_range = get_job_infos_in_time_range(fromDate, toDate)
+    if fromDate is None and toDate is None:
+        # the counts of all the jobs are kept by the view
+        jobs_attribute = jobs_view.getJobCounts(job_attribute)
 
-    jobs_attribute = {}
+    else:
+        jobs_attribute = {}
 
-    for jobInfo in job_infos_in_time_range:
+        for jobInfo in get_job_infos_in_time_range(fromDate, toDate):
 
-        if job_attribute == 'status':
-            increment(jobs_attribute, jobInfo.getJobStatus())
-        elif job_attribute == 'application':
-            increment(jobs_attribute, jobInfo.getJobApplication())
-        elif job_attribute == 'backend':
-            increment(jobs_attribute, jobInfo.getJobBackend())
+            if job_attribute == 'status':
+                increment(jobs_attribute, jobInfo.getJobStatus())
+            elif job_attribute == 'application':
+                increment(jobs_attribute, jobInfo.getJobApplication())
+            elif job_attribute == 'backend':
+                increment(jobs_attribute, jobInfo.getJobBackend())
 
     if job_attribute == 'status':
         return get_pie_chart_json(jobs_attribute, colors=True, jobs=True)
@@ -423,46 +441,25 @@ def get_jobs_JSON(fromDate=None, toDate=None):
     return "".join(json_jobs_strings)
 
 
-def update_jobs_dictionary():
+def make_job_info(job_id):
+    """
+    The JobRelatedInfo of a job, None if the job isn't in the registry any more
+    Args:
+        job_id (int): The id of the job
+    """
     from GangaCore.Core.GangaRepository import getRegistryProxy
 
-    reg = getRegistry("jobs")
-    # get the changed jobs
-    changed_ids = reg.pollChangedJobs("WebGUI")
+    try:
+        job = getRegistryProxy('jobs')(job_id)
 
-    for job_id in changed_ids:
         try:
-
-            job = getRegistryProxy('jobs')(job_id)
-
-            try:
-                jobs_dictionary[job_id] = JobRelatedInfo(
-                    job, job.time.timestamps['new'])
-            except RegistryKeyError:
-                jobs_dictionary[job_id] = JobRelatedInfo(job, None)
-
+            return JobRelatedInfo(job, job.time.timestamps['new'])
         except RegistryKeyError:
+            return JobRelatedInfo(job, None)
 
-            del jobs_dictionary[job_id]
-
-
-def fill_jobs_dictionary():
-    from GangaCore.Core.GangaRepository import getRegistryProxy
-
-    for job in getRegistryProxy('jobs'):
-        try:
-            # get the id -> it could cause RegistryKeyError and the code below
-            # will not be executed
-            jobid = job.id
-
-            try:
-                jobs_dictionary[jobid] = JobRelatedInfo(
-                    job, job.time.timestamps['new'])
-            except RegistryKeyError:
-                jobs_dictionary[jobid] = JobRelatedInfo(job, None)
+    except RegistryKeyError:
+        return None
 
-        except RegistryKeyError:
-            pass
 
 # todo remove
 
@@ -493,6 +490,13 @@ def getProcessDetails():
         file.close()
 
 
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    Answers each request in a thread of its own so that a slow query doesn't hold up the other clients
+    """
+    daemon_threads = True
+
+
 def getHttpServer():
 
     success = False
@@ -502,7 +506,7 @@ def getHttpServer():
     while not success:
 
         try:
-            server = HTTPServer((httpServerHost, port), GetHandler)
+            server = ThreadingHTTPServer((httpServerHost, port), GetHandler)
             success = True
         except Exception:
             port += 1
@@ -619,11 +623,8 @@ class HTTPServerThread(GangaThread):
 
         #   initialization
 
-        reg = getRegistry("jobs")
-        # calling here first time will take all jobs
-        reg.pollChangedJobs("WebGUI")
-        # fill jobs dictionary at the begining
-        fill_jobs_dictionary()
+        # the first update of the view takes all jobs
+        jobs_view.update()
 
         logger.info('Web gui monitoring server started successfully')
         logger.info('You can monitor your jobs at the following location: ' + getMonitoringLink(port))
@@ -647,9 +648,25 @@ class GetHandler(BaseHTTPRequestHandler):
         logger.debug(format % args)
 
     def do_GET(self):
-        queryString = self.path.split('?')[1]
-        import cgi
-        qsDict = dict(cgi.parse_qsl(queryString))
+        queryString = self.path.partition('?')[2]
+        qsDict = dict(urllib.parse.parse_qsl(queryString))
+
+        if 'list' not in qsDict or 'jsonp_callback' not in qsDict:
+            self.send_error(400, 'The list and jsonp_callback parameters are required')
+            return
+
+        start = time.time()
+        try:
+            self.answer(qsDict)
+        finally:
+            endpoint_metrics.record(qsDict['list'], time.time() - start)
+
+    def answer(self, qsDict):
+        """
+        Send the JSON asked for by a request of the web gui
+        Args:
+            qsDict (dict): The parameters of the query string of the request
+        """
         query = qsDict['list']
 
         fromDate = None
@@ -663,32 +680,45 @@ class GetHandler(BaseHTTPRequestHandler):
         elif 'timerange' in qsDict:
             fromDate = getFromDateFromTimeRange(qsDict['timerange'])
 
+        # the answer only changes with the view of the jobs, or with the job for the subjob lists
+        if query.startswith('jobs'):
+            # update the view with the changed jobs
+            jobs_view.update()
+            state = jobs_view.version
+        elif query.startswith('subjobs'):
+            state = getRegistry('jobs').getJobChangeSeq(int(qsDict['taskmonid']))
+        elif query == "metrics":
+            state = endpoint_metrics.getNumRequests()
+        else:
+            state = 0
+
+        etag = makeETag(state, fromDate, toDate, self.path)
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
         json = ''
 
         if query == "users":
             json = get_users_JSON()
         elif query == "jobs":
-            # update dictionary with the changed jobs
-            update_jobs_dictionary()
             json = get_jobs_JSON(fromDate, toDate)
 
         elif query == "subjobs":
             jobid = int(qsDict['taskmonid'])
-            json = get_subjobs_JSON(jobid, fromDate, toDate)
+            offset = int(qsDict.get('offset', 0))
+            limit = int(qsDict['limit']) if 'limit' in qsDict else None
+            json = get_subjobs_JSON(jobid, fromDate, toDate, offset, limit)
 
         elif query == "jobs_statuses":
-            # update dictionary with the changed jobs
-            update_jobs_dictionary()
             json = create_jobs_graphics('status', fromDate, toDate)
 
         elif query == "jobs_backends":
-            # update dictionary with the changed jobs
-            update_jobs_dictionary()
             json = create_jobs_graphics('backend', fromDate, toDate)
 
         elif query == "jobs_applications":
-            # update dictionary with the changed jobs
-            update_jobs_dictionary()
             json = create_jobs_graphics('application', fromDate, toDate)
 
         elif query == "subjobs_statuses":
@@ -713,23 +743,240 @@ class GetHandler(BaseHTTPRequestHandler):
             json = create_subjobs_graphics(
                 jobid, 'accumulate', fromDate, toDate)
 
+        elif query == "metrics":
+            json = endpoint_metrics.getJSON()
+
         elif query == "testaccumulation":
 
             json = "{\"totaljobs\": [[{\"TOTAL\": 92}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"procevents\": [[{\"NEventsPerJob\": 0}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"succjobs\": [[{\"TOTAL\": 92, \"TOTALEVENTS\": 1365491}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"meta\": {\"genactivity\": null, \"submissiontype\": null, \"site\": null, \"ce\": null, \"dataset\": null, \"submissiontool\": null, \"fail\": null, \"check\": [\"submitted\"], \"date1\": [\"2010-09-23 15:56:27\"], \"date2\": [\"2010-09-24 15:56:27\"], \"application\": null, \"rb\": null, \"status\": null, \"taskmonid\": [\"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"], \"args\": \"<![CDATA[taskmonid=ganga%3Ae60e5904-e63e-432f-b3df-63ca833cf080%3A]]>\", \"grid\": null, \"user\": null, \"task\": null, \"unixname\": null, \"sortby\": [\"activity\"], \"activity\": null, \"exitcode\": null}, \"allfinished\": [[{\"finished\": \"2010-08-13 14:02:18\", \"Events\": 2000}, {\"finished\": \"2010-08-13 14:39:13\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:39:25\", \"Events\": 14350}, {\"finished\": \"2010-08-13 14:39:58\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:40:03\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:40:18\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:40:19\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:40:37\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:40:38\", \"Events\": 14994}, {\"finished\": \"2010-08-13 14:40:52\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:40:53\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:40:54\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:41:25\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:27\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:41:29\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:32\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:41:32\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:34\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:41:35\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:43\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:44\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:41:45\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:41:53\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:54\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:41:55\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:41:59\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:03\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:03\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:04\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:42:06\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:07\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:42:14\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:14\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:42:27\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:27\", \"Events\": 14995}, {\"finished\": \"2010-08-13 14:42:28\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:38\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:53\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:42:54\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:57\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:42:57\", \"Events\": 14995}, {\"finished\": \"2010-08-13 14:42:58\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:42:58\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:43:01\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:02\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:04\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:04\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:11\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:15\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:15\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:43:17\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:22\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:23\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:43:24\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:25\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:43:28\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:43:32\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:36\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:43:36\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:43:39\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:43:43\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:43:56\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:43:57\", \"Events\": 14299}, {\"finished\": \"2010-08-13 14:43:57\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:44:04\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:44:15\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:44:15\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:44:34\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:44:35\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:44:35\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:44:35\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:44:36\", \"Events\": 14995}, {\"finished\": \"2010-08-13 14:45:03\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:45:10\", \"Events\": 14998}, {\"finished\": \"2010-08-13 14:45:25\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:45:26\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:45:45\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:45:50\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:45:50\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:46:01\", \"Events\": 14997}, {\"finished\": \"2010-08-13 14:46:07\", \"Events\": 14996}, {\"finished\": \"2010-08-13 14:46:14\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:46:23\", \"Events\": 14999}, {\"finished\": \"2010-08-13 14:46:26\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:46:30\", \"Events\": 15000}, {\"finished\": \"2010-08-13 14:47:09\", \"Events\": 14999}, {\"finished\": \"2010-08-13 15:57:09\", \"Events\": 14996}, {\"finished\": \"2010-08-13 16:17:45\", \"Events\": 14997}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"lastfinished\": [[{\"finished\": \"2010-08-13 16:17:45\"}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}], \"firststarted\": [[{\"started\": \"2010-08-13 13:51:21\"}], {\"taskmonid\": \"ganga:e60e5904-e63e-432f-b3df-63ca833cf080:\"}]}"
 
+        jsonp_function = qsDict['jsonp_callback']
+        result = ("%s(%s);" % (jsonp_function, json)).encode('utf-8')
+
         self.send_response(200)
         self.send_header('Content-Type', 'text/html')
+        self.send_header('ETag', etag)
+        self.send_header('Vary', 'Accept-Encoding')
+        if len(result) >= gzipMinSize and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            result = gzip.compress(result)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(result)))
         self.end_headers()
 
-        jsonp_function = qsDict['jsonp_callback']
-        result = "%s(%s);" % (jsonp_function, json)
         self.wfile.write(result)
 
         return
 
-jobs_dictionary = {}
+
+def makeETag(state, fromDate, toDate, path):
+    """
+    The ETag of an answer, built from the state of the view it comes from, the time window the request resolved to, as
+    a time range is relative to when it's asked for, and the path of the request
+    Args:
+        state (int): The version of the view of the jobs or the change sequence number of the job
+        fromDate (datetime, None): The start of the time window of the request
+        toDate (datetime, None): The end of the time window of the request
+        path (str): The path of the request including the query string
+    """
+    tag = "%s|%s|%s|%s" % (state, fromDate, toDate, path)
+    return '"%s"' % hashlib.md5(tag.encode('utf-8')).hexdigest()
+
+
+class EndpointMetrics(object):
+    """
+    The number of requests and the time taken to answer them for each endpoint of the web gui
+    """
+
+    # the number of latest answers each endpoint keeps the time of for the percentiles
+    num_recent = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._num_requests = 0
+
+    def record(self, endpoint, duration):
+        """
+        Record the time taken to answer a request
+        Args:
+            endpoint (str): The list asked for by the request
+            duration (float): The time taken to answer it in seconds
+        """
+        with self._lock:
+            self._num_requests += 1
+            if endpoint not in self._endpoints:
+                self._endpoints[endpoint] = {'count': 0, 'total': 0., 'max': 0.,
+                                             'recent': collections.deque(maxlen=self.num_recent)}
+            metrics = self._endpoints[endpoint]
+            metrics['count'] += 1
+            metrics['total'] += duration
+            metrics['max'] = max(metrics['max'], duration)
+            metrics['recent'].append(duration)
+
+    def getNumRequests(self):
+        with self._lock:
+            return self._num_requests
+
+    def getSummary(self):
+        """
+        The count, mean, maximum, median and 95th percentile of the time taken to answer each endpoint, in seconds
+        """
+        summary = {}
+        with self._lock:
+            for endpoint, metrics in self._endpoints.items():
+                recent = sorted(metrics['recent'])
+                summary[endpoint] = {'count': metrics['count'],
+                                     'mean': metrics['total'] / metrics['count'],
+                                     'max': metrics['max'],
+                                     'p50': recent[len(recent) // 2],
+                                     'p95': recent[min(len(recent) - 1, int(len(recent) * 0.95))]}
+        return summary
+
+    def getJSON(self):
+        return json.dumps(self.getSummary(), sort_keys=True)
+
+
+class JobsView(object):
+    """
+    The materialised view of the jobs shown by the web gui. The infos of the jobs are only built again for the jobs
+    which the jobs registry reports as changed, and the counts of their statuses, applications and backends are updated
+    with them. The rows of the subjobs of a job are built from the subjob index and kept, with their counts, until the
+    job changes.
+    """
+
+    # the number of jobs for which the rows of the subjobs are kept
+    max_subjob_rows = 10
+
+    def __init__(self, consumer):
+        self._consumer = consumer
+        # held whilst the changed jobs are polled and built so that they're applied in order
+        self._update_lock = threading.Lock()
+        # held whilst the view is read or changed
+        self._lock = threading.Lock()
+        self._job_infos = {}
+        self._job_counts = {'status': collections.Counter(),
+                            'application': collections.Counter(),
+                            'backend': collections.Counter()}
+        self._subjob_rows = oDict()
+        self._subjob_build_locks = {}
+        self.version = 0
+
+    def _countJob(self, job_info, step):
+        for attr, value in (('status', job_info.getJobStatus()),
+                            ('application', job_info.getJobApplication()),
+                            ('backend', job_info.getJobBackend())):
+            counts = self._job_counts[attr]
+            counts[value] += step
+            if counts[value] <= 0:
+                del counts[value]
+
+    def update(self):
+        """
+        Build the infos of the jobs changed since the last update, the first update builds them for all jobs
+        """
+        reg = getRegistry("jobs")
+        with self._update_lock:
+            changed_ids = reg.pollChangedJobs(self._consumer)
+            if not changed_ids:
+                return
+            # the jobs are loaded outside of the view lock so the view can still be read meanwhile
+            job_infos = [(job_id, make_job_info(job_id)) for job_id in changed_ids]
+            with self._lock:
+                for job_id, job_info in job_infos:
+                    old_info = self._job_infos.pop(job_id, None)
+                    if old_info is not None:
+                        self._countJob(old_info, -1)
+                    if job_info is not None:
+                        self._job_infos[job_id] = job_info
+                        self._countJob(job_info, 1)
+                self.version += 1
+
+    def getJobInfos(self):
+        """
+        The infos of the jobs ordered by id
+        """
+        with self._lock:
+            return [self._job_infos[job_id] for job_id in sorted(self._job_infos)]
+
+    def getJobCounts(self, attribute):
+        """
+        The number of jobs for each value of an attribute
+        Args:
+            attribute (str): One of 'status', 'application' or 'backend'
+        """
+        with self._lock:
+            return dict(self._job_counts[attribute])
+
+    def _getSubJobEntry(self, jobid):
+        """
+        The rows of the subjobs of a job and the counts built from them, built again only if the job has changed since
+        they were last built. Only one request builds the rows of a job, the others asking for them meanwhile wait.
+        Args:
+            jobid (int): The id of the master job
+        """
+        reg = getRegistry("jobs")
+        with self._lock:
+            build_lock = self._subjob_build_locks.setdefault(jobid, threading.Lock())
+
+        with build_lock:
+            change_seq = reg.getJobChangeSeq(jobid)
+            with self._lock:
+                stored = self._subjob_rows.pop(jobid, None)
+                if stored is not None and stored['seq'] == change_seq:
+                    self._subjob_rows[jobid] = stored
+                    return stored
+
+            job = reg[jobid]
+            subjobs = job.subjobs
+            if hasattr(subjobs, 'getAllCachedData'):
+                caches = subjobs.getAllCachedData()
+            else:
+                caches = [reg.getIndexCache(sj) for sj in subjobs]
+            stored = {'seq': change_seq,
+                      'rows': [get_subjob_row(jobid, i, cache, subjobs) for i, cache in enumerate(caches)],
+                      'counts': {}}
+
+            with self._lock:
+                self._subjob_rows[jobid] = stored
+                while len(self._subjob_rows) > self.max_subjob_rows:
+                    old_jobid = next(iter(self._subjob_rows))
+                    del self._subjob_rows[old_jobid]
+                    self._subjob_build_locks.pop(old_jobid, None)
+            return stored
+
+    def getSubJobRows(self, jobid):
+        """
+        The rows of the subjobs of a job
+        Args:
+            jobid (int): The id of the master job
+        """
+        return self._getSubJobEntry(jobid)['rows']
+
+    def getSubJobCounts(self, jobid, attribute):
+        """
+        The number of subjobs of a job for each value of an attribute
+        Args:
+            jobid (int): The id of the master job
+            attribute (str): One of 'status', 'application', 'backend' or 'actualCE'
+        """
+        if attribute == 'status':
+            # the job keeps the counts of the statuses of its subjobs itself
+            counts = stripProxy(getRegistry("jobs")[jobid])._getSubJobStatusCounts()
+            return dict((status, count) for status, count in list(counts.items()) if count > 0)
+
+        stored = self._getSubJobEntry(jobid)
+        with self._lock:
+            if attribute not in stored['counts']:
+                stored['counts'][attribute] = collections.Counter(row[attribute] for row in stored['rows'])
+            return dict(stored['counts'][attribute])
+
+
+jobs_view = JobsView("WebGUI")
+endpoint_metrics = EndpointMetrics()
 httpServerHost = 'localhost'
 httpServerStartTryPort = 8080
+# answers smaller than this aren't worth compressing
+gzipMinSize = 1024
 
 # todo remove
 #import os
@@ -114,6 +114,10 @@ conf_config.addOption('gangadir', expandvars(None, '~/gangadir'),
                  'Location of local job repositories and workspaces. Default is ~/gangadir but in somecases (such as LSF CNAF) this needs to be modified to point to the shared file system directory.', filter=GangaCore.Utility.Config.expandvars)
 conf_config.addOption('repositorytype', 'LocalXML', 'Type of the repository.', examples='LocalXML')
 conf_config.addOption('lockingStrategy', 'UNIX', 'Type of locking strategy which can be used. UNIX or FIXED . default = UNIX')
+conf_config.addOption('selectIndexAttributes', ['backend', 'application'],
+                 'Job attributes stored in the index of each job, besides the status and name, so that jobs.select() can match them without loading the jobs')
+conf_config.addOption('compactSubjobs', True,
+                 'Once they are flushed, only keep the subjobs read from disk which are still in use in memory. The others are kept as their entry in the subjob index and read back from disk when they are next accessed')
 conf_config.addOption('workspacetype', 'LocalFilesystem',
                  'Type of workspace. Workspace is a place where input and output sandbox of jobs are stored. Currently the only supported type is LocalFilesystem.')
 conf_config.addOption('user', getpass.getuser(),
@@ -171,6 +175,9 @@ queues_config = makeConfig("Queues", "configuration section for the queues")
 queues_config.addOption('Timeout', None, 'default timeout for queue generated processes')
 queues_config.addOption('ShutDownTimeout', 0.1, 'timeout before looping again over queue to give shutdown a chance')
 queues_config.addOption('NumWorkerThreads', 5, 'default number of worker threads in the queues system')
+queues_config.addOption('MaxInFlight', 0, 'maximum number of the tasks of a parallel submission queued or running at once, 0 for 4 times NumWorkerThreads')
+queues_config.addOption('SubmitRetries', 2, 'number of times the submission of a subjob is retried when submitting in parallel')
+queues_config.addOption('SubmitRetryBackoff', 1.0, 'seconds to wait before the first retry of a subjob submission, doubled for each further retry')
 
 # ------------------------------------------------
 # Plugins
@@ -219,6 +226,9 @@ poll_config.addOption('diskspace_poll_rate', 30, "The frequency in seconds for f
 poll_config.addOption('DiskSpaceChecker', "", "disk space checking callback. This function should return False when there is no disk space available, True otherwise")
 poll_config.addOption('max_shutdown_retries', 5, 'OBSOLETE: this option has no effect anymore')
 poll_config.addOption('numParallelJobs', 25, 'Number of Jobs to update the status for in parallel')
+poll_config.addOption('max_concurrent_batches', 4, 'Maximum number of batches of jobs from one backend updated at the same time by the monitoring threads')
+poll_config.addOption('batch_target_time', 10., 'Time in seconds a single backend status call should take, the number of jobs per call is tuned towards this starting from numParallelJobs')
+poll_config.addOption('max_batch_size', 5000, 'Largest number of jobs the monitoring will pass to a backend in a single status call')
 
 poll_config.addOption('forced_shutdown_policy', 'session_type',
                  'If there are remaining background activities at exit such as monitoring, output download Ganga will attempt to wait for the activities to complete. You may select if a user is prompted to answer if he wants to force shutdown ("interactive") or if the system waits on a timeout without questions ("timeout"). The default is "session_type" which will do interactive shutdown for CLI and timeout for scripts.')
@@ -443,7 +453,7 @@ lsf_config.addOption('stderrConfig', '-e %s/stderr', "String pattern for definin
 
 lsf_config.addOption('kill_str', 'bkill %s', "String used to kill job")
 lsf_config.addOption('kill_res_pattern',
-                 '(^Job <\d+> is being terminated)|(Job <\d+>: Job has already finished)|(Job <\d+>: No matching job found)',
+                 '(^Job <\d+(\[\d+\])?> is being terminated)|(Job <\d+(\[\d+\])?>: Job has already finished)|(Job <\d+(\[\d+\])?>: No matching job found)',
                  "String pattern for replay from the kill command")
 
 tempstr = '''
@@ -463,6 +473,16 @@ lsf_config.addOption('postexecute', tempstr, "String contains commands executing
 lsf_config.addOption('jobnameopt', 'J', "String contains option name for name of job in batch system")
 lsf_config.addOption('timeout', 600, 'Timeout in seconds after which a job is declared killed if it has not touched its heartbeat file. Heartbeat is touched every 30s so do not set this below 120 or so.')
 
+lsf_config.addOption('array_opt', '-J "%(name)s[1-%(size)d]"',
+                 "Option submitting the subjobs of a job as a job array of %(size)d elements named %(name)s. Subjobs are submitted one by one if it is empty")
+lsf_config.addOption('array_res_pattern', '^Job <(?P<id>\d*)> is submitted to .*queue <(?P<queue>\S*)>',
+                 "String pattern for replay from the submit command of a job array")
+lsf_config.addOption('array_index_name', 'LSB_JOBINDEX', "Name of environment with the index of the job in its job array")
+lsf_config.addOption('array_id_str', '%(id)s[%(index)d]', "String giving the id of the job with index %(index)d of job array %(id)s")
+lsf_config.addOption('array_max_size', 1000, "Largest number of jobs submitted in one job array")
+lsf_config.addOption('array_stdoutConfig', '-o %s/stdout.%%I', "String pattern for defining the stdout of a job array")
+lsf_config.addOption('array_stderrConfig', '-e %s/stderr.%%I', "String pattern for defining the stderr of a job array")
+
 # ------------------------------------------------
 # PBS
 pbs_config = makeConfig('PBS', 'internal PBS command line interface')
@@ -506,6 +526,16 @@ pbs_config.addOption('jobnameopt', 'N', "String contains option name for name of
 pbs_config.addOption('timeout', 600,
                  'Timeout in seconds after which a job is declared killed if it has not touched its heartbeat file. Heartbeat is touched every 30s so do not set this below 120 or so.')
 
+pbs_config.addOption('array_opt', '-J 1-%(size)d',
+                 "Option submitting the subjobs of a job as a job array of %(size)d elements named %(name)s. Subjobs are submitted one by one if it is empty")
+pbs_config.addOption('array_res_pattern', '^(?P<id>\d*)\[\]\.pbs\s*',
+                 "String pattern for replay from the submit command of a job array")
+pbs_config.addOption('array_index_name', 'PBS_ARRAY_INDEX', "Name of environment with the index of the job in its job array")
+pbs_config.addOption('array_id_str', '%(id)s[%(index)d]', "String giving the id of the job with index %(index)d of job array %(id)s")
+pbs_config.addOption('array_max_size', 1000, "Largest number of jobs submitted in one job array")
+pbs_config.addOption('array_stdoutConfig', '-o %s/', "String pattern for defining the stdout of a job array")
+pbs_config.addOption('array_stderrConfig', '-e %s/', "String pattern for defining the stderr of a job array")
+
 # ------------------------------------------------
 # SGE
 sge_config = makeConfig('SGE', 'internal SGE command line interface')
@@ -548,6 +578,17 @@ sge_config.addOption('postexecute', '', "String contains commands executing befo
 sge_config.addOption('jobnameopt', 'N', "String contains option name for name of job in batch system")
 sge_config.addOption('timeout', 600, 'Timeout in seconds after which a job is declared killed if it has not touched its heartbeat file. Heartbeat is touched every 30s so do not set this below 120 or so.')
 
+# The job script is run by python on SGE (-S /usr/bin/python) so the subjobs are submitted one by one
+sge_config.addOption('array_opt', '',
+                 "Option submitting the subjobs of a job as a job array of %(size)d elements named %(name)s. Subjobs are submitted one by one if it is empty")
+sge_config.addOption('array_res_pattern', 'Your job-array (?P<id>\d+)\.(.+)',
+                 "String pattern for replay from the submit command of a job array")
+sge_config.addOption('array_index_name', 'SGE_TASK_ID', "Name of environment with the index of the job in its job array")
+sge_config.addOption('array_id_str', '%(id)s.%(index)d', "String giving the id of the job with index %(index)d of job array %(id)s")
+sge_config.addOption('array_max_size', 1000, "Largest number of jobs submitted in one job array")
+sge_config.addOption('array_stdoutConfig', '-o %s/', "String pattern for defining the stdout of a job array")
+sge_config.addOption('array_stderrConfig', '-e %s/', "String pattern for defining the stderr of a job array")
+
 # ------------------------------------------------
 # Slurm
 slurm_config = makeConfig('Slurm', 'internal Slurm command line interface')
@@ -618,6 +659,16 @@ slurm_config.addOption('jobnameopt', 'J', "String contains option name for name
 slurm_config.addOption('timeout', 600,
                        'Timeout in seconds after which a job is declared killed if it has not touched its heartbeat file. Heartbeat is touched every 30s so do not set this below 120 or so.')
 
+slurm_config.addOption('array_opt', '--array=1-%(size)d',
+                       "Option submitting the subjobs of a job as a job array of %(size)d elements named %(name)s. Subjobs are submitted one by one if it is empty")
+slurm_config.addOption('array_res_pattern', '^Submitted batch job (?P<id>\d+)\s*',
+                       "String pattern for replay from the submit command of a job array")
+slurm_config.addOption('array_index_name', 'SLURM_ARRAY_TASK_ID', "Name of environment with the index of the job in its job array")
+slurm_config.addOption('array_id_str', '%(id)s_%(index)d', "String giving the id of the job with index %(index)d of job array %(id)s")
+slurm_config.addOption('array_max_size', 1000, "Largest number of jobs submitted in one job array")
+slurm_config.addOption('array_stdoutConfig', '-o %s/stdout.%%a', "String pattern for defining the stdout of a job array")
+slurm_config.addOption('array_stderrConfig', '-e %s/stderr.%%a', "String pattern for defining the stderr of a job array")
+
 # ------------------------------------------------
 # Mergers
 merge_config = makeConfig('Mergers', 'parameters for mergers')
@@ -956,6 +1007,8 @@ reg_config = makeConfig('Registry','This config controls the speed of flushing o
 reg_config.addOption('AutoFlusherWaitTime', 30, 'Time to wait between auto-flusher runs')
 reg_config.addOption('EnableAutoFlush', True, 'Enable Registry auto-flushing feature')
 reg_config.addOption('DisableLoadCheck', True, 'Disable the checking of recent bad jobs in bad state. Mainly used in testing.')
+reg_config.addOption('StartupThreads', 2, 'Number of threads creating the objects of a registry from its index in the background at startup. '
+                     'Set to 0 to create them all before the prompt appears')
 
 cred_config = makeConfig('Credentials', 'This configures the credentials singleton')
 cred_config.addOption('CleanDelay', 1, 'Seconds between auto-clean of credentials when proxy externally destroyed')
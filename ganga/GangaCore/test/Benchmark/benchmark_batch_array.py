@@ -0,0 +1,71 @@
+"""
+Compare the time taken to submit a split LSF job when each subjob was submitted with its own bsub, as Batch did before
+job arrays, with submitting the subjobs as a job array. bsub is a stub on the PATH which takes the given latency to
+answer, as a busy scheduler does.
+
+Run with:
+    python benchmark_batch_array.py [number of subjobs] [latency in seconds]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+opts = [('TestingFramework', 'AutoCleanup', 'False')]
+
+stub_bsub = """#!/bin/sh
+echo "$*" >> "$(dirname "$0")/calls"
+sleep %s
+echo "Job <1234> is submitted to default queue <normal>."
+"""
+
+
+def time_submit(num_subjobs):
+    """ Returns the time taken to submit a job split into num_subjobs subjobs to LSF """
+    from GangaCore.GPI import Job, Executable, ArgSplitter, LSF
+    j = Job(application=Executable(), backend=LSF(), splitter=ArgSplitter(args=[[str(i)] for i in range(num_subjobs)]))
+    start = time.time()
+    j.submit()
+    return time.time() - start
+
+
+def count_calls(stub_dir):
+    """ The number of calls made to the stub bsub so far """
+    with open(os.path.join(stub_dir, 'calls')) as f:
+        return len(f.readlines())
+
+
+if __name__ == '__main__':
+    num_subjobs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    gangadir = tempfile.mkdtemp()
+    stub_dir = os.path.join(gangadir, 'stubs')
+    os.makedirs(stub_dir)
+    with open(os.path.join(stub_dir, 'bsub'), 'w') as f:
+        f.write(stub_bsub % latency)
+    os.chmod(os.path.join(stub_dir, 'bsub'), 0o755)
+    os.environ['PATH'] = stub_dir + os.pathsep + os.environ['PATH']
+
+    from GangaCore.testlib.GangaUnitTest import start_ganga, stop_ganga
+    try:
+        start_ganga(gangadir, extra_opts=opts)
+        from GangaCore.GPIDev.Adapters.IBackend import IBackend
+        from GangaCore.Lib.Batch import Batch
+
+        array_submit = Batch.master_submit
+        Batch.master_submit = IBackend.master_submit
+        try:
+            old_time = time_submit(num_subjobs)
+        finally:
+            Batch.master_submit = array_submit
+        old_calls = count_calls(stub_dir)
+        new_time = time_submit(num_subjobs)
+        new_calls = count_calls(stub_dir) - old_calls
+
+        print('%d subjobs, %.2f s for each bsub' % (num_subjobs, latency))
+        print('%-20s %8.2f s %6d bsub' % ('one bsub a subjob', old_time, old_calls))
+        print('%-20s %8.2f s %6d bsub' % ('job array', new_time, new_calls))
+    finally:
+        stop_ganga()
+        shutil.rmtree(gangadir)
@@ -0,0 +1,116 @@
+"""
+Compare the throughput of reading and writing the schema attributes of a Job through the Descriptor when every access
+went through the same checks, as Descriptor.__get__ and __set__ used to, with the accessors which only do what each
+attribute needs.
+
+Run with:
+    python benchmark_descriptor.py [number of accesses]
+"""
+import sys
+import time
+import shutil
+import tempfile
+from copy import deepcopy
+
+opts = [('TestingFramework', 'AutoCleanup', 'False')]
+
+# The attributes read and the values written
+get_attrs = ['name', 'status', 'comment', 'backend', 'application', 'outputfiles']
+set_values = [('name', 'analysis'), ('comment', 'a comment'), ('parallel_submit', True), ('do_auto_resubmit', False)]
+
+
+def old_get(self, obj, cls):
+    """ Descriptor.__get__ before the accessors were worked out for each attribute """
+    from GangaCore.GPIDev.Base.Objects import _getName
+    if obj is None:
+        return cls._schema[_getName(self)]
+    with obj._getRoot()._lock:
+        name = _getName(self)
+        if self._getter_name:
+            return self._bind_method(obj, self._getter_name)()
+        obj_data = obj._data_dict
+        try:
+            return obj_data[name]
+        except KeyError:
+            pass
+        return self._locked_get(obj)
+
+
+def old_set(self, obj, val):
+    """ Descriptor.__set__ before the accessors were worked out for each attribute """
+    from GangaCore.GPIDev.Base.Objects import _getName, Descriptor
+    from GangaCore.GPIDev.Base.Proxy import stripProxy, runtimeEvalString
+    root_obj = obj._getRoot()
+    with root_obj._lock:
+        _set_name = _getName(self)
+        if isinstance(val, str):
+            if val:
+                val = stripProxy(runtimeEvalString(obj, _set_name, val))
+        if hasattr(obj, '_checkset_name'):
+            checkSet = self._bind_method(obj, self._item['checkset'])
+            if checkSet is not None:
+                checkSet(val)
+        if hasattr(obj, '_filter_name'):
+            this_filter = self._bind_method(obj, self._item['filter'])
+            if this_filter:
+                val = this_filter(val)
+        self._check_getter()
+        obj._getSessionLock(None)
+        obj._loadObject()
+        basic = False
+        for i in [int, str, bool, type]:
+            if isinstance(val, i):
+                new_value = deepcopy(val)
+                basic = True
+                break
+        if not basic:
+            new_value = Descriptor.cleanValue(obj, val, _set_name)
+        obj.setSchemaAttribute(_set_name, new_value)
+        obj._setDirty()
+
+
+def time_gets(raw_j, num_accesses):
+    start = time.time()
+    for _ in range(num_accesses // len(get_attrs)):
+        for attr in get_attrs:
+            getattr(raw_j, attr)
+    return num_accesses / (time.time() - start)
+
+
+def time_sets(raw_j, num_accesses):
+    start = time.time()
+    for _ in range(num_accesses // len(set_values)):
+        for attr, value in set_values:
+            setattr(raw_j, attr, value)
+    return num_accesses / (time.time() - start)
+
+
+if __name__ == '__main__':
+    num_accesses = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    gangadir = tempfile.mkdtemp()
+    from GangaCore.testlib.GangaUnitTest import start_ganga, stop_ganga
+    try:
+        start_ganga(gangadir, extra_opts=opts)
+        from GangaCore.GPI import Job
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.GPIDev.Base.Objects import Descriptor
+        # A subjob of a job in the registry, so it takes the lock and the session lock of its master
+        raw_j = stripProxy(Job())
+        raw_sj = stripProxy(Job())
+        raw_sj._setParent(raw_j)
+
+        new_get, new_set = Descriptor.__get__, Descriptor.__set__
+        Descriptor.__get__, Descriptor.__set__ = old_get, old_set
+        try:
+            old_rates = time_gets(raw_sj, num_accesses), time_sets(raw_sj, num_accesses)
+        finally:
+            Descriptor.__get__, Descriptor.__set__ = new_get, new_set
+        new_rates = time_gets(raw_sj, num_accesses), time_sets(raw_sj, num_accesses)
+
+        print('%d accesses of the attributes of a subjob' % num_accesses)
+        print('%-22s %14s %14s' % ('', 'get /s', 'set /s'))
+        print('%-22s %14.0f %14.0f' % ('same checks each time', old_rates[0], old_rates[1]))
+        print('%-22s %14.0f %14.0f' % ('per attribute', new_rates[0], new_rates[1]))
+    finally:
+        stop_ganga()
+        shutil.rmtree(gangadir)
@@ -0,0 +1,85 @@
+"""
+Compare the time taken to read the index of every job in a repository from one pickled <id>.index file per job, as
+GangaRepositoryLocal used to, with reading the single index file written by ColumnarIndex.
+
+Run with:
+    python benchmark_job_index.py [number of jobs]
+"""
+import os
+import sys
+import time
+import pickle
+import shutil
+import tempfile
+
+from GangaCore.Core.GangaRepository.ColumnarIndex import ColumnarIndex
+
+statuses = ['completed', 'failed', 'running', 'submitted']
+
+
+def make_cache(this_id):
+    """ An index cache like the one JobRegistry.getIndexCache makes for a job with a few subjobs """
+    return {'status': statuses[this_id % 4], 'id': this_id, 'name': 'analysis_%d' % this_id,
+            'display:fqid': str(this_id), 'display:status': statuses[this_id % 4], 'display:name': 'analysis_%d' % this_id,
+            'display:subjobs': 10, 'display:application': 'Executable', 'display:backend': 'Dirac',
+            'display:backend.actualCE': 'LCG.CERN.cern', 'display:comment': '',
+            'subjobs:status': [statuses[(this_id + i) % 4] for i in range(10)]}
+
+
+def write_legacy(root, num_jobs):
+    for this_id in range(num_jobs):
+        chunk = os.path.join(root, '%ixxx' % (this_id // 1000))
+        if this_id % 1000 == 0:
+            os.makedirs(chunk)
+        with open(os.path.join(chunk, '%i.index' % this_id), 'wb') as f:
+            pickle.dump(('jobs', 'Job', make_cache(this_id)), f, 1)
+
+
+def read_legacy(root, num_jobs):
+    entries = {}
+    for this_id in range(num_jobs):
+        fn = os.path.join(root, '%ixxx' % (this_id // 1000), '%i.index' % this_id)
+        os.stat(fn)
+        with open(fn, 'rb') as f:
+            entries[this_id] = pickle.load(f)
+    return entries
+
+
+def write_columnar(fn, num_jobs):
+    index = ColumnarIndex(fn)
+    with index.transaction():
+        for this_id in range(num_jobs):
+            index.write(this_id, 'jobs', 'Job', make_cache(this_id))
+    index.close()
+
+
+def read_columnar(fn):
+    index = ColumnarIndex(fn)
+    entries = dict(index.refresh())
+    index.close()
+    return entries
+
+
+if __name__ == '__main__':
+    num_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    root = tempfile.mkdtemp()
+    try:
+        write_legacy(os.path.join(root, 'legacy'), num_jobs)
+        fn = os.path.join(root, 'index.cidx')
+        write_columnar(fn, num_jobs)
+
+        start = time.time()
+        legacy = read_legacy(os.path.join(root, 'legacy'), num_jobs)
+        legacy_time = time.time() - start
+
+        start = time.time()
+        columnar = read_columnar(fn)
+        columnar_time = time.time() - start
+
+        assert len(columnar) == len(legacy) == num_jobs
+        assert columnar[num_jobs - 1] == legacy[num_jobs - 1]
+        print('%d jobs, index file of %.1f MB' % (num_jobs, os.path.getsize(fn) / 1e6))
+        print('%-25s %8.3f s' % ('pickled .index files', legacy_time))
+        print('%-25s %8.3f s' % ('columnar index file', columnar_time))
+    finally:
+        shutil.rmtree(root)
@@ -0,0 +1,85 @@
+"""
+Compare the time taken to read the status and backend id of every job through the GPI proxies when each access looked
+up what the proxy class could do, as the proxies used to, with the proxies which work it out once per class, and with
+jobs.values() which reads them without building any proxies.
+
+Run with:
+    python benchmark_proxy.py [number of jobs]
+"""
+import sys
+import time
+import shutil
+import tempfile
+
+opts = [('TestingFramework', 'AutoCleanup', 'False')]
+
+
+def old_getattribute(self, name):
+    """ The __getattribute__ of the proxy classes before it was worked out once per class """
+    from GangaCore.GPIDev.Base.Proxy import GPIProxyObject, stripProxy, addProxy, isType, getName, implRef
+    from GangaCore.GPIDev.Base.Objects import GangaObject, ObjectMetaclass
+    from GangaCore.Core.exceptions import GangaAttributeError
+    if name.startswith('__') or name == implRef:
+        return GPIProxyObject.__getattribute__(self, name)
+    else:
+        implInstance = stripProxy(self)
+        if '_attribute_filter__get__' in dir(implInstance) and \
+                not isType(implInstance, ObjectMetaclass) and \
+                implInstance._schema.hasItem(name) and \
+                not implInstance._schema.getItem(name)['hidden']:
+            returnable = addProxy(implInstance._attribute_filter__get__(name))
+        else:
+            try:
+                returnable = GPIProxyObject.__getattribute__(self, name)
+            except AttributeError:
+                raise GangaAttributeError("Object '%s' does not have attribute: '%s'" % (getName(self), name))
+    if isType(returnable, GangaObject):
+        return addProxy(returnable)
+    else:
+        return returnable
+
+
+def read_loop(jobs):
+    return [(j.status, j.backend.id) for j in jobs]
+
+
+def read_values(jobs):
+    return jobs.values('status', 'backend.id')
+
+
+def time_read(read, jobs):
+    start = time.time()
+    values = read(jobs)
+    return time.time() - start, values
+
+
+if __name__ == '__main__':
+    num_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    gangadir = tempfile.mkdtemp()
+    from GangaCore.testlib.GangaUnitTest import start_ganga, stop_ganga
+    try:
+        start_ganga(gangadir, extra_opts=opts)
+        from GangaCore.GPI import Job, Local, jobs
+        for _ in range(num_jobs):
+            Job(backend=Local())
+
+        proxy_classes = set(type(j) for j in jobs) | set(type(j.backend) for j in jobs)
+        new_getattributes = dict((cls, cls.__getattribute__) for cls in proxy_classes)
+        for cls in proxy_classes:
+            cls.__getattribute__ = old_getattribute
+        try:
+            old_time, old_values = time_read(read_loop, jobs)
+        finally:
+            for cls, getattribute in new_getattributes.items():
+                cls.__getattribute__ = getattribute
+        new_time, new_values = time_read(read_loop, jobs)
+        values_time, values = time_read(read_values, jobs)
+
+        assert old_values == new_values == values
+        print('status and backend.id of %d jobs' % num_jobs)
+        print('%-32s %8.3f s' % ('lookups on every access', old_time))
+        print('%-32s %8.3f s' % ('worked out per class', new_time))
+        print('%-32s %8.3f s' % ('jobs.values()', values_time))
+    finally:
+        stop_ganga()
+        shutil.rmtree(gangadir)
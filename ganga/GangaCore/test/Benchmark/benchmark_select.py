@@ -0,0 +1,102 @@
+"""
+Compare the time taken by jobs.select() on a repository of jobs which haven't been loaded yet when every job is
+matched attribute by attribute, as RegistrySlice.do_select used to, with the compiled select which answers from the
+index of each job.
+
+Run with:
+    python benchmark_select.py [number of jobs]
+"""
+import re
+import sys
+import time
+import shutil
+import fnmatch
+import tempfile
+
+# The selections timed, all of them can be answered from the index
+selections = [{'status': 'new'}, {'name': 'analysis_1*'}, {'backend': 'Interactive'}, {'application': 'Executable', 'name': '*7'}]
+
+opts = [('TestingFramework', 'AutoCleanup', 'False')]
+
+
+def make_jobs(num_jobs):
+    """ Jobs with a few different names and backends """
+    from GangaCore.GPI import Job, Local, Interactive
+    from GangaCore.Core.GangaRepository import getRegistry
+    for i in range(num_jobs):
+        Job(name='analysis_%d' % i, backend=Interactive() if i % 10 == 0 else Local())
+    getRegistry('jobs').flush_all()
+
+
+def old_select(reg_slice, **attrs):
+    """ The matching of the jobs in RegistrySlice.do_select before it was compiled """
+    from GangaCore.GPIDev.Base.Proxy import getName, getRuntimeGPIObject
+    from GangaCore.GPIDev.Base.Filters import allComponentFilters
+    from GangaCore.GPIDev.Schema import ComponentItem
+    from GangaCore.Utility.logging import getLogger
+    logger = getLogger()
+    for k, v in attrs.items():
+        if isinstance(v, str):
+            new_val = getRuntimeGPIObject(v, True)
+            if new_val is not None:
+                attrs[k] = new_val
+    selected_ids = []
+    for this_id in reg_slice.objects.keys():
+        obj = reg_slice.objects[this_id]
+        logger.debug("id, obj: %s, %s" % (this_id, obj))
+        selected = True
+        for a in attrs:
+            item = obj._schema.getItem(a)
+            attrvalue = attrs[a]
+            if item.isA(ComponentItem):
+                filtered_value = allComponentFilters[item['category']](attrs[a], item)
+                attrvalue = getName(filtered_value) if filtered_value is not None else getName(attrvalue)
+                if getName(getattr(obj, a)) != attrvalue:
+                    selected = False
+                    break
+            elif isinstance(attrvalue, str):
+                if not re.compile(fnmatch.translate(attrvalue)).match(str(getattr(obj, a))):
+                    selected = False
+            elif getattr(obj, a) != attrvalue:
+                selected = False
+                break
+        if selected:
+            selected_ids.append(this_id)
+    return selected_ids
+
+
+def time_selections(select):
+    results = []
+    start = time.time()
+    for attrs in selections:
+        results.append(select(dict(attrs)))
+    return time.time() - start, results
+
+
+if __name__ == '__main__':
+    num_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    gangadir = tempfile.mkdtemp()
+    from GangaCore.testlib.GangaUnitTest import start_ganga, stop_ganga
+    try:
+        start_ganga(gangadir, extra_opts=opts)
+        make_jobs(num_jobs)
+        stop_ganga()
+
+        # A new session which hasn't loaded any job, the compiled select goes first as the old one loads the jobs
+        start_ganga(gangadir, extra_opts=opts)
+        from GangaCore.Core.GangaRepository import getRegistry
+        registry = getRegistry('jobs')
+        reg_slice = registry.getSlice()
+        len(registry)
+
+        new_time, new_results = time_selections(lambda attrs: list(reg_slice.select(**attrs).objects.keys()))
+        num_loaded = len(registry.repository.loaded_ids())
+        old_time, old_results = time_selections(lambda attrs: old_select(reg_slice, **attrs))
+
+        assert new_results == old_results
+        print('%d jobs, %d selections, %d jobs loaded by the compiled select' % (num_jobs, len(selections), num_loaded))
+        print('%-25s %8.3f s' % ('per job matching', old_time))
+        print('%-25s %8.3f s' % ('compiled select', new_time))
+    finally:
+        stop_ganga()
+        shutil.rmtree(gangadir)
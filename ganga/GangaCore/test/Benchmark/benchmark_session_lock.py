@@ -0,0 +1,101 @@
+"""
+Compare the time taken by the session lock heartbeat when it ran touch in a shell, as it used to, with updating the
+timestamps through an open descriptor, and the time taken to lock ids with other sessions active when every lock file
+was read on each call with reading only those which have changed.
+
+Run with:
+    python benchmark_session_lock.py [number of calls]
+"""
+import os
+import sys
+import time
+import pickle
+import shutil
+import tempfile
+
+opts = [('TestingFramework', 'AutoCleanup', 'False')]
+
+# Number of other sessions holding locks in the session directory
+num_sessions = 20
+
+
+def old_touch(fn):
+    """ The heartbeat of a session file before it was done in-process """
+    os.system('touch "%s"' % fn)
+    return os.stat(fn).st_ctime
+
+
+def old_lock_ids(mgr, ids):
+    """ lock_ids before the lock files of the other sessions were cached, without the global lock """
+    ids = set(ids)
+    sessions = [sn for sn in os.listdir(mgr.sdir) if sn.endswith(mgr.name + ".locks")]
+    slocked = set()
+    for session in sessions:
+        sf = mgr._path_helper(session)
+        if sf == mgr.fn:
+            continue
+        slocked.update(mgr.session_read(sf))
+    ids.difference_update(slocked)
+    mgr.locked.update(ids)
+    mgr.session_write()
+    return list(ids)
+
+
+def new_lock_ids(mgr, ids):
+    """ lock_ids without the global lock """
+    ids = set(ids)
+    for slocked in mgr.other_sessions_locks().values():
+        ids.difference_update(slocked)
+    if not ids.issubset(mgr.locked):
+        mgr.locked.update(ids)
+        mgr.session_write()
+    return list(ids)
+
+
+def time_calls(call, num_calls):
+    start = time.time()
+    for i in range(num_calls):
+        call(i)
+    return time.time() - start
+
+
+if __name__ == '__main__':
+    num_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    gangadir = tempfile.mkdtemp()
+    from GangaCore.testlib.GangaUnitTest import start_ganga, stop_ganga
+    try:
+        start_ganga(gangadir, extra_opts=opts)
+        from GangaCore.Core.GangaRepository.SessionLock import SessionLockManager, SessionLockRefresher
+
+        lock_root = tempfile.mkdtemp(dir=gangadir)
+        mgr = SessionLockManager(None, lock_root, 'jobs')
+        mgr.mkdir(mgr.sdir)
+        with open(mgr.fn, 'wb') as f:
+            f.write(pickle.dumps(set()))
+        then = time.time() - 100
+        for i in range(num_sessions):
+            sf = os.path.join(mgr.sdir, 'host.%i.PID.%i.session.jobs.locks' % (i, i))
+            with open(sf, 'wb') as f:
+                f.write(pickle.dumps(set(range(1000 * (i + 1), 1000 * (i + 1) + 100))))
+            os.utime(sf, (then, then))
+        os.utime(mgr.sdir, (then, then))
+
+        refresher = SessionLockRefresher(mgr.session_name, mgr.sdir, mgr.fn, None, False)
+        try:
+            old_touch_time = time_calls(lambda i: old_touch(mgr.fn), num_calls)
+            new_touch_time = time_calls(lambda i: refresher.touchFile(mgr.fn), num_calls)
+        finally:
+            refresher.closeFiles()
+
+        # lock the same few ids over and over, as the monitoring does for the jobs it updates
+        old_lock_time = time_calls(lambda i: old_lock_ids(mgr, [i % 10]), num_calls)
+        new_lock_time = time_calls(lambda i: new_lock_ids(mgr, [i % 10]), num_calls)
+
+        print('%d calls, %d other sessions' % (num_calls, num_sessions))
+        print('%-32s %8.3f s' % ('heartbeat with touch', old_touch_time))
+        print('%-32s %8.3f s' % ('heartbeat with utime', new_touch_time))
+        print('%-32s %8.3f s' % ('lock_ids reading every file', old_lock_time))
+        print('%-32s %8.3f s' % ('lock_ids reading changed files', new_lock_time))
+    finally:
+        stop_ganga()
+        shutil.rmtree(gangadir)
@@ -0,0 +1,77 @@
+"""
+Compare the time and memory taken to split a job with GenericSplitter, ArgSplitter and GangaDatasetSplitter when every
+subjob is a full copy of the master, as ISplitter.createSubjob used to make them, with the subjobs which share the
+objects the splitter doesn't change with one copy of the master until they're accessed.
+
+Run with:
+    python benchmark_splitters.py [number of subjobs]
+"""
+import sys
+import time
+import shutil
+import tempfile
+import tracemalloc
+
+opts = [('TestingFramework', 'AutoCleanup', 'False')]
+
+
+def make_jobs(num_subjobs):
+    """ A master job for each splitter, with a few output files and a backend the splitters don't change """
+    from GangaCore.GPI import Job, Local, LocalFile, GenericSplitter, ArgSplitter, GangaDatasetSplitter, GangaDataset
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+    outputfiles = [LocalFile('*.root'), LocalFile('stdout'), LocalFile('summary.xml')]
+    jobs = {}
+    jobs['GenericSplitter'] = Job(backend=Local(), outputfiles=outputfiles,
+                                  splitter=GenericSplitter(attribute='application.args', values=[[str(i)] for i in range(num_subjobs)]))
+    jobs['ArgSplitter'] = Job(backend=Local(), outputfiles=outputfiles,
+                              splitter=ArgSplitter(args=[[str(i)] for i in range(num_subjobs)]))
+    jobs['GangaDatasetSplitter'] = Job(backend=Local(), outputfiles=outputfiles,
+                                       inputdata=GangaDataset(files=[LocalFile('data_%d.root' % i) for i in range(num_subjobs)]),
+                                       splitter=GangaDatasetSplitter(files_per_subjob=1))
+    return dict((name, stripProxy(j)) for name, j in jobs.items())
+
+
+def full_copy_subjob(self, job, additional_skip_args=None):
+    """ ISplitter.createSubjob before the subjobs were shared copies of the master """
+    return self._createSubjobTemplate(job, additional_skip_args or [])
+
+
+def time_split(raw_j):
+    """ Returns the time taken to split the job and the memory held by its subjobs """
+    tracemalloc.start()
+    start = time.time()
+    subjobs = raw_j.splitter.validatedSplit(raw_j)
+    duration = time.time() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return duration, size, subjobs
+
+
+if __name__ == '__main__':
+    num_subjobs = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    gangadir = tempfile.mkdtemp()
+    from GangaCore.testlib.GangaUnitTest import start_ganga, stop_ganga
+    try:
+        start_ganga(gangadir, extra_opts=opts)
+        from GangaCore.GPIDev.Adapters.ISplitter import ISplitter
+        jobs = make_jobs(num_subjobs)
+
+        print('%d subjobs, times include the tracing of the memory' % num_subjobs)
+        print('%-22s %16s %16s' % ('', 'full copies', 'shared copies'))
+        for name, raw_j in sorted(jobs.items()):
+            shared_createSubjob = ISplitter.createSubjob
+            ISplitter.createSubjob = full_copy_subjob
+            try:
+                old_time, old_size, old_subjobs = time_split(raw_j)
+            finally:
+                ISplitter.createSubjob = shared_createSubjob
+            new_time, new_size, new_subjobs = time_split(raw_j)
+
+            assert len(new_subjobs) == len(old_subjobs) == num_subjobs
+            assert new_subjobs[-1].application.args == old_subjobs[-1].application.args
+            assert new_subjobs[-1].outputfiles == old_subjobs[-1].outputfiles
+            print('%-22s %6.2f s %6.1f MB %6.2f s %6.1f MB' % (name, old_time, old_size / 1e6, new_time, new_size / 1e6))
+            del old_subjobs, new_subjobs
+    finally:
+        stop_ganga()
+        shutil.rmtree(gangadir)
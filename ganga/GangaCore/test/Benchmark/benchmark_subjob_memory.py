@@ -0,0 +1,73 @@
+"""
+Compare the memory taken by the subjob index of a job held as a dict per subjob, as it used to be, with the columns of a
+SubJobIndex, and the memory taken by the subjobs after reading all of them with and without [Configuration]compactSubjobs
+
+Run with:
+    python benchmark_subjob_memory.py [number of subjobs]
+"""
+import sys
+import shutil
+import tempfile
+import tracemalloc
+
+opts = [('TestingFramework', 'AutoCleanup', 'False')]
+
+
+def measure(build):
+    """ Returns the memory held by what build returns and what it returned """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, built
+
+
+def read_all(raw_j):
+    """ Read the status of every subjob through the subjobs themselves, as a loop over j.subjobs does """
+    subjobs = raw_j.subjobs
+    for i in range(len(subjobs)):
+        subjobs[i].status
+    return subjobs
+
+
+if __name__ == '__main__':
+    num_subjobs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    gangadir = tempfile.mkdtemp()
+    from GangaCore.testlib.GangaUnitTest import start_ganga, stop_ganga
+    try:
+        start_ganga(gangadir, extra_opts=opts)
+        from GangaCore.GPI import Job, ArgSplitter, jobs
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
+        from GangaCore.Core.GangaRepository.SubJobIndex import SubJobIndex
+        from GangaCore.Utility.Config import setConfigOption
+
+        j = Job(splitter=ArgSplitter(args=[[i] for i in range(num_subjobs)]))
+        raw_j = stripProxy(j)
+        raw_j.subjobs = GangaList()
+        for i, sj in enumerate(raw_j.splitter.split(raw_j)):
+            sj.id = i
+            raw_j.subjobs.append(sj)
+        raw_j._setDirty()
+        raw_j._getRegistry().flush_all()
+
+        registry = raw_j._getRegistry()
+        entries = [registry.getIndexCache(sj) for sj in raw_j.subjobs]
+        dict_size, _ = measure(lambda: dict((i, dict(entry)) for i, entry in enumerate(entries)))
+        index_size, _ = measure(lambda: SubJobIndex(dict(enumerate(entries))))
+
+        sizes = {}
+        for compact in (False, True):
+            setConfigOption('Configuration', 'compactSubjobs', compact)
+            registry.repository.load([raw_j.id])
+            sizes[compact], _ = measure(lambda: read_all(raw_j))
+
+        print('%d subjobs' % num_subjobs)
+        print('%-32s %8.1f kB' % ('index as a dict per subjob', dict_size / 1024.))
+        print('%-32s %8.1f kB' % ('index as columns', index_size / 1024.))
+        print('%-32s %8.1f kB' % ('all subjobs kept', sizes[False] / 1024.))
+        print('%-32s %8.1f kB' % ('unchanged subjobs released', sizes[True] / 1024.))
+    finally:
+        stop_ganga()
+        shutil.rmtree(gangadir)
@@ -0,0 +1,93 @@
+"""
+Compare the time taken to decode the <value> elements of the XML of a master job with many subjobs, and to load the
+whole job, when the values are eval'ed through an unbounded cache and deep-copied, as the Loader used to, with the
+LiteralDecoder.
+
+Run with:
+    python benchmark_xml_load.py [number of subjobs]
+"""
+import gc
+import re
+import sys
+import copy
+import time
+import shutil
+import tempfile
+from io import StringIO
+
+from benchmark_xml_writer import make_master
+
+
+def make_eval_decoder():
+    """ The decoding of <value> elements as it was done before the LiteralDecoder """
+    from GangaCore.Utility.Config import config_scope
+    cached_eval_strings = {}
+
+    def decode_value(s):
+        s = re.sub(r'(\d)L(\})', r'\1\2', s)
+        if s not in cached_eval_strings:
+            cached_eval_strings[s] = eval(s, config_scope)
+        value = cached_eval_strings[s]
+        if not isinstance(value, str):
+            return copy.deepcopy(value)
+        return value
+    return decode_value, cached_eval_strings
+
+
+def time_decode(decode_value, values):
+    gc.collect()
+    start = time.time()
+    for s in values:
+        decode_value(s)
+    return time.time() - start
+
+
+def time_load(xml):
+    from GangaCore.Core.GangaRepository.VStreamer import from_file
+    gc.collect()
+    start = time.time()
+    obj, errors = from_file(StringIO(xml))
+    assert errors == []
+    return time.time() - start, obj
+
+
+if __name__ == '__main__':
+    num_subjobs = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    gangadir = tempfile.mkdtemp()
+    from GangaCore.testlib.GangaUnitTest import start_ganga, stop_ganga
+    start_ganga(gangadir)
+    try:
+        from GangaCore.Core.GangaRepository import VStreamer, LiteralDecoder
+        sio = StringIO()
+        VStreamer.to_file(make_master(num_subjobs), sio)
+        xml = sio.getvalue()
+
+        values = [VStreamer.unescape(s) for s in re.findall(r'<value>(.*?)</value>', xml)]
+
+        eval_decode, eval_cache = make_eval_decoder()
+        eval_decode_time = time_decode(eval_decode, values)
+        LiteralDecoder._decode_literal.cache_clear()
+        decoder_decode_time = time_decode(LiteralDecoder.decode_value, values)
+
+        # The loads are dominated by building the objects, so take the best of two alternating runs of each
+        eval_time, decoder_time = [], []
+        for _ in range(2):
+            VStreamer.decode_value, eval_cache = make_eval_decoder()
+            try:
+                eval_time.append(time_load(xml)[0])
+            finally:
+                VStreamer.decode_value = LiteralDecoder.decode_value
+            LiteralDecoder._decode_literal.cache_clear()
+            load_time, decoder_job = time_load(xml)
+            decoder_time.append(load_time)
+            assert len(decoder_job.subjobs) == num_subjobs
+            del decoder_job
+        eval_time, decoder_time = min(eval_time), min(decoder_time)
+
+        print('master job with %d subjobs, %.1f MB of XML, %d values (%d distinct)' % (num_subjobs, len(xml) / 1e6, len(values), len(set(values))))
+        print('%-25s %12s %12s %s' % ('', 'decode', 'load', 'cached values'))
+        print('%-25s %10.3f s %10.3f s %d, unbounded' % ('eval with global cache', eval_decode_time, eval_time, len(eval_cache)))
+        print('%-25s %10.3f s %10.3f s %d, at most %d' % ('LiteralDecoder', decoder_decode_time, decoder_time, LiteralDecoder.cache_info().currsize, LiteralDecoder.CACHE_SIZE))
+    finally:
+        stop_ganga()
+        shutil.rmtree(gangadir)
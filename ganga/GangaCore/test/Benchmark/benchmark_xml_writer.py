@@ -0,0 +1,57 @@
+"""
+Compare the time taken to write the XML of a master job with many subjobs with the VStreamer visitor, as to_file used
+to, with the single pass XMLWriter. Both have to produce exactly the same document.
+
+Run with:
+    python benchmark_xml_writer.py [number of subjobs]
+"""
+import sys
+import time
+import shutil
+import tempfile
+from io import StringIO
+
+
+def make_master(num_subjobs):
+    """ A master job with num_subjobs subjobs as they are after splitting """
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+    from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
+    from GangaCore.GPI import Job, ArgSplitter, LocalFile
+
+    j = Job(splitter=ArgSplitter(args=[['arg_%d' % i, i] for i in range(num_subjobs)]))
+    j.inputfiles = [LocalFile('input_%d.txt' % i) for i in range(5)]
+    j.outputfiles = [LocalFile('*.root')]
+    master = stripProxy(j)
+    master.subjobs = GangaList()
+    for i, sj in enumerate(master.splitter.split(master)):
+        sj.id = i
+        master.subjobs.append(sj)
+    return master
+
+
+def time_writer(write, master):
+    sio = StringIO()
+    start = time.time()
+    write(master, sio, [])
+    return time.time() - start, sio.getvalue()
+
+
+if __name__ == '__main__':
+    num_subjobs = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    gangadir = tempfile.mkdtemp()
+    from GangaCore.testlib.GangaUnitTest import start_ganga, stop_ganga
+    start_ganga(gangadir)
+    try:
+        from GangaCore.Core.GangaRepository.VStreamer import _visitor_to_file, _raw_to_file
+        master = make_master(num_subjobs)
+
+        visitor_time, visitor_xml = time_writer(_visitor_to_file, master)
+        writer_time, writer_xml = time_writer(_raw_to_file, master)
+
+        assert writer_xml == visitor_xml
+        print('master job with %d subjobs, %.1f MB of XML' % (num_subjobs, len(writer_xml) / 1e6))
+        print('%-25s %8.3f s' % ('VStreamer visitor', visitor_time))
+        print('%-25s %8.3f s' % ('XMLWriter', writer_time))
+    finally:
+        stop_ganga()
+        shutil.rmtree(gangadir)
@@ -0,0 +1,49 @@
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+num_jobs = 5
+
+
+class TestSessionLocks(GangaUnitTest):
+
+    def setUp(self):
+        """Make sure that the Job objects aren't destroyed between tests and that the sessions lock them on disk"""
+        extra_opts = [('TestingFramework', 'AutoCleanup', 'False'), ('Configuration', 'lockingStrategy', 'UNIX')]
+        super(TestSessionLocks, self).setUp(extra_opts=extra_opts)
+
+    def test_a_JobConstruction(self):
+        """ Construct the jobs in one session"""
+        from GangaCore.GPI import Job
+
+        for _ in range(num_jobs):
+            Job()
+
+    def test_b_LockedAtOnce(self):
+        """ The jobs are locked in another session with a single request to the session lock"""
+        from GangaCore.GPI import jobs
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        raw_jobs = [stripProxy(j) for j in jobs]
+        registry = raw_jobs[0]._getRegistry()
+        self.assertFalse(any(getattr(j, '_registry_locked', False) for j in raw_jobs))
+
+        sessionlock = registry.repository.sessionlock
+        requests = []
+        lock_ids = sessionlock.lock_ids
+
+        def counted_lock_ids(ids):
+            requests.append(list(ids))
+            return lock_ids(ids)
+        sessionlock.lock_ids = counted_lock_ids
+        try:
+            registry._acquire_session_locks(raw_jobs)
+            self.assertEqual([sorted(ids) for ids in requests], [list(range(num_jobs))])
+            self.assertTrue(all(j._registry_locked for j in raw_jobs))
+            self.assertTrue(set(range(num_jobs)).issubset(sessionlock.locked))
+
+            # The jobs are already locked so nothing more is asked for
+            registry._acquire_session_locks(raw_jobs)
+            for j in raw_jobs:
+                j._getSessionLock()
+            self.assertEqual(len(requests), 1)
+        finally:
+            del sessionlock.lock_ids
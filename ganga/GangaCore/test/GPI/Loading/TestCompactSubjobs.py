@@ -0,0 +1,77 @@
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+# More than SubJobXMLList._max_loaded_subjobs so that reading all of them releases some
+num_subjobs = 150
+
+
+def getSubJobs():
+    """ The SubJobXMLList of the only job"""
+    from GangaCore.GPI import jobs
+    from GangaCore.GPIDev.Base.Proxy import stripProxy
+    return stripProxy(jobs(0)).subjobs
+
+
+class TestCompactSubjobs(GangaUnitTest):
+
+    def setUp(self):
+        """Make sure that the Job object isn't destroyed between tests"""
+        extra_opts = [('TestingFramework', 'AutoCleanup', 'False')]
+        super(TestCompactSubjobs, self).setUp(extra_opts=extra_opts)
+
+    def test_a_JobConstruction(self):
+        """ Construct a job with subjobs and store it"""
+        from GangaCore.GPI import Job, ArgSplitter
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
+
+        j = Job(splitter=ArgSplitter(args=[[i] for i in range(num_subjobs)]))
+        raw_j = stripProxy(j)
+        raw_j.subjobs = GangaList()
+        for i, sj in enumerate(raw_j.splitter.split(raw_j)):
+            sj.id = i
+            raw_j.subjobs.append(sj)
+        raw_j._setDirty()
+        raw_j._getRegistry().flush_all()
+
+    def test_b_UnchangedSubjobsReleased(self):
+        """ Reading every subjob only keeps those which are still in use"""
+        from GangaCore.Core.GangaRepository.SubJobXMLList import SubJobXMLList
+        from GangaCore.GPI import jobs
+
+        subjobs = getSubJobs()
+        self.assertIsInstance(subjobs, SubJobXMLList)
+
+        self.assertEqual(jobs(0).subjobs.values('id', 'status', 'backend.id', 'backend.exitcode'),
+                         [(i, 'new', -1, None) for i in range(num_subjobs)])
+        self.assertFalse(any(subjobs.isLoaded(i) for i in range(num_subjobs)))
+
+        kept = subjobs[0]
+        statuses = [subjobs[i].status for i in range(num_subjobs)]
+        self.assertEqual(statuses, ['new'] * num_subjobs)
+        self.assertLess(len(subjobs._cachedJobs), num_subjobs)
+
+        # The subjob still in use is handed back rather than read again
+        subjobs._releaseSubJobs()
+        self.assertFalse(subjobs.isLoaded(0))
+        self.assertIs(subjobs[0], kept)
+        self.assertEqual(subjobs.getAllSJStatus(), ['new'] * num_subjobs)
+
+    def test_c_ChangedSubjobKept(self):
+        """ A change to a subjob after it was released is kept until it's flushed"""
+        subjobs = getSubJobs()
+        sj = subjobs[1]
+        subjobs._releaseSubJobs()
+        self.assertFalse(subjobs.isLoaded(1))
+
+        sj.name = 'changed'
+        self.assertTrue(subjobs.isLoaded(1))
+        subjobs._releaseSubJobs()
+        self.assertTrue(subjobs.isLoaded(1))
+        sj._getRegistry().flush_all()
+
+    def test_d_ChangeStored(self):
+        """ The change was written"""
+        from GangaCore.GPI import jobs
+
+        self.assertEqual(jobs(0).subjobs(1).name, 'changed')
+        self.assertEqual(jobs(0).subjobs(2).name, '')
@@ -0,0 +1,62 @@
+
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+numJobs = 30
+
+
+def getJobsRepository():
+    from GangaCore.Core.GangaRepository import getRegistry
+    return getRegistry('jobs').repository
+
+
+class TestParallelStartup(GangaUnitTest):
+
+    def setUp(self):
+        """Make sure that the Job objects aren't destroyed between tests"""
+        extra_opts = [('TestingFramework', 'AutoCleanup', 'False'), ('Registry', 'StartupThreads', 2)]
+        super(TestParallelStartup, self).setUp(extra_opts=extra_opts)
+
+    def test_a_JobConstruction(self):
+        """ First construct the Job objects"""
+        from GangaCore.GPI import Job, jobs
+        for i in range(numJobs):
+            Job(name='job_%i' % i)
+        self.assertEqual(len(jobs), numJobs)
+
+    def test_b_BackgroundStartup(self):
+        """ Jobs are accessible by id while the rest of the repository is loaded in the background"""
+        from GangaCore.GPI import jobs
+
+        repo = getJobsRepository()
+        last_id = numJobs - 1
+        repo.wait_for_index([last_id])
+        self.assertIn(last_id, repo.objects)
+        self.assertEqual(jobs(last_id).name, 'job_%i' % last_id)
+
+        self.assertEqual(len(jobs), numJobs)
+        self.assertEqual(repo.pending_ids(), [])
+        self.assertEqual([j.name for j in jobs], ['job_%i' % i for i in range(numJobs)])
+
+        import GangaCore.Runtime
+        self.assertIn('registries', [phase for phase, _ in GangaCore.Runtime._prog.startup_times])
+
+
+class TestSerialStartup(GangaUnitTest):
+
+    def setUp(self):
+        """Create every job before startup returns"""
+        extra_opts = [('TestingFramework', 'AutoCleanup', 'False'), ('Registry', 'StartupThreads', 0)]
+        super(TestSerialStartup, self).setUp(extra_opts=extra_opts)
+
+    def test_a_JobConstruction(self):
+        """ First construct the Job objects"""
+        from GangaCore.GPI import Job
+        for i in range(numJobs):
+            Job(name='job_%i' % i)
+
+    def test_b_AllLoadedAtStartup(self):
+        """ With no startup threads every job has been created when startup returns"""
+        repo = getJobsRepository()
+        self.assertEqual(repo.pending_ids(), [])
+        self.assertEqual(len(repo.objects), numJobs)
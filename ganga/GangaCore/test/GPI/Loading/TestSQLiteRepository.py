@@ -0,0 +1,111 @@
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+import sqlite3
+
+numSubJobs = 5
+
+
+def getRepository():
+    """ The repository of the jobs registry"""
+    from GangaCore.Core.GangaRepository import getRegistry
+    return getRegistry('jobs').repository
+
+
+def queryRepository(statement, args=()):
+    """ Run a query on the database of the jobs registry from a connection of its own"""
+    con = sqlite3.connect(getRepository().dbfile)
+    try:
+        return con.execute(statement, args).fetchall()
+    finally:
+        con.close()
+
+
+class TestSQLiteRepository(GangaUnitTest):
+
+    def setUp(self):
+        """Make sure that the Job objects aren't destroyed between tests"""
+        extra_opts = [('Configuration', 'repositorytype', 'SQLite'), ('TestingFramework', 'AutoCleanup', 'False')]
+        super(TestSQLiteRepository, self).setUp(extra_opts=extra_opts)
+
+    def test_a_JobConstruction(self):
+        """ Jobs and their subjobs are stored as rows of the objects table"""
+        from GangaCore.GPI import Job, ArgSplitter, Interactive
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
+
+        self.assertEqual(getRepository().__class__.__name__, 'GangaRepositorySQLite')
+
+        Job(name='first')
+        Job(name='second', backend=Interactive())
+        j = Job(name='split', splitter=ArgSplitter(args=[[i] for i in range(numSubJobs)]))
+        raw_j = stripProxy(j)
+        raw_j.subjobs = GangaList()
+        for i, sj in enumerate(raw_j.splitter.split(raw_j)):
+            sj.id = i
+            raw_j.subjobs.append(sj)
+        raw_j._setDirty()
+        raw_j._getRegistry().flush_all()
+
+        rows = queryRepository("SELECT id, status, name, backend, application FROM objects WHERE parent = -1 ORDER BY id")
+        self.assertEqual(rows, [(0, 'new', 'first', 'Local', 'Executable'),
+                                (1, 'new', 'second', 'Interactive', 'Executable'),
+                                (2, 'new', 'split', 'Local', 'Executable')])
+        sj_rows = queryRepository("SELECT id FROM objects WHERE parent = 2 ORDER BY id")
+        self.assertEqual(sj_rows, [(i,) for i in range(numSubJobs)])
+
+        # The new jobs are locked by this session
+        locks = queryRepository("SELECT id FROM locks WHERE session = ?", (getRepository().session_name,))
+        self.assertEqual(sorted(locks), [(0,), (1,), (2,)])
+
+    def test_b_JobsNotLoaded(self):
+        """ A new session creates the jobs from the index without loading them, and select uses the indexed columns"""
+        from GangaCore.GPI import jobs
+
+        self.assertEqual(len(jobs), 3)
+        # The locks of the previous session have been released
+        self.assertEqual(queryRepository("SELECT COUNT(*) FROM locks"), [(0,)])
+
+        self.assertEqual([j.id for j in jobs.select(name='s*')], [1, 2])
+        self.assertEqual([j.id for j in jobs.select(backend='Interactive')], [1])
+        self.assertEqual([j.id for j in jobs.select(status='new')], [0, 1, 2])
+        self.assertEqual(len(jobs.select(status='running')), 0)
+
+        # None of the jobs had to be loaded to answer the queries
+        self.assertEqual(getRepository().loaded_ids(), set())
+
+    def test_c_SubJobsLoaded(self):
+        """ Loading a master job loads its subjobs"""
+        from GangaCore.GPI import jobs
+
+        j = jobs(2)
+        self.assertEqual(len(j.subjobs), numSubJobs)
+        for i, sj in enumerate(j.subjobs):
+            self.assertEqual(sj.id, i)
+            self.assertEqual(sj.application.args, [i])
+            self.assertEqual(sj.master.id, 2)
+
+    def test_d_ChangedJobSelected(self):
+        """ A job changed in memory is selected by its new value before it's flushed, and only its row is rewritten"""
+        from GangaCore.GPI import jobs
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        versions = dict(queryRepository("SELECT id, version FROM objects WHERE parent = -1"))
+
+        jobs(0).name = 'renamed'
+        self.assertEqual([j.id for j in jobs.select(name='renamed')], [0])
+        self.assertEqual(queryRepository("SELECT id, session FROM locks"), [(0, getRepository().session_name)])
+
+        stripProxy(jobs(0))._getRegistry().flush_all()
+        new_versions = dict(queryRepository("SELECT id, version FROM objects WHERE parent = -1"))
+        self.assertEqual(new_versions[0], versions[0] + 1)
+        self.assertEqual(new_versions[1], versions[1])
+        self.assertEqual(queryRepository("SELECT name FROM objects WHERE parent = -1 AND id = 0"), [('renamed',)])
+
+    def test_e_RemoveJob(self):
+        """ Removing a master job removes the rows of its subjobs"""
+        from GangaCore.GPI import jobs
+
+        self.assertEqual([j.name for j in jobs], ['renamed', 'second', 'split'])
+        jobs(2).remove()
+        self.assertEqual(queryRepository("SELECT COUNT(*) FROM objects WHERE id = 2 OR parent = 2"), [(0,)])
+        self.assertEqual(len(jobs), 2)
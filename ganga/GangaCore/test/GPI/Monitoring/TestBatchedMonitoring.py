@@ -0,0 +1,85 @@
+import threading
+import time
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+
+class FakeJob(object):
+    """ The parts of a job the monitoring batches look at """
+
+    def __init__(self, id):
+        self.id = id
+        self.subjobs = []
+
+
+class FakeBackend(object):
+    """ Records which thread updated each batch of jobs """
+
+    def __init__(self, delay=0., fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+        self.threads = set()
+        self.lock = threading.Lock()
+
+    def master_updateMonitoringInformation(self, jobs):
+        time.sleep(self.delay)
+        with self.lock:
+            self.batches.append([j.id for j in jobs])
+            self.threads.add(threading.current_thread().name)
+        if self.fail:
+            raise Exception('status call failed')
+
+
+class TestBatchedMonitoring(GangaUnitTest):
+
+    def setUp(self):
+        extra_opts = [('PollThread', 'autostart', 'False'), ('PollThread', 'batch_target_time', 1.)]
+        super(TestBatchedMonitoring, self).setUp(extra_opts=extra_opts)
+
+    def test_a_BatchSizeAdapts(self):
+        """The batch size grows for fast full batches and shrinks for slow or failed ones"""
+        from GangaCore.Core.MonitoringComponent.Local_GangaMC_Service import BackendBatchTuner
+
+        tuner = BackendBatchTuner(10)
+        tuner.record(5, 0.1)
+        self.assertEqual(tuner.batch_size, 10)
+        tuner.record(10, 0.1)
+        self.assertEqual(tuner.batch_size, 20)
+        tuner.record(20, 4.)
+        self.assertEqual(tuner.batch_size, 5)
+        tuner.record(5, 0.1, failed=True)
+        self.assertEqual(tuner.batch_size, 2)
+
+        stats = tuner.stats()
+        self.assertEqual(stats['batches'], 4)
+        self.assertEqual(stats['jobs'], 40)
+        self.assertEqual(stats['errors'], 1)
+
+    def test_b_BatchesRunConcurrently(self):
+        """Every batch is updated once, using more than one monitoring thread"""
+        from GangaCore.Core import monitoring_component
+        from GangaCore.Core.MonitoringComponent.Local_GangaMC_Service import get_jobs_in_bunches, getMonitoringThroughput
+
+        backend = FakeBackend(delay=0.2)
+        bunches = get_jobs_in_bunches([FakeJob(i) for i in range(20)], blocks_of_size=5, stripProxies=False)
+        self.assertEqual(monitoring_component._updateInBatches(backend, bunches), [])
+
+        self.assertEqual(sorted(i for batch in backend.batches for i in batch), list(range(20)))
+        self.assertGreater(len(backend.threads), 1)
+        self.assertEqual(getMonitoringThroughput()['FakeBackend']['jobs'], 20)
+
+        from GangaCore.GPI import queues
+        self.assertIn('FakeBackend', queues._display())
+
+    def test_c_BatchErrorsReturned(self):
+        """Exceptions from the backend are collected and the remaining batches are still updated"""
+        from GangaCore.Core import monitoring_component
+        from GangaCore.Core.MonitoringComponent.Local_GangaMC_Service import get_jobs_in_bunches
+
+        backend = FakeBackend(fail=True)
+        bunches = get_jobs_in_bunches([FakeJob(i) for i in range(10)], blocks_of_size=5, stripProxies=False)
+        errors = monitoring_component._updateInBatches(backend, bunches)
+
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(len(backend.batches), 2)
@@ -0,0 +1,28 @@
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+from GangaCore.testlib.monitoring import run_until_state
+
+
+class TestMonitoredJobs(GangaUnitTest):
+
+    def setUp(self):
+        extra_opts = [('PollThread', 'autostart', 'False'), ('PollThread', 'base_poll_rate', 1)]
+        super(TestMonitoredJobs, self).setUp(extra_opts=extra_opts)
+
+    def test_a_MonitoredIds(self):
+        """The registry tracks which jobs the monitoring has to poll as their status changes"""
+        from GangaCore.GPI import Job, jobs
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        registry = stripProxy(jobs).objects
+
+        j_new = Job()
+        j = Job()
+        self.assertNotIn(j.id, registry.getMonitoredIds())
+
+        j.submit()
+        self.assertIn(j.id, registry.getMonitoredIds())
+        self.assertNotIn(j_new.id, registry.getMonitoredIds())
+
+        run_until_state(j, 'completed', break_states=['failed', 'killed'])
+        self.assertIn(j.status, ['completed', 'failed', 'killed'])
+        self.assertNotIn(j.id, registry.getMonitoredIds())
@@ -0,0 +1,50 @@
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+from GangaCore.Core.exceptions import IncompleteJobSubmissionError
+import pytest
+
+num_subjobs = 12
+
+
+class TestParallelSubmitStages(GangaUnitTest):
+
+    def setUp(self):
+        """Retry a failed submission once, straight away"""
+        extra_opts = [('Queues', 'MaxInFlight', 3), ('Queues', 'SubmitRetries', 1), ('Queues', 'SubmitRetryBackoff', 0.)]
+        super(TestParallelSubmitStages, self).setUp(extra_opts=extra_opts)
+
+    def test_a_StagesTimed(self):
+        """ The subjobs are prepared and submitted through the bounded pipeline and each stage is timed """
+        from GangaCore.GPI import Job, TestSplitter, TestSubmitter
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        j = Job()
+        j.splitter = TestSplitter()
+        j.splitter.backs = [TestSubmitter() for _ in range(num_subjobs)]
+        j.backend = TestSubmitter()
+        j.parallel_submit = True
+        j.submit()
+
+        assert all(sj.status in ['submitted', 'running'] for sj in j.subjobs)
+        stages = stripProxy(j)._submit_timer.getStages()
+        assert stages['prepare'][1] == num_subjobs
+        assert stages['sandbox'][1] == 1
+        assert stages['submit'][1] == num_subjobs
+
+    def test_b_FailedSubmitRetried(self):
+        """ A subjob which fails to submit is retried before it's given up on, without holding up the others """
+        from GangaCore.GPI import Job, TestSplitter, TestSubmitter
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        j = Job()
+        j.splitter = TestSplitter()
+        j.splitter.backs = [TestSubmitter() for _ in range(num_subjobs)]
+        j.splitter.backs[4].fail = 'submit'
+        j.backend = TestSubmitter()
+        j.parallel_submit = True
+
+        with pytest.raises(IncompleteJobSubmissionError):
+            j.submit(keep_going=True)
+
+        assert j.subjobs[4].status == 'new'
+        assert all(sj.status in ['submitted', 'running'] for sj in j.subjobs if sj.id != 4)
+        assert stripProxy(j)._submit_timer.getStages()['submit'][1] == num_subjobs + 1
@@ -0,0 +1,56 @@
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+job_num = 6
+
+
+def getRepository():
+    """ The repository of the jobs registry"""
+    from GangaCore.Core.GangaRepository import getRegistry
+    return getRegistry('jobs').repository
+
+
+class TestSelectIndex(GangaUnitTest):
+
+    def setUp(self):
+        """Make sure that the Job objects aren't destroyed between tests"""
+        extra_opts = [('TestingFramework', 'AutoCleanup', 'False')]
+        super(TestSelectIndex, self).setUp(extra_opts=extra_opts)
+
+    def test_a_JobConstruction(self):
+        """ Construct jobs with different names and backends"""
+        from GangaCore.GPI import Job, Interactive, Local
+
+        for i in range(job_num):
+            Job(name='analysis_%d' % i, backend=Interactive() if i % 3 == 0 else Local(), comment='job %d' % i)
+        getRepository().registry.flush_all()
+
+    def test_b_SelectFromIndex(self):
+        """ A new session answers select from the index of the jobs without loading them"""
+        from GangaCore.GPI import jobs, Interactive
+
+        self.assertEqual(len(jobs), job_num)
+        self.assertEqual([j.id for j in jobs.select(name='analysis_[13]')], [1, 3])
+        self.assertEqual([j.id for j in jobs.select(backend=Interactive)], [0, 3])
+        self.assertEqual([j.id for j in jobs.select(backend='Local', status='new')], [1, 2, 4, 5])
+        self.assertEqual([j.id for j in jobs.select(2, 4, application='Executable')], [2, 3, 4])
+        self.assertEqual(len(jobs.select(status='running')), 0)
+        self.assertEqual(getRepository().loaded_ids(), set())
+
+        # The secondary index only returns the jobs which can match
+        self.assertEqual(getRepository().select_ids({'backend': ('Interactive', False)}), set([0, 3]))
+        self.assertEqual(getRepository().select_ids({'name': ('*_5', True), 'status': ('new', True)}), set([5]))
+
+        # The comment isn't in the index so the jobs have to be loaded to check it
+        self.assertEqual([j.id for j in jobs.select(comment='job 4')], [4])
+        self.assertEqual(getRepository().loaded_ids(), set(range(job_num)))
+
+    def test_c_ChangedJobSelected(self):
+        """ A job changed in memory is selected by its new value, and the secondary index follows it once flushed"""
+        from GangaCore.GPI import jobs, Local
+
+        jobs(0).backend = Local()
+        self.assertEqual([j.id for j in jobs.select(backend='Interactive')], [3])
+        self.assertEqual([j.id for j in jobs.select(backend='Local')], [0, 1, 2, 4, 5])
+
+        getRepository().registry.flush_all()
+        self.assertEqual(getRepository().select_ids({'backend': ('Interactive', False)}), set([3]))
@@ -0,0 +1,71 @@
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+job_num = 4
+
+
+def getRepository():
+    """ The repository of the jobs registry"""
+    from GangaCore.Core.GangaRepository import getRegistry
+    return getRegistry('jobs').repository
+
+
+class TestSliceValues(GangaUnitTest):
+
+    def setUp(self):
+        """Make sure that the Job objects aren't destroyed between tests"""
+        extra_opts = [('TestingFramework', 'AutoCleanup', 'False')]
+        super(TestSliceValues, self).setUp(extra_opts=extra_opts)
+
+    def test_a_JobConstruction(self):
+        """ Construct jobs with different names and backends, the last one with subjobs"""
+        from GangaCore.GPI import Job, Interactive, Local, ArgSplitter
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
+
+        for i in range(job_num):
+            Job(name='analysis_%d' % i, backend=Interactive() if i % 2 else Local())
+        j = Job(name='split', splitter=ArgSplitter(args=[['a'], ['b'], ['c']]))
+        raw_j = stripProxy(j)
+        raw_j.subjobs = GangaList()
+        for i, sj in enumerate(raw_j.splitter.split(raw_j)):
+            sj.id = i
+            raw_j.subjobs.append(sj)
+        raw_j._setDirty()
+        getRepository().registry.flush_all()
+
+    def test_b_ValuesFromIndex(self):
+        """ The values held in the index cache are read without loading the jobs"""
+        from GangaCore.GPI import jobs
+
+        self.assertEqual(jobs.values('id', 'name', 'status'),
+                         [(i, 'analysis_%d' % i, 'new') for i in range(job_num)] + [(job_num, 'split', 'new')])
+        self.assertEqual(getRepository().loaded_ids(), set())
+
+        self.assertEqual(jobs.select(0, 1).values('id'), [(0,), (1,)])
+
+    def test_c_ValuesOfComponents(self):
+        """ The attributes of components are read from the objects, with a proxy for those which are Ganga objects"""
+        from GangaCore.GPI import jobs, Local, Interactive
+        from GangaCore.GPIDev.Base.Proxy import isProxy, isType
+
+        values = jobs.values('backend', 'backend.id', 'splitter.args')
+        self.assertEqual(len(values), job_num + 1)
+        for i, (backend, backend_id, args) in enumerate(values[:job_num]):
+            self.assertTrue(isProxy(backend))
+            self.assertTrue(isType(backend, Interactive if i % 2 else Local))
+            self.assertEqual(backend_id, jobs(i).backend.id)
+            self.assertEqual(args, None)
+        self.assertEqual(values[job_num][2], [['a'], ['b'], ['c']])
+
+    def test_d_ValuesOfSubjobs(self):
+        """ The subjobs of a job answer values as well"""
+        from GangaCore.GPI import jobs
+
+        self.assertEqual(jobs(job_num).subjobs.values('id', 'application.args'), [(0, ['a']), (1, ['b']), (2, ['c'])])
+
+    def test_e_UndefinedAttribute(self):
+        """ An attribute which the objects don't have raises an error"""
+        from GangaCore.GPI import jobs
+        from GangaCore.GPIDev.Base import GangaAttributeError
+
+        self.assertRaises(GangaAttributeError, jobs.values, 'backend.not_an_attribute')
@@ -0,0 +1,159 @@
+import os
+import subprocess
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+# Stands in for the commands of the batch systems. Each call is written to the calls file next to it and numbered, the
+# number giving the id of the batch job submitted
+stub_script = """#!/bin/sh
+calls="$(dirname "$0")/calls"
+echo "$(basename "$0") $*" >> "$calls"
+n=$(( $(wc -l < "$calls") + 4240 ))
+case "$(basename "$0")" in
+    bsub) echo "Job <$n> is submitted to default queue <normal>." ;;
+    sbatch) echo "Submitted batch job $n" ;;
+    qsub) case "$*" in *"-J "*) echo "$n[].pbs" ;; *) echo "$n.pbs" ;; esac ;;
+esac
+"""
+
+stub_commands = ['bsub', 'bkill', 'sbatch', 'scancel', 'qsub', 'qdel']
+
+
+class TestBatchArray(GangaUnitTest):
+
+    def setUp(self):
+        """Make sure that the Job objects aren't destroyed between tests and put the stub batch commands on the PATH"""
+        extra_opts = [('TestingFramework', 'AutoCleanup', 'False')]
+        super(TestBatchArray, self).setUp(extra_opts=extra_opts)
+        self.stub_dir = os.path.join(self.gangadir(), 'stubs')
+        if not os.path.isdir(self.stub_dir):
+            os.makedirs(self.stub_dir)
+            for command in stub_commands:
+                path = os.path.join(self.stub_dir, command)
+                with open(path, 'w') as f:
+                    f.write(stub_script)
+                os.chmod(path, 0o755)
+        self.old_path = os.environ['PATH']
+        os.environ['PATH'] = self.stub_dir + os.pathsep + self.old_path
+
+    def tearDown(self):
+        os.environ['PATH'] = self.old_path
+        super(TestBatchArray, self).tearDown()
+
+    def calls(self):
+        """The calls made to the stub batch commands so far"""
+        with open(os.path.join(self.stub_dir, 'calls')) as f:
+            return f.read().splitlines()
+
+    @staticmethod
+    def split_job(backend, num_subjobs):
+        """Submit a job split into num_subjobs subjobs to the backend"""
+        from GangaCore.GPI import Job, Executable, ArgSplitter
+        j = Job(application=Executable(), backend=backend)
+        j.splitter = ArgSplitter(args=[[str(i)] for i in range(num_subjobs)])
+        j.submit()
+        return j
+
+    def test_a_LSFArray(self):
+        """The subjobs are submitted as one LSF job array, each with the id of its element"""
+        from GangaCore.GPI import LSF
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        j = self.split_job(LSF(), 3)
+
+        calls = self.calls()
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(calls[0].startswith('bsub'))
+        self.assertIn('-J ganga_0[1-3]', calls[0])
+        self.assertEqual([sj.backend.id for sj in j.subjobs], ['4241[1]', '4241[2]', '4241[3]'])
+        self.assertEqual([stripProxy(sj.backend).array_index for sj in j.subjobs], [1, 2, 3])
+        self.assertEqual([sj.backend.actualqueue for sj in j.subjobs], ['normal'] * 3)
+        self.assertEqual([sj.status for sj in j.subjobs], ['submitted'] * 3)
+
+    def test_b_ArrayScript(self):
+        """Each element of the array runs the job script of the subjob with its index"""
+        from GangaCore.GPI import jobs
+
+        j = jobs(0)
+        sj = j.subjobs[1]
+        with open(os.path.join(sj.inputdir, '__jobscript__'), 'w') as f:
+            f.write('#!/bin/sh\necho "subjob $PWD"\n')
+
+        array_script = os.path.join(j.inputdir, '__jobarray_0__')
+        env = dict(os.environ, LSB_JOBINDEX='2')
+        self.assertEqual(subprocess.call(['/bin/sh', array_script], env=env), 0)
+        with open(os.path.join(sj.outputdir, 'stdout')) as f:
+            self.assertEqual(f.read().strip(), 'subjob ' + sj.inputdir.rstrip('/'))
+
+        env['LSB_JOBINDEX'] = '4'
+        with open(os.devnull, 'w') as devnull:
+            self.assertEqual(subprocess.call(['/bin/sh', array_script], env=env, stderr=devnull), 1)
+
+    def test_c_MonitorElement(self):
+        """A running element of the array keeps its id rather than taking the pid of the job"""
+        from GangaCore.GPI import jobs
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.Lib.Batch import LSF
+
+        sj = stripProxy(jobs(0).subjobs[0])
+        with open(os.path.join(sj.getOutputWorkspace().getPath(), '__jobstatus__'), 'w') as f:
+            f.write('PID: 1234\nQUEUE: normal\n')
+        LSF.updateMonitoringInformation([sj])
+
+        self.assertEqual(sj.status, 'running')
+        self.assertEqual(sj.backend.id, '4241[1]')
+
+    def test_d_KillElement(self):
+        """An element of the array is killed on its own"""
+        from GangaCore.GPI import jobs
+
+        jobs(0).subjobs[2].kill()
+        self.assertEqual(self.calls()[-1], 'bkill 4241[3]')
+        self.assertEqual(jobs(0).subjobs[2].status, 'killed')
+
+    def test_e_SlurmAndPBSArrays(self):
+        """Slurm and PBS arrays are submitted with their own options and element ids"""
+        from GangaCore.GPI import Slurm, PBS
+
+        j = self.split_job(Slurm(), 2)
+        self.assertIn('--array=1-2', self.calls()[-1])
+        self.assertTrue(self.calls()[-1].startswith('sbatch'))
+        n = len(self.calls()) + 4240
+        self.assertEqual([sj.backend.id for sj in j.subjobs], ['%d_1' % n, '%d_2' % n])
+
+        j = self.split_job(PBS(), 2)
+        self.assertIn('-J 1-2', self.calls()[-1])
+        self.assertTrue(self.calls()[-1].startswith('qsub'))
+        n = len(self.calls()) + 4240
+        self.assertEqual([sj.backend.id for sj in j.subjobs], ['%d[1]' % n, '%d[2]' % n])
+
+    def test_f_ArraySize(self):
+        """No array is larger than array_max_size"""
+        from GangaCore.GPI import LSF
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.Utility.Config import getConfig
+
+        num_calls = len(self.calls())
+        getConfig('LSF').setSessionValue('array_max_size', 2)
+        try:
+            j = self.split_job(LSF(), 5)
+        finally:
+            getConfig('LSF').revertToDefault('array_max_size')
+
+        calls = self.calls()[num_calls:]
+        self.assertEqual(len(calls), 3)
+        self.assertEqual([c.split('[')[1].split(']')[0] for c in calls], ['1-2', '1-2', '1-1'])
+        self.assertEqual([stripProxy(sj.backend).array_index for sj in j.subjobs], [1, 2, 1, 2, 1])
+        self.assertEqual(len(set(sj.backend.id for sj in j.subjobs)), 5)
+
+    def test_g_OneByOne(self):
+        """Jobs which aren't split, and subjobs given the array option in extraopts, are submitted one by one"""
+        from GangaCore.GPI import Job, Executable, LSF
+
+        num_calls = len(self.calls())
+        Job(application=Executable(), backend=LSF()).submit()
+        self.split_job(LSF(extraopts='-J myname'), 3)
+
+        calls = self.calls()[num_calls:]
+        self.assertEqual(len(calls), 4)
+        self.assertTrue(all(c.startswith('bsub') and '[' not in c for c in calls))
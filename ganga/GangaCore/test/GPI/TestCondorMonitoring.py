@@ -0,0 +1,80 @@
+import os
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+from GangaCore.testlib.fake_condor import install_fake_condor, fake_condor_calls, set_fake_condor_job
+
+
+class TestCondorMonitoring(GangaUnitTest):
+
+    def setUp(self):
+        """Put freshly installed fake Condor commands on the PATH, with the monitoring loop off so that only the calls
+        made by the tests themselves are logged"""
+        extra_opts = [('PollThread', 'autostart', 'False')]
+        super(TestCondorMonitoring, self).setUp(extra_opts=extra_opts)
+        self.fake_dir = os.path.join(self.gangadir(), 'fake_condor')
+        install_fake_condor(self.fake_dir)
+        self.old_path = os.environ['PATH']
+        os.environ['PATH'] = self.fake_dir + os.pathsep + self.old_path
+
+    def tearDown(self):
+        os.environ['PATH'] = self.old_path
+        super(TestCondorMonitoring, self).tearDown()
+
+    def calls_since(self, num_calls):
+        """The commands of the calls made to the fake Condor since the first num_calls"""
+        return [c.split()[0] for c in fake_condor_calls(self.fake_dir)[num_calls:]]
+
+    def submit_split_job(self):
+        """Submit a job of three subjobs to the fake Condor, they're given the cluster.proc ids 100.0 to 100.2"""
+        from GangaCore.GPI import Job, Executable, ArgSplitter, Condor
+
+        j = Job(application=Executable(), backend=Condor())
+        j.splitter = ArgSplitter(args=[[str(i)] for i in range(3)])
+        j.submit()
+        return j
+
+    def test_a_SubmitStoresGlobalIds(self):
+        """The global ids of all the subjobs are found with a single query at submission"""
+        num_calls = len(fake_condor_calls(self.fake_dir))
+        j = self.submit_split_job()
+
+        self.assertEqual(self.calls_since(num_calls), ['condor_submit', 'condor_q'])
+        self.assertEqual([sj.backend.id.split('#')[:2] for sj in j.subjobs],
+                         [['fakeschedd.example.com', '100.%d' % i] for i in range(3)])
+        self.assertEqual([sj.status for sj in j.subjobs], ['submitted'] * 3)
+
+    def test_b_SingleQueryForAllJobs(self):
+        """The status of all the jobs comes from one condor_q and, for those which left the queue, one condor_history"""
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.Lib.Condor import Condor
+
+        j = self.submit_split_job()
+        set_fake_condor_job(self.fake_dir, '100.0', JobStatus='2', RemoteHost='slot1@node01', RemoteUserCpu='12.0')
+        set_fake_condor_job(self.fake_dir, '100.1', JobStatus='4')
+        with open(os.path.join(j.subjobs[1].outputdir, 'stdout'), 'w') as f:
+            f.write('Job end: now\nExit code: 0\n')
+
+        num_calls = len(fake_condor_calls(self.fake_dir))
+        Condor.updateMonitoringInformation([stripProxy(sj) for sj in j.subjobs])
+
+        self.assertEqual(self.calls_since(num_calls), ['condor_q', 'condor_history'])
+        self.assertEqual([sj.status for sj in j.subjobs], ['running', 'completed', 'submitted'])
+        self.assertEqual(j.subjobs[0].backend.actualCE, 'slot1@node01')
+        self.assertEqual(j.subjobs[0].backend.cputime, '12.0')
+        self.assertEqual(j.subjobs[1].backend.status, 'Completed')
+        self.assertEqual(j.subjobs[2].backend.status, 'Idle')
+
+    def test_c_NoHistoryWhileQueued(self):
+        """condor_history isn't called while all the jobs are in the queue, and a local id is resolved to the global id"""
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.Lib.Condor import Condor
+
+        sj = stripProxy(self.submit_split_job().subjobs[2])
+        sj.backend.id = '100.2'
+
+        num_calls = len(fake_condor_calls(self.fake_dir))
+        Condor.updateMonitoringInformation([sj])
+
+        self.assertEqual(self.calls_since(num_calls), ['condor_q'])
+        self.assertTrue(sj.backend.id.startswith('fakeschedd.example.com#100.2#'))
+        self.assertEqual(sj.status, 'submitted')
@@ -0,0 +1,100 @@
+from io import StringIO
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+
+class TestSplitterCopyOnWrite(GangaUnitTest):
+
+    def _split(self, j):
+        """ Split the job without submitting it and return its subjobs """
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        raw_j = stripProxy(j)
+        return raw_j.splitter.validatedSplit(raw_j)
+
+    def test_a_SharedUntilAccessed(self):
+        """ The objects a splitter doesn't change are shared with one copy of the master until they're accessed """
+        from GangaCore.GPI import Job, ArgSplitter, Local, LocalFile
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        j = Job(backend=Local(nice=3), outputfiles=[LocalFile('*.root')])
+        j.splitter = ArgSplitter(args=[['a'], ['b'], ['c']])
+        subjobs = self._split(j)
+
+        self.assertEqual([sj.application.args for sj in subjobs], [['a'], ['b'], ['c']])
+        self.assertTrue(all('backend' in sj._shared_data for sj in subjobs))
+        self.assertIs(subjobs[0]._shared_data['backend'], subjobs[1]._shared_data['backend'])
+        self.assertIsNot(subjobs[0]._shared_data['backend'], stripProxy(j.backend))
+
+        # The first access copies the backend, so a change to it stays with the subjob
+        backend = subjobs[0].backend
+        self.assertNotIn('backend', subjobs[0]._shared_data)
+        self.assertIs(backend._getParent(), subjobs[0])
+        backend.nice = 5
+        self.assertEqual(subjobs[1].backend.nice, 3)
+        self.assertEqual(j.backend.nice, 3)
+
+        self.assertEqual(subjobs[2].outputfiles[0].namePattern, '*.root')
+        self.assertIs(subjobs[2].outputfiles._getParent(), subjobs[2])
+
+    def test_b_StreamedWithoutCopy(self):
+        """ A subjob is written the same whether or not its objects are still shared """
+        from GangaCore.GPI import Job, GenericSplitter, Local
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.GPIDev.Base.Objects import GangaObject
+        from GangaCore.Core.GangaRepository.VStreamer import to_file
+
+        j = Job(backend=Local(nice=2))
+        j.splitter = GenericSplitter(attribute='application.args', values=[['1'], ['2']])
+        shared_sj, copied_sj = self._split(j)
+        shared_sj.id, copied_sj.id = 0, 0
+        copied_sj.application.args = ['1']
+        # Reading every attribute copies everything still shared
+        for name in list(copied_sj._shared_data):
+            getattr(copied_sj, name)
+        self.assertIsNone(copied_sj._shared_data)
+
+        shared_xml = StringIO()
+        to_file(shared_sj, shared_xml)
+        self.assertIn('backend', shared_sj._shared_data)
+        copied_xml = StringIO()
+        to_file(copied_sj, copied_xml)
+        self.assertEqual(shared_xml.getvalue().replace(shared_sj.info.uuid, ''), copied_xml.getvalue().replace(copied_sj.info.uuid, ''))
+
+    def test_c_SubmittedSplit(self):
+        """ The subjobs of a submitted job each have their own objects """
+        from GangaCore.GPI import Job, ArgSplitter, TestSubmitter
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        j = Job(backend=TestSubmitter())
+        j.splitter = ArgSplitter(args=[[str(i)] for i in range(5)])
+        j.submit()
+
+        self.assertEqual([sj.id for sj in j.subjobs], list(range(5)))
+        raw_subjobs = [stripProxy(sj) for sj in j.subjobs]
+        self.assertTrue(all(sj._getParent() is stripProxy(j) for sj in raw_subjobs))
+        self.assertEqual(len(set(id(sj.backend) for sj in raw_subjobs)), 5)
+        self.assertEqual([sj.application.args for sj in j.subjobs], [[str(i)] for i in range(5)])
+
+    def test_d_FlushedWithoutCopy(self):
+        """ Flushing a split job writes its subjobs and their index without copying the objects they share """
+        from GangaCore.GPI import Job, ArgSplitter, Local
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
+
+        j = Job(backend=Local(nice=4))
+        j.splitter = ArgSplitter(args=[['a'], ['b'], ['c']])
+        raw_j = stripProxy(j)
+        subjobs = self._split(j)
+        for i, sj in enumerate(subjobs):
+            sj.id = i
+        raw_j.subjobs = GangaList()
+        raw_j.subjobs._bulkAppend(subjobs)
+        raw_j._getRegistry()._flush([raw_j])
+
+        raw_subjobs = [stripProxy(sj) for sj in raw_j.subjobs]
+        self.assertTrue(all('backend' in sj._shared_data for sj in raw_subjobs))
+        self.assertIs(raw_subjobs[0]._shared_data['backend'], raw_subjobs[2]._shared_data['backend'])
+        cache = raw_j._getRegistry().getIndexCache(raw_subjobs[1])
+        self.assertEqual(cache['display:backend'], 'Localhost')
+        self.assertEqual(cache['select:backend'], 'Local')
+        self.assertIn('backend', raw_subjobs[1]._shared_data)
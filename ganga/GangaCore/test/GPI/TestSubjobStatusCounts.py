@@ -0,0 +1,76 @@
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+numSubJobs = 10
+
+
+class TestSubjobStatusCounts(GangaUnitTest):
+
+    def setUp(self):
+        """Make sure that the Job object isn't destroyed between tests"""
+        extra_opts = [('TestingFramework', 'AutoCleanup', 'False')]
+        super(TestSubjobStatusCounts, self).setUp(extra_opts=extra_opts)
+
+    def test_a_CountsFollowTransitions(self):
+        """ The counts of the subjob statuses are updated on each subjob transition without looking at the subjobs"""
+        from GangaCore.GPI import Job, ArgSplitter
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
+
+        j = Job(splitter=ArgSplitter(args=[[i] for i in range(numSubJobs)]))
+        raw_j = stripProxy(j)
+        raw_j.subjobs = GangaList()
+        for i, sj in enumerate(raw_j.splitter.split(raw_j)):
+            sj.id = i
+            raw_j.subjobs.append(sj)
+
+        self.assertEqual(raw_j.getSubJobStatuses(), set(['new']))
+        self.assertEqual(raw_j.returnSubjobStatuses(), '0/0/0/0')
+
+        # Once built the counts mustn't be rebuilt from the subjobs
+        counts = raw_j._getSubJobStatusCounts()
+        for sj in raw_j.subjobs:
+            sj.updateStatus('submitting')
+        self.assertIs(raw_j._getSubJobStatusCounts(), counts)
+        self.assertEqual(raw_j.status, 'submitting')
+
+        for sj in raw_j.subjobs[:3]:
+            sj.updateStatus('submitted')
+        raw_j.subjobs[0].updateStatus('running')
+        raw_j.subjobs[1].updateStatus('failed')
+        self.assertIs(raw_j._getSubJobStatusCounts(), counts)
+        self.assertEqual(raw_j.getSubJobStatuses(), set(['submitting', 'submitted', 'running', 'failed']))
+        self.assertEqual(raw_j.returnSubjobStatuses(), '1/1/0/0')
+        self.assertEqual(counts['submitting'], numSubJobs - 3)
+
+        for sj in raw_j.subjobs[3:]:
+            sj.updateStatus('submitted')
+        self.assertEqual(raw_j.status, 'submitted')
+
+        raw_j._setDirty()
+        raw_j._getRegistry().flush_all()
+
+    def test_b_CountsRebuiltFromIndex(self):
+        """ The counts are rebuilt from the subjob index when the job is loaded, without loading the subjobs"""
+        from GangaCore.GPI import jobs, disableMonitoring
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        disableMonitoring()
+        raw_j = stripProxy(jobs(0))
+        self.assertEqual(raw_j.returnSubjobStatuses(), '1/1/0/0')
+        self.assertEqual(raw_j.getSubJobStatuses(), set(['submitted', 'running', 'failed']))
+        for i in range(numSubJobs):
+            self.assertFalse(raw_j.subjobs.isLoaded(i))
+
+        # Once built the counts are handed out without looking at the job directory again
+        from GangaCore.Core.GangaRepository.SubJobXMLList import SubJobXMLList
+        with patch.object(SubJobXMLList, '__len__', side_effect=AssertionError('The subjobs were counted')):
+            self.assertEqual(raw_j.returnSubjobStatuses(), '1/1/0/0')
+
+        # A transition of a loaded subjob is counted
+        raw_j.subjobs[0].updateStatus('completed')
+        self.assertEqual(raw_j.returnSubjobStatuses(), '0/1/0/1')
@@ -0,0 +1,75 @@
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+import datetime
+
+numSubJobs = 10
+
+# The timestamps given to the subjobs before they're stored
+start = datetime.datetime(2020, 1, 1, 12, 0, 0)
+
+
+class TestSubjobTimeSummary(GangaUnitTest):
+
+    def setUp(self):
+        """Make sure that the Job object isn't destroyed between tests"""
+        extra_opts = [('TestingFramework', 'AutoCleanup', 'False')]
+        super(TestSubjobTimeSummary, self).setUp(extra_opts=extra_opts)
+
+    def test_a_SummaryFollowsTransitions(self):
+        """ The summary of the subjob timestamps is updated on each subjob transition without looking at the subjobs"""
+        from GangaCore.GPI import Job, ArgSplitter
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
+
+        j = Job(splitter=ArgSplitter(args=[[i] for i in range(numSubJobs)]))
+        raw_j = stripProxy(j)
+        raw_j.subjobs = GangaList()
+        for i, sj in enumerate(raw_j.splitter.split(raw_j)):
+            sj.id = i
+            raw_j.subjobs.append(sj)
+
+        summary = raw_j.time._getSubJobSummary()
+        self.assertEqual(summary['stamps']['new'][2], numSubJobs)
+
+        for sj in raw_j.subjobs:
+            sj.updateStatus('submitting')
+        for sj in raw_j.subjobs:
+            sj.updateStatus('submitted')
+        self.assertIs(raw_j.time._getSubJobSummary(), summary)
+        self.assertEqual(raw_j.status, 'submitted')
+
+        sj_submitted = [sj.time.timestamps['submitted'] for sj in raw_j.subjobs]
+        self.assertEqual(summary['stamps']['submitted'], [min(sj_submitted), max(sj_submitted), numSubJobs])
+        self.assertEqual(raw_j.time.timestamps['submitted'], min(sj_submitted))
+        self.assertEqual(raw_j.time.submissiontime(), max(sj_submitted) - raw_j.time.timestamps['submitting'])
+
+        # Give the subjobs known backend timestamps to check the summary built from the index
+        for i, sj in enumerate(raw_j.subjobs):
+            sj.time.timestamps['backend_running'] = start + datetime.timedelta(minutes=i)
+            sj.time.timestamps['backend_final'] = start + datetime.timedelta(minutes=2 * i + 1)
+            sj._setDirty()
+        raw_j._setDirty()
+        raw_j._getRegistry().flush_all()
+
+    def test_b_SummaryBuiltFromIndex(self):
+        """ The summary is built from the subjob index when the job is loaded, without loading the subjobs"""
+        from GangaCore.GPI import jobs, disableMonitoring
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        disableMonitoring()
+        raw_j = stripProxy(jobs(0))
+
+        self.assertEqual(raw_j.time.runtime(), sum((datetime.timedelta(minutes=i + 1) for i in range(numSubJobs)), datetime.timedelta(0)))
+        self.assertEqual(raw_j.time.sjStatList_return('backend_running'), start)
+        self.assertEqual(raw_j.time.sjStatList_return('backend_final'), start + datetime.timedelta(minutes=2 * numSubJobs - 1))
+        self.assertEqual(raw_j.time.waittime(), start + datetime.timedelta(minutes=numSubJobs - 1) - raw_j.time.sjStatList_return('submitted'))
+        for i in range(numSubJobs):
+            self.assertFalse(raw_j.subjobs.isLoaded(i))
+
+        # Moving the first timestamp of a state later drops the summary, it's built again from the other subjobs
+        sj = raw_j.subjobs[0]
+        old_stamps = dict(sj.time.timestamps)
+        sj.time.timestamps['backend_running'] = start + datetime.timedelta(minutes=numSubJobs)
+        raw_j.time._subjobStampsChanged(old_stamps, sj.time.timestamps)
+        self.assertEqual(raw_j.time.sjStatList_return('backend_running'), start + datetime.timedelta(minutes=1))
+        self.assertEqual(raw_j.time.runtime(), sum((datetime.timedelta(minutes=i + 1) for i in range(1, numSubJobs)), datetime.timedelta(minutes=1 - numSubJobs)))
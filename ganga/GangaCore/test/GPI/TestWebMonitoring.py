@@ -0,0 +1,182 @@
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+import gzip
+import json
+import datetime
+import threading
+import time
+import urllib.error
+import urllib.request
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+numSubJobs = 30
+
+
+class TestWebMonitoring(GangaUnitTest):
+
+    def setUp(self):
+        """Make sure that the Job object isn't destroyed between tests"""
+        extra_opts = [('TestingFramework', 'AutoCleanup', 'False')]
+        super(TestWebMonitoring, self).setUp(extra_opts=extra_opts)
+
+    def _serve(self):
+        """ Start the handler of the web gui on a free port """
+        from GangaCore.Runtime.http_server import GetHandler, ThreadingHTTPServer
+        server = ThreadingHTTPServer(('localhost', 0), GetHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return 'http://localhost:%d/' % server.server_address[1]
+
+    @staticmethod
+    def _get(url, headers=None):
+        """ Returns the status, headers and JSON of a GET of the web gui """
+        request = urllib.request.Request(url, headers=headers or {})
+        try:
+            response = urllib.request.urlopen(request)
+        except urllib.error.HTTPError as err:
+            return err.code, err.headers, None
+        body = response.read()
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        body = body.decode('utf-8')
+        return response.status, response.headers, json.loads(body[body.index('(') + 1:body.rindex(')')])
+
+    def test_a_ChangeFeed(self):
+        """ The registry reports the jobs changed since the last poll of each consumer """
+        from GangaCore.GPI import Job, ArgSplitter
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
+        from GangaCore.Core.GangaRepository import getRegistry
+
+        reg = getRegistry('jobs')
+        j = Job(splitter=ArgSplitter(args=[[i] for i in range(numSubJobs)]))
+        raw_j = stripProxy(j)
+        raw_j.subjobs = GangaList()
+        for i, sj in enumerate(raw_j.splitter.split(raw_j)):
+            sj.id = i
+            raw_j.subjobs.append(sj)
+        raw_j._setDirty()
+        reg.flush_all()
+
+        self.assertEqual(reg.pollChangedJobs('test'), [0])
+        self.assertEqual(reg.pollChangedJobs('test'), [])
+
+        seq = reg.getJobChangeSeq(0)
+        raw_j.subjobs[3].updateStatus('submitting')
+        Job()
+        self.assertEqual(reg.pollChangedJobs('test'), [0, 1])
+        self.assertGreater(reg.getJobChangeSeq(0), seq)
+
+        reg.flush_all()
+
+    def test_b_SubjobPages(self):
+        """ The subjobs are sent a page at a time with an ETag which only changes with the job """
+        from GangaCore.GPI import jobs, disableMonitoring
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        disableMonitoring()
+        url = self._serve() + '?list=subjobs&taskmonid=0&jsonp_callback=cb'
+
+        status, headers, answer = self._get(url + '&offset=10&limit=5')
+        self.assertEqual(status, 200)
+        self.assertEqual(answer['total'], numSubJobs)
+        self.assertEqual([sj['id'] for sj in answer['taskjobs']], ['0.%d' % i for i in range(10, 15)])
+        self.assertEqual(answer['taskjobs'][0]['status'], 'new')
+        self.assertEqual(answer['taskjobs'][0]['backend'], 'Local')
+        # the rows are built from the subjob index
+        raw_j = stripProxy(jobs(0))
+        self.assertFalse(any(raw_j.subjobs.isLoaded(i) for i in range(numSubJobs)))
+
+        etag = headers['ETag']
+        status, headers, answer = self._get(url + '&offset=10&limit=5', {'If-None-Match': etag})
+        self.assertEqual(status, 304)
+
+        status, headers, answer = self._get(url, {'Accept-Encoding': 'gzip'})
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(len(answer['taskjobs']), numSubJobs)
+        self.assertEqual(answer['taskjobs'][3]['status'], 'submitting')
+
+        raw_j.subjobs[4].updateStatus('submitting')
+        status, headers, answer = self._get(url + '&offset=4&limit=1', {'If-None-Match': etag})
+        self.assertEqual(status, 200)
+        self.assertEqual(answer['taskjobs'][0]['status'], 'submitting')
+
+    def test_c_JobsView(self):
+        """ The view of the jobs follows the jobs added and removed """
+        from GangaCore.GPI import Job, jobs
+
+        url = self._serve() + '?list=jobs&jsonp_callback=cb'
+        status, headers, answer = self._get(url)
+        self.assertEqual([j['id'] for j in answer['user_taskstable']], ['0', '1'])
+        self.assertEqual(answer['user_taskstable'][0]['subjobs'], str(numSubJobs))
+        self.assertEqual(answer['user_taskstable'][0]['submitted'], '0')
+
+        status, headers, answer = self._get(url, {'If-None-Match': headers['ETag']})
+        self.assertEqual(status, 304)
+
+        jobs(1).remove()
+        Job()
+        status, headers, answer = self._get(url)
+        self.assertEqual([j['id'] for j in answer['user_taskstable']], ['0', '2'])
+
+        # A time range is relative to today, so the answer is sent again once it resolves to another window
+        from GangaCore.Runtime import http_server
+        status, headers, answer = self._get(url + '&timerange=lastWeek')
+        self.assertEqual(status, 200)
+        with patch.object(http_server, 'getFromDateFromTimeRange', return_value=datetime.datetime(2000, 1, 1)):
+            status, headers, answer = self._get(url + '&timerange=lastWeek', {'If-None-Match': headers['ETag']})
+        self.assertEqual(status, 200)
+
+    def test_d_ChartCounts(self):
+        """ The charts come from the counts kept by the view, a slow request doesn't hold up the others """
+        from GangaCore.GPI import jobs
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.Runtime import http_server
+
+        url = self._serve() + '?jsonp_callback=cb&list='
+        status, headers, answer = self._get(url + 'jobs_backends')
+        self.assertEqual(answer['chl'], 'Local')
+        self.assertEqual(answer['chd'], 't:2')
+
+        raw_j = stripProxy(jobs(0))
+        raw_j.subjobs[5].updateStatus('submitting')
+        status, headers, answer = self._get(url + 'subjobs_statuses&taskmonid=0')
+        counts = dict(zip(answer['chl'].split('|'), answer['chd'][2:].split(',')))
+        self.assertEqual(counts, {'new': str(numSubJobs - 3), 'submitting': '3'})
+        status, headers, answer = self._get(url + 'subjobs_backends&taskmonid=0')
+        self.assertEqual(answer['chd'], 't:%d' % numSubJobs)
+
+        # hold up a request until another one has been answered
+        entered = threading.Event()
+        answered = threading.Event()
+        orig_users_JSON = http_server.get_users_JSON
+
+        def slow_users_JSON():
+            entered.set()
+            answered.wait(60)
+            return orig_users_JSON()
+        http_server.get_users_JSON = slow_users_JSON
+        self.addCleanup(setattr, http_server, 'get_users_JSON', orig_users_JSON)
+
+        slow = threading.Thread(target=self._get, args=(url + 'users',))
+        slow.start()
+        entered.wait(60)
+        start = time.time()
+        status, headers, answer = self._get(url + 'subjobs&taskmonid=0&limit=1')
+        duration = time.time() - start
+        self.assertEqual(status, 200)
+        self.assertTrue(slow.is_alive())
+        answered.set()
+        slow.join()
+
+        status, headers, answer = self._get(url + 'metrics')
+        self.assertEqual(answer['users']['count'], 1)
+        self.assertGreaterEqual(answer['users']['max'], duration)
+        self.assertEqual(answer['subjobs_statuses']['count'], 1)
@@ -6,7 +6,7 @@ from os import path, stat, unlink
 
 import time
 
-from .utilFunctions import getJobsPath, getXMLDir, getXMLFile, getSJXMLFile, getSJXMLIndex, getIndexFile
+from .utilFunctions import getJobsPath, getXMLDir, getXMLFile, getSJXMLFile, getSJXMLIndex, getIndexEntry, getSJIndexEntries
 
 testStr = "testFooString"
 testArgs = [[1],[2],[3],[4],[5]]
@@ -50,7 +50,7 @@ class TestSJXMLGenAndLoad(GangaUnitTest):
 
         assert path.isfile(getXMLFile(j) + '~')
 
-        assert path.isfile(getIndexFile(j))
+        assert getIndexEntry(j) is not None
 
     def test_c_XMLAutoUpdated(self):
         # Check they get updated
@@ -217,61 +217,55 @@ class TestSJXMLGenAndLoad(GangaUnitTest):
 
     def test_h_testXMLIndex(self):
         # Check index of job
-        from GangaCore.Core.GangaRepository.PickleStreamer import to_file, from_file
+        from GangaCore.Core.GangaRepository.ColumnarIndex import normalise_cache
 
         from GangaCore.GPI import jobs
 
         j = jobs(0)
 
-        assert path.isfile(getIndexFile(j))
+        obj = getIndexEntry(j)
 
-        with open(getIndexFile(j), 'rb') as handler:
-            obj, errs = from_file(handler)
+        assert isinstance(obj, tuple)
 
-            assert isinstance(obj, tuple)
+        from GangaCore.GPIDev.Base.Proxy import stripProxy, getName
+        raw_j = stripProxy(j)
+        index_cache = raw_j._getRegistry().getIndexCache(raw_j)
+        assert isinstance(index_cache, dict)
 
-            from GangaCore.GPIDev.Base.Proxy import stripProxy, getName
-            raw_j = stripProxy(j)
-            index_cache = raw_j._getRegistry().getIndexCache(raw_j)
-            assert isinstance(index_cache, dict)
+        index_cls = getName(raw_j)
+        index_cat = raw_j._category
+        this_index_cache = (index_cat, index_cls, normalise_cache(index_cache))
 
-            index_cls = getName(raw_j)
-            index_cat = raw_j._category
-            this_index_cache = (index_cat, index_cls, index_cache)
+        print(("just-built index: %s" % str(this_index_cache)))
+        print(("from disk: %s" % str(obj)))
 
-            print(("just-built index: %s" % str(this_index_cache)))
-            print(("from disk: %s" % str(obj)))
-
-            assert this_index_cache == obj
+        assert this_index_cache == obj
 
     def test_i_testSJXMLIndex(self):
         # Check index of all sj
-        from GangaCore.Core.GangaRepository.PickleStreamer import to_file, from_file
-
         from GangaCore.GPI import jobs
 
         assert len(jobs) == 2
 
         j=jobs(0)
 
-        with open(getSJXMLIndex(j), 'rb') as handler:
-            obj, errs = from_file(handler)
+        obj, records = getSJIndexEntries(j)
 
-            assert isinstance(obj, dict)
+        assert isinstance(obj, dict)
 
-            from GangaCore.GPIDev.Base.Proxy import stripProxy, getName
-            raw_j = stripProxy(j)
+        from GangaCore.GPIDev.Base.Proxy import stripProxy, getName
+        raw_j = stripProxy(j)
 
-            new_dict = {}
-            for sj in j.subjobs:
-                raw_sj = stripProxy(sj)
-                temp_index = raw_sj._getRegistry().getIndexCache(raw_sj)
+        new_dict = {}
+        for sj in j.subjobs:
+            raw_sj = stripProxy(sj)
+            temp_index = raw_sj._getRegistry().getIndexCache(raw_sj)
 
-                new_dict[sj.id] = temp_index
-                assert raw_sj._category == raw_j._category
+            new_dict[sj.id] = temp_index
+            assert raw_sj._category == raw_j._category
 
-            for k, v in new_dict.items():
-                for k1, v1 in v.items():
-                    if k1 != 'modified':
-                        assert obj[k][k1] == new_dict[k][k1]
+        for k, v in new_dict.items():
+            for k1, v1 in v.items():
+                if k1 != 'modified':
+                    assert obj[k][k1] == new_dict[k][k1]
 
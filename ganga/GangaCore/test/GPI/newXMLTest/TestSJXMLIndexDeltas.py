@@ -0,0 +1,100 @@
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+from os import path, stat
+
+import time
+
+from .utilFunctions import getSJXMLFile, getSJXMLIndex, getSJIndexEntries
+
+numSubJobs = 20
+
+
+class TestSJXMLIndexDeltas(GangaUnitTest):
+
+    def setUp(self):
+        """Make sure that the Job object isn't destroyed between tests"""
+        extra_opts = [('TestingFramework', 'AutoCleanup', 'False')]
+        super(TestSJXMLIndexDeltas, self).setUp(extra_opts=extra_opts)
+
+    def test_a_JobConstruction(self):
+        """ First construct a job with subjobs, without submitting it so nothing else touches the subjobs"""
+        from GangaCore.GPI import Job, ArgSplitter
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.GPIDev.Lib.GangaList.GangaList import GangaList
+
+        j = Job(splitter=ArgSplitter(args=[[i] for i in range(numSubJobs)]))
+        raw_j = stripProxy(j)
+        raw_j.subjobs = GangaList()
+        for i, sj in enumerate(raw_j.splitter.split(raw_j)):
+            sj.id = i
+            raw_j.subjobs.append(sj)
+        raw_j._setDirty()
+        raw_j._getRegistry().flush_all()
+
+        assert path.isfile(getSJXMLIndex(j))
+        assert len(j.subjobs) == numSubJobs
+
+    def test_b_OnlyChangedSubJobsWritten(self):
+        """ Flushing after changing a few subjobs only writes those and appends their entries to the index"""
+        from GangaCore.GPI import jobs, disableMonitoring
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        disableMonitoring()
+        j = jobs(0)
+        subjobs = stripProxy(stripProxy(j).subjobs)
+
+        index_data, records = getSJIndexEntries(j)
+        assert sorted(index_data.keys()) == list(range(numSubJobs))
+
+        before = dict((i, stat(getSJXMLFile((0, i))).st_mtime) for i in range(numSubJobs))
+        index_size = path.getsize(getSJXMLIndex(j))
+        time.sleep(1.)
+
+        changed = [3, 11]
+        for i in changed:
+            j.subjobs(i).comment = 'changed %s' % i
+        subjobs.flush()
+
+        for i in range(numSubJobs):
+            if i in changed:
+                assert stat(getSJXMLFile((0, i))).st_mtime > before[i]
+            else:
+                assert stat(getSJXMLFile((0, i))).st_mtime == before[i]
+
+        new_index_data, new_records = getSJIndexEntries(j)
+        assert new_records == records + 1
+        assert path.getsize(getSJXMLIndex(j)) > index_size
+        for i in changed:
+            assert new_index_data[i]['display:comment'] == 'changed %s' % i
+        assert new_index_data[0] == index_data[0]
+
+        # Nothing has changed so nothing is appended
+        subjobs.flush()
+        assert getSJIndexEntries(j)[1] == new_records
+
+    def test_c_IndexCompaction(self):
+        """ Once enough deltas have been appended the index is rewritten as a single record in the background"""
+        from GangaCore.GPI import jobs, disableMonitoring
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        disableMonitoring()
+        j = jobs(0)
+        subjobs = stripProxy(stripProxy(j).subjobs)
+        # The third flush starts the compaction
+        subjobs._max_index_records = subjobs._index_records + 3
+
+        for n in range(3):
+            j.subjobs(n).comment = 'compacted %s' % n
+            subjobs.flush()
+
+        for _ in range(50):
+            if not subjobs._compacting:
+                break
+            time.sleep(0.1)
+
+        index_data, records = getSJIndexEntries(j)
+        assert records == 0
+        assert sorted(index_data.keys()) == list(range(numSubJobs))
+        for n in range(3):
+            assert index_data[n]['display:comment'] == 'compacted %s' % n
+        assert index_data[11]['display:comment'] == 'changed 11'
@@ -0,0 +1,76 @@
+from GangaCore.testlib.GangaUnitTest import GangaUnitTest
+
+from io import StringIO
+
+from .TestNestedXMLWorking import getNestedList
+
+
+def visitorXML(obj, ignore_subs):
+    """ The XML the VStreamer visitor writes for this object """
+    from GangaCore.Core.GangaRepository.VStreamer import _visitor_to_file
+    sio = StringIO()
+    _visitor_to_file(obj, sio, ignore_subs)
+    return sio.getvalue()
+
+
+def writerXML(obj, ignore_subs):
+    """ The XML to_file writes for this object """
+    from GangaCore.Core.GangaRepository.VStreamer import to_file
+    sio = StringIO()
+    to_file(obj, sio, ignore_subs)
+    return sio.getvalue()
+
+
+class TestXMLWriter(GangaUnitTest):
+
+    def test_a_SimpleJob(self):
+        """ A fresh job is written exactly as the visitor writes it"""
+        from GangaCore.GPI import Job
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        j = stripProxy(Job(name='a "quoted" <name> & more', comment=u'caf\xe9'))
+        self.assertEqual(writerXML(j, []), visitorXML(j, []))
+        self.assertEqual(writerXML(j, ['subjobs']), visitorXML(j, ['subjobs']))
+
+    def test_b_NestedObjects(self):
+        """ Nested GangaLists, files and plain sequences are written exactly as the visitor writes them"""
+        from GangaCore.GPI import Job, ArgSplitter, LocalFile, Executable
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        j = Job(application=Executable(exe='echo', args=['a', 1, ['b', 2]]))
+        j.splitter = ArgSplitter(args=getNestedList())
+        j.inputfiles = [LocalFile('a.txt'), LocalFile('b.txt')]
+        j.outputfiles = [LocalFile('*.root')]
+        j.application.env = {'FOO': 'bar<baz>'}
+        raw_j = stripProxy(j)
+
+        self.assertEqual(writerXML(raw_j, []), visitorXML(raw_j, []))
+        self.assertEqual(writerXML(raw_j.splitter, []), visitorXML(raw_j.splitter, []))
+
+    def test_c_Subjobs(self):
+        """ A master job with subjobs is written exactly as the visitor writes it, with and without the subjobs"""
+        from GangaCore.GPI import Job, ArgSplitter
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+
+        j = Job(splitter=ArgSplitter(args=[[i] for i in range(5)]))
+        j.submit()
+        raw_j = stripProxy(j)
+        self.assertEqual(len(raw_j.subjobs), 5)
+
+        self.assertEqual(writerXML(raw_j, []), visitorXML(raw_j, []))
+        self.assertEqual(writerXML(raw_j, ['subjobs']), visitorXML(raw_j, ['subjobs']))
+        self.assertNotEqual(writerXML(raw_j, []), writerXML(raw_j, ['subjobs']))
+        for sj in raw_j.subjobs:
+            self.assertEqual(writerXML(sj, ['subjobs']), visitorXML(sj, ['subjobs']))
+
+    def test_d_RoundTrip(self):
+        """ The written XML can be read back"""
+        from GangaCore.GPI import Job, ArgSplitter
+        from GangaCore.GPIDev.Base.Proxy import stripProxy
+        from GangaCore.Core.GangaRepository.VStreamer import from_file
+
+        j = stripProxy(Job(name='roundtrip', splitter=ArgSplitter(args=getNestedList())))
+        obj, errs = from_file(StringIO(writerXML(j, ['subjobs'])))
+        self.assertEqual(errs, [])
+        self.assertEqual(obj.name, 'roundtrip')
+        self.assertEqual(obj.splitter.args, getNestedList())
@@ -58,3 +58,32 @@ def getIndexFile(this_job):
     """
     return path.join(getXMLDir(this_job), '../%s.index' % str(this_job.id))
 
+
+# Entry of job in the columnar index
+def getIndexEntry(this_job):
+    """ Returns the (category, classname, cache) stored for a given job (Job or id) in the repo index file
+    Args:
+        this_job (Job, int): The Job or Job_ID of interest
+    """
+    from GangaCore.Core.GangaRepository.ColumnarIndex import ColumnarIndex
+    if not isinstance(this_job, int):
+        _id = this_job.id
+    else:
+        _id = this_job
+    index = ColumnarIndex(path.join(getJobsPath(), 'index.cidx'), use_locks=False)
+    try:
+        return dict(index.refresh()).get(_id)
+    finally:
+        index.close()
+
+# Entries of the sub-j index of job
+def getSJIndexEntries(this_j):
+    """ Returns the index data of all of the subjobs of a given job (Job or id) and the number of delta records in the file
+    Args:
+        this_job (Job, int): The Job or Job_ID of interest
+    """
+    from GangaCore.Core.GangaRepository.SubJobXMLList import SubJobXMLList
+    with open(getSJXMLIndex(this_j), 'rb') as handler:
+        index_data, records, complete = SubJobXMLList.read_subJobIndex(handler)
+    assert complete
+    return index_data, records
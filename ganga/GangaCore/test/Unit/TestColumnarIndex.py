@@ -0,0 +1,120 @@
+import os
+
+import pytest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+from GangaCore.Core.exceptions import RepositoryError
+from GangaCore.Core.GangaRepository import ColumnarIndex as ColumnarIndexModule
+from GangaCore.Core.GangaRepository.ColumnarIndex import ColumnarIndex, normalise_cache
+
+
+def make_cache(status, name, subjobs=()):
+    return {'status': status, 'id': 0, 'name': name, 'display:backend': 'Local', 'subjobs:status': list(subjobs)}
+
+
+def test_round_trip(tmpdir):
+    """Entries written in one session are read back unchanged by another"""
+    fn = str(tmpdir.join('index.cidx'))
+    writer = ColumnarIndex(fn)
+    with writer.transaction():
+        writer.write(1, 'jobs', 'Job', make_cache('running', 'first', ['completed', 'running', 'submitted']))
+        writer.write(2, 'jobs', 'Job', make_cache('my_own_status', 'second'))
+    writer.write(1, 'jobs', 'Job', make_cache('completed', 'first', ['completed'] * 3))
+
+    entries = dict(ColumnarIndex(fn).refresh())
+    assert entries[1] == ('jobs', 'Job', make_cache('completed', 'first', ['completed'] * 3))
+    assert entries[2] == ('jobs', 'Job', make_cache('my_own_status', 'second'))
+
+
+def test_incremental_refresh_and_delete(tmpdir):
+    """A reader only sees what has been committed since it last looked"""
+    fn = str(tmpdir.join('index.cidx'))
+    writer = ColumnarIndex(fn)
+    reader = ColumnarIndex(fn)
+    writer.write(1, 'jobs', 'Job', make_cache('new', 'a'))
+    assert [i for i, _ in reader.refresh()] == [1]
+    assert reader.refresh() == []
+
+    writer.delete(1)
+    writer.write(2, 'jobs', 'Job', make_cache('new', 'b'))
+    assert dict(reader.refresh()) == {1: None, 2: ('jobs', 'Job', make_cache('new', 'b'))}
+
+
+def test_torn_transaction_ignored(tmpdir):
+    """A transaction cut short by a crash is never seen and is overwritten by the next one"""
+    fn = str(tmpdir.join('index.cidx'))
+    writer = ColumnarIndex(fn)
+    writer.write(1, 'jobs', 'Job', make_cache('new', 'a'))
+    good_size = os.path.getsize(fn)
+    writer.write(2, 'jobs', 'Job', make_cache('new', 'b'))
+    with open(fn, 'r+b') as f:
+        f.truncate(os.path.getsize(fn) - 3)
+
+    assert [i for i, _ in ColumnarIndex(fn).refresh()] == [1]
+
+    ColumnarIndex(fn).write(3, 'jobs', 'Job', make_cache('new', 'c'))
+    assert os.path.getsize(fn) > good_size
+    assert sorted(i for i, _ in ColumnarIndex(fn).refresh()) == [1, 3]
+
+
+def test_compact(tmpdir):
+    """Compacting keeps only the live entries and other readers pick up the new file"""
+    fn = str(tmpdir.join('index.cidx'))
+    writer = ColumnarIndex(fn)
+    reader = ColumnarIndex(fn)
+    for i in range(10):
+        writer.write(1, 'jobs', 'Job', make_cache('running', 'a' * i))
+    reader.refresh()
+    size = os.path.getsize(fn)
+
+    writer.compact({1: ('jobs', 'Job', make_cache('completed', 'a'))})
+    assert os.path.getsize(fn) < size
+    assert dict(reader.refresh()) == {1: ('jobs', 'Job', make_cache('completed', 'a'))}
+
+
+def test_compact_keeps_other_sessions_commits(tmpdir):
+    """Entries committed by another session after the snapshot being compacted was taken are kept"""
+    fn = str(tmpdir.join('index.cidx'))
+    writer = ColumnarIndex(fn)
+    other = ColumnarIndex(fn)
+    writer.write(1, 'jobs', 'Job', make_cache('running', 'a'))
+    writer.write(2, 'jobs', 'Job', make_cache('running', 'b'))
+    other.refresh()
+    other.write(3, 'jobs', 'Job', make_cache('new', 'c'))
+    other.delete(2)
+
+    writer.compact({1: ('jobs', 'Job', make_cache('completed', 'a')), 2: ('jobs', 'Job', make_cache('running', 'b'))})
+    assert dict(ColumnarIndex(fn).refresh()) == {1: ('jobs', 'Job', make_cache('completed', 'a')),
+                                                 3: ('jobs', 'Job', make_cache('new', 'c'))}
+    assert dict(writer.refresh()) == {2: None, 3: ('jobs', 'Job', make_cache('new', 'c'))}
+
+
+def test_lock_failure(tmpdir, monkeypatch):
+    """Nothing is written unlocked if the file can't be locked and the records are committed once it can"""
+    fn = str(tmpdir.join('index.cidx'))
+    repo = mock.Mock()
+    repo.registry.name = 'jobs'
+    writer = ColumnarIndex(fn, session_lock=mock.Mock(repo=repo, afs=False))
+    writer.write(1, 'jobs', 'Job', make_cache('new', 'a'))
+    size = os.path.getsize(fn)
+
+    def failing_lockf(fd, operation):
+        raise IOError("No locks available")
+
+    with monkeypatch.context() as m:
+        m.setattr(ColumnarIndexModule.fcntl, 'lockf', failing_lockf)
+        with pytest.raises(RepositoryError):
+            writer.write(2, 'jobs', 'Job', make_cache('new', 'b'))
+    assert os.path.getsize(fn) == size
+
+    writer.write(3, 'jobs', 'Job', make_cache('new', 'c'))
+    assert sorted(i for i, _ in ColumnarIndex(fn).refresh()) == [1, 2, 3]
+
+
+def test_normalise_cache():
+    """Values are stored as json so tuples come back as lists"""
+    assert normalise_cache({'status': 'new', 'display:fqid': (1, 2)}) == {'status': 'new', 'display:fqid': [1, 2]}
@@ -315,3 +315,53 @@ class TestThreadSafeGangaObject(MultiThreadedTestCase):
                     assert o.b.a == num
 
         self.run_threads([change])
+
+
+class StringGangaObject(GangaObject):
+    _schema = Schema(Version(1, 0), {
+        'name': SimpleItem('', typelist=[str]),
+        'size': SimpleItem(0, typelist=[int]),
+        'child': ComponentItem('TestGangaObject', defvalue=None, optional=1),
+        'double': SimpleItem(None, getter='_getDouble'),
+    })
+    _category = 'TestGangaObject'
+    _hidden = True
+    _enable_plugin = True
+
+    def _getDouble(self):
+        return 2 * self.size
+
+
+class TestDescriptor(unittest.TestCase):
+
+    def test_accessors(self):
+        """ Each descriptor only does what its attribute needs """
+        descriptors = dict((name, StringGangaObject.__dict__[name]) for name in ['name', 'size', 'child', 'double'])
+        self.assertEqual(dict((n, d._eval_strings) for n, d in descriptors.items()),
+                         {'name': False, 'size': True, 'child': True, 'double': True})
+        self.assertEqual(dict((n, d._plain_value) for n, d in descriptors.items()),
+                         {'name': True, 'size': True, 'child': False, 'double': True})
+        self.assertTrue(all(d._checkset_name is None and d._filter_name is None for d in descriptors.values()))
+
+    def test_get_set(self):
+        o = StringGangaObject()
+        o.name = '1 + 1'
+        self.assertEqual(o.name, '1 + 1')
+        o.size = 21
+        self.assertEqual(o.double, 42)
+        o.child = SimpleGangaObject()
+        self.assertIs(o.child._getParent(), o)
+        self.assertTrue(o._dirty)
+        with self.assertRaises(AttributeError):
+            o.double = 1
+
+    def test_read_whilst_locked(self):
+        """ A value which is set can be read whilst another thread holds the lock of the object """
+        o = StringGangaObject()
+        o.size = 3
+        read = []
+        reader = threading.Thread(target=lambda: read.append(o.size))
+        with o.const_lock:
+            reader.start()
+            reader.join(10)
+        self.assertEqual(read, [3])
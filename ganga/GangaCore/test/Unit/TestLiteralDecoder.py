@@ -0,0 +1,64 @@
+import datetime
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+from GangaCore.Core.GangaRepository.LiteralDecoder import decode_value
+
+
+values = ['', 'it\'s "quoted"', 'back\\slash\n', u'caf\xe9', 0, -12, 3.5, -1e-05, True, False, None,
+          {}, {'a': 1, 'b': [1, 2.0, 'x'], 'c': {'d': None}}, [1, 'a', [2, 3]], (1, 'a'), b'bytes',
+          {'new': datetime.datetime(2020, 1, 2, 3, 4, 5, 6), 'submitted': datetime.datetime(2020, 1, 2)},
+          datetime.timedelta(seconds=5)]
+
+
+def test_literals():
+    """Every literal the VStreamer writes decodes to the value it was written from"""
+    for value in values:
+        decoded = decode_value(repr(value))
+        assert decoded == value
+        assert type(decoded) is type(value)
+
+
+def test_python2_long():
+    """Longs written by python 2 sessions are read as ints"""
+    assert decode_value("{'a': 1L}") == {'a': 1}
+
+
+def test_mutable_values_not_shared():
+    """Every decoded container is a separate object, even when it comes from the cache"""
+    s = repr({'a': [1, 2], 'b': 1})
+    first = decode_value(s)
+    second = decode_value(s)
+    assert first == second
+    assert first is not second
+    assert first['a'] is not second['a']
+
+    s = repr({'new': datetime.datetime(2020, 1, 2)})
+    assert decode_value(s) is not decode_value(s)
+
+
+def test_fallback_to_config_scope():
+    """Names which aren't literals are still evaluated in the config scope"""
+    from GangaCore.Utility.Config import config_scope
+    config_scope['_TestLiteralDecoder'] = lambda x: [x]
+    try:
+        assert decode_value('_TestLiteralDecoder(1)') == [1]
+        assert decode_value('_TestLiteralDecoder(1)') is not decode_value('_TestLiteralDecoder(1)')
+    finally:
+        del config_scope['_TestLiteralDecoder']
+
+
+def test_legacy_constant_nodes():
+    """The constant nodes the parser produced before python 3.8 are decoded without falling back to eval"""
+    import ast
+    from GangaCore.Core.GangaRepository import LiteralDecoder
+
+    class Str(ast.AST):
+        _fields = ('s',)
+
+    node = ast.List(elts=[Str(s='a'), Str(s='b')], ctx=ast.Load())
+    with patch.object(LiteralDecoder, '_legacy_constants', ((Str, 's'),)):
+        assert LiteralDecoder._from_ast(node) == ['a', 'b']
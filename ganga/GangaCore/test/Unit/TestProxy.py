@@ -83,8 +83,9 @@ class TestProxy(unittest.TestCase):
         self.assertTrue(hasattr(proxied, '_proxyClass'))
         self.assertFalse(hasattr(proxied, '_impl'))
 
-        # A proxy instance should only have _impl in its dict
-        self.assertEqual(list(self.p.__dict__.keys()), ['_impl'])
+        # A proxy instance should only hold _impl, in a slot rather than a dict
+        self.assertFalse(hasattr(self.p, '__dict__'))
+        self.assertEqual(type(self.p).__slots__, ('_impl', '__weakref__'))
 
     def test_default(self):
         """
@@ -142,6 +143,22 @@ class TestProxy(unittest.TestCase):
     def test_isProxy(self):
         self.assertTrue(GangaCore.GPIDev.Base.Proxy.isProxy(self.p))
 
+    def test_proxy_reused(self):
+        """
+        The proxy of an object is reused whilst it's in use but isn't kept alive by the object
+        """
+        import gc
+        import weakref
+        raw = GangaCore.GPIDev.Base.Proxy.stripProxy(self.p)
+        self.assertTrue(GangaCore.GPIDev.Base.Proxy.addProxy(raw) is self.p)
+        self.assertTrue(self.p.c is self.p.c)
+
+        proxy_ref = weakref.ref(self.p)
+        del self.p
+        gc.collect()
+        self.assertTrue(proxy_ref() is None)
+        self.assertTrue(GangaCore.GPIDev.Base.Proxy.stripProxy(GangaCore.GPIDev.Base.Proxy.addProxy(raw)) is raw)
+
     def test_make_proxy_proxy(self):
         self.assertTrue(GangaCore.GPIDev.Base.Proxy.addProxy(self.p) is self.p)
 
@@ -0,0 +1,103 @@
+import os
+import pickle
+import time
+
+import pytest
+
+from GangaCore.Core.GangaRepository.SessionLock import SessionLockManager, SessionLockRefresher
+
+other_session = 'otherhost.12.00_Monday_01_January_2024.PID.1.session'
+
+
+def write_locks(sdir, session, ids, age=100):
+    """Write the lock file of another session, modified age seconds ago"""
+    fn = os.path.join(sdir, session + '.jobs.locks')
+    with open(fn, 'wb') as f:
+        f.write(pickle.dumps(set(ids)))
+    then = time.time() - age
+    os.utime(fn, (then, then))
+    return fn
+
+
+@pytest.fixture
+def manager(tmpdir):
+    """A manager of the locks of the 'jobs' registry which reads the other sessions' lock files through a counter"""
+    mgr = SessionLockManager(None, str(tmpdir), 'jobs')
+    mgr.mkdir(mgr.sdir)
+    mgr.global_lock_setup()
+    with open(mgr.fn, 'wb') as f:
+        f.write(pickle.dumps(set()))
+    mgr.reads = []
+    session_read = mgr.session_read
+
+    def counted_session_read(fn):
+        mgr.reads.append(os.path.basename(fn))
+        return session_read(fn)
+    mgr.session_read = counted_session_read
+    return mgr
+
+
+def test_touch_file(tmpdir):
+    """The heartbeat updates the session file through a descriptor, and notices when it's replaced or removed"""
+    fn = str(tmpdir.join('this.session'))
+    open(fn, 'w').close()
+    os.utime(fn, (0, 0))
+    refresher = SessionLockRefresher('this.session', str(tmpdir), fn, None, False)
+    try:
+        refresher.touchFile(fn)
+        assert os.stat(fn).st_mtime > 0
+        fd = refresher._fds[fn]
+        refresher.touchFile(fn)
+        assert refresher._fds[fn] == fd
+
+        os.unlink(fn)
+        open(fn, 'w').close()
+        os.utime(fn, (0, 0))
+        refresher.touchFile(fn)
+        assert os.stat(fn).st_mtime > 0
+
+        os.unlink(fn)
+        with pytest.raises(OSError):
+            refresher.touchFile(fn)
+    finally:
+        refresher.closeFiles()
+    assert refresher._fds == {}
+
+
+def test_other_sessions_locks_cached(manager):
+    """The other sessions' lock files are only read again once they've changed"""
+    sf = write_locks(manager.sdir, other_session, [1, 2])
+    assert manager.other_sessions_locks() == {sf: frozenset([1, 2])}
+    assert manager.reads == [os.path.basename(sf)]
+
+    assert manager.other_sessions_locks() == {sf: frozenset([1, 2])}
+    assert len(manager.reads) == 1
+
+    write_locks(manager.sdir, other_session, [1, 2, 3], age=50)
+    assert manager.other_sessions_locks() == {sf: frozenset([1, 2, 3])}
+    assert len(manager.reads) == 2
+
+    # a file changed just now may change again without its modification time changing, so it's read each time
+    write_locks(manager.sdir, other_session, [4], age=0)
+    manager.other_sessions_locks()
+    assert manager.other_sessions_locks() == {sf: frozenset([4])}
+    assert len(manager.reads) == 4
+
+    os.unlink(sf)
+    assert manager.other_sessions_locks() == {}
+
+
+def test_lock_ids(manager):
+    """The ids locked by other sessions are left out, the lock file is only written when more ids are locked"""
+    write_locks(manager.sdir, other_session, [2])
+    assert sorted(manager.lock_ids([1, 2, 3])) == [1, 3]
+    with open(manager.fn, 'rb') as f:
+        assert pickle.loads(f.read()) == {1, 3}
+
+    then = time.time() - 100
+    os.utime(manager.fn, (then, then))
+    assert manager.lock_ids([3]) == [3]
+    assert os.stat(manager.fn).st_mtime == pytest.approx(then)
+
+    assert 'PID.1' in manager.get_lock_session(2)
+    assert manager.get_lock_session(5) is None
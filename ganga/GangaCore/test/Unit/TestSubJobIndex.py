@@ -0,0 +1,100 @@
+import copy
+import datetime
+
+from GangaCore.Core.GangaRepository.SubJobIndex import SubJobIndex
+
+
+def make_entry(i, status='new'):
+    return {'status': status, 'id': i, 'name': 'sj_%d' % i, 'display:backend': 'Local', 'exitcode': None,
+            'time:timestamps': {'new': datetime.datetime(2020, 1, 1, 12, 0, i)}, 'subjobs:status': []}
+
+
+def test_round_trip():
+    """Entries are handed back as they were stored"""
+    entries = dict((i, make_entry(i, 'completed' if i % 2 else 'failed')) for i in range(10))
+    index = SubJobIndex(entries)
+    assert len(index) == 10
+    assert index.keys() == list(range(10))
+    assert dict(index.items()) == entries
+    assert index == entries
+    assert index[3] == entries[3]
+    assert isinstance(index[3]['subjobs:status'], list)
+
+
+def test_entries_are_copies():
+    """Changing an entry which was handed out doesn't change the index"""
+    index = SubJobIndex({0: make_entry(0)})
+    entry = index[0]
+    entry['status'] = 'running'
+    entry['time:timestamps']['running'] = datetime.datetime(2020, 1, 2)
+    entry['subjobs:status'].append('new')
+    assert index[0] == make_entry(0)
+
+
+def test_get_value():
+    """Single fields are read without building the entry, missing ones give the default"""
+    index = SubJobIndex({0: make_entry(0, 'running'), 2: {'status': 'new'}})
+    assert index.getValue(0, 'status') == 'running'
+    assert index.getValue(0, 'time:timestamps') == {'new': datetime.datetime(2020, 1, 1, 12, 0, 0)}
+    assert index.getValue(2, 'name') is None
+    assert index.getValue(2, 'name', 'default') == 'default'
+    assert index.getValue(1, 'status') is None
+    assert 1 not in index
+    assert index[2] == {'status': 'new'}
+
+
+def test_values_shared():
+    """The values which repeat are held once for all the subjobs"""
+    index = SubJobIndex()
+    for i in range(5):
+        index[i] = {'status': ''.join(['comp', 'leted']), 'display:backend': 'Local'}
+    statuses = [index.getValue(i, 'status') for i in range(5)]
+    assert all(status is statuses[0] for status in statuses)
+
+
+def test_replace_and_remove():
+    """Storing an entry again replaces all of it and None or pop removes it"""
+    index = SubJobIndex({0: make_entry(0), 1: make_entry(1)})
+    index[0] = {'status': 'submitted'}
+    assert index[0] == {'status': 'submitted'}
+
+    index[1] = None
+    assert 1 not in index
+    assert len(index) == 1
+    assert index.pop(0) == {'status': 'submitted'}
+    assert index.pop(0, None) is None
+    assert len(index) == 0
+    assert list(index) == []
+
+
+def test_deepcopy():
+    """A copy holds the same entries and is independent of the original"""
+    index = SubJobIndex({0: make_entry(0), 1: make_entry(1)})
+    index_copy = copy.deepcopy(index)
+    assert isinstance(index_copy, SubJobIndex)
+    assert index_copy == index
+    index_copy[0] = make_entry(0, 'killed')
+    assert index.getValue(0, 'status') == 'new'
+
+
+def test_read_torn_delta(tmpdir):
+    """A delta record cut short is ignored and the index is reported as incomplete, whatever error unpickling it raises"""
+    import pickle
+    from GangaCore.Core.GangaRepository.SubJobXMLList import SubJobXMLList
+
+    full = pickle.dumps({0: make_entry(0), 1: make_entry(1)})
+    delta = pickle.dumps({1: make_entry(1, 'completed')})
+    fn = str(tmpdir.join('subjobs.idx'))
+
+    with open(fn, 'wb') as f:
+        f.write(full + delta)
+    with open(fn, 'rb') as f:
+        index_data, records, complete = SubJobXMLList.read_subJobIndex(f)
+    assert (index_data[1]['status'], records, complete) == ('completed', 1, True)
+
+    for cut in range(1, len(delta)):
+        with open(fn, 'wb') as f:
+            f.write(full + delta[:cut])
+        with open(fn, 'rb') as f:
+            index_data, records, complete = SubJobXMLList.read_subJobIndex(f)
+        assert (index_data[1]['status'], records, complete) == ('new', 0, False)
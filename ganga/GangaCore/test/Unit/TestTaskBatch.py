@@ -0,0 +1,103 @@
+import time
+import threading
+
+from GangaCore.Core.GangaThread.WorkerThreads.TaskBatch import TaskBatch, StageTimer
+
+
+class FakeThreadPool(object):
+    """ Runs each function added in a thread of its own, the way the workers of a WorkerThreadPool call them """
+
+    def __init__(self, frozen=False):
+        self.frozen = frozen
+        self.threads = []
+
+    def add_function(self, function, args=(), callback_func=None, name=None):
+        if self.frozen:
+            return False
+
+        def run():
+            callback_func(function(*args))
+        thread = threading.Thread(target=run)
+        self.threads.append(thread)
+        thread.start()
+        return True
+
+    def isfrozen(self):
+        return self.frozen
+
+    def is_worker_thread(self):
+        return threading.current_thread() in self.threads
+
+
+def test_bounded_in_flight():
+    """ No more than max_in_flight functions run at once and wait() returns once they've all finished """
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def task(i):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return i * i
+
+    batch = TaskBatch(FakeThreadPool(), max_in_flight=3).map(task, range(20))
+
+    assert running == [0, 3]
+    assert batch.results == dict((i, i * i) for i in range(20))
+    assert batch.errors == {}
+
+
+def test_errors_kept():
+    """ The exception of a failed function is kept against its key and doesn't stop the others """
+    def task(i):
+        if i == 2:
+            raise ValueError(i)
+        return i
+
+    batch = TaskBatch(FakeThreadPool(), max_in_flight=2).map(task, range(4))
+
+    assert sorted(batch.results) == [0, 1, 3]
+    assert list(batch.errors) == [2]
+    assert isinstance(batch.errors[2], ValueError)
+
+
+def test_inline_when_frozen():
+    """ A frozen pool doesn't take functions so they're run by the caller """
+    pool = FakeThreadPool(frozen=True)
+    callers = []
+    batch = TaskBatch(pool, max_in_flight=1).map(lambda i: callers.append(threading.current_thread()), range(3))
+
+    assert pool.threads == []
+    assert callers == [threading.current_thread()] * 3
+    assert len(batch.results) == 3
+
+
+def test_inline_when_frozen_during_batch():
+    """ Functions added after the pool has been frozen are run by the caller and wait() still returns """
+    pool = FakeThreadPool()
+    batch = TaskBatch(pool, max_in_flight=1)
+    batch.add(0, lambda: 0)
+    pool.frozen = True
+    batch.add(1, lambda: threading.current_thread())
+    batch.wait()
+
+    assert len(pool.threads) == 1
+    assert batch.results == {0: 0, 1: threading.current_thread()}
+
+
+def test_stage_timer():
+    """ The time of each stage is summed over the threads """
+    timer = StageTimer()
+    with timer.stage('submit'):
+        time.sleep(0.01)
+    timer.add('submit', 1.0)
+    timer.add('prepare', 0.5, count=10)
+
+    stages = timer.getStages()
+    assert stages['submit'][1] == 2
+    assert stages['submit'][0] >= 1.01
+    assert stages['prepare'] == (0.5, 10)
+    assert 'prepare 0.50s/10' in timer.report()
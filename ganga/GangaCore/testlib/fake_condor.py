@@ -0,0 +1,150 @@
+"""
+A stand-in for the Condor commands so that the Condor backend can be tested without a Condor pool.
+
+``install_fake_condor`` writes ``condor_submit``, ``condor_q``, ``condor_history`` and ``condor_rm`` scripts into a
+directory, to be put at the front of the ``PATH``. They share the jobs in a ``jobs.json`` file in that directory, which
+tests change with ``set_fake_condor_job`` to move the jobs along, and write each call to a ``calls`` file.
+"""
+
+import json
+import os
+import sys
+import time
+
+commands = ['condor_submit', 'condor_q', 'condor_history', 'condor_rm']
+
+schedd = 'fakeschedd.example.com'
+
+wrapper_script = """#!/bin/sh
+exec "%s" "%s" "$(basename "$0")" "$(dirname "$0")" "$@"
+"""
+
+# JobStatus of the jobs in the queue, the others are in the history
+queue_statuses = ('1', '2', '5')
+
+
+def install_fake_condor(directory):
+    # type: (str) -> None
+    """
+    Write the fake Condor commands into a directory
+    Args:
+        directory (str): the directory to put at the front of the PATH
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for command in commands:
+        path = os.path.join(directory, command)
+        with open(path, 'w') as f:
+            f.write(wrapper_script % (sys.executable, os.path.abspath(__file__)))
+        os.chmod(path, 0o755)
+    _save(directory, {'next_cluster': 100, 'jobs': {}})
+
+
+def fake_condor_calls(directory):
+    # type: (str) -> List[str]
+    """
+    The calls made to the fake Condor commands so far
+    Args:
+        directory (str): the directory of the fake Condor commands
+    """
+    calls_path = os.path.join(directory, 'calls')
+    if not os.path.exists(calls_path):
+        return []
+    with open(calls_path) as f:
+        return f.read().splitlines()
+
+
+def set_fake_condor_job(directory, local_id, **attributes):
+    # type: (str, str, **str) -> None
+    """
+    Change the attributes of a job known to the fake Condor, e.g. JobStatus='2', RemoteHost='node01'
+    Args:
+        directory (str): the directory of the fake Condor commands
+        local_id (str): the cluster.proc id of the job
+    """
+    state = _load(directory)
+    state['jobs'][local_id].update(attributes)
+    _save(directory, state)
+
+
+def _load(directory):
+    with open(os.path.join(directory, 'jobs.json')) as f:
+        return json.load(f)
+
+
+def _save(directory, state):
+    with open(os.path.join(directory, 'jobs.json'), 'w') as f:
+        json.dump(state, f)
+
+
+def _submit(directory, args):
+    """Queue a job for each 'queue' of the submit description file and print them as condor_submit -v does"""
+    state = _load(directory)
+    cluster = state['next_cluster']
+    state['next_cluster'] += 1
+
+    lines = ['Submitting job(s).']
+    iwd = os.getcwd()
+    proc = 0
+    with open(args[-1]) as cdf:
+        for line in cdf:
+            key, _, value = line.partition('=')
+            if key.strip() == 'initialdir':
+                iwd = value.strip()
+            elif line.strip() == 'queue':
+                local_id = '%d.%d' % (cluster, proc)
+                state['jobs'][local_id] = {'ClusterId': str(cluster), 'ProcId': str(proc),
+                                           'GlobalJobId': '%s#%s#%d' % (schedd, local_id, int(time.time())),
+                                           'JobStatus': '1'}
+                lines += ['', '** Proc %s:' % local_id, 'Iwd = "%s"' % iwd, 'JobStatus = 1']
+                proc += 1
+
+    _save(directory, state)
+    lines += ['', '%d job(s) submitted to cluster %d.' % (proc, cluster)]
+    print('\n'.join(lines))
+
+
+def _query(directory, args, in_queue):
+    """Print the attributes of the jobs of the given clusters as -af:t does. As with the real commands every argument
+    after -af:t is an attribute, a number there is a constant expression"""
+    af_index = args.index('-af:t')
+    clusters = [a for a in args[:af_index] if a != '-global']
+    attributes = args[af_index + 1:]
+    state = _load(directory)
+    for local_id, job in sorted(state['jobs'].items()):
+        if (job['JobStatus'] in queue_statuses) != in_queue:
+            continue
+        if clusters and job['ClusterId'] not in clusters and local_id not in clusters:
+            continue
+        print('\t'.join(a if a.isdigit() else job.get(a, 'undefined') for a in attributes))
+
+
+def _rm(directory, args):
+    """Remove a job given by its cluster.proc id"""
+    state = _load(directory)
+    local_id = args[-1]
+    if local_id not in state['jobs']:
+        sys.stderr.write("Couldn't find/remove all jobs matching constraint (ClusterId == %s)\n" % local_id)
+        sys.exit(1)
+    state['jobs'][local_id]['JobStatus'] = '3'
+    _save(directory, state)
+    print('Job %s marked for removal' % local_id)
+
+
+def main(argv):
+    command, directory, args = argv[0], argv[1], argv[2:]
+    with open(os.path.join(directory, 'calls'), 'a') as f:
+        f.write(' '.join([command] + args) + '\n')
+
+    if command == 'condor_submit':
+        _submit(directory, args)
+    elif command == 'condor_q':
+        _query(directory, args, True)
+    elif command == 'condor_history':
+        _query(directory, args, False)
+    elif command == 'condor_rm':
+        _rm(directory, args)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
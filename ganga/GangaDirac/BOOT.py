@@ -56,53 +56,14 @@ def startDiracProcess():
     '''
     Start a subprocess that runs the DIRAC commands
     '''
-    HOST = 'localhost'  #Connect to localhost
-    end_trans = '###END-TRANS###'
-    import subprocess
-    from GangaDirac.Lib.Utilities.DiracUtilities import getDiracEnv, getDiracCommandIncludes, GangaDiracError
+    from GangaDirac.Lib.Utilities.DiracUtilities import getDiracEnv
+    from GangaDirac.Lib.Utilities.DiracProcessPool import launchDiracServer
     global dirac_process
-    #Some magic to locate the python script to run
-    from GangaDirac.Lib.Server.InspectionClient import runClient
-    #Create a socket and bind it to 0 to find a free port
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.bind((HOST, 0))
-    PORT = s.getsockname()[1]
-    s.close()
-    #Pass the port no as an argument to the popen
-    serverpath = os.path.join(os.path.dirname(inspect.getsourcefile(runClient)), 'DiracProcess.py')
-    popen_cmd = ['python',serverpath, str(PORT)]
-    dirac_process = subprocess.Popen(popen_cmd, env = getDiracEnv(), stdin=subprocess.PIPE)
     global running_dirac_process
-    running_dirac_process = (dirac_process.pid, PORT)
-
-    #Now set a random string to make sure only commands from this sessions are executed
-    rand_hash = uuid.uuid4()
     global dirac_process_ids
+    dirac_process, PORT, rand_hash = launchDiracServer(getDiracEnv())
+    running_dirac_process = (dirac_process.pid, PORT)
     dirac_process_ids = (dirac_process.pid, PORT, rand_hash)
-    #Pipe the random string without waiting for the process to finish.
-    dirac_process.stdin.write(str(rand_hash).encode("utf-8"))
-    dirac_process.stdin.close()
-
-    data = ''
-    #We have to wait a little bit for the subprocess to start the server so we try until the connection stops being refused. Set a limit of one minute.
-    connection_timeout = time.time() + 60
-    started = False
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    while time.time()<connection_timeout and not started:
-        try:
-            s.connect((HOST, PORT))
-            started = True
-        except socket.error as serr:
-            time.sleep(1)
-    if not started:
-        raise GangaDiracError("Failed to start the Dirac server process!")
-    #Now setup the Dirac environment in the subprocess
-    dirac_command = str(rand_hash)
-    dirac_command = dirac_command + getDiracCommandIncludes()
-    dirac_command = dirac_command + end_trans
-    s.sendall(dirac_command.encode("utf-8"))
-    data = s.recv(1024)
-    s.close()
 
 exportToGPI('startDiracProcess', startDiracProcess, 'Functions')
 
@@ -115,9 +76,23 @@ def stopDiracProcess():
         logger.info('Stopping the DIRAC process')
         dirac_process.kill()
         running_dirac_process = False
+    from GangaDirac.Lib.Utilities.DiracProcessPool import stopDiracProcessPool
+    stopDiracProcessPool()
 
 exportToGPI('stopDiracProcess', stopDiracProcess, 'Functions')
 
+def diracProcessPoolStats():
+    '''
+    Return the number of workers, queued commands and the call latency of the pool of DIRAC server processes
+    '''
+    from GangaDirac.Lib.Utilities.DiracProcessPool import getDiracProcessPool
+    pool = getDiracProcessPool()
+    if pool is None:
+        return {}
+    return pool.stats()
+
+exportToGPI('diracProcessPoolStats', diracProcessPoolStats, 'Functions')
+
 def diracAPI_interactive(connection_attempts=5):
     '''
     Run an interactive server within the DIRAC environment.
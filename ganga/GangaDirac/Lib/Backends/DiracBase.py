@@ -10,12 +10,13 @@ import datetime
 import shutil
 import tempfile
 import math
-from collections import defaultdict
+import threading
+from collections import defaultdict, deque
 from GangaCore.GPIDev.Schema import Schema, Version, SimpleItem, ComponentItem
 from GangaCore.GPIDev.Adapters.IBackend import IBackend, group_jobs_by_backend_credential
 from GangaCore.GPIDev.Lib.Job.Job import Job
 from GangaCore.Core.exceptions import GangaFileError, GangaKeyError, BackendError, IncompleteJobSubmissionError
-from GangaDirac.Lib.Backends.DiracUtils import result_ok, get_job_ident, get_parametric_datasets, outputfiles_iterator, outputfiles_foreach, getAccessURLs
+from GangaDirac.Lib.Backends.DiracUtils import result_ok, get_job_ident, get_parametric_datasets, get_parametric_skeleton, get_parametric_script, outputfiles_iterator, outputfiles_foreach, getAccessURLs
 from GangaDirac.Lib.Files.DiracFile import DiracFile
 from GangaDirac.Lib.Utilities.DiracUtilities import GangaDiracError, execute
 from GangaDirac.Lib.Credentials.DiracProxy import DiracProxy
@@ -25,6 +26,7 @@ from GangaCore.Utility.logging import getLogger, log_user_exception
 from GangaCore.GPIDev.Credentials import require_credential, credential_store, needed_credentials
 from GangaCore.GPIDev.Base.Proxy import stripProxy, isType, getName
 from GangaCore.Core.GangaThread.WorkerThreads import getQueues
+from GangaCore.Core.GangaThread.WorkerThreads.TaskBatch import TaskBatch, StageTimer
 from GangaCore.Core import monitoring_component
 from GangaCore.Runtime.GPIexport import exportToGPI
 from subprocess import check_output, CalledProcessError
@@ -32,6 +34,7 @@ configDirac = getConfig('DIRAC')
 default_finaliseOnMaster = configDirac['default_finaliseOnMaster']
 default_downloadOutputSandbox = configDirac['default_downloadOutputSandbox']
 default_unpackOutputSandbox = configDirac['default_unpackOutputSandbox']
+default_parametricSubmit = configDirac['default_parametricSubmit']
 logger = getLogger()
 regex = re.compile(r'[*?\[\]]')
 
@@ -102,6 +105,8 @@ class DiracBase(IBackend):
         'credential_requirements': ComponentItem('CredentialRequirement', defvalue=DiracProxy),
         'blockSubmit' : SimpleItem(defvalue=True, 
                                doc='Shall we use the block submission?'),
+        'parametricSubmit' : SimpleItem(defvalue=default_parametricSubmit,
+                               doc='Shall we submit the subjobs which share their sandbox and JDL as parametric DIRAC jobs?'),
         'finaliseOnMaster' : SimpleItem(defvalue=default_finaliseOnMaster,
                                doc='Finalise the subjobs all in one go when they are all finished.'),
         'downloadSandbox' : SimpleItem(defvalue=default_downloadOutputSandbox,
@@ -264,10 +269,106 @@ class DiracBase(IBackend):
 
         return 1 
 
+    @require_credential
+    def _parametric_submit(self, dirac_script, rjobs):
+        '''Submit subjobs as one parametric job via the Dirac server and give each the DIRAC id of its parameters.
+        The subjobs are left failed if the submission fails.
+        Args:
+            dirac_script (str): filename of the parametric JDL which is to be submitted to DIRAC
+            rjobs (list): the subjobs in the order of their parameters in the JDL
+        '''
+        dirac_cmd = """execfile(\'%s\')""" % dirac_script
+        try:
+            result = execute(dirac_cmd, cred_req=self.credential_requirements, return_raw_dict = True, new_subprocess = True)
+        except GangaDiracError as err:
+            result = {'OK': False, 'Message': str(err)}
+
+        dirac_ids = result.get('Value') if result.get('OK') else None
+        if not isinstance(dirac_ids, list) or len(dirac_ids) != len(rjobs):
+            if result.get('OK'):
+                err_msg = 'DIRAC returned %s for a parametric job of %s subjobs' % (dirac_ids, len(rjobs))
+            else:
+                err_msg = result.get('Message', 'DIRAC error!')
+            logger.error('Error submitting parametric job to Dirac: %s' % err_msg)
+            with open(dirac_script, 'r') as file_in:
+                logger.debug("%s" % file_in.read())
+            for sj in rjobs:
+                logger.error('Job submission failed for job %s : %s' % (sj.getFQID('.'), err_msg))
+                sj.updateStatus('failed')
+            return 0
+
+        for sj, dirac_id in zip(rjobs, dirac_ids):
+            sj.backend.id = dirac_id
+            sj.backend.actualCE = None
+            sj.backend.status = None
+            sj.backend.extraInfo = None
+            sj.backend.statusInfo = ''
+            sj.been_queued = False
+            sj.updateStatus('submitted')
+            stripProxy(sj.info).increment()
+        return 1
+
+    def _parametric_master_submit(self, rjobs, subjobconfigs, master_input_sandbox, tmp_dir, parallel_submit=False):
+        """Submit the subjobs which share a JDL skeleton, and so the same sandbox, as parametric DIRAC jobs of at most
+        maxSubjobsPerParametricJob subjobs, with one parameter for each of their names, arguments and input data.
+        Returns the subjobs, their configs and their dirac-scripts which are left to be submitted on their own.
+        """
+        groups = {}
+        remaining_jobs = []
+        remaining_configs = []
+        remaining_scripts = []
+        for sc, sj in zip(subjobconfigs, rjobs):
+            script = sj.backend._job_script(sc, master_input_sandbox, tmp_dir)
+            skeleton, parameters = get_parametric_skeleton(script)
+            if skeleton is None:
+                remaining_jobs.append(sj)
+                remaining_configs.append(sc)
+                remaining_scripts.append(script)
+            else:
+                groups.setdefault(skeleton, []).append((sj, sc, script, parameters))
+
+        nPerJob = configDirac['maxSubjobsPerParametricJob']
+        # Without parallel_submit the batch runs each submission as it's added
+        batch = TaskBatch(getQueues()._monitoring_threadpool if parallel_submit else None, name='parametric_submit')
+        chunks = []
+        for skeleton, members in groups.items():
+            # A subjob alone is no better off in a parametric job
+            if len(members) < 2:
+                for sj, sc, script, parameters in members:
+                    remaining_jobs.append(sj)
+                    remaining_configs.append(sc)
+                    remaining_scripts.append(script)
+                continue
+
+            for first in range(0, len(members), nPerJob):
+                chunk = members[first:first+nPerJob]
+                chunk_jobs = [sj for sj, sc, script, parameters in chunk]
+                for sj in chunk_jobs:
+                    sj.updateStatus('submitting')
+                dirac_script = get_parametric_script(skeleton, [parameters for sj, sc, script, parameters in chunk])
+                dirac_script_filename = os.path.join(self.getJobObject().getInputWorkspace().getPath(), 'dirac-parametric-script-%s.py' % len(chunks))
+                with open(dirac_script_filename, 'w') as f:
+                    f.write(dirac_script)
+
+                logger.info("Submitting subjobs %s as a parametric job" % ', '.join(str(sj.id) for sj in chunk_jobs))
+                batch.add(len(chunks), self._parametric_submit, dirac_script_filename, chunk_jobs)
+                chunks.append(chunk_jobs)
+        batch.wait()
+
+        for number, err in batch.errors.items():
+            logger.error("Parametric job submission failed: %s" % err)
+            for sj in chunks[number]:
+                if sj.status == 'submitting':
+                    sj.updateStatus('failed')
+
+        return remaining_jobs, remaining_configs, remaining_scripts
+
     def master_submit(self, rjobs, subjobconfigs, masterjobconfig, keep_going=False, parallel_submit=False):
         """  Submit the master job and all of its subjobs. To keep things speedy when talking to DIRAC
         we can submit several subjobs in the same process. Therefore for each subjob we collect the code for
        the dirac-script into one large file that we then execute.
+       With parametricSubmit the subjobs which share their sandbox and JDL are instead submitted as parametric jobs,
+       a single DIRAC job for many subjobs.
         """
         #If you want to go slowly use the regular master_submit:
         if not self.blockSubmit:
@@ -285,9 +386,6 @@ class DiracBase(IBackend):
 
         master_input_sandbox = self.master_prepare(masterjobconfig)
 
-        nPerProcess = configDirac['maxSubjobsPerProcess']
-        nProcessToUse = math.ceil((len(rjobs)*1.0)/nPerProcess)
-
         from GangaCore.Core.GangaThread.WorkerThreads import getQueues
         # Must check for credentials here as we cannot handle missing credentials on Queues by design!
         try:
@@ -296,17 +394,45 @@ class DiracBase(IBackend):
             credential_store.create(self.credential_requirements)
 
         tmp_dir = tempfile.mkdtemp()
-        # Loop over the processes and create the master script for each one.
+        all_rjobs = rjobs
+        try:
+            #Submit what we can as parametric jobs, the rest of the subjobs go in the block submission
+            scripts = None
+            if self.parametricSubmit and len(rjobs) > 1:
+                rjobs, subjobconfigs, scripts = self._parametric_master_submit(rjobs, subjobconfigs, master_input_sandbox, tmp_dir, parallel_submit)
+
+            nPerProcess = configDirac['maxSubjobsPerProcess']
+            nProcessToUse = math.ceil((len(rjobs)*1.0)/nPerProcess)
+
+            # Loop over the processes and create the master script for each one.
+            self._block_master_submit(rjobs, subjobconfigs, master_input_sandbox, tmp_dir, nPerProcess, nProcessToUse, keep_going, parallel_submit, scripts)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors = True)
+
+        for i in all_rjobs:
+            if i.status in ["new", "failed"]:
+                return 0
+    
+        return 1
+
+    def _block_master_submit(self, rjobs, subjobconfigs, master_input_sandbox, tmp_dir, nPerProcess, nProcessToUse, keep_going, parallel_submit, scripts=None):
+        """Submit the subjobs nPerProcess at a time, collecting the dirac-script of each subjob into one file per process.
+        scripts are the dirac-scripts of the subjobs if they've already been generated, e.g. by _parametric_master_submit
+        """
         for i in range(0,int(nProcessToUse)):
             nSubjobs = 0
             #The Dirac IDs are stored in a dict so create it at the start of the script
             masterScript = 'resultdict = {}\n'
-            for sc, sj in zip(subjobconfigs[i*nPerProcess:(i+1)*nPerProcess], rjobs[i*nPerProcess:(i+1)*nPerProcess]):
+            for index in range(i*nPerProcess, min((i+1)*nPerProcess, len(rjobs))):
+                sc, sj = subjobconfigs[index], rjobs[index]
                 #Add in the script for each subjob
                 sj.updateStatus('submitting')
                 fqid = sj.getFQID('.')
                 #Change the output of the job script for our own ends. This is a bit of a hack but it saves having to rewrite every RTHandler
-                sjScript = sj.backend._job_script(sc, master_input_sandbox, tmp_dir)
+                if scripts is not None:
+                    sjScript = scripts[index]
+                else:
+                    sjScript = sj.backend._job_script(sc, master_input_sandbox, tmp_dir)
                 sjScript = sjScript.replace("output(result)", "if isinstance(result, dict) and 'Value' in result:\n\tresultdict.update({sjNo : result['Value']})\nelse:\n\tresultdict.update({sjNo : result['Message']})")
                 if nSubjobs == 0:
                     sjScript = re.sub(r"(dirac = Dirac.*\(\))",r"\1\nsjNo='%s'\n" % fqid, sjScript)
@@ -330,30 +456,21 @@ class DiracBase(IBackend):
             if (upperlimit-1) == 0:
                 logger.info("Submitting job")
             else:
-                logger.info("Submitting subjobs %s to %s" % (i*nPerProcess, upperlimit-1))
+                logger.info("Submitting subjobs %s to %s" % (rjobs[i*nPerProcess].id, rjobs[upperlimit-1].id))
 
-            try:
-                #Either do the submission in parallel with threads or sequentially
-                if parallel_submit:
-                    getQueues()._monitoring_threadpool.add_function(self._block_submit, (dirac_script_filename, nSubjobs, keep_going))
-                else:
-                    self._block_submit(dirac_script_filename, nSubjobs, keep_going)
+            #Either do the submission in parallel with threads or sequentially
+            if parallel_submit:
+                getQueues()._monitoring_threadpool.add_function(self._block_submit, (dirac_script_filename, nSubjobs, keep_going))
+            else:
+                self._block_submit(dirac_script_filename, nSubjobs, keep_going)
+
+            while not self._subjob_status_check(rjobs, nPerProcess, i):
+                time.sleep(1.)
 
-                while not self._subjob_status_check(rjobs, nPerProcess, i):
-                    time.sleep(1.)
-            finally:
-                shutil.rmtree(tmp_dir, ignore_errors = True)
-                    
             if (upperlimit-1) == 0:
                 logger.info("Submitted job")
             else:
-                logger.info("Submitted subjobs %s to %s" % (i*nPerProcess, upperlimit-1))
-
-        for i in rjobs:
-            if i.status in ["new", "failed"]:
-                return 0
-    
-        return 1
+                logger.info("Submitted subjobs %s to %s" % (rjobs[i*nPerProcess].id, rjobs[upperlimit-1].id))
 
     def _subjob_status_check(self, rjobs, nPerProcess, i):
                 has_submitted = True
@@ -960,14 +1077,95 @@ class DiracBase(IBackend):
             job (Job) This is the job to change the status
             updated_dirac_status (str): Ganga status which is to be used somewhere
         """
-        #   Revert job back to running state if we exit uncleanly
+        #   Revert job back to running state if we exit uncleanly, there is no direct transition from completing
+        #   The caller updates the status of the master job
         if job.status == "completing":
-            job.updateStatus('running')
-            if job.master:
-                job.master.updateMasterJobStatus()
+            job.updateStatus('submitted', update_master=False)
+            job.updateStatus('running', update_master=False)
         # FIXME should I add something here to cleanup on sandboxes pulled from
         # malformed job output?
 
+    @staticmethod
+    def _write_postprocess_locations(job, file_info_dict):
+        """
+        Record the DiracFiles uploaded by a job in the PostProcessLocations file of its output workspace, with a single
+        write for all of them
+        Args:
+            job (Job): The job whose output data it is
+            file_info_dict (dict): The OutputDataInfo of the job from DIRAC, keyed by file name
+        """
+        # Set DiracFile metadata
+        if hasattr(job.outputfiles, 'get'):
+            wildcards = [f.namePattern for f in job.outputfiles.get(DiracFile) if regex.search(f.namePattern) is not None]
+        else:
+            wildcards = []
+
+        lfn_store = os.path.join(job.getOutputWorkspace().getPath(), getConfig('Output')['PostProcessLocationsFileName'])
+
+        # Make the file on disk with a nullop...
+        if not os.path.isfile(lfn_store):
+            with open(lfn_store, 'w'):
+                pass
+
+        if not (hasattr(job.outputfiles, 'get') and job.outputfiles.get(DiracFile)):
+            return
+
+        if not hasattr(file_info_dict, 'keys'):
+            logger.error("Error understanding OutputDataInfo: %s" % str(file_info_dict))
+            raise GangaDiracError("Error understanding OutputDataInfo: %s" % str(file_info_dict))
+
+        ## Caution is not clear atm whether this 'Value' is an LHCbism or bug
+        list_of_files = file_info_dict.get('Value', list(file_info_dict.keys()))
+
+        lines = []
+        for file_name in list_of_files:
+            file_name = os.path.basename(file_name)
+            info = file_info_dict.get(file_name)
+
+            if not hasattr(info, 'get'):
+                logger.error("Error getting OutputDataInfo for: %s" % str(job.getFQID('.')))
+                logger.error("Please check the Dirac Job still exists or attempt a job.backend.reset() to try again!")
+                logger.error("Err: %s" % str(info))
+                logger.error("file_info_dict: %s" % str(file_info_dict))
+                raise GangaDiracError("Error getting OutputDataInfo")
+
+            valid_wildcards = [wc for wc in wildcards if fnmatch.fnmatch(file_name, wc)]
+            if not valid_wildcards:
+                valid_wildcards.append('')
+
+            for wc in valid_wildcards:
+                lines.append('DiracFile:::%s&&%s->%s:::%s:::%s\n' % (wc,
+                                                                     file_name,
+                                                                     info.get('LFN', 'Error Getting LFN!'),
+                                                                     str(info.get('LOCATIONS', ['NotAvailable'])),
+                                                                     info.get('GUID', 'NotAvailable')
+                                                                     ))
+
+        # Now we can append to the file without touching what is already there
+        with open(lfn_store, 'ab') as postprocesslocationsfile:
+            postprocesslocationsfile.write(''.join(lines).encode())
+
+        logger.debug("Written: %s" % lines)
+
+    @staticmethod
+    def _unpack_oversized_sandbox(job, getSandboxResult, output_path):
+        """
+        If the sandbox result includes a Successful key then the sandbox has been downloaded from grid storage, likely
+        due to being oversized. Untar it and issue a warning.
+        Args:
+            job (Job): The job the sandbox belongs to
+            getSandboxResult (dict): The result of getOutputSandbox for the job
+            output_path (str): The directory the sandbox was downloaded to
+        """
+        if isinstance(getSandboxResult.get('Value'), dict) and getSandboxResult['Value'].get('Successful', False):
+            try:
+                sandbox_name = list(getSandboxResult['Value']['Successful'].values())[0]
+                check_output(['tar', '-xvf', sandbox_name, '-C', output_path])
+                check_output(['rm', sandbox_name])
+                logger.warning('Output sandbox for job %s downloaded from grid storage due to being oversized.' % job.fqid)
+            except CalledProcessError:
+                logger.error('Failed to unpack output sandbox for job %s' % job.fqid)
+
     @staticmethod
     def _internal_job_finalisation(job, updated_dirac_status):
         """
@@ -1014,60 +1212,7 @@ class DiracBase(IBackend):
             #logger.info('Job ' + job.fqid + ' OutputSandbox: ' + str(getSandboxResult))
             #logger.info('Job ' + job.fqid + ' normCPUTime: ' + str(job.backend.normCPUTime))
 
-            # Set DiracFile metadata
-            if hasattr(job.outputfiles, 'get'):
-                wildcards = [f.namePattern for f in job.outputfiles.get(DiracFile) if regex.search(f.namePattern) is not None]
-            else:
-                wildcards = []
-
-            lfn_store = os.path.join(output_path, getConfig('Output')['PostProcessLocationsFileName'])
-
-            # Make the file on disk with a nullop...
-            if not os.path.isfile(lfn_store):
-                with open(lfn_store, 'w'):
-                    pass
-
-            if hasattr(job.outputfiles, 'get') and job.outputfiles.get(DiracFile):
-
-                # Now we can iterate over the contents of the file without touching it
-                with open(lfn_store, 'ab') as postprocesslocationsfile:
-                    if not hasattr(file_info_dict, 'keys'):
-                        logger.error("Error understanding OutputDataInfo: %s" % str(file_info_dict))
-                        raise GangaDiracError("Error understanding OutputDataInfo: %s" % str(file_info_dict))
-
-                    ## Caution is not clear atm whether this 'Value' is an LHCbism or bug
-                    list_of_files = file_info_dict.get('Value', list(file_info_dict.keys()))
-
-                    for file_name in list_of_files:
-                        file_name = os.path.basename(file_name)
-                        info = file_info_dict.get(file_name)
-                        #logger.debug("file_name: %s,\tinfo: %s" % (str(file_name), str(info)))
-
-                        if not hasattr(info, 'get'):
-                            logger.error("Error getting OutputDataInfo for: %s" % str(job.getFQID('.')))
-                            logger.error("Please check the Dirac Job still exists or attempt a job.backend.reset() to try again!")
-                            logger.error("Err: %s" % str(info))
-                            logger.error("file_info_dict: %s" % str(file_info_dict))
-                            raise GangaDiracError("Error getting OutputDataInfo")
-
-                        valid_wildcards = [wc for wc in wildcards if fnmatch.fnmatch(file_name, wc)]
-                        if not valid_wildcards:
-                            valid_wildcards.append('')
-
-                        for wc in valid_wildcards:
-                            #logger.debug("wildcard: %s" % str(wc))
-
-                            DiracFileData = 'DiracFile:::%s&&%s->%s:::%s:::%s\n' % (wc,
-                                                                                    file_name,
-                                                                                    info.get('LFN', 'Error Getting LFN!'),
-                                                                                    str(info.get('LOCATIONS', ['NotAvailable'])),
-                                                                                    info.get('GUID', 'NotAvailable')
-                                                                                    )
-                            #logger.debug("DiracFileData: %s" % str(DiracFileData))
-                            postprocesslocationsfile.write(DiracFileData.encode())
-                            postprocesslocationsfile.flush()
-
-                logger.debug("Written: %s" % open(lfn_store, 'r').readlines())
+            DiracBase._write_postprocess_locations(job, file_info_dict)
 
             # check outputsandbox downloaded correctly
             if job.backend.downloadSandbox and not result_ok(getSandboxResult):
@@ -1081,15 +1226,8 @@ class DiracBase(IBackend):
                 if job.master:
                     job.master.updateMasterJobStatus()
                 raise BackendError('Dirac', 'Problem retrieving outputsandbox: %s' % str(getSandboxResult))
-            #If the sandbox dict includes a Succesful key then the sandbox has been download from grid storage, likely due to being oversized. Untar it and issue a warning.
-            elif job.backend.downloadSandbox and isinstance(getSandboxResult['Value'], dict) and getSandboxResult['Value'].get('Successful', False):
-                    try:
-                        sandbox_name = list(getSandboxResult['Value']['Successful'].values())[0]
-                        check_output(['tar', '-xvf', sandbox_name, '-C', output_path])
-                        check_output(['rm', sandbox_name])
-                        logger.warning('Output sandbox for job %s downloaded from grid storage due to being oversized.' % job.fqid)
-                    except CalledProcessError:
-                        logger.error('Failed to unpack output sandbox for job %s' % job.fqid)
+            elif job.backend.downloadSandbox:
+                DiracBase._unpack_oversized_sandbox(job, getSandboxResult, output_path)
             # finally update job to completed
             DiracBase._getStateTime(job, 'completed', completeTimeResult)
             if job.status in ['removed', 'killed']:
@@ -1160,7 +1298,8 @@ class DiracBase(IBackend):
     def finalise_jobs(allJobs, downloadSandbox = True):
         """
         Finalise the jobs given. This downloads the output sandboxes, gets the final Dirac stati, completion times etc.
-        Everything is done in one DIRAC process for maximum speed. This is also done in parallel for maximum speed.
+        The downloads, the lookups in DIRAC and the local postprocessing overlap across the jobs, see DiracFinaliser.
+        Returns the DiracFinaliser doing the work, which can be waited on
         """
         theseJobs = []
 
@@ -1174,101 +1313,7 @@ class DiracBase(IBackend):
             logger.warning("No jobs from the list are ready to be finalised yet. Be more patient.")
             return
 
-        #First grab all the info from Dirac
-        inputDict = {}
-        #I have to reduce the no. of subjobs per process to prevent DIRAC timeouts
-        nPerProcess = int(math.floor(configDirac['maxSubjobsFinalisationPerProcess']))
-        nProcessToUse = math.ceil((len(theseJobs)*1.0)/nPerProcess)
-
-        jobs = [stripProxy(j) for j in theseJobs]
-
-        for i in range(0,int(nProcessToUse)):
-            jobSlice = jobs[i*nPerProcess:(i+1)*nPerProcess]      
-            getQueues()._monitoring_threadpool.add_function(DiracBase.finalise_jobs_thread_func, (jobSlice, downloadSandbox))
-
-    @staticmethod
-    def finalise_jobs_thread_func(jobSlice, downloadSandbox = True):
-        """
-        Finalise the jobs given. This downloads the output sandboxes, gets the final Dirac statuses, completion times etc.
-        Everything is done in one DIRAC process for maximum speed. This is also done in parallel for maximum speed.
-        """
-        inputDict = {}
-
-        for sj in jobSlice:
-            inputDict[sj.backend.id] = sj.getOutputWorkspace().getPath()
-        statusmapping = configDirac['statusmapping']
-        returnDict, statusList = execute("finaliseJobs(%s, %s, %s)" % (inputDict, repr(statusmapping), downloadSandbox), cred_req=jobSlice[0].backend.credential_requirements, new_subprocess = True)
-
-        #Cycle over the jobs and store the info
-        for sj in jobSlice:
-            #Check we are able to get the job status - if not set to failed.
-            if sj.backend.id not in statusList['Value'].keys():
-                logger.error("Job %s with DIRAC ID %s has been removed from DIRAC. Unable to finalise it." % (sj.getFQID(), sj.backend.id))
-                sj.force_status('failed')
-                continue
-            #If we wanted the sandbox make sure it downloaded OK.
-            if downloadSandbox and not returnDict[sj.backend.id]['outSandbox']['OK']:
-                logger.error("Output sandbox error for job %s: %s. Unable to finalise it." % (sj.getFQID(), returnDict[sj.backend.id]['outSandbox']['Message']))
-                sj.force_status('failed')
-                continue
-            #Set the CPU time
-            sj.backend.normCPUTime = returnDict[sj.backend.id]['cpuTime']
-
-            # Set DiracFile metadata - this circuitous route is copied from the standard so as to be consistent with the rest of the job finalisation code.
-            if hasattr(sj.outputfiles, 'get'):
-                wildcards = [f.namePattern for f in sj.outputfiles.get(DiracFile) if regex.search(f.namePattern) is not None]
-            else:
-                wildcards = []
-
-            lfn_store = os.path.join(sj.getOutputWorkspace().getPath(), getConfig('Output')['PostProcessLocationsFileName'])
-
-            # Make the file on disk with a nullop...
-            if not os.path.isfile(lfn_store):
-                with open(lfn_store, 'w'):
-                    pass
-
-            if hasattr(sj.outputfiles, 'get') and sj.outputfiles.get(DiracFile):
-                # Now we can iterate over the contents of the file without touching it
-                with open(lfn_store, 'ab') as postprocesslocationsfile:
-                    if not hasattr(returnDict[sj.backend.id]['outDataInfo'], 'keys'):
-                        logger.error("Error understanding OutputDataInfo: %s" % str(returnDict[sj.backend.id]['outDataInfo']))
-                        raise GangaDiracError("Error understanding OutputDataInfo: %s" % str(returnDict[sj.backend.id]['outDataInfo']))
-
-                    ## Caution is not clear atm whether this 'Value' is an LHCbism or bug
-                    list_of_files = returnDict[sj.backend.id]['outDataInfo'].get('Value', list(returnDict[sj.backend.id]['outDataInfo'].keys()))
-                    for file_name in list_of_files:
-                        file_name = os.path.basename(file_name)
-                        info = returnDict[sj.backend.id]['outDataInfo'].get(file_name)
-                        #logger.debug("file_name: %s,\tinfo: %s" % (str(file_name), str(info)))
-
-                        if not hasattr(info, 'get'):
-                            logger.error("Error getting OutputDataInfo for: %s" % str(sj.getFQID('.')))
-                            logger.error("Please check the Dirac Job still exists or attempt a job.backend.reset() to try again!")
-                            logger.error("Err: %s" % str(info))
-                            logger.error("file_info_dict: %s" % str(returnDict[sj.backend.id]['outDataInfo']))
-                            raise GangaDiracError("Error getting OutputDataInfo")
-
-                        valid_wildcards = [wc for wc in wildcards if fnmatch.fnmatch(file_name, wc)]
-                        if not valid_wildcards:
-                            valid_wildcards.append('')
-
-                        for wc in valid_wildcards:
-                            #logger.debug("wildcard: %s" % str(wc))
-
-                            DiracFileData = 'DiracFile:::%s&&%s->%s:::%s:::%s\n' % (wc,
-                                                                                    file_name,
-                                                                                    info.get('LFN', 'Error Getting LFN!'),
-                                                                                    str(info.get('LOCATIONS', ['NotAvailable'])),
-                                                                                    info.get('GUID', 'NotAvailable')
-                                                                                    )
-                            #logger.debug("DiracFileData: %s" % str(DiracFileData))
-                            postprocesslocationsfile.write(DiracFileData)
-                            postprocesslocationsfile.flush()
-
-                logger.debug("Written: %s" % open(lfn_store, 'r').readlines())
-
-            #Set the status of the subjob
-            sj.updateStatus(statusmapping[statusList['Value'][sj.backend.id]['Status']])
+        return DiracFinaliser([stripProxy(j) for j in theseJobs], downloadSandbox, verbose=True).start()
 
     @staticmethod
     def requeue_dirac_finished_jobs(requeue_jobs, finalised_statuses):
@@ -1280,6 +1325,8 @@ class DiracBase(IBackend):
         """
 
         # requeue existing completed job
+        jobs_to_finalise = {True: [], False: []}
+        master_jobs_to_update = []
         for j in requeue_jobs:
             if j.been_queued:
                 continue
@@ -1291,13 +1338,42 @@ class DiracBase(IBackend):
             if j.backend.status not in finalised_statuses:
                 j.been_queued = False
                 continue
-            if not configDirac['serializeBackend']:
-                getQueues()._monitoring_threadpool.add_function(DiracBase.job_finalisation,
-                                                           args=(j, finalised_statuses[j.backend.status]),
-                                                           priority=5, name="Job %s Finalizing" % j.fqid)
-                j.been_queued = True
+            updated_dirac_status = finalised_statuses[j.backend.status]
+            if j.backend.finaliseOnMaster and j.master:
+                if not configDirac['serializeBackend']:
+                    getQueues()._monitoring_threadpool.add_function(DiracBase.job_finalisation,
+                                                               args=(j, updated_dirac_status),
+                                                               priority=5, name="Job %s Finalizing" % j.fqid)
+                    j.been_queued = True
+                else:
+                    DiracBase.job_finalisation(j, updated_dirac_status)
+                continue
+
+            # Check status is sane before we start
+            if j.status in ['completed', 'killed', 'removed']:
+                continue
+            if j.master and j.master.status in ['removed', 'killed']:
+                continue  # user changed it under us
+            if j.status != 'running':
+                j.updateStatus('submitted', update_master=False)
+                j.updateStatus('running', update_master=False)
+            if updated_dirac_status == 'completed':
+                j.updateStatus('completing', update_master=False)
+                downloadSandbox = j.backend.downloadSandbox
             else:
-                DiracBase.job_finalisation(j, finalised_statuses[j.backend.status])
+                downloadSandbox = configDirac['failed_sandbox_download']
+            if j.master and j.master not in master_jobs_to_update:
+                master_jobs_to_update.append(j.master)
+            j.been_queued = True
+            jobs_to_finalise[bool(downloadSandbox)].append(j)
+
+        for m in master_jobs_to_update:
+            m.updateMasterJobStatus()
+
+        # The jobs are finalised in the background, each set back to not queued as it finishes
+        for downloadSandbox, jobs in jobs_to_finalise.items():
+            if jobs:
+                DiracFinaliser(jobs, downloadSandbox).start()
 
 
     @staticmethod
@@ -1459,6 +1535,240 @@ class DiracBase(IBackend):
             logger.warning("Error in Monitoring Loop, jobs on the DIRAC backend may not update")
             logger.debug(err)
 
+class DiracFinaliser(object):
+
+    """
+    Finalises a set of jobs which have finished in DIRAC in three stages, which overlap across the jobs:
+      'sandbox'     the download of the output sandbox of each job, [DIRAC]maxConcurrentSandboxDownloads at a time
+      'lookup'      the DIRAC status, CPU time, state times and output data info of up to
+                    [DIRAC]maxSubjobsFinalisationPerProcess jobs of one credential in a single DIRAC call,
+                    [DIRAC]maxConcurrentFinalisationLookups calls per credential at a time
+      'postprocess' writing the PostProcessLocations file of a job and setting its status, as soon as both its sandbox
+                    and its lookup are in
+    The stages run on the monitoring thread pool without anything waiting on it, or one after the other in the calling
+    thread if the pool is frozen, even part way through, or [DIRAC]serializeBackend is set. The time and throughput of each stage is logged
+    once the last job is done.
+    """
+
+    def __init__(self, jobs, downloadSandbox=True, threadpool=None, verbose=False):
+        """
+        Args:
+            jobs (list): The jobs to finalise, with their DIRAC ids
+            downloadSandbox (bool): Should the output sandboxes be downloaded
+            threadpool (WorkerThreadPool): The pool the stages run on, None for the monitoring thread pool
+            verbose (bool): Should the time and throughput of the stages be logged as info rather than debug
+        """
+        if threadpool is None:
+            threadpool = getQueues()._monitoring_threadpool
+        self._threadpool = threadpool
+        self._inline = configDirac['serializeBackend'] or threadpool.isfrozen()
+        self._downloadSandbox = downloadSandbox
+        self._statusmapping = configDirac['statusmapping']
+        self._maxDownloads = max(1, int(configDirac['maxConcurrentSandboxDownloads']))
+        self._maxLookups = max(1, int(configDirac['maxConcurrentFinalisationLookups']))
+        nPerProcess = max(1, int(math.floor(configDirac['maxSubjobsFinalisationPerProcess'])))
+
+        # The jobs without a valid credential can't be looked up, they are left as they are
+        self._jobs = []
+        self._lookupQueues = []
+        for jobs_group in group_jobs_by_backend_credential(jobs):
+            indices = list(range(len(self._jobs), len(self._jobs) + len(jobs_group)))
+            self._jobs.extend(jobs_group)
+            self._lookupQueues.append(deque(indices[i:i + nPerProcess] for i in range(0, len(indices), nPerProcess)))
+        if len(self._jobs) != len(jobs):
+            logger.warning("%s jobs can't be finalised until their credentials are available" % (len(jobs) - len(self._jobs)))
+            for j in jobs:
+                if not any(j is this_job for this_job in self._jobs):
+                    j.been_queued = False
+
+        self._downloadQueue = deque(range(len(self._jobs)) if downloadSandbox else [])
+        self._sandboxes = {}
+        self._lookups = {}
+        self._done = threading.Condition()
+        self._remaining = len(self._jobs)
+        self._verbose = verbose
+        self._start = time.time()
+        self.timer = StageTimer()
+
+    def start(self):
+        """
+        Start finalising the jobs, returns without waiting for them
+        """
+        if self._inline:
+            while self._downloadQueue:
+                index = self._downloadQueue.popleft()
+                self._collect(self._sandboxes, {index: self._getSandbox(index)})
+            for queue in self._lookupQueues:
+                while queue:
+                    self._collect(self._lookups, self._getInfo(queue.popleft()))
+            return self
+
+        for _ in range(self._maxDownloads):
+            self._nextDownload()
+        for queue in self._lookupQueues:
+            for _ in range(self._maxLookups):
+                self._nextLookup(queue)
+        return self
+
+    def wait(self):
+        """
+        Wait until all the jobs have been finalised
+        """
+        with self._done:
+            while self._remaining > 0:
+                self._done.wait()
+        return self
+
+    def _nextDownload(self):
+        while True:
+            with self._done:
+                if not self._downloadQueue:
+                    return
+                index = self._downloadQueue.popleft()
+            if self._threadpool.add_function(self._downloadTask, (index,), name="Job %s Sandbox" % self._jobs[index].fqid):
+                return
+            # The pool has been frozen since we started, the rest of the downloads are done in this thread
+            self._collect(self._sandboxes, {index: self._getSandbox(index)})
+
+    def _nextLookup(self, queue):
+        while True:
+            with self._done:
+                if not queue:
+                    return
+                indices = queue.popleft()
+            if self._threadpool.add_function(self._lookupTask, (queue, indices), name="Finalisation Lookup"):
+                return
+            # As for the downloads, the rest of the lookups of this credential are done in this thread
+            self._collect(self._lookups, self._getInfo(indices))
+
+    def _downloadTask(self, index):
+        result = self._getSandbox(index)
+        self._nextDownload()
+        self._collect(self._sandboxes, {index: result})
+
+    def _lookupTask(self, queue, indices):
+        result = self._getInfo(indices)
+        self._nextLookup(queue)
+        self._collect(self._lookups, result)
+
+    def _getSandbox(self, index):
+        """
+        Download the output sandbox of a job, returns the result of getOutputSandbox
+        """
+        job = self._jobs[index]
+        dirac_cmd = "getOutputSandbox(%d,'%s', %s)" % (job.backend.id, job.getOutputWorkspace().getPath(), job.backend.unpackOutputSandbox)
+        with self.timer.stage('sandbox'):
+            try:
+                return execute(dirac_cmd, cred_req=job.backend.credential_requirements, return_raw_dict=True, new_subprocess=True)
+            except Exception as err:
+                return {'OK': False, 'Message': str(err)}
+
+    def _getInfo(self, indices):
+        """
+        Look up everything but the sandbox needed to finalise some jobs of one credential in one DIRAC call. Returns a
+        dict of the index of each job against its info, which is empty if DIRAC doesn't know the job and None if the
+        lookup failed
+        """
+        jobs = [self._jobs[i] for i in indices]
+        start = time.time()
+        try:
+            info = execute("getFinalisationInfo(%s)" % repr([j.backend.id for j in jobs]), cred_req=jobs[0].backend.credential_requirements, new_subprocess=True)
+        except Exception as err:
+            logger.warning("Unable to get the finalisation info of jobs %s from DIRAC: %s" % (', '.join(j.getFQID('.') for j in jobs), err))
+            info = None
+        self.timer.add('lookup', time.time() - start, len(indices))
+        if info is None:
+            return dict((i, None) for i in indices)
+        return dict((i, info.get(j.backend.id, {})) for i, j in zip(indices, jobs))
+
+    def _collect(self, results, new_results):
+        """
+        Store the results of a stage and postprocess the jobs which then have everything they need
+        Args:
+            results (dict): The results of the stage so far, keyed by the index of the job
+            new_results (dict): The new results of the stage
+        """
+        with self._done:
+            results.update(new_results)
+            ready = [index for index in new_results if index in self._lookups and (not self._downloadSandbox or index in self._sandboxes)]
+
+        master_jobs_to_update = []
+        try:
+            for index in ready:
+                job = self._jobs[index]
+                try:
+                    with self.timer.stage('postprocess'):
+                        self._postprocess(job, self._lookups[index], self._sandboxes.get(index))
+                except Exception as err:
+                    logger.error("Unable to finalise job %s: %s" % (job.getFQID('.'), err))
+                    if job.status == 'completing':
+                        job.force_status('failed')
+                finally:
+                    job.been_queued = False
+                if job.master and job.master not in master_jobs_to_update:
+                    master_jobs_to_update.append(job.master)
+
+            for m in master_jobs_to_update:
+                m.updateMasterJobStatus()
+        except Exception as err:
+            logger.error("Error finalising jobs: %s" % err)
+        finally:
+            with self._done:
+                self._remaining -= len(ready)
+                if ready and self._remaining == 0:
+                    (logger.info if self._verbose else logger.debug)("Finalised %s jobs: %s" % (len(self._jobs), self.report()))
+                    self._done.notify_all()
+
+    def _postprocess(self, job, info, sandbox):
+        """
+        Set the CPU time, output data and status of a job from its lookup and sandbox download
+        Args:
+            job (Job): The job to finalise
+            info (dict): The finalisation info of the job from DIRAC
+            sandbox (dict): The result of the download of its output sandbox, None if it wasn't downloaded
+        """
+        # The lookup failed, return the job to running so that the monitoring tries again
+        if info is None:
+            DiracBase.job_finalisation_cleanup(job, None)
+            return
+        #Check we are able to get the job status - if not set to failed.
+        if not info:
+            logger.error("Job %s with DIRAC ID %s has been removed from DIRAC. Unable to finalise it." % (job.getFQID('.'), job.backend.id))
+            job.force_status('failed')
+            return
+
+        status = self._statusmapping.get(info['Status'], 'failed')
+        #If we wanted the sandbox make sure it downloaded OK.
+        if self._downloadSandbox:
+            if not result_ok(sandbox):
+                if status == 'completed':
+                    logger.error("Output sandbox error for job %s: %s. Unable to finalise it." % (job.getFQID('.'), sandbox.get('Message')))
+                    job.force_status('failed')
+                    return
+                logger.warning("Problem retrieving outputsandbox of job %s: %s" % (job.getFQID('.'), sandbox.get('Message')))
+            else:
+                DiracBase._unpack_oversized_sandbox(job, sandbox, job.getOutputWorkspace().getPath())
+
+        job.backend.normCPUTime = info['cpuTime']
+        DiracBase._write_postprocess_locations(job, info['outDataInfo'])
+
+        DiracBase._getStateTime(job, status, info['outStateTime'])
+        if job.status in ['removed', 'killed']:
+            return
+        elif (job.master and job.master.status in ['removed', 'killed']):
+            return  # user changed it under us
+        job.updateStatus(status, update_master=False)
+
+    def report(self):
+        """
+        A one line summary of the wall time since the finaliser was made and the time and throughput of each stage
+        """
+        stages = self.timer.getStages()
+        rates = ', '.join('%s %d in %.2fs (%.1f/s)' % (name, calls, total, calls / total if total else 0.)
+                          for name, (total, calls) in sorted(stages.items()))
+        return '%.2fs wall, %s' % (time.time() - self._start, rates)
+
+
 def finalise_jobs_func(jobs, getSandbox = True):
     """Finalise the provided set of jobs."""
     DiracBase.finalise_jobs(jobs, getSandbox)
@@ -1,5 +1,6 @@
 import time
 import re
+import ast
 import itertools
 from GangaCore.Core.exceptions import GangaException, BackendError
 #from GangaDirac.BOOT       import dirac_ganga_server
@@ -82,6 +83,85 @@ def get_parametric_datasets(dirac_script_lines):
     return eval(dataset_str)
 
 
+parametric_sequences_marker = '###PARAMETRIC_SEQUENCES###'
+parametric_name_re = re.compile(r"^(?P<ident>\w+)\.setName\((?P<value>.*)\)\s*$")
+parametric_exe_re = re.compile(r"^(?P<ident>\w+)\.setExecutable\((?P<value>.*)\)\s*$")
+parametric_inputdata_re = re.compile(r"^(?P<ident>\w+)\.setInputData\((?P<value>.*)\)\s*$")
+parametric_none_re = re.compile(r"^\w+\.setParametricInputData\(None\)\s*$")
+
+
+def get_parametric_skeleton(dirac_script):
+    '''
+    Split a DIRAC API script into the JDL skeleton it shares with the other subjobs of a parametric job and the parameters
+    which are its own: the job name, the executable arguments and the input data. Returns (None, None) if the script
+    can't be part of a parametric job
+    Args:
+        dirac_script (str): The DIRAC API script of a subjob
+    '''
+    skeleton = []
+    parameters = {}
+    for line in dirac_script.split('\n'):
+        if parametric_none_re.match(line):
+            continue
+        m = parametric_name_re.match(line)
+        if m and 'JobName' not in parameters:
+            try:
+                parameters['JobName'] = ast.literal_eval(m.group('value'))
+            except (ValueError, SyntaxError):
+                return None, None
+            skeleton.append(parametric_sequences_marker + m.group('ident'))
+            skeleton.append("%s.setName('%%(JobName)s')" % m.group('ident'))
+            continue
+        m = parametric_exe_re.match(line)
+        if m and 'Arguments' not in parameters:
+            try:
+                exe_args = ast.literal_eval('(%s,)' % m.group('value'))
+            except (ValueError, SyntaxError):
+                return None, None
+            if len(exe_args) == 3 and all(isinstance(arg, str) for arg in exe_args):
+                parameters['Arguments'] = exe_args[1]
+                skeleton.append("%s.setExecutable(%r, '%%(Arguments)s', %r)" % (m.group('ident'), exe_args[0], exe_args[2]))
+                continue
+        m = parametric_inputdata_re.match(line)
+        if m and 'InputData' not in parameters:
+            try:
+                input_data = ast.literal_eval(m.group('value'))
+            except (ValueError, SyntaxError):
+                return None, None
+            # A job without input data keeps the line so it's only grouped with other jobs without input data
+            if input_data:
+                parameters['InputData'] = input_data
+                continue
+        skeleton.append(line)
+
+    if 'JobName' not in parameters or any('.setParametricInputData(' in line for line in skeleton):
+        return None, None
+
+    return '\n'.join(skeleton), parameters
+
+
+def get_parametric_script(skeleton, parameters):
+    '''
+    Build the DIRAC API script of a parametric job with one job for each set of parameters
+    Args:
+        skeleton (str): The JDL skeleton shared by the jobs, from get_parametric_skeleton
+        parameters (list): The parameters of each job, from get_parametric_skeleton
+    '''
+    lines = []
+    for line in skeleton.split('\n'):
+        if not line.startswith(parametric_sequences_marker):
+            lines.append(line)
+            continue
+        ident = line[len(parametric_sequences_marker):]
+        for name in sorted(parameters[0]):
+            values = [these_parameters[name] for these_parameters in parameters]
+            if name == 'InputData':
+                lines.append('%s.setParametricInputData(%r)' % (ident, values))
+            else:
+                lines.append('%s.setParameterSequence(%r, %r)' % (ident, name, values))
+    return '\n'.join(lines)
+
+
 # Note could combine selection_pred with file_type
 # using types.typetype or types.functiontype
 def outputfiles_iterator(job, file_type, selection_pred=None,
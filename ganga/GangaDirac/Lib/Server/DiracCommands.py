@@ -174,32 +174,49 @@ def getOutputDataInfo(id, pipe_out=True):
     ret = {}
     result = getOutputDataLFNs(id, pipe_out=False)
     if result.get('OK', False) and 'Value' in result:
-        for lfn in result.get('Value', []):
-            file_name = os.path.basename(lfn)
-            ret[file_name] = {}
-            ret[file_name]['LFN'] = lfn
-            md = dirac.getLfnMetadata(lfn)
-            if md.get('OK', False) and lfn in md.get('Value', {'Successful': {}})['Successful']:
-                ret[file_name]['GUID'] =  md['Value']['Successful'][lfn]['GUID']
-            # this catches if fail upload, note lfn still exists in list as
-            # dirac tried it
-            elif md.get('OK', False) and lfn in md.get('Value', {'Failed': {}})['Failed']:
-                ret[file_name]['LFN'] = '###FAILED###'
-                ret[file_name]['LOCATIONS'] = md['Value']['Failed'][lfn]
-                ret[file_name]['GUID'] = 'NotAvailable'
-                continue
-            rp = dirac.getReplicas(lfn)
-            if rp.get('OK', False) and lfn in rp.get('Value', {'Successful': {}})['Successful']:
-                ret[file_name]['LOCATIONS'] = rp['Value']['Successful'][lfn].keys()
+        lfn_info = getLFNsInfo(result['Value'], pipe_out=False)
+        for lfn in result['Value']:
+            ret[os.path.basename(lfn)] = lfn_info[lfn]
+    return ret
+
+
+@diracCommand
+def getLFNsInfo(lfns, pipe_out=True):
+    ''' Get the GUID and locations of a list of LFNs with one metadata and one replica lookup for them all, returned as a dict keyed by LFN'''
+    ret = {}
+    if not lfns:
+        return ret
+    md = dirac.getLfnMetadata(lfns)
+    md_value = md.get('Value', {}) if md.get('OK', False) else {}
+    to_locate = []
+    for lfn in lfns:
+        ret[lfn] = {'LFN': lfn}
+        if lfn in md_value.get('Successful', {}):
+            ret[lfn]['GUID'] = md_value['Successful'][lfn]['GUID']
+        # this catches if fail upload, note lfn still exists in list as
+        # dirac tried it
+        elif lfn in md_value.get('Failed', {}):
+            ret[lfn]['LFN'] = '###FAILED###'
+            ret[lfn]['LOCATIONS'] = md_value['Failed'][lfn]
+            ret[lfn]['GUID'] = 'NotAvailable'
+            continue
+        to_locate.append(lfn)
+    if to_locate:
+        rp = dirac.getReplicas(to_locate)
+        if rp.get('OK', False):
+            for lfn, replicas in rp['Value'].get('Successful', {}).items():
+                ret[lfn]['LOCATIONS'] = list(replicas.keys())
     return ret
 
 
 
 # could shrink this with dirac.getJobOutputLFNs from ##dirac
 @diracCommand
-def getOutputDataLFNs(id, pipe_out=True):
-    ''' Get the outputDataLFN which have been generated by a Dirac job of ID and pipe it out or return it'''
-    parameters = dirac.getJobParameters(id)
+def getOutputDataLFNs(id, pipe_out=True, parameters=None):
+    ''' Get the outputDataLFN which have been generated by a Dirac job of ID and pipe it out or return it
+    parameters: the result of dirac.getJobParameters(id) if it has already been looked up'''
+    if parameters is None:
+        parameters = dirac.getJobParameters(id)
     lfns = []
     ok = False
     message = 'The outputdata LFNs could not be found.'
@@ -232,9 +249,11 @@ def getOutputDataLFNs(id, pipe_out=True):
 
 
 @diracCommand
-def normCPUTime(id, pipe_out=True):
-    ''' Get the normalied CPU time that has been used by a DIRAC job of ID and pipe it out or return it'''
-    parameters = dirac.getJobParameters(id)
+def normCPUTime(id, pipe_out=True, parameters=None):
+    ''' Get the normalied CPU time that has been used by a DIRAC job of ID and pipe it out or return it
+    parameters: the result of dirac.getJobParameters(id) if it has already been looked up'''
+    if parameters is None:
+        parameters = dirac.getJobParameters(id)
     ncput = None
     if parameters is not None and parameters.get('OK', False):
         parameters = parameters['Value']
@@ -258,20 +277,32 @@ def finished_job(id, outputDir=os.getcwd(), unpack=True, oversized=True, noJobDi
 
 
 @diracCommand
-def finaliseJobs(inputDict, statusmapping, downloadSandbox=True, oversized=True, noJobDir=True):
-    ''' A function to get the necessaries to finalise a whole bunch of jobs. Returns a dict of job information and a dict of stati.'''
-    returnDict = {}
-    statusList = dirac.status(inputDict.keys())
-    for diracID in inputDict.keys():
-        returnDict[diracID] = {}
-        returnDict[diracID]['cpuTime'] = normCPUTime(diracID, pipe_out=False)
-        if downloadSandbox:
-            returnDict[diracID]['outSandbox'] = getOutputSandbox(diracID, inputDict[diracID], oversized, noJobDir, pipe_out=False)
-        else:
-            returnDict[diracID]['outSandbox'] = None
-        returnDict[diracID]['outDataInfo'] = getOutputDataInfo(diracID, pipe_out=False)
-        returnDict[diracID]['outStateTime'] = {'completed' : getStateTime(diracID, 'completed', pipe_out=False)}
-    return returnDict, statusList
+def getFinalisationInfo(job_ids, pipe_out=True):
+    ''' Get everything but the output sandbox needed to finalise a batch of jobs: their DIRAC status, normalised CPU time,
+    the times of their state transitions and their output data info. The statuses come from one call for the whole batch,
+    the CPU time and output LFNs of each job from one look at its parameters and the GUIDs and locations of the LFNs of
+    all the jobs from one metadata and one replica lookup.
+    Returns a dict keyed by DIRAC job id, which leaves out the jobs DIRAC doesn't know about'''
+    result = dirac.status(job_ids)
+    if not result.get('OK', False):
+        return result
+    bulk_status = result['Value']
+    ret = {}
+    job_lfns = {}
+    for diracID in job_ids:
+        if diracID not in bulk_status:
+            continue
+        parameters = dirac.getJobParameters(diracID)
+        ret[diracID] = {}
+        ret[diracID]['Status'] = bulk_status[diracID].get('Status', None)
+        ret[diracID]['cpuTime'] = normCPUTime(diracID, pipe_out=False, parameters=parameters)
+        ret[diracID]['outStateTime'] = getStateTimes(diracID, ['running', 'completing', 'completed', 'failed'], pipe_out=False)
+        lfns = getOutputDataLFNs(diracID, pipe_out=False, parameters=parameters)
+        job_lfns[diracID] = lfns.get('Value', []) if lfns.get('OK', False) else []
+    lfn_info = getLFNsInfo(list(set(lfn for lfns in job_lfns.values() for lfn in lfns)), pipe_out=False)
+    for diracID, lfns in job_lfns.items():
+        ret[diracID]['outDataInfo'] = dict((os.path.basename(lfn), lfn_info[lfn]) for lfn in lfns)
+    return ret
 
 
 @diracCommand
@@ -315,33 +346,34 @@ def status(job_ids, statusmapping, pipe_out=True):
 @diracCommand
 def getStateTime(id, status, pipe_out=True):
     ''' Return the state time from DIRAC corresponding to DIRACJob tranasitions'''
+    return getStateTimes(id, [status], pipe_out=False).get(status, None)
+
+
+@diracCommand
+def getStateTimes(id, statuses, pipe_out=True):
+    ''' Return a dict of the state times from DIRAC corresponding to several DIRACJob transitions from one look at the logging info'''
     log = dirac.getJobLoggingInfo(id)
     if 'Value' not in log:
-        return None
+        return dict((status, None) for status in statuses)
     L = log['Value']
-    checkstr = ''
-
-    if status == 'running':
-        checkstr = 'Running'
-    elif status == 'completed':
-        checkstr = 'Done'
-    elif status == 'completing':
-        checkstr = 'Completed'
-    elif status == 'failed':
-        checkstr = 'Failed'
-    else:
-        checkstr = ''
 
-    if checkstr == '':
-        print("%s" % None)
-        return
+    checkstrs = {'running': 'Running',
+                 'completed': 'Done',
+                 'completing': 'Completed',
+                 'failed': 'Failed'}
 
-    for l in L:
-        if checkstr in l[0]:
-            T = datetime.datetime(*(time.strptime(l[3], "%Y-%m-%d %H:%M:%S")[0:6]))
-            return T
-    
-    return None
+    result = {}
+    for status in statuses:
+        result[status] = None
+        checkstr = checkstrs.get(status, '')
+        if checkstr == '':
+            continue
+        for l in L:
+            if checkstr in l[0]:
+                result[status] = datetime.datetime(*(time.strptime(l[3], "%Y-%m-%d %H:%M:%S")[0:6]))
+                break
+
+    return result
 
 
 @diracCommand
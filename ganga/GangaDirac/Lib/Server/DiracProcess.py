@@ -3,11 +3,22 @@ import sys
 import os
 import errno
 import socket
+import struct
+import pickle
 import traceback
 HOST = 'localhost'  # Standard loopback interface address (localhost)
 PORT = int(sys.argv[1])        # Port to listen on
-rand_hash = raw_input() 
+try:
+    rand_hash = raw_input()
+except NameError:
+    rand_hash = input()
 import time
+
+#Every message in either direction is an 8 byte big-endian length followed by that many bytes of payload.
+#Commands are utf-8 text starting with the random string, replies are pickles of the objects passed to output().
+#A zero length frame marks the end of the reply to a command.
+frame_header = struct.Struct('!Q')
+
 #We have to define an output function as a placeholder here.
 def output(data):
     pass
@@ -16,9 +27,26 @@ def output(data):
 def closeSocket():
     sc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     sc.connect((HOST, PORT))
-    sc.sendall(b'close server')
+    sendFrame(sc, (rand_hash + 'close-server').encode('utf-8'))
     sc.close()
-end_trans = '###END-TRANS###'
+
+def sendFrame(skt, payload):
+    skt.sendall(frame_header.pack(len(payload)))
+    if payload:
+        skt.sendall(payload)
+
+def recvExactly(skt, size):
+    #Read straight into a preallocated buffer rather than concatenating chunks
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        nbytes = skt.recv_into(view[received:], size - received)
+        if not nbytes:
+            return None
+        received += nbytes
+    return buf
+
 #This is a wrapper for the client sockets
 class socketWrapper(object):
 
@@ -26,20 +54,17 @@ class socketWrapper(object):
         self._socket = skt
 
     def read(self):
-        cmd = ''
-        while end_trans not in cmd:
-            data = self._socket.recv(1024)
-            if not data:
-                cmd = '###BROKEN###'
-                break
-            cmd += data
+        header = recvExactly(self._socket, frame_header.size)
+        if header is None:
+            return ''
+        payload = recvExactly(self._socket, frame_header.unpack(bytes(header))[0])
+        if payload is None:
+            return ''
+        cmd = bytes(payload).decode('utf-8')
         #Check the random string is in the cmd so we know it came from a trusted source.
-        if not rand_hash in cmd:
+        if not cmd.startswith(rand_hash):
             return 'close-connection'
-        if cmd == '###BROKEN###':
-            return ''
-        return_string = cmd.replace(rand_hash, '')
-        return return_string.replace(end_trans, '')
+        return cmd[len(rand_hash):]
 
 #Start the socket
 s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -52,11 +77,12 @@ while True:
         conn, addr = s.accept()
         sock = socketWrapper(conn)
         cmd = sock.read()
-        #Here we define the output method to just send the output of the diracCommand wrapper.
+        #Here we define the output method to send each object passed to it as a pickled frame as soon as it's produced.
         def output(data):
-            conn.sendall(repr(data))
+            sendFrame(conn, pickle.dumps(data, 2))
 
-        if cmd=='close-connection':
+        #Connections which close without sending a command, e.g. the check that the server has started
+        if cmd=='' or cmd=='close-connection':
             conn.shutdown(socket.SHUT_RDWR)
             conn.close()
             continue
@@ -73,8 +99,11 @@ while True:
             except:
                 print("Exception raised executing command (cmd) '%s'\n" % cmd)
                 print(traceback.format_exc())
+                #Send the error back as the reply so the client sees it rather than no output at all
+                output({'OK': False, 'Message': "Exception raised executing command (cmd) '%s'\n%s" % (cmd, traceback.format_exc())})
 
-        conn.sendall('###END-TRANS###')
+        sendFrame(conn, b'')
+        conn.close()
     #Catch the timeout and exit
     except socket.timeout:
         break
@@ -107,7 +107,7 @@ def wrapped_execute(command, expected_type, new_subprocess = False):
         expected_type (type): This is the type of the object which is returned from DIRAC
     """
     try:
-        result = execute(command, new_subprocess)
+        result = execute(command, new_subprocess=new_subprocess)
         assert isinstance(result, expected_type)
     except AssertionError:
         raise SplitterError("Output from DIRAC expected to be of type: '%s', we got the following: '%s'" % (expected_type, result))
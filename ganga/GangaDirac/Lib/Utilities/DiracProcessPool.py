@@ -0,0 +1,286 @@
+import os
+import time
+import socket
+import inspect
+import subprocess
+import threading
+import uuid
+from collections import deque
+from GangaCore.Utility.Config import getConfig
+from GangaCore.Utility.logging import getLogger
+logger = getLogger()
+
+HOST = 'localhost'
+
+# /\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\
+
+
+def launchDiracServer(env):
+    """
+    Start a DiracProcess.py server in the given environment and load the DIRAC command includes into it.
+    Returns a tuple of (Popen object, port, random hash) which identifies the server.
+    Args:
+        env (dict): The DIRAC environment the server should run in
+    """
+    from GangaDirac.Lib.Server.InspectionClient import runClient
+    from GangaDirac.Lib.Utilities.DiracUtilities import getDiracCommandIncludes, GangaDiracError, sendDiracFrame, recvDiracFrame
+    #Create a socket and bind it to 0 to find a free port
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind((HOST, 0))
+    port = s.getsockname()[1]
+    s.close()
+    #Pass the port no as an argument to the popen
+    serverpath = os.path.join(os.path.dirname(inspect.getsourcefile(runClient)), 'DiracProcess.py')
+    popen_cmd = ['python', serverpath, str(port)]
+    process = subprocess.Popen(popen_cmd, env=env, stdin=subprocess.PIPE)
+
+    #Now set a random string to make sure only commands from this sessions are executed
+    rand_hash = uuid.uuid4()
+    process.stdin.write(str(rand_hash).encode("utf-8"))
+    process.stdin.close()
+
+    #We have to wait a little bit for the subprocess to start the server so we try until the connection stops being refused. Set a limit of one minute.
+    connection_timeout = time.time() + 60
+    started = False
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    while time.time() < connection_timeout and not started:
+        try:
+            s.connect((HOST, port))
+            started = True
+        except socket.error:
+            if process.poll() is not None:
+                break
+            time.sleep(1)
+    if not started:
+        process.kill()
+        raise GangaDiracError("Failed to start the Dirac server process!")
+    #Now setup the Dirac environment in the subprocess
+    dirac_command = str(rand_hash) + getDiracCommandIncludes()
+    sendDiracFrame(s, dirac_command.encode("utf-8"))
+    while recvDiracFrame(s):
+        pass
+    s.close()
+
+    return process, port, rand_hash
+
+
+class DiracServerWorker(object):
+    """
+    A single long-lived DIRAC server process which executes one command at a time
+    """
+
+    def __init__(self, env):
+        """
+        Args:
+            env (dict): The DIRAC environment, including the proxy location, this worker runs in
+        """
+        self.process, self.port, self.rand_hash = launchDiracServer(env)
+        self.calls = 0
+
+    def alive(self):
+        """ Is the server process still running """
+        return self.process.poll() is None
+
+    def run(self, command, cwd, timeout=None):
+        """
+        Send the command to the server process and return the evaluated reply
+        Args:
+            command (str): The command to execute in the DIRAC session
+            cwd (str): The directory the command is executed within
+            timeout (int): Seconds to wait for the reply before giving up on this worker
+        """
+        from GangaDirac.Lib.Utilities.DiracUtilities import sendDiracServerCommand
+        self.calls += 1
+        return sendDiracServerCommand(self.port, self.rand_hash, command, cwd, timeout)
+
+    def terminate(self):
+        """ Kill the server process, this worker is not reused afterwards """
+        try:
+            self.process.kill()
+            self.process.wait()
+        except OSError as err:
+            logger.debug("Failed to kill DIRAC server process %s: %s" % (self.process.pid, err))
+
+
+class DiracProcessPool(object):
+    """
+    A pool of long-lived DIRAC server processes.
+    Workers are keyed by the credential they run with so that commands needing different proxies or DIRAC
+    environments never share a process. Up to `size` workers are started per key and commands queue for a
+    free worker once all of them are busy. Workers which time out or die are discarded and replaced on demand.
+    """
+
+    # Number of recent call latencies kept to compute the average
+    _latency_window = 100
+
+    def __init__(self, size):
+        """
+        Args:
+            size (int): The maximum number of server processes per credential
+        """
+        self.size = size
+        self._cond = threading.Condition()
+        self._idle = {}
+        self._live = {}
+        self._waiting = 0
+        self._closed = False
+        self._calls = 0
+        self._failures = 0
+        self._recycled = 0
+        self._max_latency = 0.
+        self._latencies = deque(maxlen=self._latency_window)
+
+    def _acquire(self, key, env):
+        """
+        Return an idle worker for this key, starting a new one if we're below the pool size or waiting for one to be released.
+        Raises GangaDiracError once the pool has been shut down
+        Args:
+            key (tuple): The credential key of the worker
+            env (dict): The environment used to start a new worker
+        """
+        from GangaDirac.Lib.Utilities.DiracUtilities import GangaDiracError
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._closed and not self._idle.get(key) and self._live.get(key, 0) >= self.size:
+                    self._cond.wait()
+            finally:
+                self._waiting -= 1
+            if self._closed:
+                raise GangaDiracError("The DIRAC process pool has been shut down")
+            if self._idle.get(key):
+                return self._idle[key].pop()
+            self._live[key] = self._live.get(key, 0) + 1
+        try:
+            return DiracServerWorker(env)
+        except:
+            self._discard(key, None)
+            raise
+
+    def _release(self, key, worker):
+        """ Return a healthy worker to the pool, or kill it if the pool has been shut down """
+        with self._cond:
+            if not self._closed:
+                self._idle.setdefault(key, []).append(worker)
+                self._cond.notify()
+                return
+            self._live[key] -= 1
+            self._cond.notify_all()
+        worker.terminate()
+
+    def _discard(self, key, worker):
+        """ Kill a worker which has timed out or crashed and free its slot """
+        if worker is not None:
+            worker.terminate()
+        with self._cond:
+            self._live[key] -= 1
+            if worker is not None:
+                self._recycled += 1
+            if self._closed:
+                self._cond.notify_all()
+            else:
+                self._cond.notify()
+
+    def execute(self, command, env, cwd, timeout=None, key=None):
+        """
+        Execute a command on a pooled DIRAC server and return the evaluated reply.
+        A worker which has died since its last use is replaced and the command is retried once.
+        Args:
+            command (str): The command to execute in the DIRAC session
+            env (dict): The environment for any new worker which has to be started
+            cwd (str): The directory the command is executed within
+            timeout (int): The time in seconds a command may take before its worker is killed
+            key (tuple): The credential key used to choose the worker
+        """
+        from GangaDirac.Lib.Utilities.DiracUtilities import GangaDiracError
+        start = time.time()
+        for attempt in range(2):
+            worker = self._acquire(key, env)
+            try:
+                result = worker.run(command, cwd, timeout)
+            except socket.timeout:
+                self._discard(key, worker)
+                self._record(start, failed=True)
+                raise GangaDiracError("DIRAC command timed out")
+            except (socket.error, EOFError) as err:
+                logger.debug("DIRAC server process failed, recycling it: %s" % err)
+                self._discard(key, worker)
+                if attempt == 0:
+                    continue
+                self._record(start, failed=True)
+                raise GangaDiracError("DIRAC server process failed: %s" % err)
+            except:
+                self._discard(key, worker)
+                self._record(start, failed=True)
+                raise
+            self._release(key, worker)
+            self._record(start)
+            return result
+
+    def _record(self, start, failed=False):
+        """ Record the latency of a finished call """
+        latency = time.time() - start
+        with self._cond:
+            self._calls += 1
+            if failed:
+                self._failures += 1
+            self._latencies.append(latency)
+            self._max_latency = max(self._max_latency, latency)
+
+    def stats(self):
+        """
+        Return a dictionary describing the state of the pool: the number of running and idle workers, the number of commands
+        queued waiting for a worker and the call latency in seconds
+        """
+        with self._cond:
+            latencies = list(self._latencies)
+            return {'workers': sum(self._live.values()),
+                    'idle': sum(len(idle) for idle in self._idle.values()),
+                    'queued': self._waiting,
+                    'calls': self._calls,
+                    'failures': self._failures,
+                    'recycled': self._recycled,
+                    'mean_latency': sum(latencies) / len(latencies) if latencies else 0.,
+                    'max_latency': self._max_latency}
+
+    def shutdown(self):
+        """ Kill all idle workers, busy workers are killed when they're released and anything waiting for a worker gives up """
+        with self._cond:
+            self._closed = True
+            idle = []
+            for key, workers in self._idle.items():
+                self._live[key] -= len(workers)
+                idle.extend(workers)
+            self._idle = {}
+            self._cond.notify_all()
+        for worker in idle:
+            worker.terminate()
+
+# /\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\
+
+_dirac_process_pool = None
+_pool_lock = threading.Lock()
+
+
+def getDiracProcessPool():
+    """
+    Return the session wide DIRAC process pool, creating it the first time it's needed.
+    Returns None if the pool has been disabled by setting DiracProcessPoolSize to 0
+    """
+    global _dirac_process_pool
+    with _pool_lock:
+        if _dirac_process_pool is None:
+            size = getConfig('DIRAC')['DiracProcessPoolSize']
+            if size <= 0:
+                return None
+            _dirac_process_pool = DiracProcessPool(size)
+    return _dirac_process_pool
+
+
+def stopDiracProcessPool():
+    """ Stop all of the processes in the DIRAC process pool """
+    global _dirac_process_pool
+    with _pool_lock:
+        if _dirac_process_pool is not None:
+            _dirac_process_pool.shutdown()
+            _dirac_process_pool = None
@@ -7,7 +7,8 @@ import shutil
 import json
 import time
 import socket
-import re
+import struct
+import pickle
 from copy import deepcopy
 from GangaCore.Utility.Config import getConfig
 from GangaCore.Utility.logging import getLogger
@@ -24,6 +25,8 @@ DIRAC_INCLUDE = ''
 Dirac_Env_Lock = threading.Lock()
 Dirac_Proxy_Lock = threading.Lock()
 Dirac_Exec_Lock = threading.Lock()
+# Length header of each message exchanged with the DIRAC server, see DiracProcess.py
+DIRAC_FRAME_HEADER = struct.Struct('!Q')
 # /\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\
 
 class GangaDiracError(GangaException):
@@ -192,6 +195,107 @@ def getValidDiracFiles(job, names=None):
                     yield df
 
 
+def sendDiracFrame(skt, payload):
+    """
+    Send one frame of the DIRAC server protocol, an 8 byte length header followed by the payload
+    Args:
+        skt (socket): The connected socket
+        payload (bytes): The bytes to send, an empty payload marks the end of a reply
+    """
+    skt.sendall(DIRAC_FRAME_HEADER.pack(len(payload)))
+    if payload:
+        skt.sendall(payload)
+
+
+def _recvDiracExactly(skt, size):
+    """
+    Read exactly size bytes from the socket into a preallocated buffer
+    Args:
+        skt (socket): The connected socket
+        size (int): The number of bytes to read
+    """
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        nbytes = skt.recv_into(view[received:], size - received)
+        if not nbytes:
+            raise EOFError("DIRAC server closed the connection before replying")
+        received += nbytes
+    return buf
+
+
+def recvDiracFrame(skt):
+    """
+    Read one frame of the DIRAC server protocol and return its payload
+    Args:
+        skt (socket): The connected socket
+    """
+    size = DIRAC_FRAME_HEADER.unpack(bytes(_recvDiracExactly(skt, DIRAC_FRAME_HEADER.size)))[0]
+    return _recvDiracExactly(skt, size)
+
+
+def _loadDiracReply(payload):
+    """
+    Unpickle an object sent by the DIRAC server, which may be running python 2
+    Args:
+        payload (bytearray): The pickled object
+    """
+    try:
+        return pickle.loads(payload)
+    except UnicodeDecodeError:
+        return gexecute.bytes2string(pickle.loads(payload, encoding="bytes"))
+
+
+def iterDiracServerCommand(port, rand_hash, command, cwd, timeout=None):
+    """
+    Send a command to a running DiracProcess.py server and yield each object the command passes to output() as soon as it
+    arrives. This lets very large replies be consumed in pieces rather than held in memory together.
+    Raises socket.error if the server can't be reached and socket.timeout if it doesn't answer within the timeout.
+    Args:
+        port (int): The port the server is listening on
+        rand_hash (UUID): The random string the server was started with
+        command (str): This is the command we're running within our DIRAC session
+        cwd (str): The directory in which to run the command
+        timeout (int): The maximum time in seconds to wait for each part of the reply
+    """
+    HOST = 'localhost'  # The server's hostname or IP address
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        s.settimeout(timeout)
+        s.connect((HOST, port))
+        #Send a random string, then change the directory to carry out the command, then send the command
+        command_to_send  = str(rand_hash)
+        command_to_send += 'os.chdir("%s")\n' % cwd
+        command_to_send += command
+        sendDiracFrame(s, command_to_send.encode('utf-8'))
+        while True:
+            payload = recvDiracFrame(s)
+            if not payload:
+                break
+            yield _loadDiracReply(payload)
+    finally:
+        s.close()
+
+
+def sendDiracServerCommand(port, rand_hash, command, cwd, timeout=None):
+    """
+    Send a command to a running DiracProcess.py server and return the object the command passed to output(),
+    or None if it produced no output.
+    Raises socket.error if the server can't be reached and socket.timeout if it doesn't answer within the timeout.
+    Args:
+        port (int): The port the server is listening on
+        rand_hash (UUID): The random string the server was started with
+        command (str): This is the command we're running within our DIRAC session
+        cwd (str): The directory in which to run the command
+        timeout (int): The maximum time in seconds to wait for the reply
+    """
+    returnable = None
+    for returnable in iterDiracServerCommand(port, rand_hash, command, cwd, timeout):
+        pass
+    return returnable
+
+
 def execute(command,
             timeout=getConfig('DIRAC')['Timeout'],
             env=None,
@@ -239,36 +343,16 @@ def execute(command,
             from GangaDirac.BOOT import running_dirac_process
             if not running_dirac_process:
                 startDiracProcess()
-            #Set up a socket to connect to the process
             from GangaDirac.BOOT import dirac_process_ids
-            HOST = 'localhost'  # The server's hostname or IP address
-            PORT = dirac_process_ids[1]        # The port used by the server
 
             #Put inside a try/except in case the existing process has timed out
             try:
-                s= socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                s.connect((HOST, PORT))
+                returnable = sendDiracServerCommand(dirac_process_ids[1], dirac_process_ids[2], command, cwd_)
             except socket.error as serr:
                 #Start a new process
                 startDiracProcess()
                 from GangaDirac.BOOT import dirac_process_ids
-                PORT = dirac_process_ids[1]
-                s= socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                s.connect((HOST, PORT))
-
-            #Send a random string, then change the directory to carry out the command, then send the command
-            command_to_send  = str(dirac_process_ids[2])
-            command_to_send += 'os.chdir("%s")\n' % cwd_
-            command_to_send += command
-            s.sendall(('%s###END-TRANS###' % command_to_send).encode('utf-8'))
-            out = ''
-            while '###END-TRANS###' not in out:
-                data = s.recv(1024)
-                out += data.decode("utf-8")
-            s.close()
-            #Some regex nonsense to deal with the long representations in python 3
-            out = re.sub(r'((?:^|\s|,|{|\()\d+)L([^A-Za-z0-9\"\'])', r'\1\2', out)
-            returnable = eval(out)
+                returnable = sendDiracServerCommand(dirac_process_ids[1], dirac_process_ids[2], command, cwd_)
 
     else:
         if env is None:
@@ -276,6 +360,8 @@ def execute(command,
                 env = getDiracEnv()
             else:
                 env = getDiracEnv(cred_req.dirac_env)
+        # The pooled DIRAC servers only know about the standard command includes
+        poolable = python_setup == '' and not shell and not update_env and not eval_includes
         if python_setup == '':
             python_setup = getDiracCommandIncludes()
 
@@ -284,14 +370,21 @@ def execute(command,
             if os.getenv('KRB5CCNAME'):
                 env['KRB5CCNAME'] = os.getenv('KRB5CCNAME')
 
-        returnable = gexecute.execute(command,
-                                      timeout=timeout,
-                                      env=env,
-                                      cwd=cwd_,
-                                      shell=shell,
-                                      python_setup=python_setup,
-                                      eval_includes=eval_includes,
-                                      update_env=update_env)
+        from GangaDirac.Lib.Utilities.DiracProcessPool import getDiracProcessPool
+        pool = getDiracProcessPool()
+        if pool is not None and poolable:
+            # Run on one of the long-lived DIRAC servers for this credential rather than starting a new python
+            pool_key = (cred_req.dirac_env if cred_req is not None else None, env.get('X509_USER_PROXY'))
+            returnable = pool.execute(command, dict(env), cwd_, timeout, key=pool_key)
+        else:
+            returnable = gexecute.execute(command,
+                                          timeout=timeout,
+                                          env=env,
+                                          cwd=cwd_,
+                                          shell=shell,
+                                          python_setup=python_setup,
+                                          eval_includes=eval_includes,
+                                          update_env=update_env)
 
         # If the time 
         if returnable == 'Command timed out!':
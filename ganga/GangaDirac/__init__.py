@@ -20,6 +20,9 @@ if not _after_bootstrap:
     configDirac.addOption('Timeout', 1000,
                       'Default timeout (seconds) for Dirac commands')
 
+    configDirac.addOption('DiracProcessPoolSize', 4,
+                      'Number of long-lived DIRAC server processes kept per credential for commands which would otherwise start a new subprocess. 0 starts a new subprocess for each command')
+
     configDirac.addOption('splitFilesChunks', 5000,
                       'when splitting datasets, pre split into chunks of this int')
     diracenv = ""
@@ -93,11 +96,15 @@ if not _after_bootstrap:
     configDirac.addOption('proxyInfoCmd', 'dirac-proxy-info', 'Configurable which sets the default proxy init command for DIRAC')
 
     configDirac.addOption('maxSubjobsPerProcess', 100, 'Set the maximum number of subjobs to be submitted per process.')
+    configDirac.addOption('maxSubjobsPerParametricJob', 100, 'Set the maximum number of subjobs to be submitted as one parametric job. DIRAC rejects parametric jobs larger than its MaxParametricJobs (100 by default).')
     configDirac.addOption('maxSubjobsFinalisationPerProcess', 40, 'Set the maximum number of subjobs to be finalised per process. Not too high to avoid DIRAC timeouts')
+    configDirac.addOption('maxConcurrentSandboxDownloads', 4, 'Set the maximum number of output sandboxes downloaded at once whilst finalising jobs.')
+    configDirac.addOption('maxConcurrentFinalisationLookups', 4, 'Set the maximum number of DIRAC calls, each of up to maxSubjobsFinalisationPerProcess subjobs, looking up the info of the jobs of one credential at once whilst finalising jobs.')
 
     configDirac.addOption('default_finaliseOnMaster', False, 'Finalise all the subjobs in one go')
     configDirac.addOption('default_downloadOutputSandbox', True, 'Donwload output sandboxes by default')
     configDirac.addOption('default_unpackOutputSandbox', True, 'Unpack output sandboxes by default')
+    configDirac.addOption('default_parametricSubmit', False, 'Submit the subjobs which share their sandbox and JDL as parametric jobs by default')
 
 def standardSetup():
 
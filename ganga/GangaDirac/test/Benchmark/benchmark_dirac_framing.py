@@ -0,0 +1,83 @@
+"""
+Compare the time taken to receive replies from the DIRAC server with the old end-marker protocol (repr of the reply,
+read in 1 KB chunks until '###END-TRANS###' is seen, then eval'd) and the length-prefixed pickle frames now used.
+
+Run with:
+    python benchmark_dirac_framing.py [max size in MB]
+"""
+import re
+import sys
+import time
+import pickle
+import socket
+import threading
+
+from GangaDirac.Lib.Utilities.DiracUtilities import sendDiracFrame, recvDiracFrame, _loadDiracReply
+
+end_trans = '###END-TRANS###'
+
+
+def make_reply(size):
+    """ A getReplicasForJobs-like reply of roughly size bytes """
+    lfn = '/lhcb/LHCb/Collision18/DST/00012345/0000/00012345_%08d_1.dst'
+    entry = len(repr({lfn % 0: {'CERN-DST': 'srm://srm-lhcb.cern.ch/castor/cern.ch/grid' + lfn % 0}}))
+    value = dict((lfn % i, {'CERN-DST': 'srm://srm-lhcb.cern.ch/castor/cern.ch/grid' + lfn % i})
+                 for i in range(max(1, size // entry)))
+    return {'OK': True, 'Value': {'Successful': value, 'Failed': {}}}
+
+
+def legacy_receive(skt):
+    out = ''
+    while end_trans not in out:
+        data = skt.recv(1024)
+        out += data.decode('utf-8')
+    out = re.sub(r'((?:^|\s|,|{|\()\d+)L([^A-Za-z0-9\"\'])', r'\1\2', out)
+    return eval(out)
+
+
+def framed_receive(skt):
+    returnable = None
+    while True:
+        payload = recvDiracFrame(skt)
+        if not payload:
+            return returnable
+        returnable = _loadDiracReply(payload)
+
+
+def time_transfer(send, receive, reply):
+    server, client = socket.socketpair()
+    sender = threading.Thread(target=send, args=(server, reply))
+    start = time.time()
+    sender.start()
+    received = receive(client)
+    elapsed = time.time() - start
+    sender.join()
+    server.close()
+    client.close()
+    assert received == reply
+    return elapsed
+
+
+def legacy_send(skt, reply):
+    skt.sendall(repr(reply).encode('utf-8'))
+    skt.sendall(end_trans.encode('utf-8'))
+
+
+def framed_send(skt, reply):
+    sendDiracFrame(skt, pickle.dumps(reply, 2))
+    sendDiracFrame(skt, b'')
+
+
+def main(max_mb):
+    print('%12s %12s %12s %12s' % ('size', 'legacy (s)', 'framed (s)', 'speedup'))
+    size = 10 * 1024
+    while size <= max_mb * 1024 * 1024:
+        reply = make_reply(size)
+        legacy = time_transfer(legacy_send, legacy_receive, reply)
+        framed = time_transfer(framed_send, framed_receive, reply)
+        print('%10d KB %12.4f %12.4f %11.1fx' % (size // 1024, legacy, framed, legacy / framed))
+        size *= 10
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
@@ -0,0 +1,186 @@
+import os
+import ast
+import time
+import datetime
+import threading
+
+import pytest
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+from GangaCore.testlib.GangaUnitTest import load_config_files, clear_config
+from GangaDirac.Lib.Utilities.DiracUtilities import GangaDiracError
+
+
+class FakeThreadPool(object):
+    """ Runs each function added in a thread of its own, as the workers of a WorkerThreadPool would """
+
+    def __init__(self, freeze_after=None):
+        self.threads = []
+        self.freeze_after = freeze_after
+
+    def add_function(self, function, args=(), kwargs={}, priority=5, name=None):
+        if self.freeze_after is not None and len(self.threads) >= self.freeze_after:
+            return False
+        thread = threading.Thread(target=function, args=args, kwargs=kwargs)
+        self.threads.append(thread)
+        thread.start()
+        return True
+
+    def isfrozen(self):
+        return False
+
+
+class FakeDirac(object):
+    """ Answers the commands of the DiracFinaliser, keeping count of them and of the sandboxes downloaded at once """
+
+    def __init__(self, unknown=(), failed_sandboxes=(), failed_lookups=False):
+        self.lock = threading.Lock()
+        self.commands = []
+        self.downloading = 0
+        self.max_downloading = 0
+        self.looking_up = 0
+        self.max_looking_up = 0
+        self.unknown = unknown
+        self.failed_sandboxes = failed_sandboxes
+        self.failed_lookups = failed_lookups
+
+    def execute(self, command, **kwargs):
+        with self.lock:
+            self.commands.append(command)
+        if command.startswith('getOutputSandbox('):
+            dirac_id = int(command[len('getOutputSandbox('):].split(',')[0])
+            with self.lock:
+                self.downloading += 1
+                self.max_downloading = max(self.downloading, self.max_downloading)
+            time.sleep(0.01)
+            with self.lock:
+                self.downloading -= 1
+            if dirac_id in self.failed_sandboxes:
+                return {'OK': False, 'Message': 'No sandbox'}
+            return {'OK': True, 'Value': []}
+        elif command.startswith('getFinalisationInfo('):
+            with self.lock:
+                self.looking_up += 1
+                self.max_looking_up = max(self.looking_up, self.max_looking_up)
+            time.sleep(0.05)
+            with self.lock:
+                self.looking_up -= 1
+            if self.failed_lookups:
+                raise GangaDiracError('DIRAC command timed out')
+            dirac_ids = ast.literal_eval(command[len('getFinalisationInfo('):-1])
+            done = datetime.datetime(2020, 1, 1)
+            return dict((dirac_id, {'Status': 'Done',
+                                    'cpuTime': '%d' % dirac_id,
+                                    'outStateTime': {'running': done, 'completing': done, 'completed': done, 'failed': None},
+                                    'outDataInfo': {'out.dst': {'LFN': '/lhcb/user/%d/out.dst' % dirac_id,
+                                                                'GUID': 'guid-%d' % dirac_id,
+                                                                'LOCATIONS': ['CERN-USER']}}})
+                        for dirac_id in dirac_ids if dirac_id not in self.unknown)
+        raise AssertionError('Unexpected command: %s' % command)
+
+
+@pytest.yield_fixture(scope='function')
+def master_job():
+    """Provides a master job on the Dirac backend with five subjobs which have finished in DIRAC"""
+    load_config_files()
+    from GangaCore.Utility.Config import getConfig
+    from GangaCore.GPIDev.Lib.Job import Job
+    from GangaDirac.Lib.Backends.Dirac import Dirac
+    from GangaDirac.Lib.Files.DiracFile import DiracFile
+
+    getConfig('DIRAC').setSessionValue('maxSubjobsFinalisationPerProcess', 2)
+    getConfig('DIRAC').setSessionValue('maxConcurrentSandboxDownloads', 2)
+    getConfig('DIRAC').setSessionValue('maxConcurrentFinalisationLookups', 2)
+
+    j = Job()
+    j.id = 0
+    j.backend = Dirac()
+    j.status = 'running'
+    for i in range(5):
+        sj = Job()
+        sj.id = i
+        sj.backend = Dirac()
+        sj.backend.id = 1000 + i
+        sj.outputfiles = [DiracFile('*.dst')]
+        sj._setParent(j)
+        sj.status = 'completing'
+        j.subjobs.append(sj)
+        lfn_store = os.path.join(sj.getOutputWorkspace().getPath(), getConfig('Output')['PostProcessLocationsFileName'])
+        if os.path.exists(lfn_store):
+            os.remove(lfn_store)
+    yield j
+    clear_config()
+
+
+def finalise(jobs, fake_dirac, downloadSandbox=True, threadpool=None):
+    from GangaDirac.Lib.Backends.DiracBase import DiracFinaliser
+
+    with patch('GangaCore.GPIDev.Adapters.IBackend.credential_store'):
+        with patch('GangaCore.GPIDev.Credentials.credential_store'):
+            with patch('GangaDirac.Lib.Backends.DiracBase.execute', fake_dirac.execute):
+                return DiracFinaliser(list(jobs), downloadSandbox, threadpool=threadpool or FakeThreadPool()).start().wait()
+
+
+def test_finaliser(master_job):
+    from GangaCore.Utility.Config import getConfig
+
+    fake_dirac = FakeDirac()
+    finaliser = finalise(master_job.subjobs, fake_dirac)
+
+    lookups = [c for c in fake_dirac.commands if c.startswith('getFinalisationInfo(')]
+    assert sorted(lookups) == ['getFinalisationInfo([1000, 1001])', 'getFinalisationInfo([1002, 1003])', 'getFinalisationInfo([1004])']
+    assert len([c for c in fake_dirac.commands if c.startswith('getOutputSandbox(')]) == 5
+    assert fake_dirac.max_downloading <= 2
+    assert fake_dirac.max_looking_up == 2
+
+    assert [sj.status for sj in master_job.subjobs] == ['completed'] * 5
+    assert [sj.backend.normCPUTime for sj in master_job.subjobs] == ['%d' % (1000 + i) for i in range(5)]
+    assert master_job.subjobs[0].time.timestamps['backend_final'] == datetime.datetime(2020, 1, 1)
+    assert not any(sj.been_queued for sj in master_job.subjobs)
+
+    lfn_store = os.path.join(master_job.subjobs[3].getOutputWorkspace().getPath(), getConfig('Output')['PostProcessLocationsFileName'])
+    with open(lfn_store) as f:
+        assert f.read() == "DiracFile:::*.dst&&out.dst->/lhcb/user/1003/out.dst:::['CERN-USER']:::guid-1003\n"
+
+    stages = finaliser.timer.getStages()
+    assert stages['sandbox'][1] == 5
+    assert stages['lookup'][1] == 5
+    assert stages['postprocess'][1] == 5
+    assert 'lookup 5 in' in finaliser.report()
+
+
+def test_finaliser_without_sandbox(master_job):
+    fake_dirac = FakeDirac()
+    finalise(master_job.subjobs, fake_dirac, downloadSandbox=False)
+
+    assert not [c for c in fake_dirac.commands if c.startswith('getOutputSandbox(')]
+    assert [sj.status for sj in master_job.subjobs] == ['completed'] * 5
+
+
+def test_finaliser_pool_frozen(master_job):
+    # The stages carry on in the thread which finds the pool frozen
+    threadpool = FakeThreadPool(freeze_after=2)
+    finalise(master_job.subjobs, FakeDirac(), threadpool=threadpool)
+
+    assert len(threadpool.threads) == 2
+    assert [sj.status for sj in master_job.subjobs] == ['completed'] * 5
+    assert not any(sj.been_queued for sj in master_job.subjobs)
+
+
+def test_finaliser_failures(master_job):
+    # A job DIRAC has forgotten and a job whose sandbox can't be downloaded are failed, the others are finalised
+    fake_dirac = FakeDirac(unknown=[1001], failed_sandboxes=[1003])
+    finalise(master_job.subjobs, fake_dirac)
+
+    assert [sj.status for sj in master_job.subjobs] == ['completed', 'failed', 'completed', 'failed', 'completed']
+
+    # A failed lookup leaves the jobs running for the monitoring to try again
+    for sj in master_job.subjobs:
+        sj.status = 'completing'
+    finalise(master_job.subjobs, FakeDirac(failed_lookups=True))
+
+    assert [sj.status for sj in master_job.subjobs] == ['running'] * 5
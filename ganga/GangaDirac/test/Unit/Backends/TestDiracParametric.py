@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import socket
+import inspect
+import subprocess
+import uuid
+
+import pytest
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+from GangaCore.testlib.GangaUnitTest import load_config_files, clear_config
+from GangaDirac.Lib.Server.InspectionClient import runClient
+from GangaDirac.Lib.Utilities.DiracUtilities import sendDiracServerCommand
+
+# A stand-in for the parts of the DIRAC API used by the job scripts. Each job submitted is written to the file named by
+# MOCK_DIRAC_LOG, a parametric job as one job for each set of its parameters, as the DIRAC WMS expands it
+mock_dirac = {
+    'DIRAC/__init__.py': '',
+    'DIRAC/Core/__init__.py': '',
+    'DIRAC/Core/Base/__init__.py': '',
+    'DIRAC/Core/Base/Script.py': 'def parseCommandLine():\n    pass\n',
+    'DIRAC/Interfaces/__init__.py': '',
+    'DIRAC/Interfaces/API/__init__.py': '',
+    'DIRAC/Interfaces/API/Job.py': '''
+class Job(object):
+
+    def __init__(self):
+        self.attributes = {}
+        self.sequences = {}
+
+    def setName(self, name):
+        self.attributes['JobName'] = name
+
+    def setExecutable(self, exe, arguments='', logFile=''):
+        self.attributes['Executable'] = exe
+        self.attributes['Arguments'] = arguments
+
+    def setInputSandbox(self, files):
+        self.attributes['InputSandbox'] = files
+
+    def setInputData(self, lfns):
+        self.attributes['InputData'] = lfns
+
+    def setParameterSequence(self, name, values, addToWorkflow=False):
+        self.sequences[name] = values
+
+    def setParametricInputData(self, lfns):
+        if lfns:
+            self.setParameterSequence('InputData', lfns, addToWorkflow='ParametricInputData')
+            self.attributes['InputData'] = '%(InputData)s'
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+''',
+    'DIRAC/Interfaces/API/Dirac.py': '''
+import os
+import json
+
+
+class Dirac(object):
+
+    def submit(self, job):
+        return self.submitJob(job)
+
+    def submitJob(self, job):
+        if job.sequences:
+            lengths = set(len(values) for values in job.sequences.values())
+            if len(lengths) != 1:
+                return {'OK': False, 'Message': 'Parameter sequences of different lengths'}
+            jobs = []
+            for index in range(lengths.pop()):
+                expanded = {}
+                for key, value in job.attributes.items():
+                    for name, values in job.sequences.items():
+                        if value == '%%(%s)s' % name:
+                            value = values[index]
+                        elif isinstance(value, str):
+                            value = value.replace('%%(%s)s' % name, str(values[index]))
+                    expanded[key] = value
+                jobs.append(expanded)
+        else:
+            jobs = [job.attributes]
+
+        with open(os.environ['MOCK_DIRAC_LOG'], 'a') as log:
+            for this_job in jobs:
+                log.write(json.dumps(this_job) + '\\n')
+        ids = list(range(1000, 1000 + len(jobs)))
+        if job.sequences:
+            return {'OK': True, 'Value': ids}
+        return {'OK': True, 'Value': ids[0]}
+''',
+}
+
+# The script made for each subjob by ExeDiracRTHandler, up to its name, arguments and input data
+subjob_script = """
+# dirac job created by ganga
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+from DIRAC.Interfaces.API.Dirac import Dirac
+from DIRAC.Interfaces.API.Job import Job
+dirac = Dirac()
+j = Job()
+
+# default commands added by ganga
+j.setName('{Ganga_Executable_(0.%s)}')
+j.setExecutable('exe-script.py','%s','Ganga_Executable.log')
+j.setExecutionEnv(None)
+j.setInputSandbox(['/ganga/workspace/0/input/_input_sandbox_0_master.tgz'])
+j.setOutputSandbox(['std.out', 'std.err'])
+j.setInputData(%r)
+j.setParametricInputData(None)
+
+# submit the job to dirac
+j.setPlatform( 'ANY' )
+result = dirac.submit(j)
+output(result)
+"""
+
+
+@pytest.fixture(scope='module')
+def mock_dirac_server(tmpdir_factory):
+    """
+    Run DiracProcess.py with the mock DIRAC API on its path in place of a DIRAC install
+    """
+    tmpdir = tmpdir_factory.mktemp('mock_dirac')
+    for name, contents in mock_dirac.items():
+        path = tmpdir.join(name)
+        path.dirpath().ensure(dir=True)
+        path.write(contents)
+    log = str(tmpdir.join('submitted'))
+
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(('localhost', 0))
+    port = s.getsockname()[1]
+    s.close()
+    serverpath = os.path.join(os.path.dirname(inspect.getsourcefile(runClient)), 'DiracProcess.py')
+    env = dict(os.environ, PYTHONPATH=str(tmpdir), MOCK_DIRAC_LOG=log)
+    process = subprocess.Popen([sys.executable, serverpath, str(port)], stdin=subprocess.PIPE, env=env)
+    rand_hash = uuid.uuid4()
+    process.stdin.write((str(rand_hash) + '\n').encode('utf-8'))
+    process.stdin.close()
+    for _ in range(100):
+        try:
+            socket.create_connection(('localhost', port)).close()
+            break
+        except socket.error:
+            time.sleep(0.1)
+
+    def run(command):
+        return sendDiracServerCommand(port, rand_hash, command, str(tmpdir))
+
+    # The job scripts are run with execfile as on a python 2 DIRAC server
+    run("def execfile(name):\n    exec(compile(open(name).read(), name, 'exec'), globals())")
+    yield run, log
+    process.kill()
+    process.wait()
+
+
+@pytest.yield_fixture(scope='function')
+def config():
+    """Loads the config as a Ganga session would for each test function"""
+    load_config_files()
+    yield
+    clear_config()
+
+
+def submitted_jobs(log):
+    """The jobs the mock DIRAC has been given so far"""
+    with open(log) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_parametric_script_submits_one_job_per_subjob(mock_dirac_server, config, tmpdir):
+    from GangaDirac.Lib.Backends.DiracUtils import get_parametric_skeleton, get_parametric_script
+
+    run, log = mock_dirac_server
+    skeletons = set()
+    parameters = []
+    for i in range(3):
+        skeleton, these_parameters = get_parametric_skeleton(subjob_script % (i, 'arg%s' % i, ['LFN:/lhcb/%s.dst' % i]))
+        skeletons.add(skeleton)
+        parameters.append(these_parameters)
+    assert len(skeletons) == 1, 'the subjobs should share one parametric job'
+
+    script = str(tmpdir.join('dirac-parametric-script-0.py'))
+    with open(script, 'w') as f:
+        f.write(get_parametric_script(skeletons.pop(), parameters))
+
+    assert run("execfile('%s')" % script) == {'OK': True, 'Value': [1000, 1001, 1002]}
+    jobs = submitted_jobs(log)[-3:]
+    assert [job['JobName'] for job in jobs] == ['{Ganga_Executable_(0.%s)}' % i for i in range(3)]
+    assert [job['Arguments'] for job in jobs] == ['arg0', 'arg1', 'arg2']
+    assert [job['InputData'] for job in jobs] == [['LFN:/lhcb/%s.dst' % i] for i in range(3)]
+    assert all(job['InputSandbox'] == ['/ganga/workspace/0/input/_input_sandbox_0_master.tgz'] for job in jobs)
+
+
+@pytest.yield_fixture(scope='function')
+def master_job(config):
+    """Provides a master job on the Dirac backend with three subjobs being submitted"""
+    from GangaCore.GPIDev.Lib.Job import Job
+    from GangaDirac.Lib.Backends.Dirac import Dirac
+
+    j = Job()
+    j.id = 0
+    j.backend = Dirac()
+    for i in range(3):
+        sj = Job()
+        sj.id = i
+        sj.backend = Dirac()
+        sj._setParent(j)
+        sj.status = 'submitting'
+        j.subjobs.append(sj)
+    yield j
+
+
+def test__parametric_submit(mock_dirac_server, master_job, tmpdir):
+    from GangaDirac.Lib.Backends.DiracUtils import get_parametric_skeleton, get_parametric_script
+
+    run, log = mock_dirac_server
+    parameters = [get_parametric_skeleton(subjob_script % (i, '', None))[1] for i in range(3)]
+    skeleton = get_parametric_skeleton(subjob_script % (0, '', None))[0]
+    script = str(tmpdir.join('dirac-parametric-script-0.py'))
+    with open(script, 'w') as f:
+        f.write(get_parametric_script(skeleton, parameters))
+
+    def execute(command, **kwargs):
+        return run(command)
+
+    with patch('GangaCore.GPIDev.Credentials.credential_store'):
+        with patch('GangaDirac.Lib.Backends.DiracBase.execute', execute):
+            assert master_job.backend._parametric_submit(script, master_job.subjobs)
+
+    assert [sj.backend.id for sj in master_job.subjobs] == [1000, 1001, 1002]
+    assert [sj.status for sj in master_job.subjobs] == ['submitted'] * 3
+
+    # A DIRAC error leaves all the subjobs failed
+    for sj in master_job.subjobs:
+        sj.status = 'submitting'
+
+    def failing_execute(command, **kwargs):
+        return {'OK': False, 'Message': 'Too many parametric jobs'}
+
+    with patch('GangaCore.GPIDev.Credentials.credential_store'):
+        with patch('GangaDirac.Lib.Backends.DiracBase.execute', failing_execute):
+            assert not master_job.backend._parametric_submit(script, master_job.subjobs)
+
+    assert [sj.status for sj in master_job.subjobs] == ['failed'] * 3
+
+
+def test__parametric_master_submit_failure(master_job, tmpdir):
+    """An unexpected error from a parametric submission leaves its subjobs failed rather than submitting, and the
+    dirac-script of each subjob is only generated once"""
+    from GangaDirac.Lib.Backends.Dirac import Dirac
+
+    scripts = [subjob_script % (0, '', None), subjob_script % (1, '', None), 'not a parametric job']
+    calls = []
+
+    def job_script(backend, subjobconfig, master_input_sandbox, tmp_dir):
+        calls.append(subjobconfig)
+        return scripts[subjobconfig]
+
+    for sj in master_job.subjobs:
+        sj.status = 'new'
+    with patch.object(Dirac, '_job_script', job_script):
+        with patch.object(Dirac, '_parametric_submit', side_effect=RuntimeError('DIRAC went away')):
+            remaining = master_job.backend._parametric_master_submit(master_job.subjobs, [0, 1, 2], [], str(tmpdir))
+
+    assert calls == [0, 1, 2]
+    assert remaining == ([master_job.subjobs[2]], [2], ['not a parametric job'])
+    assert [sj.status for sj in master_job.subjobs] == ['failed', 'failed', 'new']
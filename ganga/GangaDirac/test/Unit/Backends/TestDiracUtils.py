@@ -61,6 +61,67 @@ j.somethingelse('other')
     assert isinstance(get_parametric_datasets(script.splitlines()), list)
 
 
+def test_get_parametric_skeleton():
+    from GangaDirac.Lib.Backends.DiracUtils import get_parametric_skeleton
+
+    script = """
+from DIRAC import Job
+j=Job()
+j.setName('{Ganga_Executable_(0.%s)}')
+j.setExecutable('exe-script.py','%s','Ganga_Executable.log')
+j.setInputSandbox(['_input_sandbox_0_master.tgz'])
+j.setInputData(%r)
+j.setParametricInputData(None)
+result = dirac.submit(j)
+"""
+
+    skeleton1, parameters1 = get_parametric_skeleton(script % (1, 'a', ['LFN:/x/1']))
+    skeleton2, parameters2 = get_parametric_skeleton(script % (2, 'b c', ['LFN:/x/2', 'LFN:/x/3']))
+    assert skeleton1 == skeleton2, 'subjobs differing only by their parameters should share a skeleton'
+    assert parameters1 == {'JobName': '{Ganga_Executable_(0.1)}', 'Arguments': 'a', 'InputData': ['LFN:/x/1']}
+    assert parameters2['InputData'] == ['LFN:/x/2', 'LFN:/x/3']
+    assert "j.setName('%(JobName)s')" in skeleton1
+    assert "j.setExecutable('exe-script.py', '%(Arguments)s', 'Ganga_Executable.log')" in skeleton1
+    assert 'setInputData' not in skeleton1 and 'setParametricInputData' not in skeleton1
+
+    # No input data isn't a parameter, so these subjobs only go with others without input data
+    skeleton3, parameters3 = get_parametric_skeleton(script % (3, 'a', None))
+    assert skeleton3 != skeleton1
+    assert 'j.setInputData(None)' in skeleton3
+    assert 'InputData' not in parameters3
+
+    # A different sandbox is a different skeleton
+    skeleton4, _ = get_parametric_skeleton((script % (4, 'a', ['LFN:/x/4'])).replace("master.tgz'", "master.tgz', '_input_sandbox_0_4.tgz'"))
+    assert skeleton4 != skeleton1
+
+    # Already parametric scripts and scripts without a name are left alone
+    assert get_parametric_skeleton(script.replace('None', "[['a'], ['b']]") % (1, 'a', None)) == (None, None)
+    assert get_parametric_skeleton("j=Job()\nresult = dirac.submit(j)\n") == (None, None)
+
+
+def test_get_parametric_script():
+    from GangaDirac.Lib.Backends.DiracUtils import get_parametric_skeleton, get_parametric_script
+
+    script = """j=Job()
+j.setName('job%s')
+j.setExecutable('exe','%s','log')
+j.setInputData(%r)
+result = dirac.submit(j)"""
+
+    parameters = []
+    for i in range(3):
+        skeleton, these_parameters = get_parametric_skeleton(script % (i, 'arg%s' % i, ['LFN:/x/%s' % i]))
+        parameters.append(these_parameters)
+
+    assert get_parametric_script(skeleton, parameters) == """j=Job()
+j.setParameterSequence('Arguments', ['arg0', 'arg1', 'arg2'])
+j.setParametricInputData([['LFN:/x/0'], ['LFN:/x/1'], ['LFN:/x/2']])
+j.setParameterSequence('JobName', ['job0', 'job1', 'job2'])
+j.setName('%(JobName)s')
+j.setExecutable('exe', '%(Arguments)s', 'log')
+result = dirac.submit(j)"""
+
+
 def test_outputfiles_iterator():
     from GangaDirac.Lib.Backends.DiracUtils import outputfiles_iterator
 
@@ -0,0 +1,128 @@
+import socket
+import threading
+
+import pytest
+
+from GangaDirac.Lib.Utilities import DiracProcessPool as pool_module
+from GangaDirac.Lib.Utilities.DiracProcessPool import DiracProcessPool
+from GangaDirac.Lib.Utilities.DiracUtilities import GangaDiracError
+
+
+class FakeWorker(object):
+    """ Stand-in for a DIRAC server process which records the commands it ran """
+
+    started = []
+
+    def __init__(self, env):
+        self.env = env
+        self.commands = []
+        self.terminated = False
+        self.behaviour = env.get('behaviour')
+        FakeWorker.started.append(self)
+
+    def alive(self):
+        return not self.terminated
+
+    def run(self, command, cwd, timeout=None):
+        self.commands.append(command)
+        if self.behaviour == 'timeout':
+            raise socket.timeout()
+        if self.behaviour == 'crash' and len(FakeWorker.started) == 1:
+            raise socket.error('Connection refused')
+        if self.behaviour == 'block':
+            self.env['event'].wait()
+        return {'OK': True, 'Value': command}
+
+    def terminate(self):
+        self.terminated = True
+
+
+@pytest.fixture(autouse=True)
+def fake_worker(monkeypatch):
+    FakeWorker.started = []
+    monkeypatch.setattr(pool_module, 'DiracServerWorker', FakeWorker)
+
+
+def test_worker_reused():
+    pool = DiracProcessPool(2)
+    assert pool.execute('a', {}, '/tmp') == {'OK': True, 'Value': 'a'}
+    assert pool.execute('b', {}, '/tmp') == {'OK': True, 'Value': 'b'}
+    assert len(FakeWorker.started) == 1
+    assert FakeWorker.started[0].commands == ['a', 'b']
+    stats = pool.stats()
+    assert stats['workers'] == 1
+    assert stats['idle'] == 1
+    assert stats['calls'] == 2
+
+
+def test_workers_keyed_by_credential():
+    pool = DiracProcessPool(2)
+    pool.execute('a', {}, '/tmp', key=('env', '/proxy1'))
+    pool.execute('b', {}, '/tmp', key=('env', '/proxy2'))
+    assert len(FakeWorker.started) == 2
+
+
+def test_timeout_recycles_worker():
+    pool = DiracProcessPool(1)
+    with pytest.raises(GangaDiracError):
+        pool.execute('a', {'behaviour': 'timeout'}, '/tmp')
+    assert FakeWorker.started[0].terminated
+    stats = pool.stats()
+    assert stats['workers'] == 0
+    assert stats['failures'] == 1
+    assert stats['recycled'] == 1
+
+
+def test_crash_retried_on_new_worker():
+    pool = DiracProcessPool(1)
+    assert pool.execute('a', {'behaviour': 'crash'}, '/tmp') == {'OK': True, 'Value': 'a'}
+    assert len(FakeWorker.started) == 2
+    assert FakeWorker.started[0].terminated
+    assert not FakeWorker.started[1].terminated
+
+
+def test_concurrent_commands_bounded():
+    pool = DiracProcessPool(2)
+    event = threading.Event()
+    env = {'behaviour': 'block', 'event': event}
+    threads = [threading.Thread(target=pool.execute, args=(str(i), env, '/tmp')) for i in range(4)]
+    for t in threads:
+        t.start()
+    while pool.stats()['queued'] < 2:
+        event.wait(0.01)
+    assert len(FakeWorker.started) == 2
+    event.set()
+    for t in threads:
+        t.join()
+    assert pool.stats()['calls'] == 4
+    assert len(FakeWorker.started) == 2
+
+
+def test_shutdown_releases_waiting_commands():
+    pool = DiracProcessPool(1)
+    event = threading.Event()
+    env = {'behaviour': 'block', 'event': event}
+    errors = []
+
+    def run(command):
+        try:
+            pool.execute(command, env, '/tmp')
+        except GangaDiracError as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=run, args=(str(i),)) for i in range(2)]
+    for t in threads:
+        t.start()
+    while pool.stats()['queued'] < 1:
+        event.wait(0.01)
+    pool.shutdown()
+    event.set()
+    for t in threads:
+        t.join(5)
+    assert not any(t.is_alive() for t in threads)
+    assert len(errors) == 1
+    assert FakeWorker.started[0].terminated
+    assert pool.stats()['workers'] == 0
+
+    with pytest.raises(GangaDiracError):
+        pool.execute('a', {}, '/tmp')
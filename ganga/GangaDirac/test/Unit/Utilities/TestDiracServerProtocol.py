@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import socket
+import inspect
+import subprocess
+import uuid
+
+import pytest
+
+from GangaDirac.Lib.Server.InspectionClient import runClient
+from GangaDirac.Lib.Utilities.DiracUtilities import sendDiracServerCommand, iterDiracServerCommand
+
+
+@pytest.fixture(scope='module')
+def dirac_server():
+    """
+    Run DiracProcess.py in this python, no DIRAC install is needed as long as the commands don't use it
+    """
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(('localhost', 0))
+    port = s.getsockname()[1]
+    s.close()
+    serverpath = os.path.join(os.path.dirname(inspect.getsourcefile(runClient)), 'DiracProcess.py')
+    process = subprocess.Popen([sys.executable, serverpath, str(port)], stdin=subprocess.PIPE)
+    rand_hash = uuid.uuid4()
+    process.stdin.write((str(rand_hash) + '\n').encode('utf-8'))
+    process.stdin.close()
+    for _ in range(100):
+        try:
+            socket.create_connection(('localhost', port)).close()
+            break
+        except socket.error:
+            time.sleep(0.1)
+    yield port, rand_hash
+    process.kill()
+    process.wait()
+
+
+def test_reply_round_trip(dirac_server):
+    port, rand_hash = dirac_server
+    reply = {'OK': True, 'Value': {123456789012: ['a', 1.5, None], 'b': (1, 2)}}
+    assert sendDiracServerCommand(port, rand_hash, 'output(%r)' % reply, os.getcwd()) == reply
+
+
+def test_large_reply(dirac_server):
+    port, rand_hash = dirac_server
+    reply = sendDiracServerCommand(port, rand_hash, "output({'OK': True, 'Value': 'x' * 5000000})", os.getcwd())
+    assert len(reply['Value']) == 5000000
+
+
+def test_no_output(dirac_server):
+    port, rand_hash = dirac_server
+    assert sendDiracServerCommand(port, rand_hash, 'a = 1', os.getcwd()) is None
+
+
+def test_streamed_reply(dirac_server):
+    port, rand_hash = dirac_server
+    command = 'for i in range(5):\n    output(list(range(i)))'
+    assert list(iterDiracServerCommand(port, rand_hash, command, os.getcwd())) == [list(range(i)) for i in range(5)]
+
+
+def test_untrusted_command_rejected(dirac_server):
+    port, rand_hash = dirac_server
+    with pytest.raises(EOFError):
+        sendDiracServerCommand(port, uuid.uuid4(), "output('should not run')", os.getcwd())
+    assert sendDiracServerCommand(port, rand_hash, "output('still running')", os.getcwd()) == 'still running'
+
+
+def test_exception_reply(dirac_server):
+    port, rand_hash = dirac_server
+    reply = sendDiracServerCommand(port, rand_hash, "raise ValueError('no such job')", os.getcwd())
+    assert reply['OK'] is False
+    assert "ValueError: no such job" in reply['Message']